@@ -0,0 +1,138 @@
+"""Fixtures for the micro-benchmarks.
+
+The fixtures are sized like the worst cases seen in production: long AI
+service descriptions, 50-turn conversations and 200-claim extraction outputs.
+A ChatML tokenizer stand-in replaces the Hugging Face tokenizer, so that the
+suite runs offline and measures only our own code.
+"""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from orbitals.types import AIServiceDescription, AIServiceDescriptionV2
+
+_SENTENCE = (
+    "The assistant helps customers of Postal Service track their parcels, "
+    "reschedule deliveries and find the nearest pickup point. "
+)
+
+
+class ChatMLTokenizer:
+    """Renders chat templates the way Qwen tokenizers do, without the vocabulary."""
+
+    def apply_chat_template(
+        self,
+        messages,
+        tokenize=False,
+        add_generation_prompt=False,
+        enable_thinking=True,
+    ):
+        prompt = "".join(
+            f"<|im_start|>{m['role']}\n{m['content']}<|im_end|>\n" for m in messages
+        )
+        if add_generation_prompt:
+            prompt += "<|im_start|>assistant\n"
+            if not enable_thinking:
+                prompt += "<think>\n\n</think>\n\n"
+        return prompt
+
+    def encode(self, text):
+        # roughly 4 characters per token
+        return list(range(len(text) // 4))
+
+
+@pytest.fixture(scope="session")
+def tokenizer() -> ChatMLTokenizer:
+    return ChatMLTokenizer()
+
+
+@pytest.fixture(scope="session")
+def long_description() -> str:
+    return _SENTENCE * 80
+
+
+@pytest.fixture(scope="session")
+def structured_description() -> AIServiceDescription:
+    return AIServiceDescription(
+        identity_role=_SENTENCE * 5,
+        context=_SENTENCE * 10,
+        knowledge_scope=_SENTENCE * 10,
+        functionalities=[_SENTENCE] * 30,
+        principles=[f"Never discuss topic number {i}." for i in range(40)],
+    )
+
+
+@pytest.fixture(scope="session")
+def structured_description_v2() -> AIServiceDescriptionV2:
+    return AIServiceDescriptionV2(
+        identity_role=_SENTENCE * 5,
+        context=_SENTENCE * 10,
+        knowledge_scope=_SENTENCE * 10,
+        functionalities=[_SENTENCE] * 30,
+        constraints=[f"Never discuss topic number {i}." for i in range(40)],
+    )
+
+
+@pytest.fixture(scope="session")
+def conversation_dicts() -> list[dict]:
+    """A 50-turn conversation ending with a user message."""
+    return [
+        {
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": f"Turn {i}. " + _SENTENCE * 3,
+        }
+        for i in range(49)
+    ]
+
+
+def _extractions(n_claims: int, evidences: bool) -> dict:
+    def _evidences():
+        return {"evidences": [_SENTENCE[:80], _SENTENCE[40:120]]} if evidences else {}
+
+    return {
+        "extractions": {
+            "intents": [
+                {"content": f"The user wants to track parcel {i}.", **_evidences()}
+                for i in range(20)
+            ],
+            "claims": [
+                {
+                    "subtype": ("Factoid", "Capability", "User Assertion")[i % 3],
+                    "content": f"Parcel {i} is expected on day {i % 7}. \U0001f4e6",
+                    **_evidences(),
+                }
+                for i in range(n_claims)
+            ],
+        }
+    }
+
+
+@pytest.fixture(scope="session")
+def extractions_200() -> dict:
+    return _extractions(200, evidences=True)
+
+
+@pytest.fixture(scope="session")
+def extractions_200_no_evidences() -> dict:
+    return _extractions(200, evidences=False)
+
+
+@pytest.fixture(scope="session")
+def extractions_200_text(extractions_200) -> str:
+    return json.dumps(extractions_200)
+
+
+@pytest.fixture(scope="session")
+def extractions_200_with_surrogates(extractions_200) -> dict:
+    # structured decoding sometimes splits emoji pairs into lone surrogates
+    return json.loads(json.dumps(extractions_200).replace("\\ud83d", "\\ud83d\\ud800"))
+
+
+@pytest.fixture(scope="session")
+def intents_only_text(extractions_200) -> str:
+    """Output of an intents-only generation, stopped at the claims key."""
+    text = json.dumps(extractions_200)
+    return text[: text.index('"claims":')]
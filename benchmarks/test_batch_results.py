@@ -0,0 +1,51 @@
+"""Benchmarks for the compact batch results (`batch_*(compact=True)`)."""
+
+from __future__ import annotations
+
+import pytest
+
+from orbitals.claim_extractor.modeling import (
+    Claim,
+    ClaimExtractorBatchResult,
+    ClaimExtractorOutput,
+    Extractions,
+    Intent,
+)
+from orbitals.types import LLMUsage
+
+pytest.importorskip("pytest_benchmark")
+
+
+@pytest.fixture(scope="module")
+def outputs_1k() -> list[ClaimExtractorOutput]:
+    """1k extraction outputs with 3 intents and 20 claims each."""
+    return [
+        ClaimExtractorOutput(
+            extractions=Extractions(
+                intents=[
+                    Intent(content=f"Intent {i}.{j}", evidences=[f"evidence {j}"])
+                    for j in range(3)
+                ],
+                claims=[
+                    Claim(
+                        subtype="Factoid",
+                        content=f"Claim {i}.{j}",
+                        evidences=[f"evidence {j}", f"more evidence {j}"],
+                    )
+                    for j in range(20)
+                ],
+            ),
+            model="principled-intelligence/claim-extractor-4B-q-2605",
+            usage=LLMUsage(prompt_tokens=900, completion_tokens=600, total_tokens=1500),
+        )
+        for i in range(1_000)
+    ]
+
+
+def test_pack_1k_outputs(benchmark, outputs_1k):
+    benchmark(ClaimExtractorBatchResult.from_outputs, outputs_1k)
+
+
+def test_unpack_1k_outputs(benchmark, outputs_1k):
+    result = ClaimExtractorBatchResult.from_outputs(outputs_1k)
+    benchmark(result.to_list)
@@ -0,0 +1,95 @@
+"""Benchmarks for the length-bucketed batching of the Hugging Face backends.
+
+The padding benchmarks only need the standard library. The generation one runs
+a tiny, randomly initialized Qwen2 model on CPU and is skipped when `torch` or
+`transformers` are not installed.
+"""
+
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from orbitals.bucketing import length_buckets, padded_tokens
+
+pytest.importorskip("pytest_benchmark")
+
+BATCH_SIZE = 16
+MAX_TOKENS_PER_BATCH = 16 * 1024
+
+
+@pytest.fixture(scope="module")
+def prompt_lengths() -> list[int]:
+    """1k prompt lengths: mostly short chats, with a long tail of long ones."""
+    rng = random.Random(0)
+    return [
+        int(rng.lognormvariate(6.5, 0.6)) + 800  # the system prompt
+        for _ in range(1000)
+    ]
+
+
+def _fixed_batches(n: int, batch_size: int) -> list[list[int]]:
+    return [list(range(i, min(i + batch_size, n))) for i in range(0, n, batch_size)]
+
+
+def test_padding_waste(benchmark, prompt_lengths):
+    buckets = benchmark(length_buckets, prompt_lengths, MAX_TOKENS_PER_BATCH)
+
+    real = sum(prompt_lengths)
+    fixed = padded_tokens(
+        prompt_lengths, _fixed_batches(len(prompt_lengths), BATCH_SIZE)
+    )
+    bucketed = padded_tokens(prompt_lengths, buckets)
+    benchmark.extra_info["padding_waste_fixed"] = round(1 - real / fixed, 3)
+    benchmark.extra_info["padding_waste_bucketed"] = round(1 - real / bucketed, 3)
+    assert bucketed < fixed
+
+
+@pytest.mark.parametrize("strategy", ["fixed", "bucketed"])
+def test_generate_tiny_model(benchmark, strategy):
+    torch = pytest.importorskip("torch")
+    transformers = pytest.importorskip("transformers")
+
+    torch.manual_seed(0)
+    model = transformers.Qwen2ForCausalLM(
+        transformers.Qwen2Config(
+            vocab_size=1024,
+            hidden_size=64,
+            intermediate_size=128,
+            num_hidden_layers=2,
+            num_attention_heads=4,
+            num_key_value_heads=2,
+        )
+    ).eval()
+
+    rng = random.Random(0)
+    lengths = [rng.choice([16, 24, 32, 384]) for _ in range(64)]
+    prompts = [torch.randint(1, 1024, (length,)) for length in lengths]
+    batches = (
+        _fixed_batches(len(prompts), 8)
+        if strategy == "fixed"
+        else length_buckets(lengths, max_tokens_per_batch=8 * 384)
+    )
+
+    def _generate():
+        for batch in batches:
+            longest = max(lengths[i] for i in batch)
+            input_ids = torch.zeros((len(batch), longest), dtype=torch.long)
+            attention_mask = torch.zeros_like(input_ids)
+            for row, i in enumerate(batch):
+                # left padding, as in the orbitals pipelines
+                input_ids[row, longest - lengths[i] :] = prompts[i]
+                attention_mask[row, longest - lengths[i] :] = 1
+            with torch.inference_mode():
+                model.generate(
+                    input_ids=input_ids,
+                    attention_mask=attention_mask,
+                    max_new_tokens=8,
+                    do_sample=False,
+                    pad_token_id=0,
+                )
+
+    benchmark.pedantic(_generate, rounds=3, iterations=1)
+    benchmark.extra_info["padded_tokens"] = padded_tokens(lengths, batches)
+    benchmark.extra_info["prompt_tokens"] = sum(lengths)
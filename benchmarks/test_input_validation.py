@@ -0,0 +1,65 @@
+"""Benchmarks for conversation input validation."""
+
+from __future__ import annotations
+
+import pytest
+
+from orbitals.claim_extractor.modeling import ClaimExtractorInputTypeAdapter
+from orbitals.scope_guard.modeling import ScopeGuardInputTypeAdapter
+from orbitals.scope_guard_v2.modeling import ScopeGuardV2InputTypeAdapter
+
+pytest.importorskip("pytest_benchmark")
+
+
+@pytest.mark.parametrize(
+    "adapter",
+    [
+        ScopeGuardInputTypeAdapter,
+        ScopeGuardV2InputTypeAdapter,
+        ClaimExtractorInputTypeAdapter,
+    ],
+    ids=["scope-guard", "scope-guard-v2", "claim-extractor"],
+)
+def test_validate_conversation(benchmark, adapter, conversation_dicts):
+    benchmark(adapter.validate_python, conversation_dicts)
+
+
+@pytest.fixture(scope="module")
+def conversations_10k() -> list[list[dict]]:
+    """10k short conversations, the size of a large `batch_validate` call."""
+    return [
+        [
+            {"role": "user", "content": f"I ordered parcel {i}."},
+            {"role": "assistant", "content": "It is in transit."},
+            {"role": "user", "content": "When will it arrive?"},
+        ]
+        for i in range(10_000)
+    ]
+
+
+def test_validate_10k_conversations(benchmark, conversations_10k):
+    benchmark(
+        lambda: [
+            ScopeGuardInputTypeAdapter.validate_python(c) for c in conversations_10k
+        ]
+    )
+
+
+def test_revalidate_10k_validated_conversations(benchmark, conversations_10k):
+    validated = [
+        ScopeGuardInputTypeAdapter.validate_python(c) for c in conversations_10k
+    ]
+    benchmark(
+        lambda: [ScopeGuardInputTypeAdapter.validate_python(c) for c in validated]
+    )
+
+
+def test_validate_single_message(benchmark):
+    benchmark(
+        ScopeGuardInputTypeAdapter.validate_python,
+        {"role": "user", "content": "Where is my parcel?"},
+    )
+
+
+def test_validate_string(benchmark):
+    benchmark(ScopeGuardInputTypeAdapter.validate_python, "Where is my parcel?")
@@ -0,0 +1,51 @@
+"""Benchmarks for parsing and validating generated outputs."""
+
+from __future__ import annotations
+
+import pytest
+
+from orbitals.claim_extractor.extractors.vllm import _strip_lone_surrogates
+from orbitals.claim_extractor.modeling import _parse_raw_output
+from orbitals.claim_extractor.prompting import (
+    _balance_truncated_json,
+    parse_intents_only_output,
+    validate_extractions_response,
+)
+
+pytest.importorskip("pytest_benchmark")
+
+
+def test_balance_truncated_json(benchmark, intents_only_text):
+    benchmark(_balance_truncated_json, intents_only_text)
+
+
+def test_parse_intents_only_output(benchmark, intents_only_text):
+    result = benchmark(parse_intents_only_output, intents_only_text)
+    assert len(result.intents) == 20
+
+
+def test_parse_raw_output(benchmark, extractions_200_text):
+    result = benchmark(_parse_raw_output, extractions_200_text)
+    assert len(result.claims) == 200
+
+
+def test_strip_lone_surrogates(benchmark, extractions_200_with_surrogates):
+    benchmark(_strip_lone_surrogates, extractions_200_with_surrogates)
+
+
+def test_validate_extractions_response(benchmark, extractions_200):
+    result = benchmark(
+        validate_extractions_response, extractions_200, skip_evidences=False
+    )
+    assert len(result.extractions.claims) == 200
+
+
+def test_validate_extractions_response_skip_evidences(
+    benchmark, extractions_200_no_evidences
+):
+    result = benchmark(
+        validate_extractions_response,
+        extractions_200_no_evidences,
+        skip_evidences=True,
+    )
+    assert len(result.extractions.claims) == 200
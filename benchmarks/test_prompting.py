@@ -0,0 +1,86 @@
+"""Benchmarks for conversation dumping and prompt building."""
+
+from __future__ import annotations
+
+import pytest
+
+from orbitals.claim_extractor import prompting as claim_extractor_prompting
+from orbitals.claim_extractor.modeling import ClaimExtractorInputTypeAdapter
+from orbitals.scope_guard import prompting as scope_guard_prompting
+from orbitals.scope_guard.modeling import ScopeGuardInputTypeAdapter
+from orbitals.scope_guard_v2 import prompting as scope_guard_v2_prompting
+from orbitals.scope_guard_v2.modeling import ScopeGuardV2InputTypeAdapter
+from orbitals.types import Conversation
+
+pytest.importorskip("pytest_benchmark")
+
+
+@pytest.fixture(scope="module")
+def scope_guard_conversation(conversation_dicts):
+    return ScopeGuardInputTypeAdapter.validate_python(conversation_dicts)
+
+
+@pytest.fixture(scope="module")
+def scope_guard_v2_conversation(conversation_dicts):
+    return ScopeGuardV2InputTypeAdapter.validate_python(conversation_dicts)
+
+
+@pytest.fixture(scope="module")
+def claim_extractor_conversation(conversation_dicts):
+    return ClaimExtractorInputTypeAdapter.validate_python(conversation_dicts)
+
+
+def test_scope_guard_dump_conversation(benchmark, scope_guard_conversation):
+    benchmark(scope_guard_prompting.dump_conversation, scope_guard_conversation)
+
+
+def test_scope_guard_v2_dumps_conversation(benchmark, scope_guard_v2_conversation):
+    conversation = Conversation(messages=scope_guard_v2_conversation)
+    benchmark(scope_guard_v2_prompting.dumps_conversation, conversation)
+
+
+def test_claim_extractor_dumps_conversation(benchmark, claim_extractor_conversation):
+    benchmark(
+        claim_extractor_prompting.dumps_conversation, claim_extractor_conversation
+    )
+
+
+@pytest.mark.parametrize("description", ["long_description", "structured_description"])
+def test_scope_guard_build_prompt(
+    benchmark, request, tokenizer, scope_guard_conversation, description
+):
+    benchmark(
+        scope_guard_prompting.build_prompt,
+        tokenizer,
+        scope_guard_conversation,
+        request.getfixturevalue(description),
+        skip_evidences=False,
+    )
+
+
+@pytest.mark.parametrize(
+    "description", ["long_description", "structured_description_v2"]
+)
+def test_scope_guard_v2_build_prompt(
+    benchmark, request, tokenizer, scope_guard_v2_conversation, description
+):
+    benchmark(
+        scope_guard_v2_prompting.build_prompt,
+        tokenizer,
+        scope_guard_v2_conversation,
+        request.getfixturevalue(description),
+        skip_evidences=False,
+    )
+
+
+@pytest.mark.parametrize("description", ["long_description", "structured_description"])
+def test_claim_extractor_build_prompt(
+    benchmark, request, tokenizer, claim_extractor_conversation, description
+):
+    benchmark(
+        claim_extractor_prompting.build_prompt,
+        tokenizer,
+        claim_extractor_conversation,
+        request.getfixturevalue(description),
+        skip_evidences=False,
+    )
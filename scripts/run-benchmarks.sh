@@ -0,0 +1,31 @@
+#!/usr/bin/env bash
+# Run the micro-benchmarks under benchmarks/ and save the results as JSON.
+#
+# Every run is also saved under .benchmarks/ (per machine). When a previous run
+# exists, the new one is compared against it and the script fails if the
+# median of any benchmark regressed by more than THRESHOLD.
+#
+# Tips:
+#   - THRESHOLD=10% ./scripts/run-benchmarks.sh   to tighten the regression gate
+#   - OUTPUT=/tmp/bench.json ./scripts/run-benchmarks.sh   to change the JSON path
+#   - extra arguments are passed through to pytest, e.g. `-k parse`
+
+set -euo pipefail
+
+REPO_ROOT="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)"
+cd "$REPO_ROOT"
+
+THRESHOLD="${THRESHOLD:-20%}"
+OUTPUT="${OUTPUT:-benchmarks/results.json}"
+
+args=(
+    benchmarks
+    --benchmark-json="$OUTPUT"
+    --benchmark-autosave
+    --benchmark-sort=name
+)
+if compgen -G ".benchmarks/*/*.json" > /dev/null; then
+    args+=(--benchmark-compare --benchmark-compare-fail="median:$THRESHOLD")
+fi
+
+uv run --with pytest-benchmark pytest "${args[@]}" "$@"
@@ -1,3 +1,5 @@
+import functools
+
 import torch
 import transformers
 from transformers import Pipeline
@@ -6,6 +8,9 @@ try:
     import orbitals.claim_extractor
     import orbitals.claim_extractor.modeling
     import orbitals.claim_extractor.prompting
+    import orbitals.json_scan
+    import orbitals.prefix_cache
+    import orbitals.structured_decoding
     import orbitals.types
 except ModuleNotFoundError:
     raise ImportError(
@@ -13,6 +18,14 @@ except ModuleNotFoundError:
     )
 
 
+@functools.cache
+def _response_schema(skip_evidences: bool) -> dict:
+    # built once per response shape: model_json_schema() walks the whole model
+    return orbitals.claim_extractor.prompting.get_extractions_response_model(
+        skip_evidences
+    ).model_json_schema()
+
+
 class ClaimExtractionPipeline(Pipeline):
     def __init__(
         self,
@@ -27,6 +40,11 @@ class ClaimExtractionPipeline(Pipeline):
         top_p: float = 0.8,
         top_k: int = 20,
         min_p: float = 0.0,
+        cache_system_prompt: bool = False,
+        cache_descriptions: bool = False,
+        max_cached_prefixes: int = 16,
+        stop_at_json_end: bool = True,
+        structured_outputs: bool = False,
         **kwargs,
     ):
         if tokenizer is None and isinstance(model, str):
@@ -55,6 +73,24 @@ class ClaimExtractionPipeline(Pipeline):
         self.top_p = top_p
         self.top_k = top_k
         self.min_p = min_p
+        self.stop_at_json_end = stop_at_json_end
+        # constrain generation to the response JSON schema, like the vllm-api
+        # backends do with `structured_outputs`
+        self._json_schema_decoding = (
+            orbitals.structured_decoding.JSONSchemaDecoding()
+            if structured_outputs
+            else None
+        )
+
+        # reuse the key/value states of the system prompt (and optionally of
+        # the AI service description) across batches, see PrefixCache
+        self._prefix_cache = (
+            orbitals.prefix_cache.PrefixCache(
+                cache_descriptions=cache_descriptions, max_size=max_cached_prefixes
+            )
+            if cache_system_prompt or cache_descriptions
+            else None
+        )
 
         super().__init__(model, tokenizer, **kwargs)
 
@@ -68,6 +104,9 @@ class ClaimExtractionPipeline(Pipeline):
         forward_kwargs = {
             "intents_only": kwargs.get("intents_only", self.intents_only)
         }
+        if self._json_schema_decoding is not None:
+            # the response schema depends on whether evidences are reported
+            forward_kwargs["skip_evidences"] = preprocess_kwargs["skip_evidences"]
 
         return (
             preprocess_kwargs,
@@ -100,13 +139,21 @@ class ClaimExtractionPipeline(Pipeline):
 
         return {"text": text}
 
-    def _forward(self, model_inputs, intents_only: bool = False):
-        tokenized = self.tokenizer(
-            model_inputs["text"],
-            return_tensors="pt",
-            padding=True,
-            truncation=True,
-        ).to(self.device)
+    def _forward(
+        self, model_inputs, intents_only: bool = False, skip_evidences: bool = True
+    ):
+        tokenized = None
+        if self._prefix_cache is not None:
+            tokenized = self._prefix_cache.prepare(
+                self.model, self.tokenizer, model_inputs["text"]
+            )
+        if tokenized is None:
+            tokenized = self.tokenizer(
+                model_inputs["text"],
+                return_tensors="pt",
+                padding=True,
+                truncation=True,
+            ).to(self.device)
 
         generate_kwargs = dict(
             max_new_tokens=self.max_new_tokens,
@@ -124,6 +171,8 @@ class ClaimExtractionPipeline(Pipeline):
                 orbitals.claim_extractor.prompting.CLAIMS_STOP_STRING
             ]
             generate_kwargs["tokenizer"] = self.tokenizer
+        generate_kwargs["stopping_criteria"] = self._stopping_criteria(tokenized)
+        generate_kwargs["logits_processor"] = self._logits_processor(skip_evidences)
 
         with torch.inference_mode():
             outputs = self.model.generate(
@@ -135,6 +184,28 @@ class ClaimExtractionPipeline(Pipeline):
             "input_ids": tokenized["input_ids"],
         }
 
+    def _stopping_criteria(self, tokenized):
+        # end each sequence once its JSON object closes, rather than waiting
+        # for EOS, which a sequence emitting trailing text would hold back
+        criteria = transformers.StoppingCriteriaList()
+        if self.stop_at_json_end:
+            criteria.append(
+                orbitals.json_scan.JSONCompletionCriteria(
+                    self.tokenizer, prompt_length=tokenized["input_ids"].shape[1]
+                )
+            )
+        return criteria
+
+    def _logits_processor(self, skip_evidences: bool):
+        processors = transformers.LogitsProcessorList()
+        if self._json_schema_decoding is not None:
+            processors.append(
+                self._json_schema_decoding.logits_processor(
+                    self.model, self.tokenizer, _response_schema(skip_evidences)
+                )
+            )
+        return processors
+
     def postprocess(self, model_outputs):
         output_ids = model_outputs["output_ids"]
         input_ids = model_outputs["input_ids"]
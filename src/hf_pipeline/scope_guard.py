@@ -1,11 +1,16 @@
+import functools
+
 import torch
 import transformers
 from transformers import Pipeline
 
 try:
+    import orbitals.json_scan
+    import orbitals.prefix_cache
     import orbitals.scope_guard
     import orbitals.scope_guard.modeling
     import orbitals.scope_guard.prompting
+    import orbitals.structured_decoding
     import orbitals.types
 except ModuleNotFoundError:
     raise ImportError(
@@ -13,6 +18,12 @@ except ModuleNotFoundError:
     )
 
 
+@functools.cache
+def _response_schema() -> dict:
+    # built once: model_json_schema() walks the whole response model
+    return orbitals.scope_guard.prompting.ScopeGuardResponseModel.model_json_schema()
+
+
 class ScopeGuardPipeline(Pipeline):
     def __init__(
         self,
@@ -21,6 +32,11 @@ class ScopeGuardPipeline(Pipeline):
         skip_evidences: bool = False,
         max_new_tokens: int = 1024,
         do_sample: bool = False,
+        cache_system_prompt: bool = False,
+        cache_descriptions: bool = False,
+        max_cached_prefixes: int = 16,
+        stop_at_json_end: bool = True,
+        structured_outputs: bool = False,
         **kwargs,
     ):
         if tokenizer is None and isinstance(model, str):
@@ -43,6 +59,24 @@ class ScopeGuardPipeline(Pipeline):
         self.skip_evidences = skip_evidences
         self.max_new_tokens = max_new_tokens
         self.do_sample = do_sample
+        self.stop_at_json_end = stop_at_json_end
+        # constrain generation to the response JSON schema, like the vllm-api
+        # backends do with `structured_outputs`
+        self._json_schema_decoding = (
+            orbitals.structured_decoding.JSONSchemaDecoding()
+            if structured_outputs
+            else None
+        )
+
+        # reuse the key/value states of the system prompt (and optionally of
+        # the AI service description) across batches, see PrefixCache
+        self._prefix_cache = (
+            orbitals.prefix_cache.PrefixCache(
+                cache_descriptions=cache_descriptions, max_size=max_cached_prefixes
+            )
+            if cache_system_prompt or cache_descriptions
+            else None
+        )
 
         super().__init__(model, tokenizer, **kwargs)
 
@@ -55,11 +89,17 @@ class ScopeGuardPipeline(Pipeline):
             preprocess_kwargs["skip_evidences"] = kwargs.get(
                 "skip_evidences", self.skip_evidences
             )
+        forward_kwargs = {}
+        postprocess_kwargs = {}
+        if kwargs.get("score_labels"):
+            preprocess_kwargs["score_labels"] = True
+            forward_kwargs["score_labels"] = True
+            postprocess_kwargs["score_labels"] = True
 
         return (
             preprocess_kwargs,
-            {},
-            {},
+            forward_kwargs,
+            postprocess_kwargs,
         )
 
     def preprocess(
@@ -69,6 +109,7 @@ class ScopeGuardPipeline(Pipeline):
             str | orbitals.types.AIServiceDescription,
         ],
         skip_evidences: bool = False,
+        score_labels: bool = False,
     ):
         conversation, ai_service_description = inputs
 
@@ -84,17 +125,70 @@ class ScopeGuardPipeline(Pipeline):
             add_generation_prompt=True,
             enable_thinking=False,
         )
+        if score_labels:
+            # end the prompt where the model writes the scope class
+            text += '{"evidences": null, "scope_class": "'
 
         return {"text": text}
 
-    def _forward(self, model_inputs):
+    def _score_labels(self, texts):
+        if isinstance(texts, str):
+            texts = [texts]
+        continuations = orbitals.scope_guard.prompting.label_continuations()
         tokenized = self.tokenizer(
-            model_inputs["text"],
+            [text + continuation for text in texts for continuation in continuations],
             return_tensors="pt",
             padding=True,
             truncation=True,
         ).to(self.device)
 
+        # the label tokens of every sequence, after the ones shared by the
+        # sequences of the same prompt; with left padding they end every row
+        lengths = tokenized["attention_mask"].sum(-1).tolist()
+        rows = [
+            ids[-length:].tolist()
+            for ids, length in zip(tokenized["input_ids"], lengths)
+        ]
+        label_lengths = []
+        for start in range(0, len(rows), len(continuations)):
+            group = rows[start : start + len(continuations)]
+            shared = orbitals.scope_guard.prompting.shared_prefix_length(group)
+            label_lengths.extend(len(row) - shared for row in group)
+
+        # only the logits predicting the label tokens are computed
+        n_logits = max(label_lengths) + 1
+        with torch.inference_mode():
+            logits = self.model(**tokenized, logits_to_keep=n_logits).logits
+        token_logprobs = (
+            torch.log_softmax(logits[:, :-1].float(), dim=-1)
+            .gather(-1, tokenized["input_ids"][:, -(n_logits - 1) :, None])
+            .squeeze(-1)
+        )
+        label_logprobs = torch.stack(
+            [
+                token_logprobs[row, -label_length:].sum()
+                for row, label_length in enumerate(label_lengths)
+            ]
+        )
+        return {"label_logprobs": label_logprobs.view(len(texts), len(continuations))}
+
+    def _forward(self, model_inputs, score_labels: bool = False):
+        if score_labels:
+            return self._score_labels(model_inputs["text"])
+
+        tokenized = None
+        if self._prefix_cache is not None:
+            tokenized = self._prefix_cache.prepare(
+                self.model, self.tokenizer, model_inputs["text"]
+            )
+        if tokenized is None:
+            tokenized = self.tokenizer(
+                model_inputs["text"],
+                return_tensors="pt",
+                padding=True,
+                truncation=True,
+            ).to(self.device)
+
         with torch.inference_mode():
             outputs = self.model.generate(
                 **tokenized,
@@ -102,13 +196,43 @@ class ScopeGuardPipeline(Pipeline):
                 do_sample=self.do_sample,
                 eos_token_id=self.tokenizer.eos_token_id,
                 pad_token_id=self.tokenizer.pad_token_id,
+                stopping_criteria=self._stopping_criteria(tokenized),
+                logits_processor=self._logits_processor(),
             )
         return {
             "output_ids": outputs,
             "input_ids": tokenized["input_ids"],
         }
 
-    def postprocess(self, model_outputs):
+    def _stopping_criteria(self, tokenized):
+        # end each sequence once its JSON object closes, rather than waiting
+        # for EOS, which a sequence emitting trailing text would hold back
+        criteria = transformers.StoppingCriteriaList()
+        if self.stop_at_json_end:
+            criteria.append(
+                orbitals.json_scan.JSONCompletionCriteria(
+                    self.tokenizer, prompt_length=tokenized["input_ids"].shape[1]
+                )
+            )
+        return criteria
+
+    def _logits_processor(self):
+        processors = transformers.LogitsProcessorList()
+        if self._json_schema_decoding is not None:
+            processors.append(
+                self._json_schema_decoding.logits_processor(
+                    self.model, self.tokenizer, _response_schema()
+                )
+            )
+        return processors
+
+    def postprocess(self, model_outputs, score_labels: bool = False):
+        if score_labels:
+            return [
+                {"label_logprobs": label_logprobs.tolist()}
+                for label_logprobs in model_outputs["label_logprobs"]
+            ]
+
         output_ids = model_outputs["output_ids"]
         input_ids = model_outputs["input_ids"]
 
@@ -1,11 +1,16 @@
+import functools
+
 import torch
 import transformers
 from transformers import Pipeline
 
 try:
+    import orbitals.json_scan
+    import orbitals.prefix_cache
     import orbitals.scope_guard_v2
     import orbitals.scope_guard_v2.modeling
     import orbitals.scope_guard_v2.prompting
+    import orbitals.structured_decoding
     import orbitals.types
 except ModuleNotFoundError:
     raise ImportError(
@@ -13,6 +18,14 @@ except ModuleNotFoundError:
     )
 
 
+@functools.cache
+def _response_schema() -> dict:
+    # built once: model_json_schema() walks the whole response model
+    return (
+        orbitals.scope_guard_v2.prompting.ScopeGuardV2ResponseModel.model_json_schema()
+    )
+
+
 class ScopeGuardV2Pipeline(Pipeline):
     def __init__(
         self,
@@ -21,6 +34,11 @@ class ScopeGuardV2Pipeline(Pipeline):
         skip_evidences: bool = False,
         max_new_tokens: int = 1024,
         do_sample: bool = False,
+        cache_system_prompt: bool = False,
+        cache_descriptions: bool = False,
+        max_cached_prefixes: int = 16,
+        stop_at_json_end: bool = True,
+        structured_outputs: bool = False,
         **kwargs,
     ):
         if tokenizer is None and isinstance(model, str):
@@ -41,6 +59,24 @@ class ScopeGuardV2Pipeline(Pipeline):
         self.skip_evidences = skip_evidences
         self.max_new_tokens = max_new_tokens
         self.do_sample = do_sample
+        self.stop_at_json_end = stop_at_json_end
+        # constrain generation to the response JSON schema, like the vllm-api
+        # backends do with `structured_outputs`
+        self._json_schema_decoding = (
+            orbitals.structured_decoding.JSONSchemaDecoding()
+            if structured_outputs
+            else None
+        )
+
+        # reuse the key/value states of the system prompt (and optionally of
+        # the AI service description) across batches, see PrefixCache
+        self._prefix_cache = (
+            orbitals.prefix_cache.PrefixCache(
+                cache_descriptions=cache_descriptions, max_size=max_cached_prefixes
+            )
+            if cache_system_prompt or cache_descriptions
+            else None
+        )
 
         super().__init__(model, tokenizer, **kwargs)
 
@@ -83,12 +119,18 @@ class ScopeGuardV2Pipeline(Pipeline):
         return {"text": text}
 
     def _forward(self, model_inputs):
-        tokenized = self.tokenizer(
-            model_inputs["text"],
-            return_tensors="pt",
-            padding=True,
-            truncation=True,
-        ).to(self.device)
+        tokenized = None
+        if self._prefix_cache is not None:
+            tokenized = self._prefix_cache.prepare(
+                self.model, self.tokenizer, model_inputs["text"]
+            )
+        if tokenized is None:
+            tokenized = self.tokenizer(
+                model_inputs["text"],
+                return_tensors="pt",
+                padding=True,
+                truncation=True,
+            ).to(self.device)
 
         with torch.inference_mode():
             outputs = self.model.generate(
@@ -97,12 +139,36 @@ class ScopeGuardV2Pipeline(Pipeline):
                 do_sample=self.do_sample,
                 eos_token_id=self.tokenizer.eos_token_id,
                 pad_token_id=self.tokenizer.pad_token_id,
+                stopping_criteria=self._stopping_criteria(tokenized),
+                logits_processor=self._logits_processor(),
             )
         return {
             "output_ids": outputs,
             "input_ids": tokenized["input_ids"],
         }
 
+    def _stopping_criteria(self, tokenized):
+        # end each sequence once its JSON object closes, rather than waiting
+        # for EOS, which a sequence emitting trailing text would hold back
+        criteria = transformers.StoppingCriteriaList()
+        if self.stop_at_json_end:
+            criteria.append(
+                orbitals.json_scan.JSONCompletionCriteria(
+                    self.tokenizer, prompt_length=tokenized["input_ids"].shape[1]
+                )
+            )
+        return criteria
+
+    def _logits_processor(self):
+        processors = transformers.LogitsProcessorList()
+        if self._json_schema_decoding is not None:
+            processors.append(
+                self._json_schema_decoding.logits_processor(
+                    self.model, self.tokenizer, _response_schema()
+                )
+            )
+        return processors
+
     def postprocess(self, model_outputs):
         output_ids = model_outputs["output_ids"]
         input_ids = model_outputs["input_ids"]
@@ -0,0 +1,216 @@
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Union
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+    from .claim_extractor.modeling import ClaimExtractorBatchResult
+    from .scope_guard.modeling import ScopeGuardBatchResult
+
+ArrowInput = Union[
+    "pa.Table",
+    "pa.RecordBatch",
+    "pa.RecordBatchReader",
+    Iterable["pa.RecordBatch"],
+    str,
+    Path,
+]
+
+
+def import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError(
+            "Arrow input and output require pyarrow. Install it with `pip install pyarrow`"
+        ) from None
+    return pyarrow
+
+
+def iter_record_batches(
+    data: ArrowInput, batch_size: int
+) -> Iterator["pa.RecordBatch"]:
+    """Iterate over record batches of at most `batch_size` rows.
+
+    Args:
+        data: An Arrow table, record batch, record batch reader or iterable of
+            record batches, or the path of a Parquet file or dataset
+            directory, which is read one batch at a time.
+        batch_size: The maximum number of rows per record batch.
+    """
+    pa = import_pyarrow()
+
+    if isinstance(data, (str, Path)):
+        import pyarrow.dataset as ds
+
+        yield from ds.dataset(data, format="parquet").to_batches(batch_size=batch_size)
+        return
+    if isinstance(data, pa.Table):
+        yield from data.to_batches(max_chunksize=batch_size)
+        return
+    if isinstance(data, pa.RecordBatch):
+        data = [data]
+
+    for record_batch in data:
+        for offset in range(0, record_batch.num_rows, batch_size):
+            yield record_batch.slice(offset, batch_size)
+
+
+def iter_arrow_results(
+    data: ArrowInput,
+    process: Callable[[list, list | None], Any],
+    to_record_batch: Callable[[Any, int, "pa.RecordBatch"], "pa.RecordBatch"],
+    *,
+    conversation_column: str,
+    description_column: str | None,
+    keep_columns: Sequence[str],
+    batch_size: int,
+) -> Iterator["pa.RecordBatch"]:
+    """Run a batch API over an Arrow input, one record batch at a time.
+
+    `process` is called with the conversations and descriptions (or `None`) of
+    each record batch and returns its compact batch result, which
+    `to_record_batch` flattens into the output record batch along with the
+    index of the first row and the `keep_columns` of the input batch.
+    """
+    row_offset = 0
+    for record_batch in iter_record_batches(data, batch_size):
+        conversations = record_batch.column(conversation_column).to_pylist()
+        descriptions = (
+            record_batch.column(description_column).to_pylist()
+            if description_column is not None
+            else None
+        )
+        result = process(conversations, descriptions)
+        yield to_record_batch(
+            result, row_offset, record_batch.select(list(keep_columns))
+        )
+        row_offset += record_batch.num_rows
+
+
+def collect_record_batches(batches: Iterable["pa.RecordBatch"]) -> "pa.Table":
+    pa = import_pyarrow()
+    batches = list(batches)
+    if not batches:
+        return pa.table({})
+    return pa.Table.from_batches(batches)
+
+
+def _list_array(
+    offsets: Sequence[int], values: list, mask: Sequence[bool] | None = None
+):
+    pa = import_pyarrow()
+    return pa.ListArray.from_arrays(
+        pa.array(list(offsets), pa.int32()),
+        pa.array(values, pa.string()),
+        mask=pa.array([bool(m) for m in mask], pa.bool_())
+        if mask is not None
+        else None,
+    )
+
+
+def _usage_array(values: Sequence[int]):
+    pa = import_pyarrow()
+    # a missing usage is stored as -1 in the usage columns
+    return pa.array([value if value >= 0 else None for value in values], pa.int64())
+
+
+def _with_kept_columns(
+    kept: "pa.RecordBatch", rows: Sequence[int], names: list[str], arrays: list
+) -> "pa.RecordBatch":
+    pa = import_pyarrow()
+    kept = kept.take(pa.array(rows, pa.int64()))
+    return pa.RecordBatch.from_arrays(
+        [arrays[0], *kept.columns, *arrays[1:]],
+        names=[names[0], *kept.schema.names, *names[1:]],
+    )
+
+
+def scope_guard_record_batch(
+    result: "ScopeGuardBatchResult", row_offset: int, kept: "pa.RecordBatch"
+) -> "pa.RecordBatch":
+    """One row per conversation: its scope class, evidences, model and usage."""
+    pa = import_pyarrow()
+    rows = range(len(result))
+    return _with_kept_columns(
+        kept,
+        rows,
+        [
+            "row_index",
+            "scope_class",
+            "evidences",
+            "model",
+            "prompt_tokens",
+            "completion_tokens",
+        ],
+        [
+            pa.array([row_offset + row for row in rows], pa.int64()),
+            pa.array(result.scope_classes, pa.string()).dictionary_encode(),
+            _list_array(
+                result.evidences.offsets,
+                result.evidences.values,
+                result.evidences.is_none,
+            ),
+            pa.array(result.models, pa.string()).dictionary_encode(),
+            _usage_array(result.usage.prompt_tokens),
+            _usage_array(result.usage.completion_tokens),
+        ],
+    )
+
+
+def claim_extractor_record_batch(
+    result: "ClaimExtractorBatchResult", row_offset: int, kept: "pa.RecordBatch"
+) -> "pa.RecordBatch":
+    """One row per extracted intent or claim, grouped by conversation.
+
+    Conversations without extractions produce no rows.
+    """
+    pa = import_pyarrow()
+    n_intents = len(result.intent_contents)
+
+    # intents and claims are concatenated, then reordered by conversation
+    order: list[int] = []
+    rows: list[int] = []
+    for row in range(len(result)):
+        start, end = result.intent_offsets[row], result.intent_offsets[row + 1]
+        order.extend(range(start, end))
+        start, end = result.claim_offsets[row], result.claim_offsets[row + 1]
+        order.extend(range(n_intents + start, n_intents + end))
+        rows.extend([row] * (len(order) - len(rows)))
+    take = pa.array(order, pa.int64())
+
+    def _column(intents: "pa.Array", claims: "pa.Array") -> "pa.Array":
+        return pa.concat_arrays([intents, claims]).take(take)
+
+    n_claims = len(result.claim_contents)
+    return _with_kept_columns(
+        kept,
+        rows,
+        ["row_index", "kind", "subtype", "content", "evidences", "model"],
+        [
+            pa.array([row_offset + row for row in rows], pa.int64()),
+            pa.array(["intent"] * n_intents + ["claim"] * n_claims, pa.string())
+            .take(take)
+            .dictionary_encode(),
+            _column(
+                pa.nulls(n_intents, pa.string()),
+                pa.array(result.claim_subtypes, pa.string()),
+            ).dictionary_encode(),
+            _column(
+                pa.array(result.intent_contents, pa.string()),
+                pa.array(result.claim_contents, pa.string()),
+            ),
+            _column(
+                _list_array(
+                    result.intent_evidences.offsets, result.intent_evidences.values
+                ),
+                _list_array(
+                    result.claim_evidences.offsets, result.claim_evidences.values
+                ),
+            ),
+            pa.array(
+                [result.models[row] for row in rows], pa.string()
+            ).dictionary_encode(),
+        ],
+    )
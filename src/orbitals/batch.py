@@ -0,0 +1,259 @@
+import asyncio
+import contextlib
+import json
+import os
+import time
+from collections.abc import Awaitable, Callable, Iterator
+from itertools import islice
+from pathlib import Path
+from typing import Any, Literal
+
+from pydantic import BaseModel
+
+OutputFormat = Literal["jsonl", "parquet"]
+
+BatchProcessor = Callable[[list[dict]], Awaitable[list[BaseModel]]]
+
+
+def infer_output_format(output_path: Path) -> OutputFormat:
+    return "parquet" if output_path.suffix == ".parquet" else "jsonl"
+
+
+def iter_jsonl(path: Path, skip: int = 0) -> Iterator[dict]:
+    """Iterate over the records of a JSONL file, after the first `skip` ones.
+
+    Blank lines are not records: they are neither yielded nor counted.
+    """
+    with path.open() as f:
+        records = (json.loads(line) for line in f if line.strip())
+        yield from islice(records, skip, None)
+
+
+def _chunks(records: Iterator[dict], size: int) -> Iterator[list[dict]]:
+    while chunk := list(islice(records, size)):
+        yield chunk
+
+
+class _Checkpoint:
+    """Progress of a batch run, persisted next to its output.
+
+    `rows_done` input rows have been processed and their results are in the
+    first `output_size` bytes (JSONL) or `output_size` part files (Parquet) of
+    the output. Anything written past that is discarded on resume.
+    """
+
+    def __init__(self, path: Path, rows_done: int = 0, output_size: int = 0):
+        self.path = path
+        self.rows_done = rows_done
+        self.output_size = output_size
+
+    @classmethod
+    def load(cls, path: Path) -> "_Checkpoint":
+        data = json.loads(path.read_text())
+        return cls(path, data["rows_done"], data["output_size"])
+
+    def save(self):
+        # write then rename, so a crash never leaves a truncated checkpoint
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(
+            json.dumps({"rows_done": self.rows_done, "output_size": self.output_size})
+        )
+        os.replace(tmp_path, self.path)
+
+
+class _JSONLWriter:
+    def __init__(self, path: Path, resume_size: int | None):
+        if resume_size is None:
+            self._file = path.open("w")
+        else:
+            self._file = path.open("r+")
+            self._file.truncate(resume_size)
+            self._file.seek(resume_size)
+
+    def write(self, rows: list[dict]) -> int:
+        for row in rows:
+            self._file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetWriter:
+    """Writes each flushed chunk as a new part file of a Parquet dataset."""
+
+    def __init__(self, path: Path, resume_size: int | None):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError(
+                "Parquet output requires pyarrow. Install it with `pip install pyarrow`"
+            ) from None
+
+        self.path = path
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.parts = resume_size or 0
+        for part in self.path.glob("part-*.parquet"):
+            if int(part.stem.split("-")[1]) >= self.parts:
+                part.unlink()
+
+    def write(self, rows: list[dict]) -> int:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        part_path = self.path / f"part-{self.parts:05d}.parquet"
+        pq.write_table(pa.Table.from_pylist(rows), part_path)
+        self.parts += 1
+        return self.parts
+
+    def close(self):
+        pass
+
+
+def _result_row(index: int, record: dict, result: BaseModel | Exception) -> dict:
+    row: dict[str, Any] = {"index": index}
+    if "id" in record:
+        row["id"] = record["id"]
+    if isinstance(result, Exception):
+        row["error"] = f"{type(result).__name__}: {result}"
+    else:
+        row.update(result.model_dump(mode="json"))
+    return row
+
+
+async def _process_with_fallback(
+    process_batch: BatchProcessor, records: list[dict]
+) -> list[BaseModel | Exception]:
+    try:
+        return list(await process_batch(records))
+    except Exception as e:  # noqa: BLE001 - any failure is retried row by row
+        if len(records) == 1:
+            return [e]
+    # isolate the failing rows, so one bad row does not fail its whole batch
+    results: list[BaseModel | Exception] = []
+    for record in records:
+        try:
+            results.extend(await process_batch([record]))
+        except Exception as e:  # noqa: BLE001 - reported in the row's error field
+            results.append(e)
+    return results
+
+
+async def run_batch(
+    input_path: Path,
+    output_path: Path,
+    process_batch: BatchProcessor,
+    batch_size: int = 16,
+    concurrency: int = 4,
+    output_format: OutputFormat | None = None,
+    resume: bool = True,
+    progress: Callable[[int, float], None] | None = None,
+) -> int:
+    """Stream a JSONL file through a guardrail, writing results incrementally.
+
+    Input rows are grouped in micro-batches of `batch_size` rows, and up to
+    `concurrency` micro-batches are processed at once. Results are written in
+    input order as soon as they are available, and progress is checkpointed
+    after every write, so that a killed run resumes where it stopped.
+
+    Args:
+        input_path: The input JSONL file.
+        output_path: The output JSONL file, or Parquet dataset directory.
+        process_batch: Returns one result per input row of a micro-batch.
+        batch_size: The number of rows per micro-batch.
+        concurrency: The maximum number of micro-batches in flight.
+        output_format: The output format. Inferred from `output_path` if None.
+        resume: Whether to resume from an existing checkpoint.
+        progress: Called after every write with the number of rows done in
+            this run and the throughput in rows per second.
+
+    Returns:
+        The number of rows processed in this run.
+    """
+    output_format = output_format or infer_output_format(output_path)
+    if output_format not in ("jsonl", "parquet"):
+        raise ValueError(f"Unknown output format '{output_format}'")
+    checkpoint_path = output_path.with_name(output_path.name + ".checkpoint")
+
+    if resume and checkpoint_path.exists() and output_path.exists():
+        checkpoint = _Checkpoint.load(checkpoint_path)
+        resume_size: int | None = checkpoint.output_size
+    else:
+        checkpoint = _Checkpoint(checkpoint_path)
+        resume_size = None
+
+    writer = (
+        _ParquetWriter(output_path, resume_size)
+        if output_format == "parquet"
+        else _JSONLWriter(output_path, resume_size)
+    )
+
+    start_index = checkpoint.rows_done
+    chunks = _chunks(iter_jsonl(input_path, skip=start_index), batch_size)
+    start_time = time.perf_counter()
+    rows_done = 0
+
+    semaphore = asyncio.Semaphore(concurrency)
+    pending: set[asyncio.Task] = set()
+    # completed micro-batches waiting for the ones before them to be written
+    completed: dict[int, list[dict]] = {}
+    next_to_write = 0
+
+    async def _run_chunk(chunk_index: int, first_row: int, records: list[dict]):
+        try:
+            results = await _process_with_fallback(process_batch, records)
+        finally:
+            semaphore.release()
+        completed[chunk_index] = [
+            _result_row(first_row + i, record, result)
+            for i, (record, result) in enumerate(zip(records, results, strict=True))
+        ]
+
+    def _flush():
+        nonlocal next_to_write, rows_done
+        while next_to_write in completed:
+            rows = completed.pop(next_to_write)
+            checkpoint.output_size = writer.write(rows)
+            checkpoint.rows_done += len(rows)
+            checkpoint.save()
+            next_to_write += 1
+            rows_done += len(rows)
+            if progress is not None:
+                elapsed = time.perf_counter() - start_time
+                progress(rows_done, rows_done / elapsed if elapsed > 0 else 0.0)
+
+    try:
+        first_row = start_index
+        for chunk_index, records in enumerate(chunks):
+            await semaphore.acquire()
+            pending.add(
+                asyncio.create_task(_run_chunk(chunk_index, first_row, records))
+            )
+            first_row += len(records)
+
+            done = {task for task in pending if task.done()}
+            pending -= done
+            for task in done:
+                task.result()
+            _flush()
+
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                task.result()
+            _flush()
+    finally:
+        for task in pending:
+            task.cancel()
+        # keep the micro-batches completed before the failure: a resumed run
+        # then starts after them. A failing writer still raises the original
+        # error, and the checkpoint only covers what was fully written.
+        with contextlib.suppress(Exception):
+            _flush()
+        writer.close()
+
+    return rows_done
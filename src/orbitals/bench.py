@@ -0,0 +1,366 @@
+import asyncio
+import json
+import math
+import random
+import re
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Literal
+
+import aiohttp
+
+# short names accepted in the `endpoint` field of request mix files
+ENDPOINT_ALIASES = {
+    "validate": "/orbitals/scope-guard/validate",
+    "batch-validate": "/orbitals/scope-guard/batch-validate",
+    "validate-v2": "/orbitals/scope-guard-v2/validate",
+    "batch-validate-v2": "/orbitals/scope-guard-v2/batch-validate",
+    "extract": "/orbitals/claim-extractor/extract",
+    "batch-extract": "/orbitals/claim-extractor/batch-extract",
+    "extract-conversation": "/orbitals/claim-extractor/extract-conversation",
+    "pipeline": "/orbitals/pipeline/run",
+}
+
+Arrival = Literal["poisson", "fixed"]
+
+_PROMETHEUS_LINE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{.*\})?\s+(\S+)$")
+
+
+class BenchRequest:
+    def __init__(self, endpoint: str, body: dict, weight: float = 1.0):
+        self.endpoint = ENDPOINT_ALIASES.get(endpoint, endpoint)
+        self.body = body
+        self.weight = weight
+
+
+class _Result:
+    def __init__(
+        self,
+        endpoint: str,
+        latency: float,
+        status: int | None,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        error: str | None = None,
+    ):
+        self.endpoint = endpoint
+        self.latency = latency
+        self.status = status
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def load_requests(path: Path) -> list[BenchRequest]:
+    """Load a request mix: one `{endpoint, body, weight}` object per line."""
+    requests: list[BenchRequest] = []
+    with path.open() as f:
+        for line in f:
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            requests.append(
+                BenchRequest(data["endpoint"], data["body"], data.get("weight", 1.0))
+            )
+    if not requests:
+        raise ValueError(f"No requests found in {path}")
+    return requests
+
+
+def percentile(sorted_values: list[float], q: float) -> float | None:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def _usage_tokens(response_json: object) -> tuple[int, int]:
+    # batch endpoints return one response, with its own usage, per item
+    items = response_json if isinstance(response_json, list) else [response_json]
+    prompt_tokens = completion_tokens = 0
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        usage = item.get("usage") or {}
+        prompt_tokens += usage.get("prompt_tokens", 0)
+        completion_tokens += usage.get("completion_tokens", 0)
+    return prompt_tokens, completion_tokens
+
+
+def parse_prometheus(text: str) -> dict[tuple[str, str], float]:
+    """Parse the Prometheus text format into `{(name, labels): value}`."""
+    samples: dict[tuple[str, str], float] = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        match = _PROMETHEUS_LINE.match(line)
+        if match is None:
+            continue
+        name, labels, value = match.groups()
+        try:
+            samples[(name, labels or "")] = float(value)
+        except ValueError:
+            continue
+    return samples
+
+
+def server_stage_metrics(
+    before: dict[tuple[str, str], float], after: dict[tuple[str, str], float]
+) -> dict[str, list[dict]]:
+    """Summarize the server metrics recorded between two `/metrics` scrapes.
+
+    Histograms are reported as the number and mean of the observations made
+    during the run, counters as their increase. Gauges and histogram buckets
+    are left out.
+    """
+    stages: dict[str, list[dict]] = defaultdict(list)
+    for (name, labels), value in sorted(after.items()):
+        delta = value - before.get((name, labels), 0.0)
+        if name.endswith("_count"):
+            base = name.removesuffix("_count")
+            if (base + "_sum", labels) not in after or delta == 0:
+                continue
+            total = after[(base + "_sum", labels)] - before.get(
+                (base + "_sum", labels), 0.0
+            )
+            stages[base].append(
+                {"labels": labels, "count": delta, "mean_ms": 1000 * total / delta}
+            )
+        elif name.endswith("_total") and delta != 0:
+            stages[name].append({"labels": labels, "increase": delta})
+    return dict(stages)
+
+
+async def _scrape_metrics(
+    session: aiohttp.ClientSession, url: str
+) -> dict[tuple[str, str], float] | None:
+    try:
+        async with session.get(f"{url}/metrics") as response:
+            if response.status != 200:
+                return None
+            return parse_prometheus(await response.text())
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return None
+
+
+async def _send(
+    session: aiohttp.ClientSession,
+    url: str,
+    request: BenchRequest,
+    started_at: float,
+) -> _Result:
+    try:
+        async with session.post(f"{url}{request.endpoint}", json=request.body) as r:
+            body = await r.read()
+            latency = time.perf_counter() - started_at
+            if r.status != 200:
+                return _Result(request.endpoint, latency, r.status, error=str(r.status))
+            prompt_tokens, completion_tokens = _usage_tokens(json.loads(body))
+            return _Result(
+                request.endpoint, latency, r.status, prompt_tokens, completion_tokens
+            )
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        return _Result(
+            request.endpoint,
+            time.perf_counter() - started_at,
+            None,
+            error=type(e).__name__,
+        )
+
+
+def _summarize(results: list[_Result], elapsed: float) -> dict:
+    latencies = sorted(r.latency for r in results if r.ok)
+    errors: dict[str, int] = defaultdict(int)
+    for r in results:
+        if not r.ok:
+            errors[r.error or "unknown"] += 1
+    prompt_tokens = sum(r.prompt_tokens for r in results)
+    completion_tokens = sum(r.completion_tokens for r in results)
+
+    def _ms(value: float | None) -> float | None:
+        return None if value is None else 1000 * value
+
+    return {
+        "requests": len(results),
+        "errors": sum(errors.values()),
+        "error_rate": sum(errors.values()) / len(results) if results else 0.0,
+        "errors_by_type": dict(errors),
+        "throughput_rps": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "mean": _ms(sum(latencies) / len(latencies)) if latencies else None,
+            "p50": _ms(percentile(latencies, 0.5)),
+            "p90": _ms(percentile(latencies, 0.9)),
+            "p99": _ms(percentile(latencies, 0.99)),
+            "p99.9": _ms(percentile(latencies, 0.999)),
+            "max": _ms(latencies[-1]) if latencies else None,
+        },
+        "tokens": {
+            "prompt": prompt_tokens,
+            "completion": completion_tokens,
+            "prompt_per_s": prompt_tokens / elapsed if elapsed > 0 else 0.0,
+            "completion_per_s": completion_tokens / elapsed if elapsed > 0 else 0.0,
+        },
+    }
+
+
+async def run_bench(
+    url: str,
+    requests: list[BenchRequest],
+    *,
+    rate: float | None = None,
+    arrival: Arrival = "poisson",
+    concurrency: int | None = None,
+    duration: float | None = 30.0,
+    num_requests: int | None = None,
+    timeout: float = 120.0,
+    headers: dict[str, str] | None = None,
+    seed: int | None = None,
+) -> dict:
+    """Drive an Orbitals server with a request mix and report its performance.
+
+    In open-loop mode (`rate`), requests are sent at `rate` per second with
+    Poisson or fixed inter-arrival times, regardless of how fast the server
+    answers; latencies are measured from the scheduled send time, so that a
+    server falling behind is not hidden by a stalled client. In closed-loop
+    mode (`concurrency`), that many simulated users send a new request as soon
+    as their previous one completes.
+
+    Args:
+        url: The base URL of the server.
+        requests: The request mix, sampled according to the request weights.
+        rate: Requests per second, for an open-loop run.
+        arrival: The inter-arrival distribution of an open-loop run.
+        concurrency: Number of concurrent users, for a closed-loop run.
+        duration: Stop sending new requests after this many seconds.
+        num_requests: Stop after sending this many requests.
+        timeout: Timeout of each request, in seconds.
+        headers: Extra headers, e.g. `X-API-Key`.
+        seed: Seed of the random generator, for reproducible request sequences.
+
+    Returns:
+        The JSON-serializable report, overall and per endpoint, with the
+        server stage metrics when the server exposes `/metrics`.
+    """
+    if (rate is None) == (concurrency is None):
+        raise ValueError("Exactly one between [rate, concurrency] must be provided")
+    if duration is None and num_requests is None:
+        raise ValueError(
+            "At least one between [duration, num_requests] must be provided"
+        )
+
+    url = url.rstrip("/")
+    rng = random.Random(seed)
+    weights = [r.weight for r in requests]
+    results: list[_Result] = []
+    sent = 0
+
+    def _next_request() -> BenchRequest | None:
+        nonlocal sent
+        if num_requests is not None and sent >= num_requests:
+            return None
+        if duration is not None and time.perf_counter() - start >= duration:
+            return None
+        sent += 1
+        return rng.choices(requests, weights)[0]
+
+    async with aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=0),
+        timeout=aiohttp.ClientTimeout(total=timeout),
+        headers=headers,
+    ) as session:
+        metrics_before = await _scrape_metrics(session, url)
+        start = time.perf_counter()
+
+        if rate is not None:
+            tasks: list[asyncio.Task] = []
+            scheduled_at = start
+            while (request := _next_request()) is not None:
+                delay = scheduled_at - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(
+                    asyncio.create_task(_send(session, url, request, scheduled_at))
+                )
+                scheduled_at += (
+                    rng.expovariate(rate) if arrival == "poisson" else 1 / rate
+                )
+            results = list(await asyncio.gather(*tasks))
+        else:
+
+            async def _user():
+                while (request := _next_request()) is not None:
+                    results.append(
+                        await _send(session, url, request, time.perf_counter())
+                    )
+
+            await asyncio.gather(*[_user() for _ in range(concurrency or 0)])
+
+        elapsed = time.perf_counter() - start
+        metrics_after = await _scrape_metrics(session, url)
+
+    by_endpoint: dict[str, list[_Result]] = defaultdict(list)
+    for result in results:
+        by_endpoint[result.endpoint].append(result)
+
+    return {
+        "mode": "open-loop" if rate is not None else "closed-loop",
+        "rate": rate,
+        "arrival": arrival if rate is not None else None,
+        "concurrency": concurrency,
+        "duration_s": elapsed,
+        **_summarize(results, elapsed),
+        "endpoints": {
+            endpoint: _summarize(endpoint_results, elapsed)
+            for endpoint, endpoint_results in sorted(by_endpoint.items())
+        },
+        "server": (
+            server_stage_metrics(metrics_before, metrics_after)
+            if metrics_before is not None and metrics_after is not None
+            else None
+        ),
+    }
+
+
+def format_report(report: dict) -> str:
+    """Render a report as a human-readable table."""
+
+    def _fmt(value: float | None) -> str:
+        return "-" if value is None else f"{value:.1f}"
+
+    header = (
+        f"{'endpoint':<48} {'reqs':>7} {'err%':>6} {'rps':>8} "
+        f"{'p50':>8} {'p90':>8} {'p99':>8} {'p99.9':>8} {'tok/s':>9}"
+    )
+    lines = [
+        f"mode: {report['mode']}, duration: {report['duration_s']:.1f}s",
+        "latencies in ms, tok/s = completion tokens per second",
+        "",
+        header,
+        "-" * len(header),
+    ]
+    rows = [*report["endpoints"].items(), ("total", report)]
+    for name, summary in rows:
+        latency = summary["latency_ms"]
+        lines.append(
+            f"{name:<48} {summary['requests']:>7} {100 * summary['error_rate']:>6.2f} "
+            f"{summary['throughput_rps']:>8.2f} {_fmt(latency['p50']):>8} "
+            f"{_fmt(latency['p90']):>8} {_fmt(latency['p99']):>8} "
+            f"{_fmt(latency['p99.9']):>8} {summary['tokens']['completion_per_s']:>9.1f}"
+        )
+
+    if report["server"]:
+        lines += ["", "server stages (mean ms over the run)"]
+        for name, series in report["server"].items():
+            for entry in series:
+                if "mean_ms" in entry:
+                    lines.append(
+                        f"  {name}{entry['labels']}: {entry['mean_ms']:.1f} "
+                        f"(n={entry['count']:.0f})"
+                    )
+    return "\n".join(lines)
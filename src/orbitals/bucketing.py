@@ -0,0 +1,108 @@
+from collections.abc import Hashable, Sequence
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+def length_buckets(
+    lengths: Sequence[int], max_tokens_per_batch: int
+) -> list[list[int]]:
+    """Group input indices into batches of similar length under a token budget.
+
+    Indices are sorted by decreasing length, so that every batch holds inputs of
+    similar length and the longest batches run (and fail, if they do not fit)
+    first. A batch is closed as soon as adding the next input would push its
+    padded size, the number of inputs times the longest one, over
+    `max_tokens_per_batch`. An input longer than the budget gets a batch of
+    its own.
+
+    Args:
+        lengths: The tokenized length of every input.
+        max_tokens_per_batch: The maximum number of padded tokens in a batch.
+
+    Returns:
+        The batches, as lists of indices into `lengths`.
+    """
+    if max_tokens_per_batch <= 0:
+        raise ValueError("max_tokens_per_batch must be positive")
+
+    buckets: list[list[int]] = []
+    bucket: list[int] = []
+    longest = 0
+    for index in sorted(range(len(lengths)), key=lambda i: -lengths[i]):
+        if bucket and (len(bucket) + 1) * longest > max_tokens_per_batch:
+            buckets.append(bucket)
+            bucket = []
+        if not bucket:
+            longest = lengths[index]
+        bucket.append(index)
+    if bucket:
+        buckets.append(bucket)
+    return buckets
+
+
+def padded_tokens(lengths: Sequence[int], buckets: Sequence[Sequence[int]]) -> int:
+    """The number of tokens, padding included, of the given batches."""
+    return sum(len(bucket) * max(lengths[i] for i in bucket) for bucket in buckets)
+
+
+def grouped_order(groups: Sequence[Hashable], lengths: Sequence[int]) -> list[int]:
+    """Order input indices by group, then by decreasing length within a group.
+
+    Submitted to vLLM in this order, the prompts sharing a prefix, e.g. the
+    same AI service description, are scheduled together: the prefix is
+    computed once and reused from the prefix cache while it is still there,
+    instead of being evicted by the prompts of other groups in between.
+    Groups keep the order of their first input.
+
+    Args:
+        groups: The group of every input.
+        lengths: The length of every input.
+
+    Returns:
+        The indices of the inputs, in submission order.
+    """
+    first_index: dict[Hashable, int] = {}
+    for index, group in enumerate(groups):
+        first_index.setdefault(group, index)
+    return sorted(
+        range(len(groups)), key=lambda i: (first_index[groups[i]], -lengths[i])
+    )
+
+
+def restore_order(order: Sequence[int], items: Sequence[T]) -> list[T]:
+    """Put `items`, computed for the inputs in `order`, back in input order."""
+    restored: list[Any] = [None] * len(order)
+    for index, item in zip(order, items):
+        restored[index] = item
+    return restored
+
+
+def run_length_bucketed(
+    pipeline, inputs: list, max_tokens_per_batch: int, **pipeline_kwargs
+) -> list[Any]:
+    """Run an orbitals Hugging Face pipeline over length-bucketed batches.
+
+    Every input is rendered with the pipeline's own `preprocess` and tokenized
+    to get its prompt length, the inputs are grouped with `length_buckets`
+    and every batch is run in a single forward pass. The outputs are returned
+    in the order of `inputs`.
+    """
+    preprocess_kwargs, _, _ = pipeline._sanitize_parameters(**pipeline_kwargs)
+    lengths = [
+        len(
+            pipeline.tokenizer(
+                pipeline.preprocess(pipeline_input, **preprocess_kwargs)["text"]
+            )["input_ids"]
+        )
+        for pipeline_input in inputs
+    ]
+
+    outputs: list[Any] = [None] * len(inputs)
+    for bucket in length_buckets(lengths, max_tokens_per_batch):
+        bucket_outputs = pipeline(
+            [inputs[i] for i in bucket], batch_size=len(bucket), **pipeline_kwargs
+        )
+        for index, output in zip(bucket, bucket_outputs):
+            outputs[index] = output
+    return outputs
@@ -1,6 +1,7 @@
 from .extractors import AsyncClaimExtractor, ClaimExtractor
 from .modeling import (
     Claim,
+    ClaimExtractorBatchResult,
     ClaimExtractorOutput,
     ExtractionSubType,
     Extractions,
@@ -11,6 +12,7 @@ __all__ = [
     "AsyncClaimExtractor",
     "ClaimExtractor",
     "Claim",
+    "ClaimExtractorBatchResult",
     "ClaimExtractorOutput",
     "ExtractionSubType",
     "Extractions",
@@ -1,11 +1,13 @@
 import typer
 
+from ...cli import run_batch
 from . import convert_default_model_name, serve
 
 app = typer.Typer()
 
 app.add_typer(serve.app)
 app.add_typer(convert_default_model_name.app)
+app.add_typer(run_batch.build_app("claim-extractor"))
 
 
 def main():
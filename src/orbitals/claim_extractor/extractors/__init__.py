@@ -1,7 +1,31 @@
-from .api import APIClaimExtractor, AsyncAPIClaimExtractor
+from importlib import import_module
+from typing import TYPE_CHECKING
+
 from .base import AsyncClaimExtractor, ClaimExtractor
-from .hf import HuggingFaceClaimExtractor
-from .vllm import AsyncVLLMApiClaimExtractor, VLLMClaimExtractor
+
+if TYPE_CHECKING:
+    from .api import APIClaimExtractor, AsyncAPIClaimExtractor
+    from .cascade import AsyncCascadeClaimExtractor
+    from .hf import HuggingFaceClaimExtractor
+    from .vllm import AsyncVLLMApiClaimExtractor, VLLMClaimExtractor
+
+# backends pull in heavy dependencies (aiohttp, requests, transformers, ...),
+# so their classes are only imported on first access
+_LAZY_IMPORTS = {
+    "APIClaimExtractor": ".api",
+    "AsyncAPIClaimExtractor": ".api",
+    "HuggingFaceClaimExtractor": ".hf",
+    "AsyncVLLMApiClaimExtractor": ".vllm",
+    "VLLMClaimExtractor": ".vllm",
+    "AsyncCascadeClaimExtractor": ".cascade",
+}
+
+
+def __getattr__(name: str):
+    if name in _LAZY_IMPORTS:
+        return getattr(import_module(_LAZY_IMPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     "AsyncClaimExtractor",
@@ -11,4 +35,5 @@ __all__ = [
     "APIClaimExtractor",
     "AsyncAPIClaimExtractor",
     "AsyncVLLMApiClaimExtractor",
+    "AsyncCascadeClaimExtractor",
 ]
@@ -1,20 +1,36 @@
 from __future__ import annotations
 
 import logging
-from typing import TYPE_CHECKING, Literal, overload
+from collections.abc import AsyncIterator, Iterator, Sequence
+from importlib import import_module
+from typing import TYPE_CHECKING, ClassVar, Literal, overload
 
 from pydantic import ValidationError
 
 if TYPE_CHECKING:
+    import pyarrow as pa
+
+    from ...metrics import MetricsRegistry
+    from ...upstream import VLLMUpstream
     from .api import APIClaimExtractor, AsyncAPIClaimExtractor
+    from .cascade import AsyncCascadeClaimExtractor, EscalationTrigger
     from .hf import HuggingFaceClaimExtractor
     from .vllm import AsyncVLLMApiClaimExtractor, VLLMClaimExtractor
 
+from ...arrow import (
+    ArrowInput,
+    claim_extractor_record_batch,
+    collect_record_batches,
+    iter_arrow_results,
+)
 from ...types import AIServiceDescription
 from ..modeling import (
+    ClaimExtractorBatchResult,
     ClaimExtractorInput,
+    ClaimExtractorInputListTypeAdapter,
     ClaimExtractorInputTypeAdapter,
     ClaimExtractorOutput,
+    ClaimExtractorStreamEvent,
 )
 
 DefaultModel = Literal["claim-extractor"]
@@ -29,6 +45,11 @@ MODEL_MAPPING = {
 
 class BaseClaimExtractor:
     _registry: dict[str, dict[str, type[ClaimExtractor | AsyncClaimExtractor]]] = {}
+    # backend -> module defining it, imported the first time the backend is requested
+    _backend_modules: ClassVar[dict[str, dict[str, str]]] = {
+        "sync": {"hf": ".hf", "vllm": ".vllm", "api": ".api"},
+        "async": {"vllm-api": ".vllm", "api": ".api", "cascade": ".cascade"},
+    }
 
     @classmethod
     def _get_outer_registry_key(cls) -> str:
@@ -50,6 +71,20 @@ class BaseClaimExtractor:
 
         return decorator
 
+    @classmethod
+    def _resolve_backend(cls, backend: str) -> type:
+        outer_registry_key = cls._get_outer_registry_key()
+        registry = cls._registry.setdefault(outer_registry_key, {})
+        backend_modules = cls._backend_modules[outer_registry_key]
+        if backend not in registry and backend in backend_modules:
+            # importing the module registers its backends
+            import_module(backend_modules[backend], __package__)
+        try:
+            return registry[backend]
+        except KeyError:
+            available = list(dict.fromkeys([*backend_modules, *registry]))
+            raise ValueError(f"Unknown backend '{backend}'. Available: {available}")
+
     @classmethod
     def maybe_map_model(cls, model: DefaultModel | str) -> str:
         if model in MODEL_MAPPING:
@@ -69,12 +104,7 @@ class BaseClaimExtractor:
             # if called on subclass, behave normally
             return super().__new__(cls)
 
-        try:
-            subclass = cls._registry[cls._get_outer_registry_key()][backend]
-        except KeyError:
-            raise ValueError(
-                f"Unknown backend '{backend}'. Available: {list(cls._registry[cls._get_outer_registry_key()].keys())}"
-            )
+        subclass = cls._resolve_backend(backend)
 
         return super().__new__(subclass)
 
@@ -87,8 +117,11 @@ class BaseClaimExtractor:
         self.backend = backend
 
     def _validate_conversation(
-        self, conversation: str | dict | list[dict]
+        self, conversation: str | dict | list[dict], validated: bool = False
     ) -> ClaimExtractorInput:
+        if validated:
+            # trusted input, e.g. a conversation already validated by the caller
+            return conversation  # type: ignore[return-value]
         try:
             return ClaimExtractorInputTypeAdapter.validate_python(conversation)
         except ValidationError as e:
@@ -96,16 +129,21 @@ class BaseClaimExtractor:
             raise e from None
 
     def _validate_conversations(
-        self, conversations: list[str] | list[dict] | list[list[dict]]
+        self,
+        conversations: list[str] | list[dict] | list[list[dict]],
+        validated: bool = False,
     ) -> list[ClaimExtractorInput]:
-        validated_conversations = []
-        for c in conversations:
-            try:
-                validated_conversations.append(self._validate_conversation(c))
-            except ValidationError as e:
-                logging.error("Invalid input format for conversation")
-                raise e from None
-        return validated_conversations
+        if validated:
+            # trusted input, e.g. a request body already parsed by FastAPI
+            return conversations  # type: ignore[return-value]
+        try:
+            return ClaimExtractorInputListTypeAdapter.validate_python(conversations)
+        except ValidationError as e:
+            indices = sorted({error["loc"][0] for error in e.errors()})
+            logging.error(
+                f"Invalid input format for conversations at indices {indices}"
+            )
+            raise e from None
 
     def _validate_ai_service_description_input(
         self,
@@ -196,9 +234,10 @@ class ClaimExtractor(BaseClaimExtractor):
         ai_service_description: str | AIServiceDescription | None = None,
         skip_evidences: bool | None = None,
         intents_only: bool | None = None,
+        validated: bool = False,
         **kwargs,
     ) -> ClaimExtractorOutput:
-        conversation = self._validate_conversation(conversation)
+        conversation = self._validate_conversation(conversation, validated)
         return self._extract(
             conversation,
             ai_service_description=ai_service_description,
@@ -226,17 +265,19 @@ class ClaimExtractor(BaseClaimExtractor):
         ai_service_descriptions: list[str] | list[AIServiceDescription] | None = None,
         skip_evidences: bool | None = None,
         intents_only: bool | None = None,
+        validated: bool = False,
+        compact: bool = False,
         **kwargs,
-    ) -> list[ClaimExtractorOutput]:
+    ) -> list[ClaimExtractorOutput] | ClaimExtractorBatchResult:
         if len(conversations) == 0:
-            return []
+            return ClaimExtractorBatchResult() if compact else []
 
-        validated_conversations = self._validate_conversations(conversations)
+        validated_conversations = self._validate_conversations(conversations, validated)
         self._validate_ai_service_description_input(
             validated_conversations, ai_service_description, ai_service_descriptions
         )
 
-        return self._batch_extract(
+        outputs = self._batch_extract(
             validated_conversations,
             ai_service_description=ai_service_description,
             ai_service_descriptions=ai_service_descriptions,
@@ -244,6 +285,7 @@ class ClaimExtractor(BaseClaimExtractor):
             intents_only=intents_only,
             **kwargs,
         )
+        return ClaimExtractorBatchResult.from_outputs(outputs) if compact else outputs
 
     def _batch_extract(
         self,
@@ -257,6 +299,72 @@ class ClaimExtractor(BaseClaimExtractor):
     ) -> list[ClaimExtractorOutput]:
         raise NotImplementedError
 
+    def iter_extract_arrow(
+        self,
+        data: ArrowInput,
+        *,
+        conversation_column: str = "conversation",
+        description_column: str | None = None,
+        ai_service_description: str | AIServiceDescription | None = None,
+        keep_columns: Sequence[str] = (),
+        batch_size: int = 1024,
+        **kwargs,
+    ) -> Iterator[pa.RecordBatch]:
+        """Run `batch_extract` over Arrow data, streaming one record batch at a time.
+
+        Only one record batch is in memory at a time, so Parquet datasets larger
+        than RAM can be processed, e.g. by writing the output batches with a
+        `pyarrow.parquet.ParquetWriter`. Requires pyarrow.
+
+        Args:
+            data: An Arrow table, record batch, record batch reader or iterable of
+                record batches, or the path of a Parquet file or dataset directory.
+            conversation_column: The column of the conversations: strings,
+                `{role, content}` structs or lists of them.
+            description_column: The column of the per-row AI service
+                descriptions, as strings or structs.
+            ai_service_description: The AI service description shared by all rows, when
+                `description_column` is not given.
+            keep_columns: Input columns copied to the output, e.g. an id column.
+            batch_size: The number of rows per `batch_extract` call.
+            **kwargs: Forwarded to `batch_extract`.
+
+        Yields:
+            Record batches with one row per extracted intent or claim, with its kind, subtype,
+            content and evidences; conversations without extractions produce
+            no rows, and the `row_index` of the input row.
+        """
+
+        def _process(conversations: list, descriptions: list | None):
+            return self.batch_extract(
+                conversations,
+                ai_service_description=ai_service_description,
+                ai_service_descriptions=None
+                if descriptions is None
+                else [
+                    d
+                    if d is None or isinstance(d, str)
+                    else AIServiceDescription.model_validate(d)
+                    for d in descriptions
+                ],
+                compact=True,
+                **kwargs,
+            )
+
+        return iter_arrow_results(
+            data,
+            _process,
+            claim_extractor_record_batch,
+            conversation_column=conversation_column,
+            description_column=description_column,
+            keep_columns=keep_columns,
+            batch_size=batch_size,
+        )
+
+    def batch_extract_arrow(self, data: ArrowInput, **kwargs) -> pa.Table:
+        """Like `iter_extract_arrow`, collecting the output into one table."""
+        return collect_record_batches(self.iter_extract_arrow(data, **kwargs))
+
 
 class AsyncClaimExtractor(BaseClaimExtractor):
     @overload
@@ -266,7 +374,7 @@ class AsyncClaimExtractor(BaseClaimExtractor):
         model: DefaultModel | str = "claim-extractor",
         skip_evidences: bool = True,
         intents_only: bool = False,
-        vllm_serving_url: str = "http://localhost:8000",
+        vllm_serving_url: str | list[str] = "http://localhost:8000",
         temperature: float = 0.7,
         max_tokens: int = 20_000,
         frequency_penalty: float = 0.0,
@@ -277,6 +385,7 @@ class AsyncClaimExtractor(BaseClaimExtractor):
         min_p: float = 0.0,
         chat_templating_tokenizer: str | None = None,
         count_system_prompt_in_usage: bool = False,
+        upstream: VLLMUpstream | None = None,
     ) -> AsyncVLLMApiClaimExtractor: ...
 
     @overload
@@ -291,6 +400,24 @@ class AsyncClaimExtractor(BaseClaimExtractor):
         custom_headers: dict[str, str] | None = None,
     ) -> AsyncAPIClaimExtractor: ...
 
+    @overload
+    def __new__(
+        cls,
+        backend: Literal["cascade"],
+        small_model: str = "claim-extractor-2B-q",
+        large_model: str = "claim-extractor-4B-q",
+        escalate_on: Sequence[EscalationTrigger] = (
+            "invalid",
+            "truncated",
+            "empty",
+            "low_confidence",
+        ),
+        min_message_chars: int = 200,
+        min_confidence: float = 0.8,
+        metrics: MetricsRegistry | None = None,
+        **kwargs,
+    ) -> AsyncCascadeClaimExtractor: ...
+
     def __new__(cls, backend: str, *args, **kwargs):
         return super().__new__(cls, backend, *args, **kwargs)
 
@@ -301,9 +428,10 @@ class AsyncClaimExtractor(BaseClaimExtractor):
         ai_service_description: str | AIServiceDescription | None = None,
         skip_evidences: bool | None = None,
         intents_only: bool | None = None,
+        validated: bool = False,
         **kwargs,
     ) -> ClaimExtractorOutput:
-        conversation = self._validate_conversation(conversation)
+        conversation = self._validate_conversation(conversation, validated)
         return await self._extract(
             conversation,
             ai_service_description=ai_service_description,
@@ -323,6 +451,44 @@ class AsyncClaimExtractor(BaseClaimExtractor):
     ) -> ClaimExtractorOutput:
         raise NotImplementedError
 
+    async def extract_stream(
+        self,
+        conversation: str | dict | list[dict],
+        *,
+        ai_service_description: str | AIServiceDescription | None = None,
+        skip_evidences: bool | None = None,
+        intents_only: bool | None = None,
+        validated: bool = False,
+        **kwargs,
+    ) -> AsyncIterator[ClaimExtractorStreamEvent]:
+        """Extract from a conversation, yielding intents and claims as they are generated.
+
+        Every intent and claim is reported as soon as the model closes it, and
+        the last event holds the complete output.
+        """
+        conversation = self._validate_conversation(conversation, validated)
+        async for event in self._extract_stream(
+            conversation,
+            ai_service_description=ai_service_description,
+            skip_evidences=skip_evidences,
+            intents_only=intents_only,
+            **kwargs,
+        ):
+            yield event
+
+    def _extract_stream(
+        self,
+        conversation: ClaimExtractorInput,
+        *,
+        ai_service_description: str | AIServiceDescription | None = None,
+        skip_evidences: bool | None = None,
+        intents_only: bool | None = None,
+        **kwargs,
+    ) -> AsyncIterator[ClaimExtractorStreamEvent]:
+        raise NotImplementedError(
+            f"Streaming is not supported by the '{self.backend}' backend"
+        )
+
     async def batch_extract(
         self,
         conversations: list[str] | list[dict] | list[list[dict]],
@@ -331,17 +497,19 @@ class AsyncClaimExtractor(BaseClaimExtractor):
         ai_service_descriptions: list[str] | list[AIServiceDescription] | None = None,
         skip_evidences: bool | None = None,
         intents_only: bool | None = None,
+        validated: bool = False,
+        compact: bool = False,
         **kwargs,
-    ) -> list[ClaimExtractorOutput]:
+    ) -> list[ClaimExtractorOutput] | ClaimExtractorBatchResult:
         if len(conversations) == 0:
-            return []
+            return ClaimExtractorBatchResult() if compact else []
 
-        validated_conversations = self._validate_conversations(conversations)
+        validated_conversations = self._validate_conversations(conversations, validated)
         self._validate_ai_service_description_input(
             validated_conversations, ai_service_description, ai_service_descriptions
         )
 
-        return await self._batch_extract(
+        outputs = await self._batch_extract(
             validated_conversations,
             ai_service_description=ai_service_description,
             ai_service_descriptions=ai_service_descriptions,
@@ -349,6 +517,7 @@ class AsyncClaimExtractor(BaseClaimExtractor):
             intents_only=intents_only,
             **kwargs,
         )
+        return ClaimExtractorBatchResult.from_outputs(outputs) if compact else outputs
 
     async def _batch_extract(
         self,
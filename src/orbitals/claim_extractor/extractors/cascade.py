@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Collection
+from typing import Literal, get_args
+
+from ...confidence import mean_token_probability
+from ...metrics import MetricsRegistry, default_registry
+from ...types import AIServiceDescription, ConversationMessage
+from ..modeling import ClaimExtractorInput, ClaimExtractorOutput
+from .base import AsyncClaimExtractor
+from .vllm import AsyncVLLMApiClaimExtractor
+
+EscalationTrigger = Literal["invalid", "truncated", "empty", "low_confidence"]
+
+
+def _last_message_length(conversation: ClaimExtractorInput) -> int:
+    if isinstance(conversation, str):
+        return len(conversation)
+    if isinstance(conversation, ConversationMessage):
+        return len(conversation.content)
+    return len(conversation[-1].content) if conversation else 0
+
+
+@AsyncClaimExtractor.register_extractor("cascade")
+class AsyncCascadeClaimExtractor(AsyncClaimExtractor):
+    """Runs a small model first, escalating to a larger one only when needed.
+
+    Every conversation is sent to `small_model`, through a `vllm-api`
+    backend. Its output is returned unless one of the `escalate_on` triggers
+    fires, in which case the conversation is sent again to `large_model`,
+    whose output, or error, is returned instead. The `model` of the output
+    tells which of the two answered.
+
+    The triggers are:
+
+    - `invalid`: the small model's output does not parse or validate.
+    - `truncated`: its generation stopped at `max_tokens`.
+    - `empty`: it extracted neither intents nor claims, although the last
+      message is at least `min_message_chars` long.
+    - `low_confidence`: the geometric mean of the probabilities of its
+      tokens is below `min_confidence`. The log-probabilities are only
+      requested with this trigger.
+
+    The requests and escalations, by trigger, are counted in `metrics` as
+    `orbitals_cascade_requests_total` and `orbitals_cascade_escalations_total`,
+    and in `stats()`.
+
+    Args:
+        small_model: The model tried first.
+        large_model: The model escalated to.
+        escalate_on: The triggers of an escalation.
+        min_message_chars: The length of the last message from which an empty
+            extraction escalates.
+        min_confidence: The mean token probability below which an extraction
+            escalates.
+        metrics: The registry of the cascade metrics.
+        **kwargs: The other arguments of both `vllm-api` backends, like
+            `vllm_serving_url`, `upstream` or `max_tokens`.
+    """
+
+    def __init__(
+        self,
+        backend: Literal["cascade"] = "cascade",
+        small_model: str = "claim-extractor-2B-q",
+        large_model: str = "claim-extractor-4B-q",
+        escalate_on: Collection[EscalationTrigger] = get_args(EscalationTrigger),
+        min_message_chars: int = 200,
+        min_confidence: float = 0.8,
+        metrics: MetricsRegistry | None = None,
+        **kwargs,
+    ):
+        super().__init__(backend)
+        unknown = set(escalate_on) - set(get_args(EscalationTrigger))
+        if unknown:
+            raise ValueError(
+                f"Unknown escalation triggers: {sorted(unknown)}. "
+                f"Available: {list(get_args(EscalationTrigger))}"
+            )
+        self.small = AsyncVLLMApiClaimExtractor("vllm-api", model=small_model, **kwargs)
+        self.large = AsyncVLLMApiClaimExtractor("vllm-api", model=large_model, **kwargs)
+        self.escalate_on = frozenset(escalate_on)
+        self.min_message_chars = min_message_chars
+        self.min_confidence = min_confidence
+        self.metrics = metrics if metrics is not None else default_registry
+        self.requests = 0
+        self.escalations: dict[str, int] = dict.fromkeys(get_args(EscalationTrigger), 0)
+
+        self.metrics.describe(
+            "orbitals_cascade_requests_total",
+            "Extractions sent to the small model of the cascade",
+        )
+        self.metrics.describe(
+            "orbitals_cascade_escalations_total",
+            "Extractions escalated to the large model of the cascade",
+        )
+
+    def warmup(self):
+        """Load the chat-templating tokenizers of both models."""
+        self.small.warmup()
+        self.large.warmup()
+
+    @property
+    def escalation_rate(self) -> float:
+        """The share of the extractions escalated so far."""
+        return sum(self.escalations.values()) / self.requests if self.requests else 0.0
+
+    def stats(self) -> dict:
+        """The extractions so far, and how many escalated, by trigger."""
+        return {
+            "requests": self.requests,
+            "escalations": dict(self.escalations),
+            "escalation_rate": self.escalation_rate,
+        }
+
+    def _escalation_trigger(
+        self,
+        conversation: ClaimExtractorInput,
+        output: ClaimExtractorOutput | None,
+        response_json: dict,
+    ) -> EscalationTrigger | None:
+        choice = response_json["choices"][0] if response_json else {}
+        if "truncated" in self.escalate_on and choice.get("finish_reason") == "length":
+            return "truncated"
+        if output is None:
+            return "invalid" if "invalid" in self.escalate_on else None
+        if (
+            "empty" in self.escalate_on
+            and not output.extractions.intents
+            and not output.extractions.claims
+            and _last_message_length(conversation) >= self.min_message_chars
+        ):
+            return "empty"
+        if "low_confidence" in self.escalate_on and choice.get("logprobs"):
+            confidence = mean_token_probability(choice["logprobs"]["token_logprobs"])
+            if confidence is not None and confidence < self.min_confidence:
+                return "low_confidence"
+        return None
+
+    async def _cascade(
+        self,
+        conversation: ClaimExtractorInput,
+        ai_service_description: str | AIServiceDescription | None,
+        skip_evidences: bool | None,
+        intents_only: bool | None,
+        prefill: bool | None,
+    ) -> ClaimExtractorOutput:
+        response_json: dict = {}
+        output = None
+        error = None
+        try:
+            output = await self.small._handle_request(
+                model_name=None,
+                conversation=conversation,
+                ai_service_description=ai_service_description,
+                skip_evidences=skip_evidences,
+                intents_only=intents_only,
+                prefill=prefill if prefill is not None else self.small.prefill,
+                logprobs="low_confidence" in self.escalate_on,
+                on_response=response_json.update,
+            )
+        except ValueError as e:
+            error = e
+
+        self.requests += 1
+        self.metrics.inc("orbitals_cascade_requests_total")
+        trigger = self._escalation_trigger(conversation, output, response_json)
+        if trigger is None:
+            if output is None:
+                raise error  # type: ignore[misc]
+            return output
+
+        self.escalations[trigger] += 1
+        self.metrics.inc("orbitals_cascade_escalations_total", trigger=trigger)
+        return await self.large._handle_request(
+            model_name=None,
+            conversation=conversation,
+            ai_service_description=ai_service_description,
+            skip_evidences=skip_evidences,
+            intents_only=intents_only,
+            prefill=prefill if prefill is not None else self.large.prefill,
+        )
+
+    async def _extract(
+        self,
+        conversation: ClaimExtractorInput,
+        *,
+        ai_service_description: str | AIServiceDescription | None = None,
+        skip_evidences: bool | None = None,
+        intents_only: bool | None = None,
+        prefill: bool | None = None,
+        **kwargs,
+    ) -> ClaimExtractorOutput:
+        return await self._cascade(
+            conversation, ai_service_description, skip_evidences, intents_only, prefill
+        )
+
+    async def _batch_extract(
+        self,
+        conversations: list[ClaimExtractorInput],
+        *,
+        ai_service_description: str | AIServiceDescription | None = None,
+        ai_service_descriptions: list[str] | list[AIServiceDescription] | None = None,
+        skip_evidences: bool | None = None,
+        intents_only: bool | None = None,
+        prefill: bool | None = None,
+        **kwargs,
+    ) -> list[ClaimExtractorOutput]:
+        if ai_service_descriptions is None:
+            ai_service_descriptions = [ai_service_description] * len(conversations)  # type: ignore[invalid-assignment]
+
+        # like the `vllm-api` backend, the requests are dispatched one by one:
+        # each conversation escalates as soon as its small-model output is in
+        return await asyncio.gather(
+            *(
+                self._cascade(c, aisd, skip_evidences, intents_only, prefill)
+                for c, aisd in zip(conversations, ai_service_descriptions)  # type: ignore[invalid-argument-type]
+            )
+        )
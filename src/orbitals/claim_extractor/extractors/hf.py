@@ -3,6 +3,7 @@ from typing import TYPE_CHECKING, Literal
 if TYPE_CHECKING:
     from transformers import pipeline  # noqa: F401
 
+from ...bucketing import run_length_bucketed
 from ...types import AIServiceDescription
 from ..modeling import (
     ClaimExtractorInput,
@@ -30,6 +31,7 @@ class HuggingFaceClaimExtractor(ClaimExtractor):
         top_p: float = 0.8,
         top_k: int = 20,
         min_p: float = 0.0,
+        max_tokens_per_batch: int | None = None,
         **kwargs,
     ):
         from ...utils import maybe_configure_gpu_usage
@@ -42,6 +44,7 @@ class HuggingFaceClaimExtractor(ClaimExtractor):
         self.model = self.maybe_map_model(model)
         self.skip_evidences = skip_evidences
         self.intents_only = intents_only
+        self.max_tokens_per_batch = max_tokens_per_batch
         self._pipeline = pipeline(
             task="claim-extraction",
             model=self.model,
@@ -77,6 +80,20 @@ class HuggingFaceClaimExtractor(ClaimExtractor):
             return parse_intents_only_output(generated_text)
         return _parse_raw_output(generated_text)
 
+    def _run_pipeline(
+        self,
+        pipeline_inputs: list,
+        max_tokens_per_batch: int | None,
+        **pipeline_kwargs,
+    ) -> list:
+        if max_tokens_per_batch is None:
+            max_tokens_per_batch = self.max_tokens_per_batch
+        if max_tokens_per_batch is None:
+            return self._pipeline(pipeline_inputs, **pipeline_kwargs)
+        return run_length_bucketed(
+            self._pipeline, pipeline_inputs, max_tokens_per_batch, **pipeline_kwargs
+        )
+
     def _extract(
         self,
         conversation: ClaimExtractorInput,
@@ -111,6 +128,7 @@ class HuggingFaceClaimExtractor(ClaimExtractor):
         ai_service_descriptions: list[str] | list[AIServiceDescription] | None = None,
         skip_evidences: bool | None = None,
         intents_only: bool | None = None,
+        max_tokens_per_batch: int | None = None,
         **kwargs,
     ) -> list[ClaimExtractorOutput]:
         resolved_intents_only = (
@@ -124,8 +142,9 @@ class HuggingFaceClaimExtractor(ClaimExtractor):
             pipeline_inputs = [(c, ai_service_description) for c in conversations]
 
         pipeline_kwargs = self._resolve_flags(skip_evidences, intents_only)
-        pipeline_outputs = self._pipeline(
+        pipeline_outputs = self._run_pipeline(
             pipeline_inputs,
+            max_tokens_per_batch,
             **pipeline_kwargs,
         )
 
@@ -2,8 +2,9 @@ from __future__ import annotations
 
 import asyncio
 import json
+from collections.abc import AsyncIterator, Callable
 from functools import lru_cache
-from typing import TYPE_CHECKING, Final, Literal
+from typing import TYPE_CHECKING, Any, Final, Literal
 
 import aiohttp
 import pydantic
@@ -12,14 +13,31 @@ if TYPE_CHECKING:
     import transformers  # noqa: F401
     import vllm  # noqa: F401
 
+from ...bucketing import grouped_order, restore_order
+from ...json_scan import JSONPath, JSONStreamParser
 from ...types import AIServiceDescription, LLMUsage
+from ...upstream import (
+    ReplicaRouter,
+    VLLMUpstream,
+    collect_completion_stream,
+    iter_sse_json,
+    routing_key,
+    streaming_body,
+)
 from ..modeling import (
+    Claim,
+    ClaimExtractorClaimEvent,
     ClaimExtractorInput,
+    ClaimExtractorIntentEvent,
     ClaimExtractorOutput,
+    ClaimExtractorOutputEvent,
+    ClaimExtractorStreamEvent,
+    Intent,
 )
 from ..prompting import (
     CLAIMS_STOP_STRING,
     build_prompt,
+    get_prefill,
     get_system_prompt,
     parse_intents_only_output,
     validate_extractions_response,
@@ -48,6 +66,21 @@ def _strip_lone_surrogates(obj):
     return obj
 
 
+def _extraction_event(path: JSONPath, value: Any) -> ClaimExtractorStreamEvent | None:
+    try:
+        match path:
+            case ("extractions", "intents", int(index)):
+                intent = Intent.model_validate(_strip_lone_surrogates(value))
+                return ClaimExtractorIntentEvent(index=index, intent=intent)
+            case ("extractions", "claims", int(index)):
+                claim = Claim.model_validate(_strip_lone_surrogates(value))
+                return ClaimExtractorClaimEvent(index=index, claim=claim)
+    except pydantic.ValidationError:
+        # invalid extractions are left to the final validation
+        pass
+    return None
+
+
 _DEFAULT_SPECULATIVE_CONFIG = {"num_speculative_tokens": 4, "method": "mtp"}
 # Sentinel for `speculative_config`: distinguishes "user did not specify, apply
 # our default" from "user explicitly passed None to disable speculative decoding".
@@ -172,7 +205,16 @@ class VLLMClaimExtractor(ClaimExtractor):
         else:
             sampling_params = self.sampling_params
 
-        outputs = self.llm.generate(prompts, sampling_params, use_tqdm=False)
+        # submitted grouped by description, returned in the caller's order
+        order = grouped_order(
+            [routing_key(ad) for ad in descriptions], [len(p) for p in prompts]
+        )
+        outputs = restore_order(
+            order,
+            self.llm.generate(
+                [prompts[i] for i in order], sampling_params, use_tqdm=False
+            ),
+        )
 
         results: list[ClaimExtractorOutput] = []
 
@@ -211,7 +253,7 @@ class AsyncVLLMApiClaimExtractor(AsyncClaimExtractor):
         model: DefaultModel | str = "claim-extractor",
         skip_evidences: bool = True,
         intents_only: bool = False,
-        vllm_serving_url: str = "http://localhost:8000",
+        vllm_serving_url: str | list[str] = "http://localhost:8000",
         temperature: float = 0.7,
         max_tokens: int = 20_000,
         frequency_penalty: float = 0.0,
@@ -222,6 +264,8 @@ class AsyncVLLMApiClaimExtractor(AsyncClaimExtractor):
         min_p: float = 0.0,
         chat_templating_tokenizer: str | None = None,
         count_system_prompt_in_usage: bool = False,
+        upstream: VLLMUpstream | None = None,
+        prefill: bool = False,
     ):
         super().__init__(backend)
         self.default_model_name = self.maybe_map_model(model)
@@ -233,6 +277,7 @@ class AsyncVLLMApiClaimExtractor(AsyncClaimExtractor):
         self.skip_evidences = skip_evidences
         self.intents_only = intents_only
         self.vllm_serving_url = vllm_serving_url
+        self.router = ReplicaRouter(vllm_serving_url)
         self.vllm_temperature = temperature
         self.vllm_max_tokens = max_tokens
         self.vllm_frequency_penalty = frequency_penalty
@@ -242,6 +287,59 @@ class AsyncVLLMApiClaimExtractor(AsyncClaimExtractor):
         self.vllm_top_k = top_k
         self.vllm_min_p = min_p
         self.count_system_prompt_in_usage = count_system_prompt_in_usage
+        self.upstream = upstream
+        self.prefill = prefill
+
+    def warmup(self):
+        """Load the default chat-templating tokenizer ahead of the first request."""
+        _get_tokenizer(self.default_tokenizer_name)
+
+    async def _post_completion(
+        self, request_body: dict, routing_key: str | None = None
+    ) -> dict:
+        if self.upstream is not None:
+            return await self.upstream.completions(
+                request_body, guardrail="claim-extractor", routing_key=routing_key
+            )
+
+        with self.router.route(routing_key) as replica_url:
+            async with (
+                aiohttp.ClientSession() as session,
+                session.post(
+                    f"{replica_url}/v1/completions",
+                    json=request_body,
+                    headers={"Content-Type": "application/json"},
+                ) as response,
+            ):
+                response.raise_for_status()
+                return await response.json()
+
+    async def _stream_completion(
+        self,
+        request_body: dict,
+        on_text: Callable[[str], None],
+        routing_key: str | None = None,
+    ) -> dict:
+        request_body = streaming_body(request_body)
+        if self.upstream is not None:
+            return await collect_completion_stream(
+                self.upstream.stream_completions(
+                    request_body, guardrail="claim-extractor", routing_key=routing_key
+                ),
+                on_text,
+            )
+
+        with self.router.route(routing_key) as replica_url:
+            async with (
+                aiohttp.ClientSession() as session,
+                session.post(
+                    f"{replica_url}/v1/completions",
+                    json=request_body,
+                    headers={"Content-Type": "application/json"},
+                ) as response,
+            ):
+                response.raise_for_status()
+                return await collect_completion_stream(iter_sse_json(response), on_text)
 
     async def _handle_request(
         self,
@@ -252,6 +350,9 @@ class AsyncVLLMApiClaimExtractor(AsyncClaimExtractor):
         intents_only: bool | None,
         prefill: bool,
         chat_templating_tokenizer: str | None = None,
+        on_text: Callable[[str], None] | None = None,
+        logprobs: bool = False,
+        on_response: Callable[[dict], None] | None = None,
     ) -> ClaimExtractorOutput:
         model_name = (
             self.maybe_map_model(model_name) if model_name is not None else None
@@ -291,19 +392,28 @@ class AsyncVLLMApiClaimExtractor(AsyncClaimExtractor):
             "top_p": self.vllm_top_p,
             "top_k": self.vllm_top_k,
             "min_p": self.vllm_min_p,
+            # the log-probability of every generated token, without alternatives
+            **({"logprobs": 0} if logprobs else {}),
         }
         if resolved_intents_only:
             request_body["stop"] = [CLAIMS_STOP_STRING]
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{self.vllm_serving_url}/v1/completions",
-                json=request_body,
-                headers={"Content-Type": "application/json"},
-            ) as response:
-                response.raise_for_status()
-                response_json = await response.json()
-                response_text = response_json["choices"][0]["text"]
+        if on_text is None:
+            response_json = await self._post_completion(
+                request_body, routing_key(ai_service_description)
+            )
+        else:
+            if prefill:
+                on_text(get_prefill())
+            response_json = await self._stream_completion(
+                request_body, on_text, routing_key(ai_service_description)
+            )
+        if on_response is not None:
+            on_response(response_json)
+        response_text = response_json["choices"][0]["text"]
+
+        if prefill:
+            response_text = get_prefill() + response_text
 
         if resolved_intents_only:
             extractions = parse_intents_only_output(response_text)
@@ -350,6 +460,7 @@ class AsyncVLLMApiClaimExtractor(AsyncClaimExtractor):
         intents_only: bool | None = None,
         model: str | None = None,
         chat_templating_tokenizer: str | None = None,
+        prefill: bool | None = None,
         **kwargs,
     ) -> ClaimExtractorOutput:
         results = await self._batch_extract(
@@ -359,9 +470,51 @@ class AsyncVLLMApiClaimExtractor(AsyncClaimExtractor):
             intents_only=intents_only,
             model=model,
             chat_templating_tokenizer=chat_templating_tokenizer,
+            prefill=prefill,
         )
         return results[0]
 
+    async def _extract_stream(
+        self,
+        conversation: ClaimExtractorInput,
+        *,
+        ai_service_description: str | AIServiceDescription | None = None,
+        skip_evidences: bool | None = None,
+        intents_only: bool | None = None,
+        model: str | None = None,
+        chat_templating_tokenizer: str | None = None,
+        prefill: bool | None = None,
+        **kwargs,
+    ) -> AsyncIterator[ClaimExtractorStreamEvent]:
+        parser = JSONStreamParser(max_depth=3)
+        events: asyncio.Queue[ClaimExtractorStreamEvent | None] = asyncio.Queue()
+
+        def on_text(text: str) -> None:
+            for path, value in parser.feed(text):
+                event = _extraction_event(path, value)
+                if event is not None:
+                    events.put_nowait(event)
+
+        task = asyncio.ensure_future(
+            self._handle_request(
+                model_name=model,
+                conversation=conversation,
+                ai_service_description=ai_service_description,
+                skip_evidences=skip_evidences,
+                intents_only=intents_only,
+                prefill=prefill if prefill is not None else self.prefill,
+                chat_templating_tokenizer=chat_templating_tokenizer,
+                on_text=on_text,
+            )
+        )
+        task.add_done_callback(lambda _: events.put_nowait(None))
+        try:
+            while (event := await events.get()) is not None:
+                yield event
+            yield ClaimExtractorOutputEvent(output=await task)
+        finally:
+            task.cancel()
+
     async def _batch_extract(
         self,
         conversations: list[ClaimExtractorInput],
@@ -372,8 +525,10 @@ class AsyncVLLMApiClaimExtractor(AsyncClaimExtractor):
         intents_only: bool | None = None,
         model: str | None = None,
         chat_templating_tokenizer: str | None = None,
+        prefill: bool | None = None,
         **kwargs,
     ) -> list[ClaimExtractorOutput]:
+        prefill = prefill if prefill is not None else self.prefill
         if ai_service_descriptions is None:
             ai_service_descriptions = [ai_service_description] * len(conversations)  # type: ignore[invalid-assignment]
 
@@ -383,7 +538,10 @@ class AsyncVLLMApiClaimExtractor(AsyncClaimExtractor):
         # to better distribute the load.
         # Sending all requests in a single batched request would mean a single vLLM server
         # would have to process all of them.
-        # We are not even re-using the session to avoid ALBs not distributing requests properly.
+        # We are not even re-using the session to avoid ALBs not distributing requests properly,
+        # unless an `upstream` is provided, in which case its pooled session is shared.
+        # Given several replica URLs, the requests sharing a description are instead
+        # kept on one replica, to hit its prefix cache (see `ReplicaRouter`).
         # TODO further optimizations and discussions
 
         tasks = [
@@ -393,9 +551,7 @@ class AsyncVLLMApiClaimExtractor(AsyncClaimExtractor):
                 ai_service_description=aisd,
                 skip_evidences=skip_evidences,
                 intents_only=intents_only,
-                # TODO supporting True on this parameter is a bit tricky
-                # problem is the grammar-based decoding, which is unaware of the prefilling
-                prefill=False,
+                prefill=prefill,
                 chat_templating_tokenizer=chat_templating_tokenizer,
             )
             for c, aisd in zip(conversations, ai_service_descriptions)  # type: ignore[invalid-argument-type]
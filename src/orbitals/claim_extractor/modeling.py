@@ -1,8 +1,18 @@
 import json
+import sys
+from array import array
 from typing import Annotated, Any, Literal
 
-from pydantic import BaseModel, BeforeValidator, Field, TypeAdapter
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    Field,
+    TypeAdapter,
+    ValidatorFunctionWrapHandler,
+    WrapValidator,
+)
 
+from ..columnar import BatchResult, RaggedColumn, UsageColumn
 from ..types import ConversationMessage, LLMUsage
 
 ExtractionSubType = Literal["Factoid", "Capability", "User Assertion", "Unverifiable"]
@@ -62,24 +72,122 @@ class ClaimExtractorOutput(BaseModel):
     usage: LLMUsage | None
 
 
+class ClaimExtractorIntentEvent(BaseModel):
+    """Sent by `extract_stream` as soon as an intent is generated."""
+
+    event: Literal["intent"] = "intent"
+    index: int
+    intent: Intent
+
+
+class ClaimExtractorClaimEvent(BaseModel):
+    """Sent by `extract_stream` as soon as a claim is generated."""
+
+    event: Literal["claim"] = "claim"
+    index: int
+    claim: Claim
+
+
+class ClaimExtractorOutputEvent(BaseModel):
+    """The last event of `extract_stream`, with the complete output."""
+
+    event: Literal["output"] = "output"
+    output: ClaimExtractorOutput
+
+
+ClaimExtractorStreamEvent = Annotated[
+    ClaimExtractorIntentEvent | ClaimExtractorClaimEvent | ClaimExtractorOutputEvent,
+    Field(discriminator="event"),
+]
+
+
+class ClaimExtractorBatchResult(BatchResult[ClaimExtractorOutput]):
+    """Compact `batch_extract` results, see `orbitals.columnar.BatchResult`.
+
+    Intents and claims of all conversations are flattened into columns;
+    `intent_offsets` and `claim_offsets` delimit the rows of each
+    conversation, and the evidences columns have one row per intent or claim.
+    """
+
+    def __init__(self):
+        self.models: list[str] = []
+        self.usage = UsageColumn()
+        self.intent_offsets = array("Q", [0])
+        self.intent_contents: list[str] = []
+        self.intent_evidences = RaggedColumn()
+        self.claim_offsets = array("Q", [0])
+        self.claim_subtypes: list[str] = []
+        self.claim_contents: list[str] = []
+        self.claim_evidences = RaggedColumn()
+
+    def __len__(self) -> int:
+        return len(self.models)
+
+    def append(self, output: ClaimExtractorOutput) -> None:
+        self.models.append(sys.intern(output.model))
+        self.usage.append(output.usage)
+        for intent in output.extractions.intents:
+            self.intent_contents.append(intent.content)
+            self.intent_evidences.append(intent.evidences)
+        self.intent_offsets.append(len(self.intent_contents))
+        for claim in output.extractions.claims:
+            self.claim_subtypes.append(sys.intern(claim.subtype))
+            self.claim_contents.append(claim.content)
+            self.claim_evidences.append(claim.evidences)
+        self.claim_offsets.append(len(self.claim_contents))
+
+    def _row(self, index: int) -> ClaimExtractorOutput:
+        intents = [
+            Intent.model_construct(
+                content=self.intent_contents[i], evidences=self.intent_evidences[i]
+            )
+            for i in range(self.intent_offsets[index], self.intent_offsets[index + 1])
+        ]
+        claims = [
+            Claim.model_construct(
+                subtype=self.claim_subtypes[i],
+                content=self.claim_contents[i],
+                evidences=self.claim_evidences[i],
+            )
+            for i in range(self.claim_offsets[index], self.claim_offsets[index + 1])
+        ]
+        return ClaimExtractorOutput.model_construct(
+            extractions=Extractions.model_construct(intents=intents, claims=claims),
+            model=self.models[index],
+            usage=self.usage[index],
+        )
+
+
+# built once: constructing a TypeAdapter compiles a core schema
+_MESSAGE_ADAPTER = TypeAdapter(ConversationMessage)
+_CONVERSATION_ADAPTER = TypeAdapter(list[ConversationMessage])
+
+
 def _select_model_based_on_fields(
-    v: Any,
+    v: Any, handler: ValidatorFunctionWrapHandler
 ) -> str | ConversationMessage | list[ConversationMessage]:
-    if isinstance(v, str):
-        return TypeAdapter(str).validate_python(v)
+    if isinstance(v, (str, ConversationMessage)):
+        return v
     elif isinstance(v, dict):
-        return TypeAdapter(ConversationMessage).validate_python(v)
+        return _MESSAGE_ADAPTER.validate_python(v)
     elif isinstance(v, list):
-        return TypeAdapter(list[ConversationMessage]).validate_python(v)
+        # conversations of already validated messages need no revalidation
+        if all(type(message) is ConversationMessage for message in v):
+            return v
+        return _CONVERSATION_ADAPTER.validate_python(v)
 
     # no matching model found, let's fall back to standard pydantic behavior
-    return v
+    return handler(v)
 
 
 ClaimExtractorInput = Annotated[
     str | ConversationMessage | list[ConversationMessage],
-    BeforeValidator(_select_model_based_on_fields),
+    WrapValidator(_select_model_based_on_fields),
 ]
 
 
 ClaimExtractorInputTypeAdapter = TypeAdapter(ClaimExtractorInput)
+# validates a whole batch at once, errors are located by conversation index
+ClaimExtractorInputListTypeAdapter = TypeAdapter(
+    list[ClaimExtractorInput], config=ConfigDict(title="conversations")
+)
@@ -391,6 +391,7 @@ import json
 
 from pydantic import BaseModel, Field
 
+from ..json_scan import JSONScanner
 from ..types import AIServiceDescription, Conversation, ConversationMessage
 from .modeling import Claim, ClaimExtractorInput, Extractions, ExtractionSubType, Intent
 
@@ -480,33 +481,9 @@ def _balance_truncated_json(text: str) -> str:
     if s.endswith(","):
         s = s[:-1].rstrip()
 
-    stack: list[str] = []
-    in_str = False
-    escaped = False
-    for ch in s:
-        if in_str:
-            if escaped:
-                escaped = False
-            elif ch == "\\":
-                escaped = True
-            elif ch == '"':
-                in_str = False
-            continue
-        if ch == '"':
-            in_str = True
-        elif ch in "{[":
-            stack.append(ch)
-        elif ch == "}":
-            if stack and stack[-1] == "{":
-                stack.pop()
-        elif ch == "]":
-            if stack and stack[-1] == "[":
-                stack.pop()
-
-    closer = '"' if in_str else ""
-    for opener in reversed(stack):
-        closer += "}" if opener == "{" else "]"
-    return s + closer
+    scanner = JSONScanner()
+    scanner.feed(s)
+    return s + scanner.closer()
 
 
 def parse_intents_only_output(text: str) -> Extractions:
@@ -672,11 +649,15 @@ def build_prompt(
     )
 
     if prefill:
-        # TODO: prefilling is not currently supported for claim extractor because it
-        # is incompatible with the structured/guided JSON decoding used on vLLM. The
-        # same caveat applies to scope_guard's vLLM backend.
-        raise NotImplementedError(
-            "Prefill is not currently supported for claim extractor prompts."
-        )
+        prompt += get_prefill()
 
     return prompt
+
+
+def get_prefill() -> str:
+    """The start of the response that `build_prompt(prefill=True)` writes for the model.
+
+    The extractions always open with the intents array, whether or not they
+    report evidences.
+    """
+    return '{"extractions": {"intents": ['
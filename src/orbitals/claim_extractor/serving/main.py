@@ -4,8 +4,9 @@ import time
 from contextlib import asynccontextmanager
 from typing import Annotated
 
-from fastapi import Body, FastAPI, HTTPException
+from fastapi import APIRouter, Body, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from orbitals.claim_extractor import AsyncClaimExtractor
@@ -14,16 +15,19 @@ from orbitals.claim_extractor.modeling import (
     ClaimExtractorInput,
     Extractions,
 )
+from orbitals.serving.health import ServingHealth, install_health
+from orbitals.serving.rate_limiting import install_rate_limiting, rate_limiter_from_env
+from orbitals.serving.streaming import event_stream_response
 from orbitals.types import AIServiceDescription, ConversationMessage, LLMUsage
+from orbitals.upstream import VLLMUpstream
 
 claim_extractor: AsyncVLLMApiClaimExtractor
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    global claim_extractor
-
-    claim_extractor = AsyncClaimExtractor(  # type: ignore[invalid-assignment]
+def create_claim_extractor(
+    upstream: VLLMUpstream | None = None,
+) -> AsyncVLLMApiClaimExtractor:
+    return AsyncClaimExtractor(  # type: ignore[invalid-return-type]
         backend="vllm-api",
         model=os.environ["CLAIM_EXTRACTOR_VLLM_MODEL"],
         skip_evidences=os.environ.get("CLAIM_EXTRACTOR_SKIP_EVIDENCES", "1") == "1",
@@ -42,7 +46,26 @@ async def lifespan(app: FastAPI):
         top_p=float(os.environ.get("CLAIM_EXTRACTOR_TOP_P", "0.8")),
         top_k=int(os.environ.get("CLAIM_EXTRACTOR_TOP_K", "20")),
         min_p=float(os.environ.get("CLAIM_EXTRACTOR_MIN_P", "0.0")),
+        chat_templating_tokenizer=os.environ.get(
+            "CLAIM_EXTRACTOR_CHAT_TEMPLATING_TOKENIZER"
+        ),
+        upstream=upstream,
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global claim_extractor
+
+    claim_extractor = create_claim_extractor()
+
+    max_in_flight = os.environ.get("CLAIM_EXTRACTOR_MAX_IN_FLIGHT")
+    app.state.health = ServingHealth(
+        vllm_serving_url=os.environ["CLAIM_EXTRACTOR_VLLM_SERVING_URL"],
+        max_in_flight=int(max_in_flight) if max_in_flight else None,
     )
+    await app.state.health.warmup(claim_extractor.warmup)
+    app.state.rate_limiter = rate_limiter_from_env("CLAIM_EXTRACTOR_RATE_LIMIT_CONFIG")
 
     yield
 
@@ -59,6 +82,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+install_health(app)
+install_rate_limiting(app)
+
+
+# only on the standalone app: the unified app has its own `/health`
+@app.get("/health")
+async def health() -> dict[str, str]:
+    return {"status": "ok"}
+
+
+router = APIRouter()
+
 
 class ClaimExtractorResponse(BaseModel):
     extractions: Extractions
@@ -83,12 +118,7 @@ def _require_usage(usage: LLMUsage | None) -> LLMUsage:
     return usage
 
 
-@app.get("/health")
-async def health() -> dict[str, str]:
-    return {"status": "ok"}
-
-
-@app.post("/orbitals/claim-extractor/extract", response_model=ClaimExtractorResponse)
+@router.post("/orbitals/claim-extractor/extract", response_model=ClaimExtractorResponse)
 async def extract(
     conversation: ClaimExtractorInput,
     ai_service_description: Annotated[
@@ -118,7 +148,29 @@ async def extract(
     )
 
 
-@app.post(
+@router.post("/orbitals/claim-extractor/extract-stream")
+async def extract_stream(
+    conversation: ClaimExtractorInput,
+    ai_service_description: Annotated[
+        str | AIServiceDescription | None, Body()
+    ] = None,
+    skip_evidences: Annotated[bool | None, Body()] = None,
+    intents_only: Annotated[bool | None, Body()] = None,
+    model: Annotated[str | None, Body()] = None,
+) -> StreamingResponse:
+    return event_stream_response(
+        claim_extractor.extract_stream(
+            conversation,
+            validated=True,
+            ai_service_description=ai_service_description,
+            skip_evidences=skip_evidences,
+            intents_only=intents_only,
+            model=model,
+        )
+    )
+
+
+@router.post(
     "/orbitals/claim-extractor/batch-extract",
     response_model=list[ClaimExtractorResponse],
 )
@@ -180,7 +232,7 @@ async def batch_extract(
     )
 
 
-@app.post(
+@router.post(
     "/orbitals/claim-extractor/extract-conversation",
     response_model=ConversationClaimExtractorResponse,
 )
@@ -212,6 +264,7 @@ async def extract_conversation(
     start_time = time.time()
     results = await claim_extractor.batch_extract(
         prefixes,
+        validated=True,
         ai_service_description=ai_service_description,
         skip_evidences=skip_evidences,
         intents_only=intents_only,
@@ -232,3 +285,6 @@ async def extract_conversation(
         usage=total_usage,
         time_taken=end_time - start_time,
     )
+
+
+app.include_router(router)
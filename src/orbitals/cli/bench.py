@@ -0,0 +1,80 @@
+import asyncio
+import json
+from pathlib import Path
+from typing import Annotated
+
+import typer
+
+app = typer.Typer()
+
+
+@app.command("bench")
+def bench(
+    requests_file: Annotated[
+        Path,
+        typer.Argument(
+            help="JSONL request mix, one {endpoint, body, weight} object per line"
+        ),
+    ],
+    url: Annotated[
+        str, typer.Option(help="The server base URL")
+    ] = "http://localhost:8000",
+    rate: Annotated[
+        float | None, typer.Option(help="Requests per second, for an open-loop run")
+    ] = None,
+    arrival: Annotated[
+        str, typer.Option(help="Open-loop inter-arrival times: poisson or fixed")
+    ] = "poisson",
+    concurrency: Annotated[
+        int | None,
+        typer.Option(help="Number of concurrent users, for a closed-loop run"),
+    ] = None,
+    duration: Annotated[
+        float | None, typer.Option(help="Seconds to send requests for")
+    ] = 30.0,
+    num_requests: Annotated[
+        int | None,
+        typer.Option(
+            help="Number of requests to send (stops at the first limit reached)"
+        ),
+    ] = None,
+    timeout: Annotated[
+        float, typer.Option(help="Timeout of each request, in seconds")
+    ] = 120.0,
+    api_key: Annotated[
+        str | None, typer.Option(help="Sent as the X-API-Key header of every request")
+    ] = None,
+    output: Annotated[
+        Path | None, typer.Option(help="Write the JSON report to this file")
+    ] = None,
+    seed: Annotated[
+        int | None, typer.Option(help="Random seed of the request sequence")
+    ] = None,
+):
+    """Load test an Orbitals server and report latency and throughput."""
+    from orbitals.bench import format_report, load_requests, run_bench
+
+    if (rate is None) == (concurrency is None):
+        raise typer.BadParameter("Pass exactly one between --rate and --concurrency")
+    if arrival not in ("poisson", "fixed"):
+        raise typer.BadParameter("Must be poisson or fixed", param_hint="--arrival")
+
+    report = asyncio.run(
+        run_bench(
+            url,
+            load_requests(requests_file),
+            rate=rate,
+            arrival=arrival,  # type: ignore[arg-type]
+            concurrency=concurrency,
+            duration=duration,
+            num_requests=num_requests,
+            timeout=timeout,
+            headers={"X-API-Key": api_key} if api_key is not None else None,
+            seed=seed,
+        )
+    )
+
+    typer.echo(format_report(report))
+    if output is not None:
+        output.write_text(json.dumps(report, indent=2))
+        typer.echo(f"\nReport written to {output}")
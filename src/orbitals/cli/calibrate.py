@@ -0,0 +1,49 @@
+import json
+from pathlib import Path
+from typing import Annotated
+
+import typer
+
+from orbitals.confidence import TemperatureScaling, is_model_prediction
+
+app = typer.Typer()
+
+
+def _read_jsonl(path: Path) -> list[dict]:
+    with path.open() as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+@app.command("calibrate")
+def calibrate(
+    predictions_path: Annotated[
+        Path,
+        typer.Argument(
+            help="JSONL file with scope_class_probabilities, e.g. the output of run-batch --with-probabilities"
+        ),
+    ],
+    output_path: Annotated[Path, typer.Argument(help="Output JSON calibration file")],
+    labels_path: Annotated[
+        Path | None,
+        typer.Option(
+            help="JSONL file with the true labels, matched to the predictions by their index "
+            "(e.g. the run-batch input). By default the labels are read from the predictions"
+        ),
+    ] = None,
+    label_field: Annotated[
+        str, typer.Option(help="The field holding the true class")
+    ] = "label",
+):
+    if labels_path is None:
+        calibration = TemperatureScaling.fit_jsonl(
+            predictions_path, label_field=label_field
+        )
+    else:
+        labels = [row.get(label_field) for row in _read_jsonl(labels_path)]
+        calibration = TemperatureScaling.fit(
+            (row["scope_class_probabilities"], labels[row["index"]])
+            for row in _read_jsonl(predictions_path)
+            if is_model_prediction(row) and labels[row["index"]]
+        )
+    calibration.save(output_path)
+    typer.echo(f"Fitted temperature: {calibration.temperature:.4f}")
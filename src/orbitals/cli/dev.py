@@ -0,0 +1,61 @@
+import typer
+
+app = typer.Typer(help="Development and testing utilities")
+
+
+@app.command("fake-vllm")
+def fake_vllm(
+    port: int = typer.Option(
+        8001, "-p", "--port", help="The port to use for the server"
+    ),
+    host: str = typer.Option(
+        "127.0.0.1", "-h", "--host", help="The host to use for the server"
+    ),
+    latency_distribution: str = typer.Option(
+        "constant",
+        help="Distribution of the base latency: constant, uniform, exponential or lognormal",
+    ),
+    latency_mean_ms: float = typer.Option(
+        0.0, help="Mean base latency of a completion, in milliseconds"
+    ),
+    latency_stddev_ms: float = typer.Option(
+        0.0,
+        help="Standard deviation of the base latency (uniform and lognormal only)",
+    ),
+    per_token_ms: float = typer.Option(
+        0.0, help="Extra latency per completion token, in milliseconds"
+    ),
+    error_rate: float = typer.Option(
+        0.0, help="Fraction of completions answered with an error"
+    ),
+    error_status: int = typer.Option(500, help="HTTP status of the injected errors"),
+    max_concurrency: int | None = typer.Option(
+        None,
+        help="Maximum number of completions processed at once; the rest are queued",
+    ),
+    seed: int | None = typer.Option(None, help="Random seed, for reproducible runs"),
+):
+    """Serve a CPU-only fake of the vLLM completions API, for load tests and CI."""
+    from aiohttp import web
+
+    from orbitals.dev import FakeVLLM, LatencyModel
+
+    try:
+        latency = LatencyModel(
+            distribution=latency_distribution,
+            mean_ms=latency_mean_ms,
+            stddev_ms=latency_stddev_ms,
+            per_token_ms=per_token_ms,
+        )
+    except ValueError as e:
+        raise typer.BadParameter(str(e), param_hint="--latency-distribution")
+
+    server = FakeVLLM(
+        latency=latency,
+        error_rate=error_rate,
+        error_status=error_status,
+        max_concurrency=max_concurrency,
+        seed=seed,
+    )
+    typer.echo(f"Starting fake vLLM server on {host}:{port}")
+    web.run_app(server.create_app(), host=host, port=port, print=None)
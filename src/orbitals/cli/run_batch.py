@@ -0,0 +1,257 @@
+import asyncio
+import time
+from pathlib import Path
+from typing import Annotated, NamedTuple
+
+import typer
+from pydantic import BaseModel
+
+from orbitals.batch import run_batch
+from orbitals.claim_extractor import AsyncClaimExtractor, ClaimExtractor
+from orbitals.scope_guard import AsyncScopeGuard, ScopeGuard
+from orbitals.scope_guard_v2 import AsyncScopeGuardV2, ScopeGuardV2
+from orbitals.types import AIServiceDescription, AIServiceDescriptionV2
+
+ASYNC_BACKENDS = ("api", "vllm-api")
+
+
+class BatchGuard(NamedTuple):
+    """What `run-batch` needs to know about a guardrail.
+
+    Args:
+        guard_cls: The guardrail class, for the hf and vllm backends.
+        async_guard_cls: The async guardrail class, for `ASYNC_BACKENDS`.
+        method: The name of the batch method of both classes.
+        description_cls: The structured AI service description model.
+        backend: The default backend.
+        model: The default model, `None` if the option is required.
+        skip_evidences: The default of `--skip-evidences`.
+        flag: The guardrail specific boolean option, passed to the constructor.
+        flag_help: The help of `flag`.
+        flag_backends: The backends supporting `flag`, `None` if all do.
+        missing_description: Used for rows without an AI service description,
+            which are rejected if `None`.
+    """
+
+    guard_cls: type
+    async_guard_cls: type
+    method: str
+    description_cls: type[BaseModel]
+    backend: str
+    model: str | None
+    skip_evidences: bool
+    flag: str
+    flag_help: str
+    flag_backends: tuple[str, ...] | None = None
+    missing_description: str | None = None
+
+
+GUARDS = {
+    "scope-guard": BatchGuard(
+        guard_cls=ScopeGuard,
+        async_guard_cls=AsyncScopeGuard,
+        method="batch_validate",
+        description_cls=AIServiceDescription,
+        backend="hf",
+        model="scope-guard",
+        skip_evidences=False,
+        flag="with_probabilities",
+        flag_help="Add the scope class probabilities to the output (vllm and vllm-api backends only)",
+        flag_backends=("vllm", "vllm-api"),
+    ),
+    "scope-guard-v2": BatchGuard(
+        guard_cls=ScopeGuardV2,
+        async_guard_cls=AsyncScopeGuardV2,
+        method="batch_validate",
+        description_cls=AIServiceDescriptionV2,
+        backend="vllm",
+        model=None,
+        skip_evidences=False,
+        flag="with_probabilities",
+        flag_help="Add the scope class probabilities to the output (vllm and vllm-api backends only)",
+        flag_backends=("vllm", "vllm-api"),
+    ),
+    "claim-extractor": BatchGuard(
+        guard_cls=ClaimExtractor,
+        async_guard_cls=AsyncClaimExtractor,
+        method="batch_extract",
+        description_cls=AIServiceDescription,
+        backend="hf",
+        model="claim-extractor",
+        skip_evidences=True,
+        flag="intents_only",
+        flag_help="Only extract intents (stop generation before claims)",
+        # same placeholder the prompt uses when no description is given at all
+        missing_description="No AI service description provided.",
+    ),
+}
+
+
+def _descriptions(
+    guard: BatchGuard, records: list[dict], default: str | None
+) -> list[str | BaseModel] | None:
+    descriptions = [record.get("ai_service_description", default) for record in records]
+    if guard.missing_description is not None and all(
+        description is None for description in descriptions
+    ):
+        # let the guardrail fall back to its own placeholder
+        return None
+
+    resolved = []
+    for description in descriptions:
+        if description is None:
+            if guard.missing_description is None:
+                raise ValueError(
+                    "Each row needs an ai_service_description, or pass --ai-service-description"
+                )
+            description = guard.missing_description
+        if isinstance(description, dict):
+            description = guard.description_cls.model_validate(description)
+        resolved.append(description)
+    return resolved
+
+
+def build_app(guardrail: str) -> typer.Typer:
+    """The `run-batch` command of one of the `GUARDS`."""
+    guard = GUARDS[guardrail]
+    option = guard.flag.replace("_", "-")
+    app = typer.Typer()
+
+    @app.command("run-batch")
+    def run_batch_command(
+        input_path: Annotated[
+            Path,
+            typer.Argument(
+                help="JSONL file with one {conversation, ai_service_description, id} object per line",
+            ),
+        ],
+        output_path: Annotated[
+            Path,
+            typer.Argument(
+                help="Output JSONL file, or Parquet dataset directory (*.parquet)"
+            ),
+        ],
+        backend: Annotated[
+            str, typer.Option(help="The backend to use: hf, vllm, api or vllm-api")
+        ] = guard.backend,
+        # a default of ... makes the option required
+        model: Annotated[str, typer.Option(help="The model to use")] = (
+            guard.model if guard.model is not None else ...
+        ),  # type: ignore[assignment]
+        skip_evidences: Annotated[
+            bool, typer.Option(help="Whether to skip evidences")
+        ] = guard.skip_evidences,
+        flag: Annotated[
+            bool, typer.Option(f"--{option}/--no-{option}", help=guard.flag_help)
+        ] = False,
+        ai_service_description: Annotated[
+            Path | None,
+            typer.Option(
+                help="File with the AI service description used for rows without one"
+            ),
+        ] = None,
+        api_url: Annotated[
+            str, typer.Option(help="The Orbitals API URL, for the api backend")
+        ] = "http://localhost:8000",
+        api_key: Annotated[
+            str | None, typer.Option(help="The API key, for the api backend")
+        ] = None,
+        vllm_serving_url: Annotated[
+            str, typer.Option(help="The vLLM server URL, for the vllm-api backend")
+        ] = "http://localhost:8000",
+        batch_size: Annotated[
+            int, typer.Option(help="Number of rows per micro-batch")
+        ] = 16,
+        concurrency: Annotated[
+            int,
+            typer.Option(
+                help="Maximum number of micro-batches in flight (api and vllm-api backends only)"
+            ),
+        ] = 4,
+        output_format: Annotated[
+            str | None,
+            typer.Option(
+                help="jsonl or parquet. Inferred from the output path by default"
+            ),
+        ] = None,
+        resume: Annotated[
+            bool,
+            typer.Option(help="Resume from the checkpoint of a previous run, if any"),
+        ] = True,
+    ):
+        if (
+            flag
+            and guard.flag_backends is not None
+            and backend not in guard.flag_backends
+        ):
+            raise typer.BadParameter(
+                f"--{option} is not supported by the {backend} backend, "
+                f"use one of: {', '.join(guard.flag_backends)}",
+                param_hint="'--backend'",
+            )
+
+        default_description = (
+            ai_service_description.read_text()
+            if ai_service_description is not None
+            else None
+        )
+        kwargs: dict = {
+            "backend": backend,
+            "model": model,
+            "skip_evidences": skip_evidences,
+            **({guard.flag: True} if flag else {}),
+        }
+
+        if backend in ASYNC_BACKENDS:
+            kwargs.update(
+                {"api_url": api_url, "api_key": api_key}
+                if backend == "api"
+                else {"vllm_serving_url": vllm_serving_url}
+            )
+            async_method = getattr(guard.async_guard_cls(**kwargs), guard.method)
+
+            async def process_batch(records: list[dict]):
+                return await async_method(
+                    [record["conversation"] for record in records],
+                    ai_service_descriptions=_descriptions(
+                        guard, records, default_description
+                    ),
+                )
+
+        else:
+            method = getattr(guard.guard_cls(**kwargs), guard.method)
+            # a local model processes one batch at a time
+            concurrency = 1
+
+            async def process_batch(records: list[dict]):
+                return await asyncio.to_thread(
+                    method,
+                    [record["conversation"] for record in records],
+                    ai_service_descriptions=_descriptions(
+                        guard, records, default_description
+                    ),
+                )
+
+        start_time = time.perf_counter()
+        rows = asyncio.run(
+            run_batch(
+                input_path,
+                output_path,
+                process_batch,
+                batch_size=batch_size,
+                concurrency=concurrency,
+                output_format=output_format,  # type: ignore[arg-type]
+                resume=resume,
+                progress=lambda rows, rate: typer.echo(
+                    f"{rows} rows done ({rate:.2f} rows/s)", err=True
+                ),
+            )
+        )
+        elapsed = time.perf_counter() - start_time
+        typer.echo(
+            f"Processed {rows} rows in {elapsed:.1f}s ({rows / elapsed:.2f} rows/s)"
+            if elapsed > 0
+            else f"Processed {rows} rows"
+        )
+
+    return app
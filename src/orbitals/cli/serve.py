@@ -0,0 +1,319 @@
+import logging
+import os
+import shlex
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Annotated
+
+import typer
+
+from orbitals.claim_extractor import ClaimExtractor
+from orbitals.scope_guard import ScopeGuard
+
+app = typer.Typer()
+
+GUARDRAILS = ("scope-guard", "scope-guard-v2", "claim-extractor")
+
+
+def setup_fastapi_logging():
+    """Configure logging for the FastAPI server."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format="[FastAPI] %(levelname)s %(asctime)s %(name)s:%(lineno)d] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    # Set log level for common noisy loggers
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("httpcore").setLevel(logging.WARNING)
+
+
+def _parse_lora_modules(lora_modules: list[str]) -> dict[str, str]:
+    parsed = {}
+    for lora_module in lora_modules:
+        name, sep, path = lora_module.partition("=")
+        if not sep or not name or not path:
+            raise typer.BadParameter(
+                f"Invalid LoRA module {lora_module!r}, expected NAME=PATH"
+            )
+        parsed[name] = path
+    return parsed
+
+
+@app.command("serve")
+def serve(
+    guardrails: Annotated[
+        list[str] | None,
+        typer.Option(
+            "-g",
+            "--guardrail",
+            help="Guardrail to mount (repeatable). Defaults to all of them",
+        ),
+    ] = None,
+    scope_guard_model: str = typer.Option(
+        "scope-guard", help="Model (or LoRA name) used by scope-guard"
+    ),
+    scope_guard_v2_model: str | None = typer.Option(
+        None, help="Model (or LoRA name) used by scope-guard-v2"
+    ),
+    claim_extractor_model: str = typer.Option(
+        "claim-extractor", help="Model (or LoRA name) used by claim-extractor"
+    ),
+    scope_guard_skip_evidences: bool = typer.Option(
+        False, help="Whether scope-guard skips evidences"
+    ),
+    scope_guard_v2_skip_evidences: bool = typer.Option(
+        False, help="Whether scope-guard-v2 skips evidences"
+    ),
+    claim_extractor_skip_evidences: bool = typer.Option(
+        True, help="Whether claim-extractor skips evidences"
+    ),
+    claim_extractor_intents_only: bool = typer.Option(
+        False, help="Whether claim-extractor only extracts intents by default"
+    ),
+    chat_templating_tokenizer: str | None = typer.Option(
+        None,
+        help="Tokenizer used to apply the chat template, when the served model "
+        "names (e.g. LoRA names) are not valid Hugging Face repositories",
+    ),
+    max_concurrency: int | None = typer.Option(
+        None,
+        help="Maximum number of in-flight requests to vLLM across all guardrails",
+    ),
+    max_connections: int = typer.Option(
+        100, help="Size of the connection pool shared by all guardrails"
+    ),
+    port: int = typer.Option(
+        8000, "-p", "--port", help="The port to use for the server"
+    ),
+    host: str = typer.Option(
+        "0.0.0.0", "-h", "--host", help="The host to use for the server"
+    ),
+    vllm_serving_url: str | None = typer.Option(
+        None,
+        help="URL of an already running vLLM server, or comma-separated URLs of "
+        "several replicas, which requests are routed across by AI service "
+        "description. If not set, one is started",
+    ),
+    vllm_model: str | None = typer.Option(
+        None,
+        help="Base model of the vLLM server. Defaults to the model of the first "
+        "mounted guardrail",
+    ),
+    lora_modules: Annotated[
+        list[str] | None,
+        typer.Option(
+            "--lora-module",
+            help="LoRA adapter to serve, as NAME=PATH (repeatable). Guardrail models "
+            "can then refer to NAME",
+        ),
+    ] = None,
+    vllm_port: int = typer.Option(8001, help="The port to use for the vLLM server"),
+    vllm_max_model_len: int = typer.Option(
+        40_000, help="Maximum model length for vLLM"
+    ),
+    vllm_max_num_seqs: int = typer.Option(
+        8, help="Maximum number of sequences for vLLM"
+    ),
+    vllm_gpu_memory_utilization: float = typer.Option(
+        0.9, help="GPU memory utilization for vLLM"
+    ),
+    vllm_enable_prefix_caching: bool = typer.Option(
+        True, help="Enable vLLM prefix caching"
+    ),
+    vllm_extra_args: str | None = typer.Option(
+        None, help="Extra arguments to pass to the vLLM server"
+    ),
+    max_in_flight: int | None = typer.Option(
+        None,
+        help="Number of in-flight requests above which /readyz reports not ready",
+    ),
+    drain_timeout: int = typer.Option(
+        30,
+        help="Seconds to wait for in-flight requests to complete on shutdown",
+    ),
+    drain_delay: float = typer.Option(
+        0.0,
+        help="Seconds to keep listening (with /readyz failing) after SIGTERM, "
+        "so that load balancers stop routing traffic first",
+    ),
+    rate_limit_config: Annotated[
+        Path | None,
+        typer.Option(
+            help="JSON file with per-API-key rate limits, reloaded when it changes"
+        ),
+    ] = None,
+):
+    """Serve several guardrails from one app, sharing a single vLLM server."""
+    # imported here to keep `orbitals --help` and the other commands fast
+    import httpx
+    import uvicorn
+
+    from orbitals.serving.server import run_server, stop_vllm_process
+
+    guardrails = guardrails or list(GUARDRAILS)
+    unknown = set(guardrails) - set(GUARDRAILS)
+    if unknown:
+        raise typer.BadParameter(
+            f"Unknown guardrails: {sorted(unknown)}. Available: {list(GUARDRAILS)}"
+        )
+    if "scope-guard-v2" in guardrails and scope_guard_v2_model is None:
+        raise typer.BadParameter(
+            "--scope-guard-v2-model is required when serving scope-guard-v2"
+        )
+
+    models = {
+        "scope-guard": ScopeGuard.maybe_map_model(scope_guard_model),
+        "scope-guard-v2": scope_guard_v2_model,
+        "claim-extractor": ClaimExtractor.maybe_map_model(claim_extractor_model),
+    }
+    models = {g: models[g] for g in GUARDRAILS if g in guardrails}
+
+    os.environ["ORBITALS_SERVE_GUARDRAILS"] = ",".join(models)
+    os.environ["ORBITALS_SERVE_MAX_CONNECTIONS"] = str(max_connections)
+    if max_concurrency is not None:
+        os.environ["ORBITALS_SERVE_MAX_CONCURRENCY"] = str(max_concurrency)
+
+    vllm_process = None
+    if vllm_serving_url is None:
+        lora = _parse_lora_modules(lora_modules or [])
+        vllm_model = vllm_model or next(m for m in models.values() if m not in lora)
+        unservable = {
+            g: m for g, m in models.items() if m != vllm_model and m not in lora
+        }
+        if unservable:
+            raise typer.BadParameter(
+                f"Models {unservable} are neither the vLLM base model "
+                f"({vllm_model}) nor a --lora-module"
+            )
+        vllm_serving_url = f"http://localhost:{vllm_port}"
+
+        # Set up vLLM logging configuration
+        vllm_logging_config = (
+            Path(__file__).parent.parent / "serving" / "vllm_logging_config.json"
+        )
+        os.environ["VLLM_LOGGING_CONFIG_PATH"] = str(vllm_logging_config)
+
+        # Start vLLM server
+        vllm_cmd = [
+            "vllm",
+            "serve",
+            vllm_model,
+            "--max-model-len",
+            str(vllm_max_model_len),
+            "--max-num-seqs",
+            str(vllm_max_num_seqs),
+            "--port",
+            str(vllm_port),
+            "--gpu-memory-utilization",
+            str(vllm_gpu_memory_utilization),
+        ]
+        if vllm_enable_prefix_caching:
+            vllm_cmd.append("--enable-prefix-caching")
+        if lora:
+            vllm_cmd.extend(
+                [
+                    "--enable-lora",
+                    "--lora-modules",
+                    *(f"{name}={path}" for name, path in lora.items()),
+                ]
+            )
+        if vllm_extra_args is not None:
+            vllm_cmd.extend(shlex.split(vllm_extra_args))
+
+        typer.echo(f"Starting vLLM server: {' '.join(vllm_cmd)}")
+        vllm_process = subprocess.Popen(vllm_cmd, stdout=sys.stdout, stderr=sys.stderr)
+
+        # Wait for vLLM server to be ready
+        typer.echo(f"Waiting for vLLM server to be ready at {vllm_serving_url}...")
+        max_retries = 60
+        retry_delay = 5
+
+        for i in range(max_retries):
+            try:
+                response = httpx.get(f"{vllm_serving_url}/health", timeout=2.0)
+                if response.status_code == 200:
+                    typer.echo("vLLM server is ready!")
+                    break
+            except (httpx.RequestError, httpx.HTTPError):
+                if i < max_retries - 1:
+                    typer.echo(
+                        f"vLLM server not ready yet, retrying in {retry_delay}s..."
+                    )
+                    time.sleep(retry_delay)
+                else:
+                    typer.echo("vLLM server failed to start in time", err=True)
+                    vllm_process.terminate()
+                    vllm_process.wait()
+                    raise typer.Exit(code=1)
+
+    os.environ["ORBITALS_SERVE_VLLM_SERVING_URL"] = vllm_serving_url
+
+    if "scope-guard" in models:
+        os.environ["SCOPE_GUARD_VLLM_MODEL"] = models["scope-guard"]
+        os.environ["SCOPE_GUARD_VLLM_SERVING_URL"] = vllm_serving_url
+        os.environ["SCOPE_GUARD_SKIP_EVIDENCES"] = (
+            str(1) if scope_guard_skip_evidences else str(0)
+        )
+    if "scope-guard-v2" in models:
+        os.environ["SCOPE_GUARD_V2_VLLM_MODEL"] = models["scope-guard-v2"]
+        os.environ["SCOPE_GUARD_V2_VLLM_SERVING_URL"] = vllm_serving_url
+        os.environ["SCOPE_GUARD_V2_SKIP_EVIDENCES"] = (
+            str(1) if scope_guard_v2_skip_evidences else str(0)
+        )
+    if "claim-extractor" in models:
+        os.environ["CLAIM_EXTRACTOR_VLLM_MODEL"] = models["claim-extractor"]
+        os.environ["CLAIM_EXTRACTOR_VLLM_SERVING_URL"] = vllm_serving_url
+        os.environ["CLAIM_EXTRACTOR_SKIP_EVIDENCES"] = (
+            str(1) if claim_extractor_skip_evidences else str(0)
+        )
+        os.environ["CLAIM_EXTRACTOR_INTENTS_ONLY"] = (
+            str(1) if claim_extractor_intents_only else str(0)
+        )
+    if chat_templating_tokenizer is not None:
+        for prefix in ("SCOPE_GUARD", "SCOPE_GUARD_V2", "CLAIM_EXTRACTOR"):
+            os.environ[f"{prefix}_CHAT_TEMPLATING_TOKENIZER"] = (
+                chat_templating_tokenizer
+            )
+
+    if max_in_flight is not None:
+        os.environ["ORBITALS_SERVE_MAX_IN_FLIGHT"] = str(max_in_flight)
+    if rate_limit_config is not None:
+        os.environ["ORBITALS_SERVE_RATE_LIMIT_CONFIG"] = str(
+            rate_limit_config.resolve()
+        )
+
+    # Set up FastAPI logging
+    setup_fastapi_logging()
+
+    # Start uvicorn server with custom logging configuration
+    typer.echo(f"Starting FastAPI server on {host}:{port} serving {list(models)}")
+
+    # Configure uvicorn logging
+    log_config = uvicorn.config.LOGGING_CONFIG  # type: ignore[attr-defined]
+    log_config["formatters"]["default"]["fmt"] = (
+        "[FastAPI] %(levelprefix)s %(asctime)s %(name)s] %(message)s"
+    )
+    log_config["formatters"]["default"]["datefmt"] = "%Y-%m-%d %H:%M:%S"
+    log_config["formatters"]["access"]["fmt"] = (
+        "[FastAPI] %(levelprefix)s %(asctime)s %(client_addr)s - "
+        '"%(request_line)s" %(status_code)s'
+    )
+    log_config["formatters"]["access"]["datefmt"] = "%Y-%m-%d %H:%M:%S"
+
+    try:
+        run_server(
+            "orbitals.serving.main:create_app",
+            host=host,
+            port=port,
+            log_config=log_config,
+            drain_timeout=drain_timeout,
+            drain_delay=drain_delay,
+            factory=True,
+        )
+    finally:
+        if vllm_process is not None:
+            # Clean up vLLM process on exit
+            typer.echo("Shutting down vLLM server...")
+            stop_vllm_process(vllm_process)
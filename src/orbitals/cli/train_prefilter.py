@@ -0,0 +1,69 @@
+import random
+from pathlib import Path
+from typing import Annotated
+
+import typer
+
+from orbitals.prefilter import (
+    CHIT_CHAT,
+    CharNGramClassifier,
+    precision_at,
+    read_training_samples,
+)
+
+app = typer.Typer()
+
+
+@app.command("train-prefilter")
+def train_prefilter(
+    logs_path: Annotated[
+        Path,
+        typer.Argument(
+            help="JSONL logs with the scope class of every conversation, e.g. the output of run-batch"
+        ),
+    ],
+    output_path: Annotated[
+        Path, typer.Argument(help="Output JSON pre-classifier file")
+    ],
+    inputs_path: Annotated[
+        Path | None,
+        typer.Option(
+            help="JSONL file with the conversations, matched to the logs by their index "
+            "(e.g. the run-batch input). By default the conversations are read from the logs"
+        ),
+    ] = None,
+    label_field: Annotated[
+        str, typer.Option(help="The field holding the scope class")
+    ] = "scope_class",
+    epochs: Annotated[int, typer.Option(help="Number of passes over the logs")] = 10,
+    max_n: Annotated[
+        int, typer.Option(help="Length of the longest character n-grams")
+    ] = 4,
+    holdout: Annotated[
+        float,
+        typer.Option(help="Share of the logs held out to evaluate the pre-classifier"),
+    ] = 0.1,
+    threshold: Annotated[
+        float,
+        typer.Option(help="Confidence threshold the held-out precision is reported at"),
+    ] = 0.9,
+):
+    samples = read_training_samples(
+        logs_path, inputs_path=inputs_path, label_field=label_field
+    )
+    random.Random(0).shuffle(samples)
+    held_out = samples[: int(len(samples) * holdout)]
+    training = samples[len(held_out) :]
+
+    classifier = CharNGramClassifier.fit(training, epochs=epochs, max_n=max_n)
+    classifier.save(output_path)
+    typer.echo(f"Trained on {len(training)} turns, labels: {classifier.labels}")
+    if held_out:
+        precision, coverage = precision_at(
+            classifier, held_out, label=CHIT_CHAT, threshold=threshold
+        )
+        typer.echo(
+            f"{CHIT_CHAT} at threshold {threshold}: answers {coverage:.1%} of "
+            f"{len(held_out)} held-out turns"
+            + (f", precision {precision:.3f}" if precision is not None else "")
+        )
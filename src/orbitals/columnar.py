@@ -0,0 +1,135 @@
+from array import array
+from collections.abc import Iterable, Iterator, Sequence
+from typing import Generic, TypeVar, overload
+
+from .types import LLMUsage
+
+T = TypeVar("T")
+
+# marks a missing usage in the usage columns
+_NO_USAGE = -1
+
+
+class RaggedColumn:
+    """A column of variable-length lists, stored as one flat list plus offsets.
+
+    Row `i` is `values[offsets[i]:offsets[i + 1]]`, so a million rows cost one
+    list and one array instead of a million lists.
+    """
+
+    __slots__ = ("offsets", "values")
+
+    def __init__(self):
+        self.offsets = array("Q", [0])
+        self.values: list = []
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def append(self, row: Iterable) -> None:
+        self.values.extend(row)
+        self.offsets.append(len(self.values))
+
+    def __getitem__(self, index: int) -> list:
+        return self.values[self.offsets[index] : self.offsets[index + 1]]
+
+
+class OptionalRaggedColumn(RaggedColumn):
+    """A `RaggedColumn` whose rows can be `None`."""
+
+    __slots__ = ("is_none",)
+
+    def __init__(self):
+        super().__init__()
+        self.is_none = array("b")
+
+    def append(self, row: Iterable | None) -> None:
+        self.is_none.append(row is None)
+        super().append(row or ())
+
+    def __getitem__(self, index: int) -> list | None:  # type: ignore[override]
+        return None if self.is_none[index] else super().__getitem__(index)
+
+
+class UsageColumn:
+    """Token usages stored as three integer arrays."""
+
+    __slots__ = ("completion_tokens", "prompt_tokens", "total_tokens")
+
+    def __init__(self):
+        self.prompt_tokens = array("q")
+        self.completion_tokens = array("q")
+        self.total_tokens = array("q")
+
+    def __len__(self) -> int:
+        return len(self.prompt_tokens)
+
+    def append(self, usage: LLMUsage | None) -> None:
+        if usage is None:
+            self.prompt_tokens.append(_NO_USAGE)
+            self.completion_tokens.append(_NO_USAGE)
+            self.total_tokens.append(_NO_USAGE)
+        else:
+            self.prompt_tokens.append(usage.prompt_tokens)
+            self.completion_tokens.append(usage.completion_tokens)
+            self.total_tokens.append(usage.total_tokens)
+
+    def __getitem__(self, index: int) -> LLMUsage | None:
+        if self.prompt_tokens[index] == _NO_USAGE:
+            return None
+        return LLMUsage.model_construct(
+            prompt_tokens=self.prompt_tokens[index],
+            completion_tokens=self.completion_tokens[index],
+            total_tokens=self.total_tokens[index],
+        )
+
+
+class BatchResult(Sequence[T], Generic[T]):
+    """A compact, columnar sequence of guardrail outputs.
+
+    Outputs are stored column by column, with interned low-cardinality strings,
+    and the pydantic output of a row is only built when the row is accessed,
+    without being cached. Subclasses define the columns, `append` and `_row`.
+    """
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def append(self, output: T) -> None:
+        raise NotImplementedError
+
+    def _row(self, index: int) -> T:
+        raise NotImplementedError
+
+    @classmethod
+    def from_outputs(cls, outputs: Iterable[T]):
+        result = cls()
+        for output in outputs:
+            result.append(output)
+        return result
+
+    @overload
+    def __getitem__(self, index: int) -> T: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[T]: ...
+
+    def __getitem__(self, index: int | slice) -> T | list[T]:
+        if isinstance(index, slice):
+            return [self._row(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"{type(self).__name__} index out of range")
+        return self._row(index)
+
+    def __iter__(self) -> Iterator[T]:
+        for index in range(len(self)):
+            yield self._row(index)
+
+    def to_list(self) -> list[T]:
+        """Convert every row to its pydantic output."""
+        return list(self)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(len={len(self)})"
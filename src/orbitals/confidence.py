@@ -0,0 +1,240 @@
+import json
+import math
+import re
+from collections.abc import Iterable, Mapping, Sequence
+from pathlib import Path
+from typing import TypeVar
+
+from pydantic import BaseModel, Field
+
+K = TypeVar("K")
+
+# the number of alternatives requested for every generated token, vLLM's
+# default `--max-logprobs`
+TOP_LOGPROBS = 20
+
+
+def normalize_logprobs(
+    logprobs: Sequence[float], temperature: float = 1.0
+) -> list[float]:
+    """Turn unnormalized log-probabilities into probabilities.
+
+    `-inf` entries get a probability of 0. With a `temperature` above 1 the
+    distribution is flattened, below 1 it is sharpened.
+    """
+    top = max(logprobs)
+    weights = [math.exp((logprob - top) / temperature) for logprob in logprobs]
+    total = sum(weights)
+    return [weight / total for weight in weights]
+
+
+def class_logprobs(
+    tokens: Sequence[str],
+    top_logprobs: Sequence[Mapping[str, float]],
+    labels: Sequence[str],
+    field: str = "scope_class",
+) -> list[float] | None:
+    """Read the log-probability of every class label off a generated JSON object.
+
+    The classes are told apart by the first token of the `field` value: each
+    label gets the log-probabilities of the alternatives of that token that
+    can start it. Labels none of the alternatives can start get `-inf`.
+
+    Args:
+        tokens: The generated tokens, whose concatenation is the generated text.
+        top_logprobs: The most likely alternatives of every generated token,
+            with their log-probabilities.
+        labels: The class labels.
+        field: The JSON field holding the class.
+
+    Returns:
+        The log-probabilities, in `labels` order, or `None` if the field is not
+        in the generated text.
+    """
+    text = "".join(tokens)
+    match = re.search(rf'"{re.escape(field)}"\s*:\s*"', text)
+    if match is None:
+        return None
+    value_start = match.end()
+
+    # the token where the value starts, which may also hold the opening quote
+    offset = 0
+    for token, alternatives in zip(tokens, top_logprobs):
+        if offset + len(token) > value_start:
+            break
+        offset += len(token)
+    else:
+        return None
+    before_value = text[offset:value_start]
+
+    logprobs = []
+    for label in labels:
+        value = f'{before_value}{label}"'
+        matching = [
+            logprob
+            for alternative, logprob in alternatives.items()
+            if len(alternative) > len(before_value)
+            and (value.startswith(alternative) or alternative.startswith(value))
+        ]
+        logprobs.append(_logsumexp(matching))
+    if all(logprob == -math.inf for logprob in logprobs):
+        return None
+    return logprobs
+
+
+def _logsumexp(values: Sequence[float]) -> float:
+    if not values:
+        return -math.inf
+    top = max(values)
+    return top + math.log(sum(math.exp(value - top) for value in values))
+
+
+def mean_token_probability(token_logprobs: Sequence[float | None]) -> float | None:
+    """The geometric mean of the probabilities of the generated tokens.
+
+    A cheap confidence score for a whole generation: it is low when the model
+    hesitated over many tokens. Missing log-probabilities, like vLLM's `None`
+    for the first token of an echoed prompt, are skipped.
+
+    Returns:
+        The mean probability, or `None` if there is no log-probability.
+    """
+    values = [logprob for logprob in token_logprobs if logprob is not None]
+    if not values:
+        return None
+    return math.exp(sum(values) / len(values))
+
+
+def is_model_prediction(
+    row: Mapping, probabilities_field: str = "scope_class_probabilities"
+) -> bool:
+    """Whether a `run-batch` output row holds class probabilities from the model."""
+    # imported here: the pre-filter builds on this module
+    from .prefilter import PRE_FILTER_MODEL
+
+    return bool(row.get(probabilities_field)) and row.get("model") != PRE_FILTER_MODEL
+
+
+class TemperatureScaling(BaseModel):
+    """Temperature scaling of class probabilities.
+
+    A single temperature, fitted on labelled outputs, divides the
+    log-probabilities of the classes before they are normalized. Models are
+    usually overconfident, in which case the fitted temperature is above 1
+    and the scaled probabilities are lower but better match the observed
+    accuracy.
+    """
+
+    temperature: float = Field(default=1.0, gt=0)
+
+    def apply(self, probabilities: Mapping[K, float]) -> dict[K, float]:
+        """Rescale a probability distribution over classes."""
+        logprobs = [
+            math.log(probability) if probability > 0 else -math.inf
+            for probability in probabilities.values()
+        ]
+        return dict(
+            zip(probabilities, normalize_logprobs(logprobs, self.temperature))
+        )
+
+    @classmethod
+    def fit(
+        cls,
+        samples: Iterable[tuple[Mapping[str, float], str]],
+        min_temperature: float = 0.05,
+        max_temperature: float = 20.0,
+    ) -> "TemperatureScaling":
+        """Fit the temperature minimizing the negative log-likelihood of the labels.
+
+        Args:
+            samples: Pairs of predicted class probabilities, keyed by label, and
+                true label.
+            min_temperature: The lowest temperature considered.
+            max_temperature: The highest temperature considered.
+        """
+        data = []
+        for probabilities, label in samples:
+            labels = list(probabilities)
+            if label not in labels:
+                raise ValueError(
+                    f"Label '{label}' is not one of the predicted classes: {labels}"
+                )
+            logprobs = [
+                math.log(probability) if probability > 0 else -math.inf
+                for probability in probabilities.values()
+            ]
+            data.append((logprobs, labels.index(label)))
+        if not data:
+            raise ValueError("Cannot fit a temperature without samples")
+
+        def nll(log_temperature: float) -> float:
+            temperature = math.exp(log_temperature)
+            return -sum(
+                math.log(
+                    max(normalize_logprobs(logprobs, temperature)[label], 1e-12)
+                )
+                for logprobs, label in data
+            )
+
+        # the NLL is unimodal in the temperature: golden-section search on its log
+        low, high = math.log(min_temperature), math.log(max_temperature)
+        ratio = (math.sqrt(5) - 1) / 2
+        for _ in range(60):
+            a = high - ratio * (high - low)
+            b = low + ratio * (high - low)
+            if nll(a) < nll(b):
+                high = b
+            else:
+                low = a
+        return cls(temperature=math.exp((low + high) / 2))
+
+    @classmethod
+    def fit_jsonl(
+        cls,
+        path: str | Path,
+        probabilities_field: str = "scope_class_probabilities",
+        label_field: str = "label",
+    ) -> "TemperatureScaling":
+        """Fit the temperature on a JSONL file of labelled outputs.
+
+        Every line holds the predicted probabilities in `probabilities_field`,
+        e.g. a `run-batch` output row, and the true class in `label_field`.
+        Lines without probabilities or label, and the answers of a pre-filter,
+        which are not the model's, are skipped.
+        """
+        samples = []
+        with Path(path).open() as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                if is_model_prediction(row, probabilities_field) and row.get(
+                    label_field
+                ):
+                    samples.append((row[probabilities_field], row[label_field]))
+        return cls.fit(samples)
+
+    def save(self, path: str | Path) -> None:
+        Path(path).write_text(self.model_dump_json())
+
+    @classmethod
+    def load(cls, path: str | Path) -> "TemperatureScaling":
+        return cls.model_validate_json(Path(path).read_text())
+
+
+def vllm_completion_logprobs(completion) -> tuple[list[str], list[dict[str, float]]]:
+    """The tokens and top alternatives of an offline vLLM `CompletionOutput`.
+
+    The completion must have been generated with `SamplingParams(logprobs=...)`.
+    """
+    tokens = []
+    top_logprobs = []
+    for token_id, alternatives in zip(completion.token_ids, completion.logprobs):
+        tokens.append(alternatives[token_id].decoded_token)
+        top_logprobs.append(
+            {
+                alternative.decoded_token: alternative.logprob
+                for alternative in alternatives.values()
+            }
+        )
+    return tokens, top_logprobs
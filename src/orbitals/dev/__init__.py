@@ -0,0 +1,3 @@
+from .fake_vllm import FakeVLLM, LatencyModel
+
+__all__ = ["FakeVLLM", "LatencyModel"]
@@ -0,0 +1,286 @@
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from typing import Any
+
+from aiohttp import web
+
+from ..claim_extractor.prompting import ExtractionsResponseModel
+
+# rough chars-per-token ratio used to count tokens without a tokenizer
+CHARS_PER_TOKEN = 4
+
+LATENCY_DISTRIBUTIONS = ("constant", "uniform", "exponential", "lognormal")
+
+_SAMPLE_SENTENCES = (
+    "The user is asking about the status of their order.",
+    "The package is expected to be delivered within three business days.",
+    "The assistant can help with tracking shipments.",
+    "Refunds are handled by the customer support team.",
+)
+
+
+def count_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+class LatencyModel:
+    """Latency of a fake completion, in seconds.
+
+    A request takes a base latency drawn from `distribution`, with the given
+    mean and standard deviation, plus `per_token_ms` for every generated token.
+
+    Args:
+        distribution: One of `constant`, `uniform`, `exponential` or `lognormal`.
+        mean_ms: Mean of the base latency.
+        stddev_ms: Standard deviation of the base latency, for the `uniform`
+            and `lognormal` distributions.
+        per_token_ms: Decoding time of each completion token.
+    """
+
+    def __init__(
+        self,
+        distribution: str = "constant",
+        mean_ms: float = 0.0,
+        stddev_ms: float = 0.0,
+        per_token_ms: float = 0.0,
+    ):
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(
+                f"Unknown latency distribution '{distribution}'. Available: {list(LATENCY_DISTRIBUTIONS)}"
+            )
+        self.distribution = distribution
+        self.mean_ms = mean_ms
+        self.stddev_ms = stddev_ms
+        self.per_token_ms = per_token_ms
+
+    def _base_ms(self, rng: random.Random) -> float:
+        if self.mean_ms <= 0:
+            return 0.0
+        if self.distribution == "uniform":
+            # a uniform distribution with this mean and standard deviation
+            half_width = min(self.mean_ms, self.stddev_ms * math.sqrt(3))
+            return rng.uniform(self.mean_ms - half_width, self.mean_ms + half_width)
+        if self.distribution == "exponential":
+            return rng.expovariate(1 / self.mean_ms)
+        if self.distribution == "lognormal":
+            sigma2 = math.log(1 + (self.stddev_ms / self.mean_ms) ** 2)
+            mu = math.log(self.mean_ms) - sigma2 / 2
+            return rng.lognormvariate(mu, math.sqrt(sigma2))
+        return self.mean_ms
+
+    def sample(self, rng: random.Random, completion_tokens: int) -> float:
+        return (self._base_ms(rng) + self.per_token_ms * completion_tokens) / 1000
+
+
+def _resolve_ref(schema: dict, root: dict) -> dict:
+    ref = schema.get("$ref")
+    if ref is None:
+        return schema
+    node: Any = root
+    for part in ref.removeprefix("#/").split("/"):
+        node = node[part]
+    return node
+
+
+def sample_from_schema(schema: dict, rng: random.Random, root: dict | None = None):
+    """Build a value matching a (pydantic-generated) JSON schema."""
+    root = schema if root is None else root
+    schema = _resolve_ref(schema, root)
+
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+    if "const" in schema:
+        return schema["const"]
+    for key in ("anyOf", "oneOf"):
+        if key in schema:
+            # prefer a non-null branch, so that optional fields are filled in
+            options = [s for s in schema[key] if s.get("type") != "null"]
+            return sample_from_schema(rng.choice(options or schema[key]), rng, root)
+    if "allOf" in schema:
+        return sample_from_schema(schema["allOf"][0], rng, root)
+
+    schema_type = schema.get("type", "object")
+    if schema_type == "object":
+        return {
+            name: sample_from_schema(property_schema, rng, root)
+            for name, property_schema in schema.get("properties", {}).items()
+        }
+    if schema_type == "array":
+        min_items = schema.get("minItems", 1)
+        max_items = min(schema.get("maxItems", 3), max(min_items, 3))
+        return [
+            sample_from_schema(schema.get("items", {}), rng, root)
+            for _ in range(rng.randint(min_items, max_items))
+        ]
+    if schema_type == "string":
+        return rng.choice(_SAMPLE_SENTENCES)[: schema.get("maxLength")]
+    if schema_type == "integer":
+        return rng.randint(schema.get("minimum", 0), schema.get("maximum", 10))
+    if schema_type == "number":
+        return rng.uniform(schema.get("minimum", 0.0), schema.get("maximum", 1.0))
+    if schema_type == "boolean":
+        return rng.random() < 0.5
+    return None
+
+
+def _apply_stop(text: str, stop: str | list[str] | None) -> tuple[str, bool]:
+    if not stop:
+        return text, False
+    stops = [stop] if isinstance(stop, str) else stop
+    positions = [text.find(s) for s in stops if s and s in text]
+    if not positions:
+        return text, False
+    # like vLLM, the stop string itself is not included in the output
+    return text[: min(positions)], True
+
+
+class FakeVLLM:
+    """A CPU-only stand-in for the vLLM OpenAI-compatible completions server.
+
+    `/v1/completions` returns canned but schema-valid outputs: a sample of the
+    `structured_outputs.json` schema, one of the `structured_outputs.choice`
+    options, or an extractions JSON when no structured output is requested, as
+    for the claim extractor. `stop` and `max_tokens` are honoured, and `usage`
+    is computed from the prompt and completion lengths.
+
+    Args:
+        latency: The latency model of a completion.
+        error_rate: Fraction of completions answered with `error_status`.
+        error_status: HTTP status of the injected errors.
+        max_concurrency: Maximum number of completions processed at once, like
+            vLLM's `--max-num-seqs`. Further requests wait in a queue.
+        seed: Seed of the random generator, for reproducible runs.
+    """
+
+    def __init__(
+        self,
+        latency: LatencyModel | None = None,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        max_concurrency: int | None = None,
+        seed: int | None = None,
+    ):
+        self.latency = latency if latency is not None else LatencyModel()
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.max_concurrency = max_concurrency
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.running = 0
+        self.waiting = 0
+        self._semaphore: asyncio.Semaphore | None = None
+
+    def _completion_text(self, body: dict) -> str:
+        structured_outputs = body.get("structured_outputs") or {}
+        if "choice" in structured_outputs:
+            return self.rng.choice(structured_outputs["choice"])
+        if "regex" in structured_outputs:
+            raise web.HTTPBadRequest(
+                text="regex structured outputs are not supported by the fake server"
+            )
+        schema = structured_outputs.get("json")
+        if isinstance(schema, str):
+            schema = json.loads(schema)
+        if schema is None:
+            schema = ExtractionsResponseModel.model_json_schema()
+        return json.dumps(sample_from_schema(schema, self.rng), ensure_ascii=False)
+
+    def complete(self, body: dict) -> tuple[dict, int]:
+        """Build the completion response for `body`, and its number of tokens."""
+        prompt = body.get("prompt", "")
+        if isinstance(prompt, list):
+            prompt = "".join(str(p) for p in prompt)
+
+        text = self._completion_text(body)
+        text, stopped = _apply_stop(text, body.get("stop"))
+        finish_reason = "stop"
+
+        max_tokens = body.get("max_tokens")
+        if max_tokens is not None and count_tokens(text) > max_tokens:
+            text = text[: max_tokens * CHARS_PER_TOKEN]
+            finish_reason = "length"
+        stop_reason = (
+            None if not stopped or finish_reason == "length" else body.get("stop")
+        )
+
+        prompt_tokens = count_tokens(prompt)
+        completion_tokens = count_tokens(text)
+        response = {
+            "id": f"cmpl-{uuid.uuid4().hex}",
+            "object": "text_completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [
+                {
+                    "index": 0,
+                    "text": text,
+                    "logprobs": None,
+                    "finish_reason": finish_reason,
+                    "stop_reason": stop_reason,
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+        return response, completion_tokens
+
+    async def _handle_completions(self, request: web.Request) -> web.Response:
+        try:
+            body = await request.json()
+        except json.JSONDecodeError:
+            raise web.HTTPBadRequest(text="Invalid JSON body") from None
+
+        self.requests += 1
+        if self._semaphore is None and self.max_concurrency is not None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        self.waiting += 1
+        try:
+            if self._semaphore is not None:
+                await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.running += 1
+        try:
+            response, completion_tokens = self.complete(body)
+            await asyncio.sleep(self.latency.sample(self.rng, completion_tokens))
+            if self.rng.random() < self.error_rate:
+                self.errors += 1
+                return web.json_response(
+                    {"error": {"message": "Injected error", "type": "FakeError"}},
+                    status=self.error_status,
+                )
+            return web.json_response(response)
+        finally:
+            self.running -= 1
+            if self._semaphore is not None:
+                self._semaphore.release()
+
+    async def _handle_health(self, request: web.Request) -> web.Response:
+        return web.Response()
+
+    async def _handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "requests": self.requests,
+                "errors": self.errors,
+                "running": self.running,
+                "waiting": self.waiting,
+            }
+        )
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/health", self._handle_health)
+        app.router.add_get("/stats", self._handle_stats)
+        app.router.add_post("/v1/completions", self._handle_completions)
+        return app
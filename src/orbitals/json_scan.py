@@ -0,0 +1,220 @@
+import json
+from typing import Any
+
+
+class JSONScanner:
+    """Tracks the nesting of a JSON text fed to it chunk by chunk.
+
+    It follows string literals (and their escape sequences) and the open
+    objects and arrays, without parsing values, so it can tell as the text is
+    generated whether the top-level value is complete, and which characters
+    would close a truncated one. Closing brackets that do not match the
+    innermost open one are ignored.
+    """
+
+    def __init__(self) -> None:
+        self.stack: list[str] = []
+        self.in_string = False
+        self.escaped = False
+        self.complete = False
+
+    def feed(self, text: str) -> int | None:
+        """Scan the next chunk of text.
+
+        Returns:
+            The offset in `text` just after the bracket closing the top-level
+            value, if it closes in this chunk, else `None`.
+        """
+        end = None
+        for offset, ch in enumerate(text):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+                continue
+            if ch == '"':
+                self.in_string = True
+            elif ch in "{[":
+                self.stack.append(ch)
+            elif (
+                ch in "}]"
+                and self.stack
+                and self.stack[-1] == ("{" if ch == "}" else "[")
+            ):
+                self.stack.pop()
+                if not self.stack and not self.complete:
+                    self.complete = True
+                    end = offset + 1
+        return end
+
+    def closer(self) -> str:
+        """The characters closing the open string, arrays and objects."""
+        closer = '"' if self.in_string else ""
+        for opener in reversed(self.stack):
+            closer += "}" if opener == "{" else "]"
+        return closer
+
+
+class JSONCompletionCriteria:
+    """A `transformers` stopping criterion ending generation at the end of the JSON.
+
+    Every sequence of the batch is scanned as it is generated, and is finished
+    as soon as its top-level JSON value closes, so that a sequence that keeps
+    emitting whitespace or trailing text after its closing brace does not hold
+    the whole batch until `max_new_tokens`. Wrap it in a
+    `transformers.StoppingCriteriaList`; it is meant for a single `generate`
+    call.
+
+    Args:
+        tokenizer: The tokenizer decoding the generated tokens.
+        prompt_length: The length of the (padded) prompts, after which the
+            generated tokens start.
+    """
+
+    def __init__(self, tokenizer, prompt_length: int):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self._scanned = prompt_length
+        self._scanners: list[JSONScanner] = []
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+
+        if not self._scanners:
+            self._scanners = [JSONScanner() for _ in range(input_ids.shape[0])]
+
+        new_ids = input_ids[:, self._scanned :].tolist()
+        self._scanned = input_ids.shape[1]
+        for scanner, ids in zip(self._scanners, new_ids):
+            if not scanner.complete:
+                scanner.feed(self.tokenizer.decode(ids, skip_special_tokens=True))
+
+        return torch.tensor(
+            [scanner.complete for scanner in self._scanners],
+            dtype=torch.bool,
+            device=input_ids.device,
+        )
+
+
+JSONPath = tuple[str | int, ...]
+
+
+class _Container:
+    def __init__(self, kind: str, path: JSONPath, start: int):
+        self.kind = kind
+        self.path = path
+        self.start = start
+        self.key: str | None = None
+        self.index = 0
+        self.expect_key = kind == "{"
+
+    def child_path(self) -> JSONPath:
+        return self.path + ((self.key,) if self.kind == "{" else (self.index,))  # type: ignore[operator]
+
+
+class JSONStreamParser:
+    """Parses a JSON text fed chunk by chunk, reporting values as they complete.
+
+    Unlike `JSONScanner`, it follows the keys and array indices, so that each
+    value is reported with its path, e.g. `("extractions", "claims", 2)`, as
+    soon as its last character has been fed.
+
+    Args:
+        max_depth: Only values at most this deep are reported; the top-level
+            value itself has depth 0, its fields or items depth 1.
+    """
+
+    def __init__(self, max_depth: int = 1):
+        self.max_depth = max_depth
+        self.text = ""
+        self._containers: list[_Container] = []
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._string_is_key = False
+        self._scalar_start: int | None = None
+
+    def _value_path(self) -> JSONPath:
+        return self._containers[-1].child_path() if self._containers else ()
+
+    def _complete(self, path: JSONPath, start: int, end: int, completed: list) -> None:
+        if len(path) > self.max_depth:
+            return
+        try:
+            completed.append((path, json.loads(self.text[start:end])))
+        except json.JSONDecodeError:
+            # a malformed value is left to the final parse to report
+            pass
+
+    def feed(self, text: str) -> list[tuple[JSONPath, Any]]:
+        """Scan the next chunk of text.
+
+        Returns:
+            The `(path, value)` of every value completed by this chunk, in
+            order of completion, so nested values come before their parents.
+        """
+        completed: list[tuple[JSONPath, Any]] = []
+        offset = len(self.text)
+        self.text += text
+        for position in range(offset, len(self.text)):
+            ch = self.text[position]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._string_is_key:
+                        self._containers[-1].key = json.loads(
+                            self.text[self._string_start : position + 1]
+                        )
+                    else:
+                        self._complete(
+                            self._value_path(),
+                            self._string_start,
+                            position + 1,
+                            completed,
+                        )
+                continue
+
+            if self._scalar_start is not None:
+                if ch not in ",}] \t\r\n":
+                    continue
+                self._complete(
+                    self._value_path(), self._scalar_start, position, completed
+                )
+                self._scalar_start = None
+
+            if ch in " \t\r\n":
+                continue
+            if ch == '"':
+                self._in_string = True
+                self._string_start = position
+                self._string_is_key = bool(
+                    self._containers and self._containers[-1].expect_key
+                )
+            elif ch in "{[":
+                self._containers.append(_Container(ch, self._value_path(), position))
+            elif ch in "}]":
+                if not self._containers:
+                    continue
+                container = self._containers.pop()
+                self._complete(container.path, container.start, position + 1, completed)
+            elif ch == ":":
+                if self._containers:
+                    self._containers[-1].expect_key = False
+            elif ch == ",":
+                if self._containers:
+                    container = self._containers[-1]
+                    if container.kind == "{":
+                        container.expect_key = True
+                        container.key = None
+                    else:
+                        container.index += 1
+            else:
+                self._scalar_start = position
+        return completed
@@ -0,0 +1,186 @@
+import math
+import threading
+from collections import defaultdict
+
+DEFAULT_LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+)
+
+LabelSet = tuple[tuple[str, str], ...]
+
+
+def _label_set(labels: dict[str, object]) -> LabelSet:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: LabelSet, extra: tuple[tuple[str, str], ...] = ()) -> str:
+    items = [*labels, *extra]
+    if not items:
+        return ""
+    escaped = (
+        (k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in items
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+class _Histogram:
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float | None:
+        """Estimate a quantile by linear interpolation within the matching bucket."""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        lower = 0.0
+        for i, upper in enumerate(self.buckets):
+            previous = cumulative
+            cumulative += self.counts[i]
+            if cumulative >= rank:
+                if self.counts[i] == 0:
+                    return upper
+                return lower + (upper - lower) * (rank - previous) / self.counts[i]
+            lower = upper
+        return self.buckets[-1] if self.buckets else math.nan
+
+
+class MetricsRegistry:
+    """In-process registry of counters, gauges and histograms.
+
+    The serving apps share a single registry so that upstream, scheduler and
+    HTTP metrics end up on the same `/metrics` page. Metrics are rendered in
+    the Prometheus text exposition format, without requiring `prometheus_client`.
+    """
+
+    def __init__(self, latency_buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS):
+        self.latency_buckets = latency_buckets
+        self._lock = threading.Lock()
+        self._counters: dict[str, dict[LabelSet, float]] = defaultdict(dict)
+        self._gauges: dict[str, dict[LabelSet, float]] = defaultdict(dict)
+        self._histograms: dict[str, dict[LabelSet, _Histogram]] = defaultdict(dict)
+        self._help: dict[str, str] = {}
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = _label_set(labels)
+        with self._lock:
+            series = self._counters[name]
+            series[key] = series.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges[name][_label_set(labels)] = value
+
+    def add_gauge(self, name: str, delta: float, **labels):
+        key = _label_set(labels)
+        with self._lock:
+            series = self._gauges[name]
+            series[key] = series.get(key, 0.0) + delta
+
+    def observe(self, name: str, value: float, **labels):
+        key = _label_set(labels)
+        with self._lock:
+            series = self._histograms[name]
+            if key not in series:
+                series[key] = _Histogram(self.latency_buckets)
+            series[key].observe(value)
+
+    def get_counter(self, name: str, **labels) -> float:
+        return self._counters.get(name, {}).get(_label_set(labels), 0.0)
+
+    def get_gauge(self, name: str, **labels) -> float:
+        return self._gauges.get(name, {}).get(_label_set(labels), 0.0)
+
+    def snapshot(self) -> dict:
+        """Return a JSON-serializable view of every metric."""
+        with self._lock:
+            return {
+                "counters": {
+                    name: [{"labels": dict(k), "value": v} for k, v in series.items()]
+                    for name, series in self._counters.items()
+                },
+                "gauges": {
+                    name: [{"labels": dict(k), "value": v} for k, v in series.items()]
+                    for name, series in self._gauges.items()
+                },
+                "histograms": {
+                    name: [
+                        {
+                            "labels": dict(k),
+                            "count": h.count,
+                            "sum": h.sum,
+                            "p50": h.quantile(0.5),
+                            "p90": h.quantile(0.9),
+                            "p99": h.quantile(0.99),
+                        }
+                        for k, h in series.items()
+                    ]
+                    for name, series in self._histograms.items()
+                },
+            }
+
+    def render_prometheus(self) -> str:
+        lines: list[str] = []
+        with self._lock:
+            for kind, metrics in (("counter", self._counters), ("gauge", self._gauges)):
+                for name, series in sorted(metrics.items()):
+                    if name in self._help:
+                        lines.append(f"# HELP {name} {self._help[name]}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    for labels, value in series.items():
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in series.items():
+                    cumulative = 0
+                    for upper, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        le = (("le", f"{upper}"),)
+                        lines.append(
+                            f"{name}_bucket{_format_labels(labels, le)} {cumulative}"
+                        )
+                    inf = (("le", "+Inf"),)
+                    lines.append(
+                        f"{name}_bucket{_format_labels(labels, inf)} {histogram.count}"
+                    )
+                    lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+                    lines.append(
+                        f"{name}_count{_format_labels(labels)} {histogram.count}"
+                    )
+        return "\n".join(lines) + "\n"
+
+
+default_registry = MetricsRegistry()
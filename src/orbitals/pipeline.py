@@ -0,0 +1,178 @@
+import asyncio
+
+from pydantic import BaseModel
+
+from .claim_extractor import AsyncClaimExtractor, ClaimExtractorOutput
+from .claim_extractor.modeling import (
+    ClaimExtractorInput,
+    ClaimExtractorInputTypeAdapter,
+)
+from .scope_guard import AsyncScopeGuard, ScopeClass, ScopeGuardOutput
+from .scope_guard.modeling import (
+    ConversationUserMessage,
+    ScopeGuardInput,
+    ScopeGuardInputTypeAdapter,
+)
+from .types import AIServiceDescription, ConversationMessage
+
+
+class GuardrailPipelineOutput(BaseModel):
+    scope_guard: ScopeGuardOutput | None = None
+    claim_extractor: ClaimExtractorOutput | None = None
+    extraction_cancelled: bool = False
+
+
+def _dumps_ai_service_description(
+    ai_service_description: str | AIServiceDescription,
+) -> str:
+    if isinstance(ai_service_description, str):
+        return ai_service_description
+    return ai_service_description.model_dump_json()
+
+
+class AsyncGuardrailPipeline:
+    """Run ScopeGuard and ClaimExtractor concurrently on the same conversation.
+
+    The conversation is validated once and the AI service description is
+    rendered once, then both guardrails are queried in parallel, so the
+    latency of a turn is that of the slowest guardrail rather than their sum.
+
+    Args:
+        scope_guard: The scope guard to run, if any.
+        claim_extractor: The claim extractor to run, if any.
+        cancel_extraction_on_restricted: Whether to cancel a still-running
+            extraction as soon as the scope guard returns `Restricted`.
+    """
+
+    def __init__(
+        self,
+        scope_guard: AsyncScopeGuard | None = None,
+        claim_extractor: AsyncClaimExtractor | None = None,
+        cancel_extraction_on_restricted: bool = False,
+    ):
+        if scope_guard is None and claim_extractor is None:
+            raise ValueError(
+                "At least one between [scope_guard, claim_extractor] must be provided"
+            )
+        self.scope_guard = scope_guard
+        self.claim_extractor = claim_extractor
+        self.cancel_extraction_on_restricted = cancel_extraction_on_restricted
+
+    def _validate_conversation(
+        self, conversation: str | dict | list[dict]
+    ) -> tuple[ScopeGuardInput | None, ClaimExtractorInput | None]:
+        if self.scope_guard is None:
+            return None, ClaimExtractorInputTypeAdapter.validate_python(conversation)
+
+        scope_guard_conversation = ScopeGuardInputTypeAdapter.validate_python(
+            conversation
+        )
+        if self.claim_extractor is None:
+            return scope_guard_conversation, None
+
+        # the scope guard input is stricter than the claim extractor one, so the
+        # parsed conversation can be reused as is, except for the single user
+        # message that uses a dedicated model
+        claim_extractor_conversation: ClaimExtractorInput
+        if isinstance(scope_guard_conversation, ConversationUserMessage):
+            claim_extractor_conversation = ConversationMessage(
+                role="user", content=scope_guard_conversation.content
+            )
+        else:
+            claim_extractor_conversation = scope_guard_conversation
+        return scope_guard_conversation, claim_extractor_conversation
+
+    async def run(
+        self,
+        conversation: str | dict | list[dict],
+        *,
+        ai_service_description: str | AIServiceDescription,
+        skip_evidences: bool | None = None,
+        include_default_safety_principles: bool | None = None,
+        intents_only: bool | None = None,
+        cancel_extraction_on_restricted: bool | None = None,
+        scope_guard_kwargs: dict | None = None,
+        claim_extractor_kwargs: dict | None = None,
+    ) -> GuardrailPipelineOutput:
+        """Run the configured guardrails concurrently.
+
+        Args:
+            conversation: The conversation to check, in any format accepted by
+                the configured guardrails.
+            ai_service_description: The AI service description shared by the
+                guardrails.
+            skip_evidences: Whether the guardrails should skip evidences.
+                Defaults to each guardrail's own setting.
+            include_default_safety_principles: Forwarded to the scope guard.
+            intents_only: Forwarded to the claim extractor.
+            cancel_extraction_on_restricted: Overrides the pipeline setting for
+                this call.
+            scope_guard_kwargs: Extra keyword arguments for the scope guard.
+            claim_extractor_kwargs: Extra keyword arguments for the claim
+                extractor.
+
+        Returns:
+            The merged results. A guardrail that was not configured, or an
+            extraction that was cancelled, is reported as `None`.
+        """
+        if cancel_extraction_on_restricted is None:
+            cancel_extraction_on_restricted = self.cancel_extraction_on_restricted
+
+        scope_guard_conversation, claim_extractor_conversation = (
+            self._validate_conversation(conversation)
+        )
+        rendered_description = _dumps_ai_service_description(ai_service_description)
+
+        # the conversations are passed as `validated`, so that the guardrails
+        # do not parse them again, while still applying their pre-filter and
+        # default safety principles
+        tasks: dict[str, asyncio.Task] = {}
+        if self.scope_guard is not None:
+            tasks["scope_guard"] = asyncio.create_task(
+                self.scope_guard.validate(
+                    scope_guard_conversation,  # type: ignore[arg-type]
+                    ai_service_description=rendered_description,
+                    skip_evidences=skip_evidences,
+                    include_default_safety_principles=include_default_safety_principles,
+                    validated=True,
+                    **(scope_guard_kwargs or {}),
+                )
+            )
+        if self.claim_extractor is not None:
+            tasks["claim_extractor"] = asyncio.create_task(
+                self.claim_extractor.extract(
+                    claim_extractor_conversation,  # type: ignore[arg-type]
+                    ai_service_description=rendered_description,
+                    skip_evidences=skip_evidences,
+                    intents_only=intents_only,
+                    validated=True,
+                    **(claim_extractor_kwargs or {}),
+                )
+            )
+
+        output = GuardrailPipelineOutput()
+        pending = set(tasks.values())
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for name, task in tasks.items():
+                    if task not in done:
+                        continue
+                    setattr(output, name, task.result())
+
+                if (
+                    cancel_extraction_on_restricted
+                    and output.scope_guard is not None
+                    and output.scope_guard.scope_class == ScopeClass.RESTRICTED
+                    and tasks.get("claim_extractor") in pending
+                ):
+                    tasks["claim_extractor"].cancel()
+                    pending.discard(tasks["claim_extractor"])
+                    output.extraction_cancelled = True
+        finally:
+            for task in pending:
+                task.cancel()
+
+        return output
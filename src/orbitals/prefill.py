@@ -0,0 +1,42 @@
+import json
+import re
+from collections.abc import Iterable
+
+# Regular expressions for the JSON fragments a prefilled completion still has to
+# write. vLLM's `structured_outputs.json` constrains the whole object from its
+# opening brace, so it rejects a completion that starts halfway through it; the
+# rest of the object is constrained with `structured_outputs.regex` instead.
+# They follow the `json.dumps` layout the models are trained on, tolerating a
+# missing space after the separators, and only use the regex syntax shared by
+# all of vLLM's structured output backends.
+
+# the rest of a JSON string after its opening quote, closing quote included
+JSON_STRING_REST = r'([^"\\]|\\.)*"'
+JSON_STRING = '"' + JSON_STRING_REST
+ITEM_SEPARATOR = ", ?"
+KEY_SEPARATOR = ": ?"
+
+
+def escape(text: str) -> str:
+    """Escape the regex metacharacters of `text`, and only them."""
+    return re.sub(r"([\\.^$*+?()\[\]{}|])", r"\\\1", text)
+
+
+def json_key(name: str) -> str:
+    """An object key, with the following colon."""
+    return escape(json.dumps(name)) + KEY_SEPARATOR
+
+
+def json_enum(values: Iterable[str]) -> str:
+    """One of the given strings."""
+    return "(" + "|".join(escape(json.dumps(value)) for value in values) + ")"
+
+
+def json_array(item: str) -> str:
+    """An array of `item`s, possibly empty."""
+    return r"\[(" + item + "(" + ITEM_SEPARATOR + item + ")*" + r")?\]"
+
+
+def json_nullable(value: str) -> str:
+    """`value` or `null`."""
+    return f"(null|{value})"
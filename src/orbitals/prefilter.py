@@ -0,0 +1,371 @@
+import json
+import random
+import re
+import zlib
+from collections.abc import Collection, Iterable, Sequence
+from pathlib import Path
+from typing import Annotated, Literal, Protocol
+
+from pydantic import BaseModel, Field, PrivateAttr, TypeAdapter
+
+from .confidence import normalize_logprobs
+from .metrics import MetricsRegistry, default_registry
+
+# the `Chit Chat` value of both ScopeGuard and ScopeGuard V2 `ScopeClass`
+CHIT_CHAT = "Chit Chat"
+
+# the `model` of the outputs answered by a pre-filter
+PRE_FILTER_MODEL = "pre-filter"
+
+# the pleasantries of the default rules, matched on the whole normalized turn,
+# alone or chained, e.g. "hi, thanks!"
+DEFAULT_CHIT_CHAT_PATTERNS = (
+    r"(hi|hello|hey|hiya|howdy|greetings|good (morning|afternoon|evening))( there| again)?",
+    r"(many )?(thanks|thank you|thx|ty|cheers)( (so|very) much| a lot| again)?",
+    r"(bye|goodbye|see you( later| soon)?|have a (nice|good|great) (day|evening|weekend))",
+    r"(ok|okay|great|cool|perfect|awesome|nice|got it|sounds good)",
+    r"how are you( doing)?( today)?",
+)
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split()).strip(" !.?,;:")
+
+
+def turn_text(conversation) -> str:
+    """The text of the turn a pre-classifier looks at: the last message."""
+    if isinstance(conversation, str):
+        return conversation
+    if isinstance(conversation, list):
+        return conversation[-1].content if conversation else ""
+    return conversation.content
+
+
+class PreClassifier(Protocol):
+    def predict(self, text: str) -> tuple[str, float] | None:
+        """The scope class of a turn and its confidence, if it can tell."""
+        ...
+
+
+class RulePreClassifier(BaseModel):
+    """Labels the turns fully matched by regular expressions.
+
+    The turn is lowercased, its whitespace collapsed and its leading and
+    trailing punctuation stripped. It is labelled with the first class one of
+    whose patterns, alone or chained with commas or spaces, matches all of
+    it, with a confidence of 1. By default, greetings, thanks and similar
+    pleasantries are labelled `Chit Chat`.
+    """
+
+    kind: Literal["rules"] = "rules"
+    rules: dict[str, list[str]] = Field(
+        default_factory=lambda: {CHIT_CHAT: list(DEFAULT_CHIT_CHAT_PATTERNS)}
+    )
+    _compiled: list[tuple[str, re.Pattern]] = PrivateAttr(default_factory=list)
+
+    def model_post_init(self, context, /) -> None:
+        for label, patterns in self.rules.items():
+            phrase = "(" + "|".join(f"({pattern})" for pattern in patterns) + ")"
+            self._compiled.append(
+                (label, re.compile(rf"{phrase}([ ,!.]+{phrase})*", re.IGNORECASE))
+            )
+
+    def predict(self, text: str) -> tuple[str, float] | None:
+        text = _normalize(text)
+        for label, pattern in self._compiled:
+            if pattern.fullmatch(text):
+                return label, 1.0
+        return None
+
+
+class CharNGramClassifier(BaseModel):
+    """A linear classifier over the character n-grams of a turn, run on CPU.
+
+    The n-grams of the normalized turn are hashed into `num_features`
+    buckets, and a multinomial logistic regression over their L2-normalized
+    counts gives the probability of every label. It is trained in pure
+    Python with `fit`, typically on logged model outputs, and predicts in
+    microseconds.
+    """
+
+    kind: Literal["char-ngram"] = "char-ngram"
+    labels: list[str]
+    min_n: int = 1
+    max_n: int = 4
+    num_features: int = 2**18
+    # feature -> one weight per label, only for the features seen in training
+    weights: dict[int, list[float]] = Field(default_factory=dict)
+    bias: list[float] = Field(default_factory=list)
+
+    def features(self, text: str) -> dict[int, float]:
+        """The hashed, L2-normalized n-gram counts of a turn."""
+        text = f" {_normalize(text)} "
+        counts: dict[int, float] = {}
+        for n in range(self.min_n, self.max_n + 1):
+            for start in range(len(text) - n + 1):
+                # crc32 rather than `hash`, which is salted per process
+                feature = (
+                    zlib.crc32(text[start : start + n].encode()) % self.num_features
+                )
+                counts[feature] = counts.get(feature, 0.0) + 1.0
+        norm = sum(count * count for count in counts.values()) ** 0.5
+        return {feature: count / norm for feature, count in counts.items()}
+
+    def _logits(self, features: dict[int, float]) -> list[float]:
+        logits = list(self.bias) if self.bias else [0.0] * len(self.labels)
+        for feature, value in features.items():
+            weights = self.weights.get(feature)
+            if weights is not None:
+                for k, weight in enumerate(weights):
+                    logits[k] += weight * value
+        return logits
+
+    def predict_proba(self, text: str) -> dict[str, float]:
+        """The probability of every label."""
+        return dict(
+            zip(self.labels, normalize_logprobs(self._logits(self.features(text))))
+        )
+
+    def predict(self, text: str) -> tuple[str, float] | None:
+        probabilities = self.predict_proba(text)
+        label = max(probabilities, key=probabilities.__getitem__)
+        return label, probabilities[label]
+
+    @classmethod
+    def fit(
+        cls,
+        samples: Iterable[tuple[str, str]],
+        epochs: int = 10,
+        learning_rate: float = 0.5,
+        l2: float = 1e-5,
+        min_n: int = 1,
+        max_n: int = 4,
+        num_features: int = 2**18,
+        seed: int = 0,
+    ) -> "CharNGramClassifier":
+        """Fit the classifier with stochastic gradient descent on the log-loss.
+
+        Args:
+            samples: Pairs of turn text and label.
+            epochs: The number of passes over the samples, shuffled each time.
+            learning_rate: The step size.
+            l2: The L2 penalty of the weights.
+            min_n: The shortest n-grams.
+            max_n: The longest n-grams.
+            num_features: The number of hash buckets of the n-grams.
+            seed: The seed of the shuffling.
+        """
+        samples = list(samples)
+        if not samples:
+            raise ValueError("Cannot fit a classifier without samples")
+        labels = sorted({label for _, label in samples})
+        model = cls(labels=labels, min_n=min_n, max_n=max_n, num_features=num_features)
+        model.bias = [0.0] * len(labels)
+        data = [(model.features(text), labels.index(label)) for text, label in samples]
+
+        rng = random.Random(seed)
+        for _ in range(epochs):
+            rng.shuffle(data)
+            for features, target in data:
+                probabilities = normalize_logprobs(model._logits(features))
+                gradients = [
+                    probability - (k == target)
+                    for k, probability in enumerate(probabilities)
+                ]
+                for k, gradient in enumerate(gradients):
+                    model.bias[k] -= learning_rate * gradient
+                for feature, value in features.items():
+                    weights = model.weights.setdefault(feature, [0.0] * len(labels))
+                    for k, gradient in enumerate(gradients):
+                        weights[k] -= learning_rate * (
+                            gradient * value + l2 * weights[k]
+                        )
+        return model
+
+    def save(self, path: str | Path) -> None:
+        Path(path).write_text(self.model_dump_json())
+
+    @classmethod
+    def load(cls, path: str | Path) -> "CharNGramClassifier":
+        return cls.model_validate_json(Path(path).read_text())
+
+
+_PRE_CLASSIFIER_ADAPTER = TypeAdapter(
+    Annotated[RulePreClassifier | CharNGramClassifier, Field(discriminator="kind")]
+)
+
+
+def load_pre_classifier(path: str | Path) -> RulePreClassifier | CharNGramClassifier:
+    """Load a pre-classifier saved as JSON, of either kind."""
+    return _PRE_CLASSIFIER_ADAPTER.validate_json(Path(path).read_text())
+
+
+def read_training_samples(
+    logs_path: str | Path,
+    inputs_path: str | Path | None = None,
+    label_field: str = "scope_class",
+    conversation_field: str = "conversation",
+) -> list[tuple[str, str]]:
+    """Read (turn text, label) pairs from JSONL logs.
+
+    Every line of `logs_path` holds a label in `label_field`, e.g. the
+    `scope_class` of a `run-batch` output row, and its conversation in
+    `conversation_field`. With `inputs_path`, e.g. the `run-batch` input, the
+    conversations are read from it instead, matched by the `index` of the
+    log lines. Lines without label or conversation, like failed rows, are
+    skipped.
+    """
+    with Path(logs_path).open() as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    if inputs_path is not None:
+        with Path(inputs_path).open() as f:
+            inputs = [json.loads(line) for line in f if line.strip()]
+        for row in rows:
+            row[conversation_field] = inputs[row["index"]].get(conversation_field)
+
+    samples = []
+    for row in rows:
+        conversation = row.get(conversation_field)
+        if not row.get(label_field) or not conversation:
+            continue
+        if isinstance(conversation, list):
+            text = conversation[-1]["content"]
+        elif isinstance(conversation, dict):
+            text = conversation["content"]
+        else:
+            text = conversation
+        samples.append((text, row[label_field]))
+    return samples
+
+
+def precision_at(
+    classifier: PreClassifier,
+    samples: Sequence[tuple[str, str]],
+    label: str = CHIT_CHAT,
+    threshold: float = 0.9,
+) -> tuple[float | None, float]:
+    """How a pre-filter answering `label` at `threshold` would do on labelled turns.
+
+    Returns:
+        The share of the answered turns that are correct, `None` if none is
+        answered, and the share of the turns answered.
+    """
+    answered = correct = 0
+    for text, true_label in samples:
+        prediction = classifier.predict(text)
+        if (
+            prediction is not None
+            and prediction[0] == label
+            and prediction[1] >= threshold
+        ):
+            answered += 1
+            correct += true_label == label
+    return (correct / answered if answered else None), (
+        answered / len(samples) if samples else 0.0
+    )
+
+
+class PreFilter:
+    """A cheap stage answering the trivially classifiable turns without the model.
+
+    The pre-classifier looks at the last message of every conversation. When
+    it labels it with one of `answer_classes` with a confidence of at least
+    `threshold`, the guard answers with that scope class, with `model` set to
+    `"pre-filter"` and no token usage, instead of calling the model. Every
+    other conversation goes to the model.
+
+    In shadow mode every conversation still goes to the model, and each local
+    answer the pre-filter would have given is compared to the model's, so
+    that the agreement can be measured before the pre-filter is enabled.
+
+    Decisions and shadow comparisons are counted in `metrics` as
+    `orbitals_prefilter_requests_total`, `orbitals_prefilter_decisions_total`
+    and `orbitals_prefilter_shadow_total`, and in `stats()`.
+
+    Args:
+        classifier: A `RulePreClassifier`, a `CharNGramClassifier` or any object
+            with a `predict(text)` method returning a `(scope class,
+            confidence)` pair or `None`.
+        threshold: The lowest confidence of a local answer.
+        answer_classes: The scope classes answered locally.
+        shadow: Whether to only compare the local answers to the model's.
+        metrics: The registry of the pre-filter metrics.
+    """
+
+    def __init__(
+        self,
+        classifier: PreClassifier,
+        threshold: float = 0.9,
+        answer_classes: Collection[str] = (CHIT_CHAT,),
+        shadow: bool = False,
+        metrics: MetricsRegistry | None = None,
+    ):
+        self.classifier = classifier
+        self.threshold = threshold
+        self.answer_classes = frozenset(answer_classes)
+        self.shadow = shadow
+        self.metrics = metrics if metrics is not None else default_registry
+        self.requests = 0
+        self.decisions = 0
+        self.agreements = 0
+        self.disagreements = 0
+
+        self.metrics.describe(
+            "orbitals_prefilter_requests_total",
+            "Conversations seen by the pre-filter",
+        )
+        self.metrics.describe(
+            "orbitals_prefilter_decisions_total",
+            "Conversations the pre-filter answered, or would have in shadow mode",
+        )
+        self.metrics.describe(
+            "orbitals_prefilter_shadow_total",
+            "Shadow-mode local answers compared to the model's",
+        )
+
+    def decide(self, conversation) -> tuple[str, float] | None:
+        """The local answer to a conversation and its confidence, if any."""
+        self.requests += 1
+        self.metrics.inc("orbitals_prefilter_requests_total")
+        prediction = self.classifier.predict(turn_text(conversation))
+        if prediction is None:
+            return None
+        label, confidence = prediction
+        if label not in self.answer_classes or confidence < self.threshold:
+            return None
+        self.decisions += 1
+        self.metrics.inc(
+            "orbitals_prefilter_decisions_total",
+            scope_class=label,
+            shadow=int(self.shadow),
+        )
+        return label, confidence
+
+    def record_shadow(self, label: str, model_label: str) -> None:
+        """Compare a shadow-mode local answer to the model's."""
+        agree = label == model_label
+        if agree:
+            self.agreements += 1
+        else:
+            self.disagreements += 1
+        self.metrics.inc(
+            "orbitals_prefilter_shadow_total",
+            scope_class=label,
+            outcome="agree" if agree else "disagree",
+        )
+
+    @property
+    def agreement_rate(self) -> float | None:
+        """The share of the shadow-mode local answers the model agreed with."""
+        compared = self.agreements + self.disagreements
+        return self.agreements / compared if compared else None
+
+    def stats(self) -> dict:
+        """The conversations seen, answered locally and compared in shadow mode."""
+        return {
+            "requests": self.requests,
+            "decisions": self.decisions,
+            "agreements": self.agreements,
+            "disagreements": self.disagreements,
+            "agreement_rate": self.agreement_rate,
+        }
@@ -0,0 +1,149 @@
+import copy
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import Any, NamedTuple
+
+# every prompt renders the system turn first, then the AI service description
+# between these markers, then the conversation
+DESCRIPTION_START_MARKER = "**START OF THE AI SERVICE DESCRIPTION**"
+DESCRIPTION_END_MARKER = "**END OF THE AI SERVICE DESCRIPTION**"
+
+
+class CachedPrefix(NamedTuple):
+    input_ids: list[int]
+    past_key_values: Any
+
+
+class SplicedInputs(NamedTuple):
+    input_ids: list[list[int]]
+    attention_mask: list[list[int]]
+
+
+def shared_prefix(texts: Sequence[str], cache_descriptions: bool) -> str | None:
+    """The longest cacheable prefix shared by all the prompts of a batch.
+
+    That is the system turn plus the AI service description when
+    `cache_descriptions` is set and all prompts share the same description,
+    else the system turn alone. `None` if the prompts do not share one.
+    """
+    candidates = []
+    for text in texts:
+        start = text.find(DESCRIPTION_START_MARKER)
+        end = text.find(DESCRIPTION_END_MARKER)
+        if start == -1 or end == -1:
+            return None
+        candidates.append((text[:start], text[: end + len(DESCRIPTION_END_MARKER)]))
+
+    system_prefixes, description_prefixes = zip(*candidates)
+    if cache_descriptions and len(set(description_prefixes)) == 1:
+        return description_prefixes[0]
+    if len(set(system_prefixes)) == 1:
+        return system_prefixes[0]
+    return None
+
+
+def splice_prefix(
+    prefix_ids: list[int], rows: list[list[int]], pad_token_id: int
+) -> SplicedInputs | None:
+    """Lay out a batch as the cached prefix, then padding, then each row's suffix.
+
+    The padding goes between the prefix and the suffixes, so that every row
+    shares the same prefix positions and a single cache can be reused for the
+    whole batch; the attention mask hides the padding and the position ids
+    derived from it stay contiguous. `None` if a row does not start with the
+    prefix tokens.
+    """
+    n = len(prefix_ids)
+    if any(row[:n] != prefix_ids for row in rows):
+        return None
+    suffixes = [row[n:] for row in rows]
+    width = max(len(suffix) for suffix in suffixes)
+    return SplicedInputs(
+        input_ids=[
+            prefix_ids + [pad_token_id] * (width - len(suffix)) + suffix
+            for suffix in suffixes
+        ],
+        attention_mask=[
+            [1] * n + [0] * (width - len(suffix)) + [1] * len(suffix)
+            for suffix in suffixes
+        ],
+    )
+
+
+class PrefixCache:
+    """Caches the `past_key_values` of the prompt prefixes shared by requests.
+
+    Every prompt starts with the same system turn for a given prompt variant
+    (e.g. `skip_evidences`), usually followed by one of a handful of AI service
+    descriptions, and both are much longer than the conversation. Their
+    key/value states are computed once per model and prefix and copied into
+    every batch that starts with them, so that `generate` only runs prefill
+    over the rest of the prompt.
+
+    Args:
+        cache_descriptions: Also cache the prefix up to the end of the AI
+            service description, for batches sharing one description.
+        max_size: The maximum number of cached prefixes, the least recently
+            used is evicted first.
+    """
+
+    def __init__(self, cache_descriptions: bool = False, max_size: int = 16):
+        self.cache_descriptions = cache_descriptions
+        self.max_size = max_size
+        self._entries: OrderedDict[tuple[str, str], CachedPrefix] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get(self, model, tokenizer, prefix: str) -> CachedPrefix:
+        import torch
+
+        key = (getattr(model, "name_or_path", str(id(model))), prefix)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        # the last token is dropped in case it merges with the following text
+        input_ids = tokenizer(prefix)["input_ids"][:-1]
+        with torch.inference_mode():
+            past_key_values = model(
+                input_ids=torch.tensor([input_ids], device=model.device),
+                use_cache=True,
+            ).past_key_values
+
+        self._entries[key] = CachedPrefix(input_ids, past_key_values)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return self._entries[key]
+
+    def prepare(self, model, tokenizer, texts: str | list[str]) -> dict | None:
+        """Build the `generate` inputs of a batch from a cached prefix.
+
+        Returns:
+            The `input_ids`, `attention_mask` and `past_key_values` to pass to
+            `generate`, or `None` if the batch has no cacheable prefix, in
+            which case the caller tokenizes and generates as usual.
+        """
+        import torch
+
+        if isinstance(texts, str):
+            texts = [texts]
+        prefix = shared_prefix(texts, self.cache_descriptions)
+        if prefix is None:
+            return None
+
+        cached = self._get(model, tokenizer, prefix)
+        rows = tokenizer(texts, truncation=True)["input_ids"]
+        spliced = splice_prefix(cached.input_ids, rows, tokenizer.pad_token_id)
+        if spliced is None:
+            return None
+
+        # generate extends the cache in place, so every batch gets its own copy
+        past_key_values = copy.deepcopy(cached.past_key_values)
+        if len(texts) > 1:
+            past_key_values.batch_repeat_interleave(len(texts))
+        return {
+            "input_ids": torch.tensor(spliced.input_ids, device=model.device),
+            "attention_mask": torch.tensor(spliced.attention_mask, device=model.device),
+            "past_key_values": past_key_values,
+        }
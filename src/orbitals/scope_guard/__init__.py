@@ -1,5 +1,5 @@
 from .guards import AsyncScopeGuard, ScopeGuard
-from .modeling import ScopeClass, ScopeGuardOutput
+from .modeling import ScopeClass, ScopeGuardBatchResult, ScopeGuardOutput
 from .safety_principles import (
     ADDITIONAL_SAFETY_RULES,
     augment_with_default_safety_principles,
@@ -9,6 +9,7 @@ __all__ = [
     "ADDITIONAL_SAFETY_RULES",
     "AsyncScopeGuard",
     "ScopeClass",
+    "ScopeGuardBatchResult",
     "ScopeGuardOutput",
     "ScopeGuard",
     "augment_with_default_safety_principles",
@@ -1,11 +1,15 @@
 import typer
 
+from ...cli import calibrate, run_batch, train_prefilter
 from . import convert_default_model_name, serve
 
 app = typer.Typer()
 
 app.add_typer(serve.app)
 app.add_typer(convert_default_model_name.app)
+app.add_typer(run_batch.build_app("scope-guard"))
+app.add_typer(calibrate.app)
+app.add_typer(train_prefilter.app)
 
 
 def main():
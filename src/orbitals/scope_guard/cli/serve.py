@@ -5,10 +5,9 @@ import subprocess
 import sys
 import time
 from pathlib import Path
+from typing import Annotated
 
-import httpx
 import typer
-import uvicorn
 
 from orbitals.scope_guard import ScopeGuard
 
@@ -50,7 +49,32 @@ def serve(
     vllm_extra_args: str | None = typer.Option(
         None, help="Extra arguments to pass to the vLLM server"
     ),
+    max_in_flight: int | None = typer.Option(
+        None,
+        help="Number of in-flight requests above which /readyz reports not ready",
+    ),
+    drain_timeout: int = typer.Option(
+        30,
+        help="Seconds to wait for in-flight requests to complete on shutdown",
+    ),
+    drain_delay: float = typer.Option(
+        0.0,
+        help="Seconds to keep listening (with /readyz failing) after SIGTERM, "
+        "so that load balancers stop routing traffic first",
+    ),
+    rate_limit_config: Annotated[
+        Path | None,
+        typer.Option(
+            help="JSON file with per-API-key rate limits, reloaded when it changes"
+        ),
+    ] = None,
 ):
+    # imported here to keep `orbitals --help` and the other commands fast
+    import httpx
+    import uvicorn
+
+    from orbitals.serving.server import run_server, stop_vllm_process
+
     vllm_model = ScopeGuard.maybe_map_model(vllm_model)
 
     os.environ["SCOPE_GUARD_VLLM_MODEL"] = vllm_model
@@ -105,6 +129,11 @@ def serve(
                 vllm_process.wait()
                 raise typer.Exit(code=1)
 
+    if max_in_flight is not None:
+        os.environ["SCOPE_GUARD_MAX_IN_FLIGHT"] = str(max_in_flight)
+    if rate_limit_config is not None:
+        os.environ["SCOPE_GUARD_RATE_LIMIT_CONFIG"] = str(rate_limit_config.resolve())
+
     # Set up FastAPI logging
     setup_fastapi_logging()
 
@@ -124,15 +153,15 @@ def serve(
     log_config["formatters"]["access"]["datefmt"] = "%Y-%m-%d %H:%M:%S"
 
     try:
-        uvicorn.run(
+        run_server(
             "orbitals.scope_guard.serving.main:app",
             host=host,
             port=port,
             log_config=log_config,
-            log_level="info",
+            drain_timeout=drain_timeout,
+            drain_delay=drain_delay,
         )
     finally:
         # Clean up vLLM process on exit
         typer.echo("Shutting down vLLM server...")
-        vllm_process.terminate()
-        vllm_process.wait(timeout=10)
+        stop_vllm_process(vllm_process)
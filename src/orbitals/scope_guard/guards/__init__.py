@@ -1,7 +1,29 @@
-from .api import APIScopeGuard, AsyncAPIScopeGuard
+from importlib import import_module
+from typing import TYPE_CHECKING
+
 from .base import AsyncScopeGuard, ScopeGuard
-from .hf import HuggingFaceScopeGuard
-from .vllm import AsyncVLLMApiScopeGuard, VLLMScopeGuard
+
+if TYPE_CHECKING:
+    from .api import APIScopeGuard, AsyncAPIScopeGuard
+    from .hf import HuggingFaceScopeGuard
+    from .vllm import AsyncVLLMApiScopeGuard, VLLMScopeGuard
+
+# backends pull in heavy dependencies (aiohttp, requests, transformers, ...),
+# so their classes are only imported on first access
+_LAZY_IMPORTS = {
+    "APIScopeGuard": ".api",
+    "AsyncAPIScopeGuard": ".api",
+    "HuggingFaceScopeGuard": ".hf",
+    "AsyncVLLMApiScopeGuard": ".vllm",
+    "VLLMScopeGuard": ".vllm",
+}
+
+
+def __getattr__(name: str):
+    if name in _LAZY_IMPORTS:
+        return getattr(import_module(_LAZY_IMPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     "AsyncScopeGuard",
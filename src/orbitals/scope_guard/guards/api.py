@@ -5,6 +5,7 @@ from typing import Literal
 import aiohttp
 import requests
 
+from ...prefilter import PreFilter
 from ...types import AIServiceDescription
 from ..modeling import (
     ScopeGuardInput,
@@ -96,10 +97,12 @@ class APIScopeGuard(ScopeGuard):
         skip_evidences: bool = False,
         custom_headers: dict[str, str] | None = None,
         include_default_safety_principles: bool = False,
+        pre_filter: PreFilter | None = None,
     ):
         super().__init__(
             backend,
             include_default_safety_principles=include_default_safety_principles,
+            pre_filter=pre_filter,
         )
         self.default_model = (
             self.maybe_map_model(model) if model is not None else None
@@ -190,10 +193,12 @@ class AsyncAPIScopeGuard(AsyncScopeGuard):
         skip_evidences: bool = False,
         custom_headers: dict[str, str] | None = None,
         include_default_safety_principles: bool = False,
+        pre_filter: PreFilter | None = None,
     ):
         super().__init__(
             backend,
             include_default_safety_principles=include_default_safety_principles,
+            pre_filter=pre_filter,
         )
         self.default_model = (
             self.maybe_map_model(model) if model is not None else None
@@ -1,18 +1,33 @@
 from __future__ import annotations
 
 import logging
-from typing import TYPE_CHECKING, Literal, overload
+from collections.abc import Iterator, Sequence
+from importlib import import_module
+from typing import TYPE_CHECKING, ClassVar, Literal, overload
 
 from pydantic import ValidationError
 
 if TYPE_CHECKING:
+    import pyarrow as pa
+
+    from ...upstream import VLLMUpstream
     from .api import APIScopeGuard, AsyncAPIScopeGuard
     from .hf import HuggingFaceScopeGuard
     from .vllm import AsyncVLLMApiScopeGuard, VLLMScopeGuard
 
-from ...types import AIServiceDescription
+from ...arrow import (
+    ArrowInput,
+    collect_record_batches,
+    iter_arrow_results,
+    scope_guard_record_batch,
+)
+from ...prefilter import PRE_FILTER_MODEL, PreFilter
+from ...types import AIServiceDescription, LLMUsage
 from ..modeling import (
+    ScopeClass,
+    ScopeGuardBatchResult,
     ScopeGuardInput,
+    ScopeGuardInputListTypeAdapter,
     ScopeGuardInputTypeAdapter,
     ScopeGuardOutput,
 )
@@ -29,6 +44,11 @@ MODEL_MAPPING = {
 
 class BaseScopeGuard:
     _registry: dict[str, dict[str, type[ScopeGuard | AsyncScopeGuard]]] = {}
+    # backend -> module defining it, imported the first time the backend is requested
+    _backend_modules: ClassVar[dict[str, dict[str, str]]] = {
+        "sync": {"hf": ".hf", "vllm": ".vllm", "api": ".api"},
+        "async": {"vllm-api": ".vllm", "api": ".api"},
+    }
 
     @classmethod
     def _get_outer_registry_key(cls) -> str:
@@ -50,6 +70,20 @@ class BaseScopeGuard:
 
         return decorator
 
+    @classmethod
+    def _resolve_backend(cls, backend: str) -> type:
+        outer_registry_key = cls._get_outer_registry_key()
+        registry = cls._registry.setdefault(outer_registry_key, {})
+        backend_modules = cls._backend_modules[outer_registry_key]
+        if backend not in registry and backend in backend_modules:
+            # importing the module registers its backends
+            import_module(backend_modules[backend], __package__)
+        try:
+            return registry[backend]
+        except KeyError:
+            available = list(dict.fromkeys([*backend_modules, *registry]))
+            raise ValueError(f"Unknown backend '{backend}'. Available: {available}")
+
     @classmethod
     def maybe_map_model(cls, model: DefaultModel | str) -> str:
         if model in MODEL_MAPPING:
@@ -69,12 +103,7 @@ class BaseScopeGuard:
             # if called on subclass, behave normally
             return super().__new__(cls)
 
-        try:
-            subclass = cls._registry[cls._get_outer_registry_key()][backend]
-        except KeyError:
-            raise ValueError(
-                f"Unknown backend '{backend}'. Available: {list(cls._registry[cls._get_outer_registry_key()].keys())}"
-            )
+        subclass = cls._resolve_backend(backend)
 
         return super().__new__(subclass)
 
@@ -83,10 +112,12 @@ class BaseScopeGuard:
         backend: str,
         *args,
         include_default_safety_principles: bool = False,
+        pre_filter: PreFilter | None = None,
         **kwargs,
     ):
         self.backend = backend
         self.include_default_safety_principles = include_default_safety_principles
+        self.pre_filter = pre_filter
 
     def _resolve_include_default_safety_principles(
         self, per_call_value: bool | None
@@ -116,9 +147,81 @@ class BaseScopeGuard:
             for ad in ai_service_descriptions
         ]  # type: ignore[return-value]
 
+    def _pre_classify(self, conversation: ScopeGuardInput) -> tuple[str, float] | None:
+        pre_filter = getattr(self, "pre_filter", None)
+        return pre_filter.decide(conversation) if pre_filter is not None else None
+
+    def _pre_filter_answers(self, decision: tuple[str, float] | None) -> bool:
+        return decision is not None and not self.pre_filter.shadow  # type: ignore[union-attr]
+
+    def _pre_filter_output(self, label: str, confidence: float) -> ScopeGuardOutput:
+        return ScopeGuardOutput(
+            evidences=None,
+            scope_class=ScopeClass(label),
+            model=PRE_FILTER_MODEL,
+            usage=LLMUsage(prompt_tokens=0, completion_tokens=0, total_tokens=0),
+            pre_filter_confidence=confidence,
+        )
+
+    def _record_shadow(
+        self, decision: tuple[str, float] | None, output: ScopeGuardOutput
+    ) -> None:
+        if decision is not None:
+            self.pre_filter.record_shadow(decision[0], output.scope_class.value)  # type: ignore[union-attr]
+
+    def _pre_filter_split(
+        self,
+        conversations: list[ScopeGuardInput],
+        ai_service_descriptions: list | None,
+    ) -> tuple[
+        list[tuple[str, float] | None], list[int], list[ScopeGuardInput], list | None
+    ]:
+        """Pre-classify a batch.
+
+        Returns:
+            The decision of the pre-filter on every conversation, the indices
+            of the conversations still sent to the model, and those
+            conversations and their AI service descriptions.
+        """
+        decisions = [self._pre_classify(c) for c in conversations]
+        forwarded = [
+            i for i, d in enumerate(decisions) if not self._pre_filter_answers(d)
+        ]
+        if len(forwarded) == len(conversations):
+            return decisions, forwarded, conversations, ai_service_descriptions
+        return (
+            decisions,
+            forwarded,
+            [conversations[i] for i in forwarded],
+            None
+            if ai_service_descriptions is None
+            else [ai_service_descriptions[i] for i in forwarded],
+        )
+
+    def _pre_filter_merge(
+        self,
+        decisions: list[tuple[str, float] | None],
+        forwarded: list[int],
+        outputs: list[ScopeGuardOutput],
+    ) -> list[ScopeGuardOutput]:
+        """Put the model outputs of a batch back among the pre-filter answers."""
+        if getattr(self, "pre_filter", None) is None:
+            return outputs
+        merged: list[ScopeGuardOutput | None] = [None] * len(decisions)
+        for index, output in zip(forwarded, outputs):
+            merged[index] = output
+            self._record_shadow(decisions[index], output)
+        return [
+            output if output is not None else self._pre_filter_output(*decision)  # type: ignore[misc]
+            for output, decision in zip(merged, decisions)
+        ]
+
     def _validate_conversation(
-        self, conversation: str | dict | list[dict]
+        self, conversation: str | dict | list[dict], validated: bool = False
     ) -> ScopeGuardInput:
+        if validated:
+            # trusted input, e.g. a conversation already validated by the caller
+            return conversation  # type: ignore[return-value]
         try:
             return ScopeGuardInputTypeAdapter.validate_python(conversation)
         except ValidationError as e:
@@ -126,16 +229,21 @@ class BaseScopeGuard:
             raise e from None
 
     def _validate_conversations(
-        self, conversations: list[str] | list[dict] | list[list[dict]]
+        self,
+        conversations: list[str] | list[dict] | list[list[dict]],
+        validated: bool = False,
     ) -> list[ScopeGuardInput]:
-        validated_conversations = []
-        for c in conversations:
-            try:
-                validated_conversations.append(self._validate_conversation(c))
-            except ValidationError as e:
-                logging.error("Invalid input format for conversation")
-                raise e from None
-        return validated_conversations
+        if validated:
+            # trusted input, e.g. a request body already parsed by FastAPI
+            return conversations  # type: ignore[return-value]
+        try:
+            return ScopeGuardInputListTypeAdapter.validate_python(conversations)
+        except ValidationError as e:
+            indices = sorted({error["loc"][0] for error in e.errors()})
+            logging.error(
+                f"Invalid input format for conversations at indices {indices}"
+            )
+            raise e from None
 
     def _validate_ai_service_description_input(
         self,
@@ -173,6 +281,7 @@ class ScopeGuard(BaseScopeGuard):
         max_new_tokens: int = 3000,
         do_sample: bool = False,
         include_default_safety_principles: bool = False,
+        pre_filter: PreFilter | None = None,
         **kwargs,
     ) -> HuggingFaceScopeGuard: ...
 
@@ -187,7 +296,9 @@ class ScopeGuard(BaseScopeGuard):
         max_model_len: int = 30_000,
         max_num_seqs: int = 2,
         gpu_memory_utilization: float = 0.9,
+        enable_prefix_caching: bool = True,
         include_default_safety_principles: bool = False,
+        pre_filter: PreFilter | None = None,
     ) -> VLLMScopeGuard: ...
 
     @overload
@@ -200,6 +311,7 @@ class ScopeGuard(BaseScopeGuard):
         skip_evidences: bool = False,
         custom_headers: dict[str, str] | None = None,
         include_default_safety_principles: bool = False,
+        pre_filter: PreFilter | None = None,
     ) -> APIScopeGuard: ...
 
     def __new__(cls, backend: str = "hf", *args, **kwargs):
@@ -212,19 +324,25 @@ class ScopeGuard(BaseScopeGuard):
         ai_service_description: str | AIServiceDescription,
         skip_evidences: bool | None = None,
         include_default_safety_principles: bool | None = None,
+        validated: bool = False,
         **kwargs,
     ) -> ScopeGuardOutput:
-        conversation = self._validate_conversation(conversation)
+        conversation = self._validate_conversation(conversation, validated)
         include = self._resolve_include_default_safety_principles(
             include_default_safety_principles
         )
         ai_service_description = self._maybe_augment(ai_service_description, include)
-        return self._validate(
+        decision = self._pre_classify(conversation)
+        if self._pre_filter_answers(decision):
+            return self._pre_filter_output(*decision)  # type: ignore[misc]
+        output = self._validate(
             conversation,
             ai_service_description=ai_service_description,
             skip_evidences=skip_evidences,
             **kwargs,
         )
+        self._record_shadow(decision, output)
+        return output
 
     def _validate(
         self,
@@ -244,12 +362,14 @@ class ScopeGuard(BaseScopeGuard):
         ai_service_descriptions: list[str] | list[AIServiceDescription] | None = None,
         skip_evidences: bool | None = None,
         include_default_safety_principles: bool | None = None,
+        validated: bool = False,
+        compact: bool = False,
         **kwargs,
-    ) -> list[ScopeGuardOutput]:
+    ) -> list[ScopeGuardOutput] | ScopeGuardBatchResult:
         if len(conversations) == 0:
-            return []
+            return ScopeGuardBatchResult() if compact else []
 
-        validated_conversations = self._validate_conversations(conversations)
+        validated_conversations = self._validate_conversations(conversations, validated)
         self._validate_ai_service_description_input(
             validated_conversations, ai_service_description, ai_service_descriptions
         )
@@ -262,13 +382,22 @@ class ScopeGuard(BaseScopeGuard):
             ai_service_descriptions, include
         )
 
-        return self._batch_validate(
-            validated_conversations,
-            ai_service_description=ai_service_description,
-            ai_service_descriptions=ai_service_descriptions,
-            skip_evidences=skip_evidences,
-            **kwargs,
+        decisions, forwarded, validated_conversations, ai_service_descriptions = (
+            self._pre_filter_split(validated_conversations, ai_service_descriptions)
+        )
+        outputs = (
+            self._batch_validate(
+                validated_conversations,
+                ai_service_description=ai_service_description,
+                ai_service_descriptions=ai_service_descriptions,
+                skip_evidences=skip_evidences,
+                **kwargs,
+            )
+            if validated_conversations
+            else []
         )
+        outputs = self._pre_filter_merge(decisions, forwarded, outputs)
+        return ScopeGuardBatchResult.from_outputs(outputs) if compact else outputs
 
     def _batch_validate(
         self,
@@ -281,6 +410,71 @@ class ScopeGuard(BaseScopeGuard):
     ) -> list[ScopeGuardOutput]:
         raise NotImplementedError
 
+    def iter_validate_arrow(
+        self,
+        data: ArrowInput,
+        *,
+        conversation_column: str = "conversation",
+        description_column: str | None = None,
+        ai_service_description: str | AIServiceDescription | None = None,
+        keep_columns: Sequence[str] = (),
+        batch_size: int = 1024,
+        **kwargs,
+    ) -> Iterator[pa.RecordBatch]:
+        """Run `batch_validate` over Arrow data, streaming one record batch at a time.
+
+        Only one record batch is in memory at a time, so Parquet datasets larger
+        than RAM can be processed, e.g. by writing the output batches with a
+        `pyarrow.parquet.ParquetWriter`. Requires pyarrow.
+
+        Args:
+            data: An Arrow table, record batch, record batch reader or iterable of
+                record batches, or the path of a Parquet file or dataset directory.
+            conversation_column: The column of the conversations: strings,
+                `{role, content}` structs or lists of them.
+            description_column: The column of the per-row AI service
+                descriptions, as strings or structs.
+            ai_service_description: The AI service description shared by all rows, when
+                `description_column` is not given.
+            keep_columns: Input columns copied to the output, e.g. an id column.
+            batch_size: The number of rows per `batch_validate` call.
+            **kwargs: Forwarded to `batch_validate`.
+
+        Yields:
+            Record batches with one row per conversation with its scope class, evidences, model
+            and token usage, and the `row_index` of the input row.
+        """
+
+        def _process(conversations: list, descriptions: list | None):
+            return self.batch_validate(
+                conversations,
+                ai_service_description=ai_service_description,
+                ai_service_descriptions=None
+                if descriptions is None
+                else [
+                    d
+                    if d is None or isinstance(d, str)
+                    else AIServiceDescription.model_validate(d)
+                    for d in descriptions
+                ],
+                compact=True,
+                **kwargs,
+            )
+
+        return iter_arrow_results(
+            data,
+            _process,
+            scope_guard_record_batch,
+            conversation_column=conversation_column,
+            description_column=description_column,
+            keep_columns=keep_columns,
+            batch_size=batch_size,
+        )
+
+    def batch_validate_arrow(self, data: ArrowInput, **kwargs) -> pa.Table:
+        """Like `iter_validate_arrow`, collecting the output into one table."""
+        return collect_record_batches(self.iter_validate_arrow(data, **kwargs))
+
 
 class AsyncScopeGuard(BaseScopeGuard):
     @overload
@@ -289,12 +483,14 @@ class AsyncScopeGuard(BaseScopeGuard):
         backend: Literal["vllm-api"],
         model: DefaultModel | str = "scope-guard",
         skip_evidences: bool = False,
-        vllm_serving_url: str = "http://localhost:8000",
+        vllm_serving_url: str | list[str] = "http://localhost:8000",
         temperature: float = 0.0,
         max_tokens: int = 3000,
         chat_templating_tokenizer: str | None = None,
         count_system_prompt_in_usage: bool = False,
         include_default_safety_principles: bool = False,
+        upstream: VLLMUpstream | None = None,
+        pre_filter: PreFilter | None = None,
     ) -> AsyncVLLMApiScopeGuard: ...
 
     @overload
@@ -307,6 +503,7 @@ class AsyncScopeGuard(BaseScopeGuard):
         skip_evidences: bool = False,
         custom_headers: dict[str, str] | None = None,
         include_default_safety_principles: bool = False,
+        pre_filter: PreFilter | None = None,
     ) -> AsyncAPIScopeGuard: ...
 
     def __new__(cls, backend: str, *args, **kwargs):
@@ -319,19 +516,25 @@ class AsyncScopeGuard(BaseScopeGuard):
         ai_service_description: str | AIServiceDescription,
         skip_evidences: bool | None = None,
         include_default_safety_principles: bool | None = None,
+        validated: bool = False,
         **kwargs,
     ) -> ScopeGuardOutput:
-        conversation = self._validate_conversation(conversation)
+        conversation = self._validate_conversation(conversation, validated)
         include = self._resolve_include_default_safety_principles(
             include_default_safety_principles
         )
         ai_service_description = self._maybe_augment(ai_service_description, include)
-        return await self._validate(
+        decision = self._pre_classify(conversation)
+        if self._pre_filter_answers(decision):
+            return self._pre_filter_output(*decision)  # type: ignore[misc]
+        output = await self._validate(
             conversation,
             ai_service_description=ai_service_description,
             skip_evidences=skip_evidences,
             **kwargs,
         )
+        self._record_shadow(decision, output)
+        return output
 
     async def _validate(
         self,
@@ -351,12 +554,14 @@ class AsyncScopeGuard(BaseScopeGuard):
         ai_service_descriptions: list[str] | list[AIServiceDescription] | None = None,
         skip_evidences: bool | None = None,
         include_default_safety_principles: bool | None = None,
+        validated: bool = False,
+        compact: bool = False,
         **kwargs,
-    ) -> list[ScopeGuardOutput]:
+    ) -> list[ScopeGuardOutput] | ScopeGuardBatchResult:
         if len(conversations) == 0:
-            return []
+            return ScopeGuardBatchResult() if compact else []
 
-        validated_conversations = self._validate_conversations(conversations)
+        validated_conversations = self._validate_conversations(conversations, validated)
         self._validate_ai_service_description_input(
             validated_conversations, ai_service_description, ai_service_descriptions
         )
@@ -369,13 +574,22 @@ class AsyncScopeGuard(BaseScopeGuard):
             ai_service_descriptions, include
         )
 
-        return await self._batch_validate(
-            validated_conversations,
-            ai_service_description=ai_service_description,
-            ai_service_descriptions=ai_service_descriptions,
-            skip_evidences=skip_evidences,
-            **kwargs,
+        decisions, forwarded, validated_conversations, ai_service_descriptions = (
+            self._pre_filter_split(validated_conversations, ai_service_descriptions)
+        )
+        outputs = (
+            await self._batch_validate(
+                validated_conversations,
+                ai_service_description=ai_service_description,
+                ai_service_descriptions=ai_service_descriptions,
+                skip_evidences=skip_evidences,
+                **kwargs,
+            )
+            if validated_conversations
+            else []
         )
+        outputs = self._pre_filter_merge(decisions, forwarded, outputs)
+        return ScopeGuardBatchResult.from_outputs(outputs) if compact else outputs
 
     async def _batch_validate(
         self,
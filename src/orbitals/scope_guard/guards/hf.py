@@ -6,11 +6,14 @@ import pydantic
 if TYPE_CHECKING:
     from transformers import pipeline  # noqa: F401
 
+from ...bucketing import run_length_bucketed
+from ...prefilter import PreFilter
 from ...types import AIServiceDescription
 from ..modeling import (
     ScopeClass,
     ScopeGuardInput,
     ScopeGuardOutput,
+    scope_class_probabilities,
 )
 from ..prompting import ScopeGuardResponseModel
 from .base import DefaultModel, ScopeGuard
@@ -26,6 +29,9 @@ class HuggingFaceScopeGuard(ScopeGuard):
         max_new_tokens: int = 3000,
         do_sample: bool = False,
         include_default_safety_principles: bool = False,
+        pre_filter: PreFilter | None = None,
+        max_tokens_per_batch: int | None = None,
+        score_labels: bool = False,
         **kwargs,
     ):
         from ...utils import maybe_configure_gpu_usage
@@ -37,8 +43,12 @@ class HuggingFaceScopeGuard(ScopeGuard):
         super().__init__(
             backend,
             include_default_safety_principles=include_default_safety_principles,
+            pre_filter=pre_filter,
         )
         self.model = self.maybe_map_model(model)
+        self.skip_evidences = skip_evidences
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.score_labels = score_labels
         self._pipeline = pipeline(
             task="scope-guard",
             model=self.model,
@@ -49,14 +59,58 @@ class HuggingFaceScopeGuard(ScopeGuard):
             **kwargs,
         )  # type: ignore # ty: ignore[no-matching-overload]
 
+    def _run_pipeline(
+        self,
+        pipeline_inputs: list,
+        max_tokens_per_batch: int | None,
+        **pipeline_kwargs,
+    ) -> list:
+        if max_tokens_per_batch is None:
+            max_tokens_per_batch = self.max_tokens_per_batch
+        if max_tokens_per_batch is None:
+            return self._pipeline(pipeline_inputs, **pipeline_kwargs)
+        return run_length_bucketed(
+            self._pipeline, pipeline_inputs, max_tokens_per_batch, **pipeline_kwargs
+        )
+
+    def _resolve_score_labels(
+        self, skip_evidences: bool | None, score_labels: bool | None
+    ) -> bool:
+        score_labels = score_labels if score_labels is not None else self.score_labels
+        skip_evidences = (
+            skip_evidences if skip_evidences is not None else self.skip_evidences
+        )
+        if score_labels and not skip_evidences:
+            raise ValueError("Label scoring requires skip_evidences=True")
+        return score_labels
+
+    def _label_scoring_output(self, label_logprobs: list[float]) -> ScopeGuardOutput:
+        probabilities = scope_class_probabilities(label_logprobs)
+        return ScopeGuardOutput(
+            evidences=None,
+            scope_class=max(probabilities, key=probabilities.__getitem__),
+            model=self.model,
+            usage=None,
+            scope_class_probabilities=probabilities,
+        )
+
     def _validate(
         self,
         conversation: ScopeGuardInput,
         *,
         ai_service_description: str | AIServiceDescription,
         skip_evidences: bool | None = None,
+        score_labels: bool | None = None,
         **kwargs,
     ) -> ScopeGuardOutput:
+        if self._resolve_score_labels(skip_evidences, score_labels):
+            return self._batch_validate(
+                [conversation],
+                ai_service_description=ai_service_description,
+                skip_evidences=skip_evidences,
+                score_labels=True,
+            )[0]
+
         generated_text = self._pipeline(
             inputs=(conversation, ai_service_description),
             **(
@@ -90,8 +144,11 @@ class HuggingFaceScopeGuard(ScopeGuard):
         ai_service_description: str | AIServiceDescription | None = None,
         ai_service_descriptions: list[str] | list[AIServiceDescription] | None = None,
         skip_evidences: bool | None = None,
+        max_tokens_per_batch: int | None = None,
+        score_labels: bool | None = None,
         **kwargs,
     ) -> list[ScopeGuardOutput]:
+        score_labels = self._resolve_score_labels(skip_evidences, score_labels)
         if ai_service_descriptions is not None:
             pipeline_inputs = [
                 (c, ad) for c, ad in zip(conversations, ai_service_descriptions)
@@ -101,13 +158,21 @@ class HuggingFaceScopeGuard(ScopeGuard):
         else:
             raise ValueError
 
-        pipeline_outputs = self._pipeline(
+        pipeline_outputs = self._run_pipeline(
             pipeline_inputs,
+            max_tokens_per_batch,
             **(
                 {"skip_evidences": skip_evidences} if skip_evidences is not None else {}
             ),
+            **({"score_labels": True} if score_labels else {}),
         )
 
+        if score_labels:
+            return [
+                self._label_scoring_output(pipeline_output[0]["label_logprobs"])
+                for pipeline_output in pipeline_outputs
+            ]
+
         results = []
 
         for pipeline_output in pipeline_outputs:
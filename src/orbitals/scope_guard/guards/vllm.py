@@ -13,12 +13,35 @@ if TYPE_CHECKING:
 
 from functools import lru_cache
 
+from ...bucketing import grouped_order, restore_order
+from ...confidence import (
+    TOP_LOGPROBS,
+    TemperatureScaling,
+    class_logprobs,
+    vllm_completion_logprobs,
+)
+from ...prefilter import PreFilter
 from ...types import AIServiceDescription, LLMUsage
+from ...upstream import (
+    ReplicaRouter,
+    VLLMUpstream,
+    routing_key,
+)
 from ..modeling import (
+    ScopeClass,
     ScopeGuardInput,
     ScopeGuardOutput,
+    scope_class_probabilities,
+)
+from ..prompting import (
+    ScopeGuardResponseModel,
+    build_prompt,
+    get_prefill,
+    get_system_prompt,
+    label_continuations,
+    prefill_structured_outputs,
+    score_label_continuations,
 )
-from ..prompting import SYSTEM_PROMPT, ScopeGuardResponseModel, build_prompt
 from .base import AsyncScopeGuard, DefaultModel, ScopeGuard
 
 
@@ -29,6 +52,17 @@ def _get_tokenizer(model_name: str) -> transformers.PreTrainedTokenizer:
     return transformers.AutoTokenizer.from_pretrained(model_name)
 
 
+def _generated_probabilities(
+    tokens: list[str], top_logprobs: list[dict[str, float]], temperature: float
+) -> dict[ScopeClass, float] | None:
+    logprobs = class_logprobs(
+        tokens, top_logprobs, [scope_class.value for scope_class in ScopeClass]
+    )
+    if logprobs is None:
+        return None
+    return scope_class_probabilities(logprobs, temperature)
+
+
 @ScopeGuard.register_guard("vllm")
 class VLLMScopeGuard(ScopeGuard):
     def __init__(
@@ -41,7 +75,12 @@ class VLLMScopeGuard(ScopeGuard):
         max_model_len: int = 30_000,
         max_num_seqs: int = 2,
         gpu_memory_utilization: float = 0.9,
+        enable_prefix_caching: bool = True,
         include_default_safety_principles: bool = False,
+        pre_filter: PreFilter | None = None,
+        score_labels: bool = False,
+        with_probabilities: bool = False,
+        calibration: TemperatureScaling | None = None,
     ):
         from ...utils import maybe_configure_gpu_usage
 
@@ -52,20 +91,32 @@ class VLLMScopeGuard(ScopeGuard):
         super().__init__(
             backend,
             include_default_safety_principles=include_default_safety_principles,
+            pre_filter=pre_filter,
         )
         self.model = self.maybe_map_model(model)
         self.skip_evidences = skip_evidences
+        self.score_labels = score_labels
+        self.with_probabilities = with_probabilities
+        self.calibration = calibration
         self.llm = vllm.LLM(
             model=self.model,
             max_model_len=max_model_len,
             max_num_seqs=max_num_seqs,
             gpu_memory_utilization=gpu_memory_utilization,
+            enable_prefix_caching=enable_prefix_caching,
         )
         self.tokenizer = _get_tokenizer(self.model)
         self.sampling_params = vllm.SamplingParams(
             temperature=temperature,
             max_tokens=max_tokens,
         )
+        self.probability_params = vllm.SamplingParams(
+            temperature=temperature,
+            max_tokens=max_tokens,
+            logprobs=TOP_LOGPROBS,
+        )
+        # one prefill pass per label continuation, without decoding
+        self.scoring_params = vllm.SamplingParams(max_tokens=1, prompt_logprobs=0)
 
     def _validate(
         self,
@@ -73,14 +124,60 @@ class VLLMScopeGuard(ScopeGuard):
         *,
         ai_service_description: str | AIServiceDescription,
         skip_evidences: bool | None = None,
+        score_labels: bool | None = None,
+        with_probabilities: bool | None = None,
         **kwargs,
     ) -> ScopeGuardOutput:
         return self._batch_validate(
             [conversation],
             ai_service_description=ai_service_description,
             skip_evidences=skip_evidences,
+            score_labels=score_labels,
+            with_probabilities=with_probabilities,
         )[0]
 
+    def _score_labels(self, prompts: list[str]) -> list[ScopeGuardOutput]:
+        continuations = label_continuations()
+        outputs = self.llm.generate(
+            [
+                prompt + continuation
+                for prompt in prompts
+                for continuation in continuations
+            ],
+            self.scoring_params,
+            use_tqdm=False,
+        )
+
+        results = []
+        for start in range(0, len(outputs), len(continuations)):
+            label_outputs = outputs[start : start + len(continuations)]
+            label_logprobs = score_label_continuations(
+                [output.prompt_token_ids for output in label_outputs],
+                [
+                    [
+                        logprobs[token_id].logprob if logprobs is not None else None
+                        for token_id, logprobs in zip(
+                            output.prompt_token_ids, output.prompt_logprobs
+                        )
+                    ]
+                    for output in label_outputs
+                ],
+            )
+            probabilities = scope_class_probabilities(
+                label_logprobs, self._calibration_temperature
+            )
+            results.append(
+                ScopeGuardOutput(
+                    evidences=None,
+                    scope_class=max(probabilities, key=probabilities.__getitem__),
+                    model=self.model,
+                    usage=None,
+                    scope_class_probabilities=probabilities,
+                )
+            )
+
+        return results
+
     def _batch_validate(
         self,
         conversations: list[ScopeGuardInput],
@@ -88,36 +185,56 @@ class VLLMScopeGuard(ScopeGuard):
         ai_service_description: str | AIServiceDescription | None = None,
         ai_service_descriptions: list[str] | list[AIServiceDescription] | None = None,
         skip_evidences: bool | None = None,
+        score_labels: bool | None = None,
+        with_probabilities: bool | None = None,
         **kwargs,
     ) -> list[ScopeGuardOutput]:
+        with_probabilities = (
+            with_probabilities
+            if with_probabilities is not None
+            else self.with_probabilities
+        )
+        skip_evidences = (
+            skip_evidences if skip_evidences is not None else self.skip_evidences
+        )
+        score_labels = score_labels if score_labels is not None else self.score_labels
+        if score_labels and not skip_evidences:
+            raise ValueError("Label scoring requires skip_evidences=True")
+
         if ai_service_descriptions is not None:
-            prompts = [
-                build_prompt(
-                    self.tokenizer,
-                    c,
-                    ad,
-                    skip_evidences=skip_evidences
-                    if skip_evidences is not None
-                    else self.skip_evidences,
-                )
-                for c, ad in zip(conversations, ai_service_descriptions)
-            ]
+            descriptions = list(ai_service_descriptions)
         elif ai_service_description is not None:
-            prompts = [
-                build_prompt(
-                    self.tokenizer,
-                    c,
-                    ai_service_description,
-                    skip_evidences=skip_evidences
-                    if skip_evidences is not None
-                    else self.skip_evidences,
-                )
-                for c in conversations
-            ]
+            descriptions = [ai_service_description] * len(conversations)
         else:
             raise ValueError
 
-        outputs = self.llm.generate(prompts, self.sampling_params, use_tqdm=False)
+        prompts = [
+            build_prompt(
+                self.tokenizer,
+                c,
+                ad,
+                skip_evidences=skip_evidences,
+                prefill=score_labels,
+            )
+            for c, ad in zip(conversations, descriptions)
+        ]
+        # submitted grouped by description, returned in the caller's order
+        order = grouped_order(
+            [routing_key(ad) for ad in descriptions], [len(p) for p in prompts]
+        )
+        prompts = [prompts[i] for i in order]
+
+        if score_labels:
+            return restore_order(order, self._score_labels(prompts))
+
+        outputs = restore_order(
+            order,
+            self.llm.generate(
+                prompts,
+                self.probability_params if with_probabilities else self.sampling_params,
+                use_tqdm=False,
+            ),
+        )
 
         results = []
 
@@ -136,11 +253,21 @@ class VLLMScopeGuard(ScopeGuard):
                     scope_class=validated_obj.scope_class,
                     model=self.model,
                     usage=None,
+                    scope_class_probabilities=_generated_probabilities(
+                        *vllm_completion_logprobs(output.outputs[0]),
+                        temperature=self._calibration_temperature,
+                    )
+                    if with_probabilities
+                    else None,
                 )
             )
 
         return results
 
+    @property
+    def _calibration_temperature(self) -> float:
+        return self.calibration.temperature if self.calibration is not None else 1.0
+
 
 @AsyncScopeGuard.register_guard("vllm-api")
 class AsyncVLLMApiScopeGuard(AsyncScopeGuard):
@@ -149,16 +276,23 @@ class AsyncVLLMApiScopeGuard(AsyncScopeGuard):
         backend: Literal["vllm-api", "vllm-async-api"] = "vllm-api",
         model: DefaultModel | str = "scope-guard",
         skip_evidences: bool = False,
-        vllm_serving_url: str = "http://localhost:8000",
+        vllm_serving_url: str | list[str] = "http://localhost:8000",
         temperature: float = 0.0,
         max_tokens: int = 3000,
         chat_templating_tokenizer: str | None = None,
         count_system_prompt_in_usage: bool = False,
         include_default_safety_principles: bool = False,
+        pre_filter: PreFilter | None = None,
+        upstream: VLLMUpstream | None = None,
+        prefill: bool = False,
+        score_labels: bool = False,
+        with_probabilities: bool = False,
+        calibration: TemperatureScaling | None = None,
     ):
         super().__init__(
             backend,
             include_default_safety_principles=include_default_safety_principles,
+            pre_filter=pre_filter,
         )
         self.default_model_name = self.maybe_map_model(model)
         self.default_tokenizer_name = (
@@ -168,9 +302,41 @@ class AsyncVLLMApiScopeGuard(AsyncScopeGuard):
         )
         self.skip_evidences = skip_evidences
         self.vllm_serving_url = vllm_serving_url
+        self.router = ReplicaRouter(vllm_serving_url)
         self.vllm_temperature = temperature
         self.vllm_max_tokens = max_tokens
         self.count_system_prompt_in_usage = count_system_prompt_in_usage
+        self.upstream = upstream
+        self.prefill = prefill
+        self.score_labels = score_labels
+        self.with_probabilities = with_probabilities
+        self.calibration = calibration
+
+    @property
+    def _calibration_temperature(self) -> float:
+        return self.calibration.temperature if self.calibration is not None else 1.0
+
+    def warmup(self):
+        """Load the default chat-templating tokenizer ahead of the first request."""
+        _get_tokenizer(self.default_tokenizer_name)
+
+    async def _post_completion(
+        self, request_body: dict, routing_key: str | None = None
+    ) -> dict:
+        if self.upstream is not None:
+            return await self.upstream.completions(
+                request_body, guardrail="scope-guard", routing_key=routing_key
+            )
+
+        with self.router.route(routing_key) as replica_url:
+            async with aiohttp.ClientSession() as session:
+                async with session.post(
+                    f"{replica_url}/v1/completions",
+                    json=request_body,
+                    headers={"Content-Type": "application/json"},
+                ) as response:
+                    response.raise_for_status()
+                    return await response.json()
 
     async def _handle_request(
         self,
@@ -180,6 +346,8 @@ class AsyncVLLMApiScopeGuard(AsyncScopeGuard):
         skip_evidences: bool | None,
         prefill: bool,
         chat_templating_tokenizer: str | None = None,
+        score_labels: bool | None = None,
+        with_probabilities: bool | None = None,
     ) -> ScopeGuardOutput:
         model_name = (
             self.maybe_map_model(model_name) if model_name is not None else None
@@ -196,6 +364,27 @@ class AsyncVLLMApiScopeGuard(AsyncScopeGuard):
         skip_evidences = (
             skip_evidences if skip_evidences is not None else self.skip_evidences
         )
+        score_labels = score_labels if score_labels is not None else self.score_labels
+        with_probabilities = (
+            with_probabilities
+            if with_probabilities is not None
+            else self.with_probabilities
+        )
+        if score_labels:
+            if not skip_evidences:
+                raise ValueError("Label scoring requires skip_evidences=True")
+            return await self._score_labels(
+                model_name,
+                tokenizer,
+                build_prompt(
+                    tokenizer=tokenizer,
+                    conversation=conversation,
+                    ai_service_description=ai_service_description,
+                    skip_evidences=True,
+                    prefill=True,
+                ),
+                routing_key(ai_service_description),
+            )
 
         prompt = build_prompt(
             tokenizer=tokenizer,
@@ -205,26 +394,23 @@ class AsyncVLLMApiScopeGuard(AsyncScopeGuard):
             prefill=prefill,
         )
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{self.vllm_serving_url}/v1/completions",
-                json={
-                    "model": model_name,
-                    "prompt": prompt,
-                    "temperature": self.vllm_temperature,
-                    "max_tokens": self.vllm_max_tokens,
-                    "structured_outputs": {
-                        "json": ScopeGuardResponseModel.model_json_schema()
-                    },
-                },
-                headers={"Content-Type": "application/json"},
-            ) as response:
-                response.raise_for_status()
-                response_json = await response.json()
-                response_text = response_json["choices"][0]["text"]
+        response_json = await self._post_completion(
+            {
+                "model": model_name,
+                "prompt": prompt,
+                "temperature": self.vllm_temperature,
+                "max_tokens": self.vllm_max_tokens,
+                "structured_outputs": prefill_structured_outputs(skip_evidences)
+                if prefill
+                else {"json": ScopeGuardResponseModel.model_json_schema()},
+                **({"logprobs": TOP_LOGPROBS} if with_probabilities else {}),
+            },
+            routing_key(ai_service_description),
+        )
+        response_text = response_json["choices"][0]["text"]
 
         if prefill:
-            response_text = prompt[prompt.rindex('{"evidences"') :] + response_text
+            response_text = get_prefill(skip_evidences) + response_text
 
         try:
             parsed_obj = json.loads(response_text)
@@ -239,13 +425,26 @@ class AsyncVLLMApiScopeGuard(AsyncScopeGuard):
         system_prompt_tokens = (
             0
             if self.count_system_prompt_in_usage
-            else len(tokenizer.encode(SYSTEM_PROMPT))
+            else len(tokenizer.encode(get_system_prompt()))
         )
 
+        probabilities = None
+        if with_probabilities:
+            logprobs = response_json["choices"][0]["logprobs"]
+            tokens, top_logprobs = logprobs["tokens"], logprobs["top_logprobs"]
+            if prefill:
+                # the prefilled part of the response, where the field starts
+                tokens = [get_prefill(skip_evidences), *tokens]
+                top_logprobs = [{}, *top_logprobs]
+            probabilities = _generated_probabilities(
+                tokens, top_logprobs, temperature=self._calibration_temperature
+            )
+
         return ScopeGuardOutput(
             scope_class=validated_obj.scope_class,
             evidences=validated_obj.evidences,
             model=model_name,
+            scope_class_probabilities=probabilities,
             # TODO usage implementation is mocked
             usage=LLMUsage(
                 prompt_tokens=response_json["usage"]["prompt_tokens"]
@@ -256,6 +455,51 @@ class AsyncVLLMApiScopeGuard(AsyncScopeGuard):
             ),
         )
 
+    async def _score_labels(
+        self, model_name: str, tokenizer, prompt: str, routing_key: str | None = None
+    ) -> ScopeGuardOutput:
+        # echo the prompt with the log-probability of each of its tokens, the
+        # only generated token is dropped below
+        response_json = await self._post_completion(
+            {
+                "model": model_name,
+                "prompt": [prompt + label for label in label_continuations()],
+                "temperature": 0.0,
+                "max_tokens": 1,
+                "echo": True,
+                "logprobs": 0,
+            },
+            routing_key,
+        )
+        choices = sorted(response_json["choices"], key=lambda choice: choice["index"])
+        label_logprobs = score_label_continuations(
+            [choice["logprobs"]["tokens"][:-1] for choice in choices],
+            [choice["logprobs"]["token_logprobs"][:-1] for choice in choices],
+        )
+        probabilities = scope_class_probabilities(
+            label_logprobs, self._calibration_temperature
+        )
+
+        system_prompt_tokens = (
+            0
+            if self.count_system_prompt_in_usage
+            else len(tokenizer.encode(get_system_prompt())) * len(choices)
+        )
+
+        return ScopeGuardOutput(
+            scope_class=max(probabilities, key=probabilities.__getitem__),
+            evidences=None,
+            model=model_name,
+            usage=LLMUsage(
+                prompt_tokens=response_json["usage"]["prompt_tokens"]
+                - system_prompt_tokens,
+                completion_tokens=response_json["usage"]["completion_tokens"],
+                total_tokens=response_json["usage"]["total_tokens"]
+                - system_prompt_tokens,
+            ),
+            scope_class_probabilities=probabilities,
+        )
+
     async def _validate(
         self,
         conversation: ScopeGuardInput,
@@ -264,6 +508,9 @@ class AsyncVLLMApiScopeGuard(AsyncScopeGuard):
         skip_evidences: bool | None = None,
         model: str | None = None,
         chat_templating_tokenizer: str | None = None,
+        score_labels: bool | None = None,
+        with_probabilities: bool | None = None,
+        prefill: bool | None = None,
         **kwargs,
     ) -> ScopeGuardOutput:
         results = await self._batch_validate(
@@ -272,6 +519,9 @@ class AsyncVLLMApiScopeGuard(AsyncScopeGuard):
             skip_evidences=skip_evidences,
             model=model,
             chat_templating_tokenizer=chat_templating_tokenizer,
+            score_labels=score_labels,
+            with_probabilities=with_probabilities,
+            prefill=prefill,
         )
         return results[0]
 
@@ -284,8 +534,12 @@ class AsyncVLLMApiScopeGuard(AsyncScopeGuard):
         skip_evidences: bool | None = None,
         model: str | None = None,
         chat_templating_tokenizer: str | None = None,
+        score_labels: bool | None = None,
+        with_probabilities: bool | None = None,
+        prefill: bool | None = None,
         **kwargs,
     ) -> list[ScopeGuardOutput]:
+        prefill = prefill if prefill is not None else self.prefill
         if ai_service_description is not None:
             ai_service_descriptions = [ai_service_description] * len(conversations)  # type: ignore[invalid-assignment]
 
@@ -295,7 +549,10 @@ class AsyncVLLMApiScopeGuard(AsyncScopeGuard):
         # to better distribute the load.
         # Sending all requests in a single batched request would mean a single vLLM server
         # would have to process all of them.
-        # We are not even re-using the session to avoid ALBs not distributing requests properly.
+        # We are not even re-using the session to avoid ALBs not distributing requests properly,
+        # unless an `upstream` is provided, in which case its pooled session is shared.
+        # Given several replica URLs, the requests sharing a description are instead
+        # kept on one replica, to hit its prefix cache (see `ReplicaRouter`).
         # TODO further optimizations and discussions
 
         tasks = [
@@ -304,10 +561,10 @@ class AsyncVLLMApiScopeGuard(AsyncScopeGuard):
                 conversation=c,
                 ai_service_description=aisd,
                 skip_evidences=skip_evidences,
-                # TODO supporting True on this parameter is a bit tricky
-                # problem is the grammar-based decoding, which is unaware of the prefilling
-                prefill=False,
+                prefill=prefill,
                 chat_templating_tokenizer=chat_templating_tokenizer,
+                score_labels=score_labels,
+                with_probabilities=with_probabilities,
             )
             for c, aisd in zip(conversations, ai_service_descriptions)  # type: ignore[invalid-argument-type]
         ]
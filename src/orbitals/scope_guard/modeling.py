@@ -1,8 +1,18 @@
+import sys
+from collections.abc import Sequence
 from enum import Enum
 from typing import Annotated, Any, Literal
 
-from pydantic import BaseModel, BeforeValidator, TypeAdapter
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    TypeAdapter,
+    ValidatorFunctionWrapHandler,
+    WrapValidator,
+)
 
+from ..columnar import BatchResult, OptionalRaggedColumn, UsageColumn
+from ..confidence import normalize_logprobs
 from ..types import ConversationMessage, LLMUsage
 
 
@@ -59,6 +69,71 @@ class ScopeGuardOutput(BaseModel):
     scope_class: ScopeClass
     model: str
     usage: LLMUsage | None
+    # only set by label scoring (`score_labels=True`) or `with_probabilities=True`
+    scope_class_probabilities: dict[ScopeClass, float] | None = None
+    # only set on the answers of a `PreFilter`, which has no distribution
+    pre_filter_confidence: float | None = None
+
+    @property
+    def confidence(self) -> float | None:
+        """The probability of `scope_class`, if the backend or pre-filter reported it."""
+        if self.scope_class_probabilities is None:
+            return self.pre_filter_confidence
+        return self.scope_class_probabilities.get(self.scope_class, 0.0)
+
+
+def scope_class_probabilities(
+    label_logprobs: Sequence[float], temperature: float = 1.0
+) -> dict[ScopeClass, float]:
+    """Turn the log-probabilities of the scope class labels into probabilities.
+
+    `label_logprobs` are in `ScopeClass` order and need not be normalized. A
+    `temperature` fitted with `orbitals.confidence.TemperatureScaling`
+    calibrates the probabilities.
+    """
+    return dict(zip(ScopeClass, normalize_logprobs(label_logprobs, temperature)))
+
+
+class ScopeGuardBatchResult(BatchResult[ScopeGuardOutput]):
+    """Compact `batch_validate` results, see `orbitals.columnar.BatchResult`."""
+
+    def __init__(self):
+        self.scope_classes: list[str] = []
+        self.models: list[str] = []
+        self.evidences = OptionalRaggedColumn()
+        self.usage = UsageColumn()
+        # one probability per scope class, in `ScopeClass` order
+        self.scope_class_probabilities = OptionalRaggedColumn()
+        self.pre_filter_confidences: list[float | None] = []
+
+    def __len__(self) -> int:
+        return len(self.scope_classes)
+
+    def append(self, output: ScopeGuardOutput) -> None:
+        self.scope_classes.append(sys.intern(output.scope_class.value))
+        self.models.append(sys.intern(output.model))
+        self.evidences.append(output.evidences)
+        self.usage.append(output.usage)
+        probabilities = output.scope_class_probabilities
+        self.scope_class_probabilities.append(
+            [probabilities.get(scope_class, 0.0) for scope_class in ScopeClass]
+            if probabilities is not None
+            else None
+        )
+        self.pre_filter_confidences.append(output.pre_filter_confidence)
+
+    def _row(self, index: int) -> ScopeGuardOutput:
+        probabilities = self.scope_class_probabilities[index]
+        return ScopeGuardOutput.model_construct(
+            evidences=self.evidences[index],
+            scope_class=ScopeClass(self.scope_classes[index]),
+            model=self.models[index],
+            usage=self.usage[index],
+            scope_class_probabilities=dict(zip(ScopeClass, probabilities))
+            if probabilities is not None
+            else None,
+            pre_filter_confidence=self.pre_filter_confidences[index],
+        )
 
 
 class ConversationUserMessage(BaseModel):
@@ -66,23 +141,35 @@ class ConversationUserMessage(BaseModel):
     content: str
 
 
+# built once: constructing a TypeAdapter compiles a core schema
+_MESSAGE_ADAPTER = TypeAdapter(ConversationUserMessage)
+_CONVERSATION_ADAPTER = TypeAdapter(list[ConversationMessage])
+
+
 def _select_model_based_on_fields(
-    v: Any,
+    v: Any, handler: ValidatorFunctionWrapHandler
 ) -> str | ConversationUserMessage | list[ConversationMessage]:
-    if isinstance(v, str):
-        return TypeAdapter(str).validate_python(v)
+    if isinstance(v, (str, ConversationUserMessage)):
+        return v
     elif isinstance(v, dict):
-        return TypeAdapter(ConversationUserMessage).validate_python(v)
+        return _MESSAGE_ADAPTER.validate_python(v)
     elif isinstance(v, list):
-        return TypeAdapter(list[ConversationMessage]).validate_python(v)
+        # conversations of already validated messages need no revalidation
+        if all(type(message) is ConversationMessage for message in v):
+            return v
+        return _CONVERSATION_ADAPTER.validate_python(v)
 
     # no matching model found, let's fall back to standard pydantic behavior
-    return v
+    return handler(v)
 
 
 ScopeGuardInput = Annotated[
     str | ConversationUserMessage | list[ConversationMessage],
-    BeforeValidator(_select_model_based_on_fields),
+    WrapValidator(_select_model_based_on_fields),
 ]
 
 ScopeGuardInputTypeAdapter = TypeAdapter(ScopeGuardInput)
+# validates a whole batch at once, errors are located by conversation index
+ScopeGuardInputListTypeAdapter = TypeAdapter(
+    list[ScopeGuardInput], config=ConfigDict(title="conversations")
+)
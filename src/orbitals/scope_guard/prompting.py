@@ -1,7 +1,18 @@
 import json
+from collections.abc import Sequence
+from functools import cache
+from typing import Any
 
 from pydantic import BaseModel, Field
 
+from ..prefill import (
+    ITEM_SEPARATOR,
+    JSON_STRING,
+    json_array,
+    json_enum,
+    json_key,
+    json_nullable,
+)
 from ..types import AIServiceDescription
 from .modeling import (
     ConversationUserMessage,
@@ -20,7 +31,10 @@ class ScopeGuardResponseModel(BaseModel):
     )
 
 
-SYSTEM_PROMPT = f"""
+@cache
+def get_system_prompt() -> str:
+    """The system prompt, built on first use as it embeds the response JSON schema."""
+    return f"""
 You are an expert AI classifier specialized in classifying user queries given the description of an AI service.
 
 Your task is to classify the LAST USER MESSAGE in a conversation between a user and an AI Service. Follow these steps:
@@ -48,6 +62,12 @@ Output the classification in the following JSON schema:
 """.strip()
 
 
+def __getattr__(name: str):
+    if name == "SYSTEM_PROMPT":
+        return get_system_prompt()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def dump_conversation(conversation: ScopeGuardInput) -> str:
     if isinstance(conversation, str):
         dict_conv = [f"User\n{conversation}"]
@@ -82,7 +102,7 @@ def prepare_messages(
     if skip_evidences:
         user_input += "\n\n**SKIP EVIDENCES**: do not report evidences, report only the scope_class."
     messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "system", "content": get_system_prompt()},
         {"role": "user", "content": user_input},
     ]
     return messages
@@ -108,9 +128,75 @@ def build_prompt(
     )
 
     if prefill:
-        if skip_evidences:
-            prompt += '{"evidences": null, "scope_class": "'
-        else:
-            prompt += '{"evidences":'
+        prompt += get_prefill(skip_evidences)
 
     return prompt
+
+
+def get_prefill(skip_evidences: bool) -> str:
+    """The start of the response that `build_prompt(prefill=True)` writes for the model."""
+    if skip_evidences:
+        return '{"evidences": null, "scope_class": "'
+    return '{"evidences":'
+
+
+def prefill_structured_outputs(skip_evidences: bool) -> dict:
+    """The vLLM `structured_outputs` constraining the rest of a prefilled response.
+
+    With `skip_evidences` only the scope class is left to write, so the
+    completion is one of the labels followed by the closing characters.
+    """
+    if skip_evidences:
+        return {"choice": [f"{label}}}" for label in label_continuations()]}
+    return {
+        "regex": " ?"
+        + json_nullable(json_array(JSON_STRING))
+        + ITEM_SEPARATOR
+        + json_key("scope_class")
+        + json_enum(scope_class.value for scope_class in ScopeClass)
+        + r"\}"
+    }
+
+
+def label_continuations() -> list[str]:
+    """The continuation of each scope class label, in `ScopeClass` order.
+
+    Label scoring appends each of them to a prompt built with
+    `skip_evidences=True, prefill=True`, which ends right where the model writes
+    the scope class, and compares their log-probabilities. The closing quote
+    is part of the continuation, so that a label is not scored as a prefix of
+    a longer one.
+    """
+    return [f'{scope_class.value}"' for scope_class in ScopeClass]
+
+
+def score_label_continuations(
+    tokens: Sequence[Sequence[Any]],
+    token_logprobs: Sequence[Sequence[float | None]],
+) -> list[float]:
+    """Score every label continuation from the log-probabilities of its tokens.
+
+    The tokens shared by all the sequences at their start are the common prompt,
+    which has the same log-probabilities whatever the label, so each label is
+    scored by summing the log-probabilities of the tokens after it. Working
+    on tokens rather than characters copes with tokenizers that merge the
+    prefilled quote with the first word of the label.
+
+    Args:
+        tokens: The tokens (ids or strings) of every prompt plus continuation,
+            in `label_continuations` order.
+        token_logprobs: The log-probability of each of those tokens, `None`
+            for the first one.
+    """
+    shared = shared_prefix_length(tokens)
+    return [sum(logprob or 0.0 for logprob in row[shared:]) for row in token_logprobs]
+
+
+def shared_prefix_length(tokens: Sequence[Sequence[Any]]) -> int:
+    """The number of tokens all the sequences start with."""
+    shared = 0
+    for position in zip(*tokens):
+        if any(token != position[0] for token in position):
+            break
+        shared += 1
+    return shared
@@ -3,7 +3,7 @@ import time
 from contextlib import asynccontextmanager
 from typing import Annotated
 
-from fastapi import Body, FastAPI
+from fastapi import APIRouter, Body, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
@@ -13,21 +13,40 @@ from orbitals.scope_guard.modeling import (
     ScopeClass,
     ScopeGuardInput,
 )
+from orbitals.serving.health import ServingHealth, install_health
+from orbitals.serving.rate_limiting import install_rate_limiting, rate_limiter_from_env
 from orbitals.types import AIServiceDescription, LLMUsage
+from orbitals.upstream import VLLMUpstream
 
 scope_guard: AsyncVLLMApiScopeGuard
 
 
+def create_scope_guard(upstream: VLLMUpstream | None = None) -> AsyncVLLMApiScopeGuard:
+    return AsyncScopeGuard(  # type: ignore[invalid-return-type]
+        backend="vllm-api",
+        model=os.environ["SCOPE_GUARD_VLLM_MODEL"],
+        skip_evidences=os.environ["SCOPE_GUARD_SKIP_EVIDENCES"] == "1",
+        vllm_serving_url=os.environ["SCOPE_GUARD_VLLM_SERVING_URL"],
+        chat_templating_tokenizer=os.environ.get(
+            "SCOPE_GUARD_CHAT_TEMPLATING_TOKENIZER"
+        ),
+        upstream=upstream,
+    )
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     global scope_guard
 
-    scope_guard = AsyncScopeGuard(  # type: ignore[invalid-assignment]
-        backend="vllm-api",
-        model=os.environ["SCOPE_GUARD_VLLM_MODEL"],
-        skip_evidences=os.environ["SCOPE_GUARD_SKIP_EVIDENCES"] == "1",
+    scope_guard = create_scope_guard()
+
+    max_in_flight = os.environ.get("SCOPE_GUARD_MAX_IN_FLIGHT")
+    app.state.health = ServingHealth(
         vllm_serving_url=os.environ["SCOPE_GUARD_VLLM_SERVING_URL"],
+        max_in_flight=int(max_in_flight) if max_in_flight else None,
     )
+    await app.state.health.warmup(scope_guard.warmup)
+    app.state.rate_limiter = rate_limiter_from_env("SCOPE_GUARD_RATE_LIMIT_CONFIG")
 
     yield
 
@@ -44,6 +63,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+install_health(app)
+install_rate_limiting(app)
+
+
+router = APIRouter()
+
 
 class ScopeGuardResponse(BaseModel):
     scope_class: ScopeClass
@@ -53,7 +78,7 @@ class ScopeGuardResponse(BaseModel):
     time_taken: float
 
 
-@app.post("/orbitals/scope-guard/validate", response_model=ScopeGuardResponse)
+@router.post("/orbitals/scope-guard/validate", response_model=ScopeGuardResponse)
 async def validate(
     conversation: ScopeGuardInput,
     ai_service_description: Annotated[str | AIServiceDescription, Body()],
@@ -82,7 +107,7 @@ async def validate(
     )
 
 
-@app.post(
+@router.post(
     "/orbitals/scope-guard/batch-validate",
     response_model=list[ScopeGuardResponse],
 )
@@ -99,6 +124,7 @@ async def batch_validate(
     start_time = time.time()
     results = await scope_guard.batch_validate(
         conversations,
+        validated=True,
         ai_service_description=ai_service_description,
         ai_service_descriptions=ai_service_descriptions,
         skip_evidences=skip_evidences,
@@ -117,3 +143,6 @@ async def batch_validate(
         )
         for result in results
     ]
+
+
+app.include_router(router)
@@ -1,5 +1,5 @@
 from .guards import AsyncScopeGuardV2, ScopeGuardV2
-from .modeling import ScopeClass, ScopeGuardV2Output
+from .modeling import ScopeClass, ScopeGuardV2BatchResult, ScopeGuardV2Output
 from .safety_principles import (
     ADDITIONAL_SAFETY_RULES,
     augment_with_default_safety_principles_v2,
@@ -10,6 +10,7 @@ __all__ = [
     "AsyncScopeGuardV2",
     "ScopeClass",
     "ScopeGuardV2",
+    "ScopeGuardV2BatchResult",
     "ScopeGuardV2Output",
     "augment_with_default_safety_principles_v2",
 ]
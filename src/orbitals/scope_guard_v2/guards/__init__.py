@@ -1,7 +1,29 @@
-from .api import APIScopeGuardV2, AsyncAPIScopeGuardV2
+from importlib import import_module
+from typing import TYPE_CHECKING
+
 from .base import AsyncScopeGuardV2, ScopeGuardV2
-from .hf import HuggingFaceScopeGuardV2
-from .vllm import AsyncVLLMApiScopeGuardV2, VLLMScopeGuardV2
+
+if TYPE_CHECKING:
+    from .api import APIScopeGuardV2, AsyncAPIScopeGuardV2
+    from .hf import HuggingFaceScopeGuardV2
+    from .vllm import AsyncVLLMApiScopeGuardV2, VLLMScopeGuardV2
+
+# backends pull in heavy dependencies (aiohttp, requests, transformers, ...),
+# so their classes are only imported on first access
+_LAZY_IMPORTS = {
+    "APIScopeGuardV2": ".api",
+    "AsyncAPIScopeGuardV2": ".api",
+    "HuggingFaceScopeGuardV2": ".hf",
+    "AsyncVLLMApiScopeGuardV2": ".vllm",
+    "VLLMScopeGuardV2": ".vllm",
+}
+
+
+def __getattr__(name: str):
+    if name in _LAZY_IMPORTS:
+        return getattr(import_module(_LAZY_IMPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     "AsyncScopeGuardV2",
@@ -5,6 +5,7 @@ from typing import Literal
 import aiohttp
 import requests
 
+from ...prefilter import PreFilter
 from ...types import AIServiceDescriptionV2
 from ..modeling import (
     ScopeGuardV2Input,
@@ -111,10 +112,12 @@ class APIScopeGuardV2(ScopeGuardV2):
         skip_evidences: bool = False,
         custom_headers: dict[str, str] | None = None,
         include_default_safety_principles: bool = False,
+        pre_filter: PreFilter | None = None,
     ):
         super().__init__(
             backend,
             include_default_safety_principles=include_default_safety_principles,
+            pre_filter=pre_filter,
         )
         self.default_model = model
         self.api_url = api_url
@@ -186,10 +189,12 @@ class AsyncAPIScopeGuardV2(AsyncScopeGuardV2):
         skip_evidences: bool = False,
         custom_headers: dict[str, str] | None = None,
         include_default_safety_principles: bool = False,
+        pre_filter: PreFilter | None = None,
     ):
         super().__init__(
             backend,
             include_default_safety_principles=include_default_safety_principles,
+            pre_filter=pre_filter,
         )
         self.default_model = model
         self.api_url = api_url
@@ -1,26 +1,41 @@
 from __future__ import annotations
 
 import logging
-from typing import TYPE_CHECKING, Literal, overload
+from collections.abc import AsyncIterator
+from importlib import import_module
+from typing import TYPE_CHECKING, ClassVar, Literal, overload
 
 from pydantic import ValidationError
 
 if TYPE_CHECKING:
+    from ...upstream import VLLMUpstream
     from .api import APIScopeGuardV2, AsyncAPIScopeGuardV2
     from .hf import HuggingFaceScopeGuardV2
     from .vllm import AsyncVLLMApiScopeGuardV2, VLLMScopeGuardV2
 
-from ...types import AIServiceDescriptionV2
+from ...prefilter import PRE_FILTER_MODEL, PreFilter
+from ...types import AIServiceDescriptionV2, LLMUsage
 from ..modeling import (
+    ScopeClass,
+    ScopeGuardV2BatchResult,
     ScopeGuardV2Input,
+    ScopeGuardV2InputListTypeAdapter,
     ScopeGuardV2InputTypeAdapter,
     ScopeGuardV2Output,
+    ScopeGuardV2OutputEvent,
+    ScopeGuardV2ScopeClassEvent,
+    ScopeGuardV2StreamEvent,
 )
 from ..safety_principles import augment_with_default_safety_principles_v2
 
 
 class BaseScopeGuardV2:
     _registry: dict[str, dict[str, type[ScopeGuardV2 | AsyncScopeGuardV2]]] = {}
+    # backend -> module defining it, imported the first time the backend is requested
+    _backend_modules: ClassVar[dict[str, dict[str, str]]] = {
+        "sync": {"hf": ".hf", "vllm": ".vllm", "api": ".api"},
+        "async": {"vllm-api": ".vllm", "api": ".api"},
+    }
 
     @classmethod
     def _get_outer_registry_key(cls) -> str:
@@ -42,6 +57,20 @@ class BaseScopeGuardV2:
 
         return decorator
 
+    @classmethod
+    def _resolve_backend(cls, backend: str) -> type:
+        outer_registry_key = cls._get_outer_registry_key()
+        registry = cls._registry.setdefault(outer_registry_key, {})
+        backend_modules = cls._backend_modules[outer_registry_key]
+        if backend not in registry and backend in backend_modules:
+            # importing the module registers its backends
+            import_module(backend_modules[backend], __package__)
+        try:
+            return registry[backend]
+        except KeyError:
+            available = list(dict.fromkeys([*backend_modules, *registry]))
+            raise ValueError(f"Unknown backend '{backend}'. Available: {available}")
+
     def __new__(
         cls,
         backend: str = "vllm",
@@ -51,12 +80,7 @@ class BaseScopeGuardV2:
         if cls is not ScopeGuardV2 and cls is not AsyncScopeGuardV2:
             return super().__new__(cls)
 
-        try:
-            subclass = cls._registry[cls._get_outer_registry_key()][backend]
-        except KeyError:
-            raise ValueError(
-                f"Unknown backend '{backend}'. Available: {list(cls._registry[cls._get_outer_registry_key()].keys())}"
-            )
+        subclass = cls._resolve_backend(backend)
 
         return super().__new__(subclass)
 
@@ -65,10 +89,12 @@ class BaseScopeGuardV2:
         backend: str,
         *args,
         include_default_safety_principles: bool = False,
+        pre_filter: PreFilter | None = None,
         **kwargs,
     ):
         self.backend = backend
         self.include_default_safety_principles = include_default_safety_principles
+        self.pre_filter = pre_filter
 
     def _resolve_include_default_safety_principles(
         self, per_call_value: bool | None
@@ -98,9 +124,83 @@ class BaseScopeGuardV2:
             for ad in ai_service_descriptions
         ]  # type: ignore[return-value]
 
+    def _pre_classify(
+        self, conversation: ScopeGuardV2Input
+    ) -> tuple[str, float] | None:
+        pre_filter = getattr(self, "pre_filter", None)
+        return pre_filter.decide(conversation) if pre_filter is not None else None
+
+    def _pre_filter_answers(self, decision: tuple[str, float] | None) -> bool:
+        return decision is not None and not self.pre_filter.shadow  # type: ignore[union-attr]
+
+    def _pre_filter_output(self, label: str, confidence: float) -> ScopeGuardV2Output:
+        return ScopeGuardV2Output(
+            scope_class=ScopeClass(label),
+            reasoning=f"Answered by the pre-filter with confidence {confidence:.2f}.",
+            model=PRE_FILTER_MODEL,
+            usage=LLMUsage(prompt_tokens=0, completion_tokens=0, total_tokens=0),
+            pre_filter_confidence=confidence,
+        )
+
+    def _record_shadow(
+        self, decision: tuple[str, float] | None, output: ScopeGuardV2Output
+    ) -> None:
+        if decision is not None:
+            self.pre_filter.record_shadow(decision[0], output.scope_class.value)  # type: ignore[union-attr]
+
+    def _pre_filter_split(
+        self,
+        conversations: list[ScopeGuardV2Input],
+        ai_service_descriptions: list | None,
+    ) -> tuple[
+        list[tuple[str, float] | None], list[int], list[ScopeGuardV2Input], list | None
+    ]:
+        """Pre-classify a batch.
+
+        Returns:
+            The decision of the pre-filter on every conversation, the indices
+            of the conversations still sent to the model, and those
+            conversations and their AI service descriptions.
+        """
+        decisions = [self._pre_classify(c) for c in conversations]
+        forwarded = [
+            i for i, d in enumerate(decisions) if not self._pre_filter_answers(d)
+        ]
+        if len(forwarded) == len(conversations):
+            return decisions, forwarded, conversations, ai_service_descriptions
+        return (
+            decisions,
+            forwarded,
+            [conversations[i] for i in forwarded],
+            None
+            if ai_service_descriptions is None
+            else [ai_service_descriptions[i] for i in forwarded],
+        )
+
+    def _pre_filter_merge(
+        self,
+        decisions: list[tuple[str, float] | None],
+        forwarded: list[int],
+        outputs: list[ScopeGuardV2Output],
+    ) -> list[ScopeGuardV2Output]:
+        """Put the model outputs of a batch back among the pre-filter answers."""
+        if getattr(self, "pre_filter", None) is None:
+            return outputs
+        merged: list[ScopeGuardV2Output | None] = [None] * len(decisions)
+        for index, output in zip(forwarded, outputs):
+            merged[index] = output
+            self._record_shadow(decisions[index], output)
+        return [
+            output if output is not None else self._pre_filter_output(*decision)  # type: ignore[misc]
+            for output, decision in zip(merged, decisions)
+        ]
+
     def _validate_conversation(
-        self, conversation: str | dict | list[dict]
+        self, conversation: str | dict | list[dict], validated: bool = False
     ) -> ScopeGuardV2Input:
+        if validated:
+            # trusted input, e.g. a conversation already validated by the caller
+            return conversation  # type: ignore[return-value]
         try:
             return ScopeGuardV2InputTypeAdapter.validate_python(conversation)
         except ValidationError as e:
@@ -108,16 +208,21 @@ class BaseScopeGuardV2:
             raise e from None
 
     def _validate_conversations(
-        self, conversations: list[str] | list[dict] | list[list[dict]]
+        self,
+        conversations: list[str] | list[dict] | list[list[dict]],
+        validated: bool = False,
     ) -> list[ScopeGuardV2Input]:
-        validated_conversations = []
-        for c in conversations:
-            try:
-                validated_conversations.append(self._validate_conversation(c))
-            except ValidationError as e:
-                logging.error("Invalid input format for conversation")
-                raise e from None
-        return validated_conversations
+        if validated:
+            # trusted input, e.g. a request body already parsed by FastAPI
+            return conversations  # type: ignore[return-value]
+        try:
+            return ScopeGuardV2InputListTypeAdapter.validate_python(conversations)
+        except ValidationError as e:
+            indices = sorted({error["loc"][0] for error in e.errors()})
+            logging.error(
+                f"Invalid input format for conversations at indices {indices}"
+            )
+            raise e from None
 
     def _validate_ai_service_description_input(
         self,
@@ -157,7 +262,9 @@ class ScopeGuardV2(BaseScopeGuardV2):
         max_model_len: int = 30_000,
         max_num_seqs: int = 2,
         gpu_memory_utilization: float = 0.9,
+        enable_prefix_caching: bool = True,
         include_default_safety_principles: bool = False,
+        pre_filter: PreFilter | None = None,
     ) -> VLLMScopeGuardV2: ...
 
     @overload
@@ -169,6 +276,7 @@ class ScopeGuardV2(BaseScopeGuardV2):
         max_new_tokens: int = 3000,
         do_sample: bool = False,
         include_default_safety_principles: bool = False,
+        pre_filter: PreFilter | None = None,
         **kwargs,
     ) -> HuggingFaceScopeGuardV2: ...
 
@@ -182,6 +290,7 @@ class ScopeGuardV2(BaseScopeGuardV2):
         skip_evidences: bool = False,
         custom_headers: dict[str, str] | None = None,
         include_default_safety_principles: bool = False,
+        pre_filter: PreFilter | None = None,
     ) -> APIScopeGuardV2: ...
 
     def __new__(cls, backend: str = "vllm", *args, **kwargs):
@@ -194,19 +303,25 @@ class ScopeGuardV2(BaseScopeGuardV2):
         ai_service_description: str | AIServiceDescriptionV2,
         skip_evidences: bool | None = None,
         include_default_safety_principles: bool | None = None,
+        validated: bool = False,
         **kwargs,
     ) -> ScopeGuardV2Output:
-        conversation = self._validate_conversation(conversation)
+        conversation = self._validate_conversation(conversation, validated)
         include = self._resolve_include_default_safety_principles(
             include_default_safety_principles
         )
         ai_service_description = self._maybe_augment(ai_service_description, include)
-        return self._validate(
+        decision = self._pre_classify(conversation)
+        if self._pre_filter_answers(decision):
+            return self._pre_filter_output(*decision)  # type: ignore[misc]
+        output = self._validate(
             conversation,
             ai_service_description=ai_service_description,
             skip_evidences=skip_evidences,
             **kwargs,
         )
+        self._record_shadow(decision, output)
+        return output
 
     def _validate(
         self,
@@ -226,12 +341,14 @@ class ScopeGuardV2(BaseScopeGuardV2):
         ai_service_descriptions: list[str] | list[AIServiceDescriptionV2] | None = None,
         skip_evidences: bool | None = None,
         include_default_safety_principles: bool | None = None,
+        validated: bool = False,
+        compact: bool = False,
         **kwargs,
-    ) -> list[ScopeGuardV2Output]:
+    ) -> list[ScopeGuardV2Output] | ScopeGuardV2BatchResult:
         if len(conversations) == 0:
-            return []
+            return ScopeGuardV2BatchResult() if compact else []
 
-        validated_conversations = self._validate_conversations(conversations)
+        validated_conversations = self._validate_conversations(conversations, validated)
         self._validate_ai_service_description_input(
             validated_conversations, ai_service_description, ai_service_descriptions
         )
@@ -244,13 +361,22 @@ class ScopeGuardV2(BaseScopeGuardV2):
             ai_service_descriptions, include
         )
 
-        return self._batch_validate(
-            validated_conversations,
-            ai_service_description=ai_service_description,
-            ai_service_descriptions=ai_service_descriptions,
-            skip_evidences=skip_evidences,
-            **kwargs,
+        decisions, forwarded, validated_conversations, ai_service_descriptions = (
+            self._pre_filter_split(validated_conversations, ai_service_descriptions)
+        )
+        outputs = (
+            self._batch_validate(
+                validated_conversations,
+                ai_service_description=ai_service_description,
+                ai_service_descriptions=ai_service_descriptions,
+                skip_evidences=skip_evidences,
+                **kwargs,
+            )
+            if validated_conversations
+            else []
         )
+        outputs = self._pre_filter_merge(decisions, forwarded, outputs)
+        return ScopeGuardV2BatchResult.from_outputs(outputs) if compact else outputs
 
     def _batch_validate(
         self,
@@ -271,12 +397,14 @@ class AsyncScopeGuardV2(BaseScopeGuardV2):
         backend: Literal["vllm-api"],
         model: str,
         skip_evidences: bool = False,
-        vllm_serving_url: str = "http://localhost:8000",
+        vllm_serving_url: str | list[str] = "http://localhost:8000",
         temperature: float = 0.0,
         max_tokens: int = 3000,
         chat_templating_tokenizer: str | None = None,
         count_system_prompt_in_usage: bool = False,
         include_default_safety_principles: bool = False,
+        upstream: VLLMUpstream | None = None,
+        pre_filter: PreFilter | None = None,
     ) -> AsyncVLLMApiScopeGuardV2: ...
 
     @overload
@@ -289,6 +417,7 @@ class AsyncScopeGuardV2(BaseScopeGuardV2):
         skip_evidences: bool = False,
         custom_headers: dict[str, str] | None = None,
         include_default_safety_principles: bool = False,
+        pre_filter: PreFilter | None = None,
     ) -> AsyncAPIScopeGuardV2: ...
 
     def __new__(cls, backend: str, *args, **kwargs):
@@ -301,19 +430,25 @@ class AsyncScopeGuardV2(BaseScopeGuardV2):
         ai_service_description: str | AIServiceDescriptionV2,
         skip_evidences: bool | None = None,
         include_default_safety_principles: bool | None = None,
+        validated: bool = False,
         **kwargs,
     ) -> ScopeGuardV2Output:
-        conversation = self._validate_conversation(conversation)
+        conversation = self._validate_conversation(conversation, validated)
         include = self._resolve_include_default_safety_principles(
             include_default_safety_principles
         )
         ai_service_description = self._maybe_augment(ai_service_description, include)
-        return await self._validate(
+        decision = self._pre_classify(conversation)
+        if self._pre_filter_answers(decision):
+            return self._pre_filter_output(*decision)  # type: ignore[misc]
+        output = await self._validate(
             conversation,
             ai_service_description=ai_service_description,
             skip_evidences=skip_evidences,
             **kwargs,
         )
+        self._record_shadow(decision, output)
+        return output
 
     async def _validate(
         self,
@@ -325,6 +460,56 @@ class AsyncScopeGuardV2(BaseScopeGuardV2):
     ) -> ScopeGuardV2Output:
         raise NotImplementedError
 
+    async def validate_stream(
+        self,
+        conversation: str | dict | list[dict],
+        *,
+        ai_service_description: str | AIServiceDescriptionV2,
+        skip_evidences: bool | None = None,
+        include_default_safety_principles: bool | None = None,
+        validated: bool = False,
+        **kwargs,
+    ) -> AsyncIterator[ScopeGuardV2StreamEvent]:
+        """Validate a conversation, yielding the response fields as they are generated.
+
+        The scope class is reported as soon as the model writes it, before the
+        reasoning or suggested response that may follow, and the last event
+        holds the complete output. A conversation answered by the pre-filter
+        yields both at once.
+        """
+        conversation = self._validate_conversation(conversation, validated)
+        include = self._resolve_include_default_safety_principles(
+            include_default_safety_principles
+        )
+        ai_service_description = self._maybe_augment(ai_service_description, include)
+        decision = self._pre_classify(conversation)
+        if self._pre_filter_answers(decision):
+            output = self._pre_filter_output(*decision)  # type: ignore[misc]
+            yield ScopeGuardV2ScopeClassEvent(scope_class=output.scope_class)
+            yield ScopeGuardV2OutputEvent(output=output)
+            return
+        async for event in self._validate_stream(
+            conversation,
+            ai_service_description=ai_service_description,
+            skip_evidences=skip_evidences,
+            **kwargs,
+        ):
+            if isinstance(event, ScopeGuardV2OutputEvent):
+                self._record_shadow(decision, event.output)
+            yield event
+
+    def _validate_stream(
+        self,
+        conversation: ScopeGuardV2Input,
+        *,
+        ai_service_description: str | AIServiceDescriptionV2,
+        skip_evidences: bool | None = None,
+        **kwargs,
+    ) -> AsyncIterator[ScopeGuardV2StreamEvent]:
+        raise NotImplementedError(
+            f"Streaming is not supported by the '{self.backend}' backend"
+        )
+
     async def batch_validate(
         self,
         conversations: list[str] | list[dict] | list[list[dict]],
@@ -333,12 +518,14 @@ class AsyncScopeGuardV2(BaseScopeGuardV2):
         ai_service_descriptions: list[str] | list[AIServiceDescriptionV2] | None = None,
         skip_evidences: bool | None = None,
         include_default_safety_principles: bool | None = None,
+        validated: bool = False,
+        compact: bool = False,
         **kwargs,
-    ) -> list[ScopeGuardV2Output]:
+    ) -> list[ScopeGuardV2Output] | ScopeGuardV2BatchResult:
         if len(conversations) == 0:
-            return []
+            return ScopeGuardV2BatchResult() if compact else []
 
-        validated_conversations = self._validate_conversations(conversations)
+        validated_conversations = self._validate_conversations(conversations, validated)
         self._validate_ai_service_description_input(
             validated_conversations, ai_service_description, ai_service_descriptions
         )
@@ -351,13 +538,22 @@ class AsyncScopeGuardV2(BaseScopeGuardV2):
             ai_service_descriptions, include
         )
 
-        return await self._batch_validate(
-            validated_conversations,
-            ai_service_description=ai_service_description,
-            ai_service_descriptions=ai_service_descriptions,
-            skip_evidences=skip_evidences,
-            **kwargs,
+        decisions, forwarded, validated_conversations, ai_service_descriptions = (
+            self._pre_filter_split(validated_conversations, ai_service_descriptions)
+        )
+        outputs = (
+            await self._batch_validate(
+                validated_conversations,
+                ai_service_description=ai_service_description,
+                ai_service_descriptions=ai_service_descriptions,
+                skip_evidences=skip_evidences,
+                **kwargs,
+            )
+            if validated_conversations
+            else []
         )
+        outputs = self._pre_filter_merge(decisions, forwarded, outputs)
+        return ScopeGuardV2BatchResult.from_outputs(outputs) if compact else outputs
 
     async def _batch_validate(
         self,
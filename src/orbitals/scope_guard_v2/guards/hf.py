@@ -6,6 +6,8 @@ import pydantic
 if TYPE_CHECKING:
     from transformers import pipeline  # noqa: F401
 
+from ...bucketing import run_length_bucketed
+from ...prefilter import PreFilter
 from ...types import AIServiceDescriptionV2
 from ..modeling import ScopeGuardV2Input, ScopeGuardV2Output
 from ..prompting import ScopeGuardV2ResponseModel
@@ -22,6 +24,8 @@ class HuggingFaceScopeGuardV2(ScopeGuardV2):
         max_new_tokens: int = 3000,
         do_sample: bool = False,
         include_default_safety_principles: bool = False,
+        pre_filter: PreFilter | None = None,
+        max_tokens_per_batch: int | None = None,
         **kwargs,
     ):
         from ...utils import maybe_configure_gpu_usage
@@ -33,10 +37,12 @@ class HuggingFaceScopeGuardV2(ScopeGuardV2):
         super().__init__(
             backend,
             include_default_safety_principles=include_default_safety_principles,
+            pre_filter=pre_filter,
         )
         if model is None:
             raise ValueError("A model name must be provided for ScopeGuardV2.")
         self.model = model
+        self.max_tokens_per_batch = max_tokens_per_batch
         self._pipeline = pipeline(
             task="scope-guard-v2",
             model=self.model,
@@ -47,6 +53,20 @@ class HuggingFaceScopeGuardV2(ScopeGuardV2):
             **kwargs,
         )  # type: ignore # ty: ignore[no-matching-overload]
 
+    def _run_pipeline(
+        self,
+        pipeline_inputs: list,
+        max_tokens_per_batch: int | None,
+        **pipeline_kwargs,
+    ) -> list:
+        if max_tokens_per_batch is None:
+            max_tokens_per_batch = self.max_tokens_per_batch
+        if max_tokens_per_batch is None:
+            return self._pipeline(pipeline_inputs, **pipeline_kwargs)
+        return run_length_bucketed(
+            self._pipeline, pipeline_inputs, max_tokens_per_batch, **pipeline_kwargs
+        )
+
     def _validate(
         self,
         conversation: ScopeGuardV2Input,
@@ -88,6 +108,7 @@ class HuggingFaceScopeGuardV2(ScopeGuardV2):
         ai_service_description: str | AIServiceDescriptionV2 | None = None,
         ai_service_descriptions: list[str] | list[AIServiceDescriptionV2] | None = None,
         skip_evidences: bool | None = None,
+        max_tokens_per_batch: int | None = None,
         **kwargs,
     ) -> list[ScopeGuardV2Output]:
         if ai_service_descriptions is not None:
@@ -99,8 +120,9 @@ class HuggingFaceScopeGuardV2(ScopeGuardV2):
         else:
             raise ValueError
 
-        pipeline_outputs = self._pipeline(
+        pipeline_outputs = self._run_pipeline(
             pipeline_inputs,
+            max_tokens_per_batch,
             **(
                 {"skip_evidences": skip_evidences} if skip_evidences is not None else {}
             ),
@@ -2,8 +2,9 @@ from __future__ import annotations
 
 import asyncio
 import json
+from collections.abc import AsyncIterator, Callable
 from functools import lru_cache
-from typing import TYPE_CHECKING, Literal
+from typing import TYPE_CHECKING, Any, Literal
 
 import aiohttp
 import pydantic
@@ -12,9 +13,41 @@ if TYPE_CHECKING:
     import transformers  # noqa: F401
     import vllm  # noqa: F401
 
+from ...bucketing import grouped_order, restore_order
+from ...confidence import (
+    TOP_LOGPROBS,
+    TemperatureScaling,
+    class_logprobs,
+    vllm_completion_logprobs,
+)
+from ...json_scan import JSONStreamParser
+from ...prefilter import PreFilter
 from ...types import AIServiceDescriptionV2, LLMUsage
-from ..modeling import ScopeGuardV2Input, ScopeGuardV2Output
-from ..prompting import SYSTEM_PROMPT, ScopeGuardV2ResponseModel, build_prompt
+from ...upstream import (
+    ReplicaRouter,
+    VLLMUpstream,
+    collect_completion_stream,
+    iter_sse_json,
+    routing_key,
+    streaming_body,
+)
+from ..modeling import (
+    ScopeClass,
+    ScopeGuardV2FieldEvent,
+    ScopeGuardV2Input,
+    ScopeGuardV2Output,
+    ScopeGuardV2OutputEvent,
+    ScopeGuardV2ScopeClassEvent,
+    ScopeGuardV2StreamEvent,
+    scope_class_probabilities,
+)
+from ..prompting import (
+    ScopeGuardV2ResponseModel,
+    build_prompt,
+    get_prefill,
+    get_system_prompt,
+    prefill_structured_outputs,
+)
 from .base import AsyncScopeGuardV2, ScopeGuardV2
 
 
@@ -25,6 +58,27 @@ def _get_tokenizer(model_name: str) -> transformers.PreTrainedTokenizer:
     return transformers.AutoTokenizer.from_pretrained(model_name)
 
 
+def _generated_probabilities(
+    tokens: list[str], top_logprobs: list[dict[str, float]], temperature: float
+) -> dict[ScopeClass, float] | None:
+    logprobs = class_logprobs(
+        tokens, top_logprobs, [scope_class.value for scope_class in ScopeClass]
+    )
+    if logprobs is None:
+        return None
+    return scope_class_probabilities(logprobs, temperature)
+
+
+def _field_event(field: Any, value: Any) -> ScopeGuardV2StreamEvent | None:
+    try:
+        if field == "scope_class":
+            return ScopeGuardV2ScopeClassEvent(scope_class=value)
+        return ScopeGuardV2FieldEvent(field=field, value=value)
+    except pydantic.ValidationError:
+        # unknown fields and invalid values are left to the final validation
+        return None
+
+
 @ScopeGuardV2.register_guard("vllm")
 class VLLMScopeGuardV2(ScopeGuardV2):
     def __init__(
@@ -37,7 +91,11 @@ class VLLMScopeGuardV2(ScopeGuardV2):
         max_model_len: int = 30_000,
         max_num_seqs: int = 2,
         gpu_memory_utilization: float = 0.9,
+        enable_prefix_caching: bool = True,
         include_default_safety_principles: bool = False,
+        pre_filter: PreFilter | None = None,
+        with_probabilities: bool = False,
+        calibration: TemperatureScaling | None = None,
     ):
         from ...utils import maybe_configure_gpu_usage
 
@@ -48,22 +106,35 @@ class VLLMScopeGuardV2(ScopeGuardV2):
         super().__init__(
             backend,
             include_default_safety_principles=include_default_safety_principles,
+            pre_filter=pre_filter,
         )
         if model is None:
             raise ValueError("A model name must be provided for ScopeGuardV2.")
         self.model = model
         self.skip_evidences = skip_evidences
+        self.with_probabilities = with_probabilities
+        self.calibration = calibration
         self.llm = vllm.LLM(
             model=self.model,
             max_model_len=max_model_len,
             max_num_seqs=max_num_seqs,
             gpu_memory_utilization=gpu_memory_utilization,
+            enable_prefix_caching=enable_prefix_caching,
         )
         self.tokenizer = _get_tokenizer(self.model)
         self.sampling_params = vllm.SamplingParams(
             temperature=temperature,
             max_tokens=max_tokens,
         )
+        self.probability_params = vllm.SamplingParams(
+            temperature=temperature,
+            max_tokens=max_tokens,
+            logprobs=TOP_LOGPROBS,
+        )
+
+    @property
+    def _calibration_temperature(self) -> float:
+        return self.calibration.temperature if self.calibration is not None else 1.0
 
     def _validate(
         self,
@@ -71,12 +142,14 @@ class VLLMScopeGuardV2(ScopeGuardV2):
         *,
         ai_service_description: str | AIServiceDescriptionV2,
         skip_evidences: bool | None = None,
+        with_probabilities: bool | None = None,
         **kwargs,
     ) -> ScopeGuardV2Output:
         return self._batch_validate(
             [conversation],
             ai_service_description=ai_service_description,
             skip_evidences=skip_evidences,
+            with_probabilities=with_probabilities,
         )[0]
 
     def _batch_validate(
@@ -86,36 +159,47 @@ class VLLMScopeGuardV2(ScopeGuardV2):
         ai_service_description: str | AIServiceDescriptionV2 | None = None,
         ai_service_descriptions: list[str] | list[AIServiceDescriptionV2] | None = None,
         skip_evidences: bool | None = None,
+        with_probabilities: bool | None = None,
         **kwargs,
     ) -> list[ScopeGuardV2Output]:
         resolved_skip_evidences = (
             skip_evidences if skip_evidences is not None else self.skip_evidences
         )
+        with_probabilities = (
+            with_probabilities
+            if with_probabilities is not None
+            else self.with_probabilities
+        )
 
         if ai_service_descriptions is not None:
-            prompts = [
-                build_prompt(
-                    self.tokenizer,
-                    c,
-                    ad,
-                    skip_evidences=resolved_skip_evidences,
-                )
-                for c, ad in zip(conversations, ai_service_descriptions)
-            ]
+            descriptions = list(ai_service_descriptions)
         elif ai_service_description is not None:
-            prompts = [
-                build_prompt(
-                    self.tokenizer,
-                    c,
-                    ai_service_description,
-                    skip_evidences=resolved_skip_evidences,
-                )
-                for c in conversations
-            ]
+            descriptions = [ai_service_description] * len(conversations)
         else:
             raise ValueError
 
-        outputs = self.llm.generate(prompts, self.sampling_params, use_tqdm=False)
+        prompts = [
+            build_prompt(
+                self.tokenizer,
+                c,
+                ad,
+                skip_evidences=resolved_skip_evidences,
+            )
+            for c, ad in zip(conversations, descriptions)
+        ]
+        # submitted grouped by description, returned in the caller's order
+        order = grouped_order(
+            [routing_key(ad) for ad in descriptions], [len(p) for p in prompts]
+        )
+
+        outputs = restore_order(
+            order,
+            self.llm.generate(
+                [prompts[i] for i in order],
+                self.probability_params if with_probabilities else self.sampling_params,
+                use_tqdm=False,
+            ),
+        )
 
         results = []
         for output in outputs:
@@ -130,6 +214,12 @@ class VLLMScopeGuardV2(ScopeGuardV2):
                     suggested_response=validated_obj.suggested_response,
                     model=self.model,
                     usage=None,
+                    scope_class_probabilities=_generated_probabilities(
+                        *vllm_completion_logprobs(output.outputs[0]),
+                        temperature=self._calibration_temperature,
+                    )
+                    if with_probabilities
+                    else None,
                 )
             )
 
@@ -143,16 +233,22 @@ class AsyncVLLMApiScopeGuardV2(AsyncScopeGuardV2):
         backend: Literal["vllm-api", "vllm-async-api"] = "vllm-api",
         model: str | None = None,
         skip_evidences: bool = False,
-        vllm_serving_url: str = "http://localhost:8000",
+        vllm_serving_url: str | list[str] = "http://localhost:8000",
         temperature: float = 0.0,
         max_tokens: int = 3000,
         chat_templating_tokenizer: str | None = None,
         count_system_prompt_in_usage: bool = False,
         include_default_safety_principles: bool = False,
+        pre_filter: PreFilter | None = None,
+        upstream: VLLMUpstream | None = None,
+        prefill: bool = False,
+        with_probabilities: bool = False,
+        calibration: TemperatureScaling | None = None,
     ):
         super().__init__(
             backend,
             include_default_safety_principles=include_default_safety_principles,
+            pre_filter=pre_filter,
         )
         if model is None:
             raise ValueError("A model name must be provided for AsyncScopeGuardV2.")
@@ -164,9 +260,69 @@ class AsyncVLLMApiScopeGuardV2(AsyncScopeGuardV2):
         )
         self.skip_evidences = skip_evidences
         self.vllm_serving_url = vllm_serving_url
+        self.router = ReplicaRouter(vllm_serving_url)
         self.vllm_temperature = temperature
         self.vllm_max_tokens = max_tokens
         self.count_system_prompt_in_usage = count_system_prompt_in_usage
+        self.upstream = upstream
+        self.prefill = prefill
+        self.with_probabilities = with_probabilities
+        self.calibration = calibration
+
+    @property
+    def _calibration_temperature(self) -> float:
+        return self.calibration.temperature if self.calibration is not None else 1.0
+
+    def warmup(self):
+        """Load the default chat-templating tokenizer ahead of the first request."""
+        _get_tokenizer(self.default_tokenizer_name)
+
+    async def _post_completion(
+        self, request_body: dict, routing_key: str | None = None
+    ) -> dict:
+        if self.upstream is not None:
+            return await self.upstream.completions(
+                request_body, guardrail="scope-guard-v2", routing_key=routing_key
+            )
+
+        with self.router.route(routing_key) as replica_url:
+            async with (
+                aiohttp.ClientSession() as session,
+                session.post(
+                    f"{replica_url}/v1/completions",
+                    json=request_body,
+                    headers={"Content-Type": "application/json"},
+                ) as response,
+            ):
+                response.raise_for_status()
+                return await response.json()
+
+    async def _stream_completion(
+        self,
+        request_body: dict,
+        on_text: Callable[[str], None],
+        routing_key: str | None = None,
+    ) -> dict:
+        request_body = streaming_body(request_body)
+        if self.upstream is not None:
+            return await collect_completion_stream(
+                self.upstream.stream_completions(
+                    request_body, guardrail="scope-guard-v2", routing_key=routing_key
+                ),
+                on_text,
+            )
+
+        with self.router.route(routing_key) as replica_url:
+            async with (
+                aiohttp.ClientSession() as session,
+                session.post(
+                    f"{replica_url}/v1/completions",
+                    json=request_body,
+                    headers={"Content-Type": "application/json"},
+                ) as response,
+            ):
+                response.raise_for_status()
+                return await collect_completion_stream(iter_sse_json(response), on_text)
 
     async def _handle_request(
         self,
@@ -176,6 +332,8 @@ class AsyncVLLMApiScopeGuardV2(AsyncScopeGuardV2):
         skip_evidences: bool | None,
         prefill: bool,
         chat_templating_tokenizer: str | None = None,
+        with_probabilities: bool | None = None,
+        on_text: Callable[[str], None] | None = None,
     ) -> ScopeGuardV2Output:
         if chat_templating_tokenizer is not None:
             tokenizer = _get_tokenizer(chat_templating_tokenizer)
@@ -188,6 +346,11 @@ class AsyncVLLMApiScopeGuardV2(AsyncScopeGuardV2):
         skip_evidences = (
             skip_evidences if skip_evidences is not None else self.skip_evidences
         )
+        with_probabilities = (
+            with_probabilities
+            if with_probabilities is not None
+            else self.with_probabilities
+        )
 
         prompt = build_prompt(
             tokenizer=tokenizer,
@@ -197,26 +360,30 @@ class AsyncVLLMApiScopeGuardV2(AsyncScopeGuardV2):
             prefill=prefill,
         )
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{self.vllm_serving_url}/v1/completions",
-                json={
-                    "model": model_name,
-                    "prompt": prompt,
-                    "temperature": self.vllm_temperature,
-                    "max_tokens": self.vllm_max_tokens,
-                    "structured_outputs": {
-                        "json": ScopeGuardV2ResponseModel.model_json_schema()
-                    },
-                },
-                headers={"Content-Type": "application/json"},
-            ) as response:
-                response.raise_for_status()
-                response_json = await response.json()
-                response_text = response_json["choices"][0]["text"]
+        request_body = {
+            "model": model_name,
+            "prompt": prompt,
+            "temperature": self.vllm_temperature,
+            "max_tokens": self.vllm_max_tokens,
+            "structured_outputs": prefill_structured_outputs(skip_evidences)
+            if prefill
+            else {"json": ScopeGuardV2ResponseModel.model_json_schema()},
+            **({"logprobs": TOP_LOGPROBS} if with_probabilities else {}),
+        }
+        if on_text is None:
+            response_json = await self._post_completion(
+                request_body, routing_key(ai_service_description)
+            )
+        else:
+            if prefill:
+                on_text(get_prefill(skip_evidences))
+            response_json = await self._stream_completion(
+                request_body, on_text, routing_key(ai_service_description)
+            )
+        response_text = response_json["choices"][0]["text"]
 
         if prefill:
-            response_text = prompt[prompt.rindex('{"evidences"') :] + response_text
+            response_text = get_prefill(skip_evidences) + response_text
 
         try:
             parsed_obj = json.loads(response_text)
@@ -231,15 +398,28 @@ class AsyncVLLMApiScopeGuardV2(AsyncScopeGuardV2):
         system_prompt_tokens = (
             0
             if self.count_system_prompt_in_usage
-            else len(tokenizer.encode(SYSTEM_PROMPT))
+            else len(tokenizer.encode(get_system_prompt()))
         )
 
+        probabilities = None
+        if with_probabilities:
+            logprobs = response_json["choices"][0]["logprobs"]
+            tokens, top_logprobs = logprobs["tokens"], logprobs["top_logprobs"]
+            if prefill:
+                # the prefilled part of the response, where the field starts
+                tokens = [get_prefill(skip_evidences), *tokens]
+                top_logprobs = [{}, *top_logprobs]
+            probabilities = _generated_probabilities(
+                tokens, top_logprobs, temperature=self._calibration_temperature
+            )
+
         return ScopeGuardV2Output(
             scope_class=validated_obj.scope_class,
             evidences=validated_obj.evidences,
             reasoning=validated_obj.reasoning,
             suggested_response=validated_obj.suggested_response,
             model=model_name,
+            scope_class_probabilities=probabilities,
             usage=LLMUsage(
                 prompt_tokens=response_json["usage"]["prompt_tokens"]
                 - system_prompt_tokens,
@@ -257,6 +437,8 @@ class AsyncVLLMApiScopeGuardV2(AsyncScopeGuardV2):
         skip_evidences: bool | None = None,
         model: str | None = None,
         chat_templating_tokenizer: str | None = None,
+        with_probabilities: bool | None = None,
+        prefill: bool | None = None,
         **kwargs,
     ) -> ScopeGuardV2Output:
         results = await self._batch_validate(
@@ -265,9 +447,52 @@ class AsyncVLLMApiScopeGuardV2(AsyncScopeGuardV2):
             skip_evidences=skip_evidences,
             model=model,
             chat_templating_tokenizer=chat_templating_tokenizer,
+            with_probabilities=with_probabilities,
+            prefill=prefill,
         )
         return results[0]
 
+    async def _validate_stream(
+        self,
+        conversation: ScopeGuardV2Input,
+        *,
+        ai_service_description: str | AIServiceDescriptionV2,
+        skip_evidences: bool | None = None,
+        model: str | None = None,
+        chat_templating_tokenizer: str | None = None,
+        with_probabilities: bool | None = None,
+        prefill: bool | None = None,
+        **kwargs,
+    ) -> AsyncIterator[ScopeGuardV2StreamEvent]:
+        parser = JSONStreamParser(max_depth=1)
+        events: asyncio.Queue[ScopeGuardV2StreamEvent | None] = asyncio.Queue()
+
+        def on_text(text: str) -> None:
+            for path, value in parser.feed(text):
+                event = _field_event(path[0], value) if path else None
+                if event is not None:
+                    events.put_nowait(event)
+
+        task = asyncio.ensure_future(
+            self._handle_request(
+                model_name=model,
+                conversation=conversation,
+                ai_service_description=ai_service_description,
+                skip_evidences=skip_evidences,
+                prefill=prefill if prefill is not None else self.prefill,
+                chat_templating_tokenizer=chat_templating_tokenizer,
+                with_probabilities=with_probabilities,
+                on_text=on_text,
+            )
+        )
+        task.add_done_callback(lambda _: events.put_nowait(None))
+        try:
+            while (event := await events.get()) is not None:
+                yield event
+            yield ScopeGuardV2OutputEvent(output=await task)
+        finally:
+            task.cancel()
+
     async def _batch_validate(
         self,
         conversations: list[ScopeGuardV2Input],
@@ -277,8 +502,11 @@ class AsyncVLLMApiScopeGuardV2(AsyncScopeGuardV2):
         skip_evidences: bool | None = None,
         model: str | None = None,
         chat_templating_tokenizer: str | None = None,
+        with_probabilities: bool | None = None,
+        prefill: bool | None = None,
         **kwargs,
     ) -> list[ScopeGuardV2Output]:
+        prefill = prefill if prefill is not None else self.prefill
         if ai_service_description is not None:
             ai_service_descriptions = [ai_service_description] * len(conversations)  # type: ignore[invalid-assignment]
 
@@ -288,10 +516,9 @@ class AsyncVLLMApiScopeGuardV2(AsyncScopeGuardV2):
                 conversation=c,
                 ai_service_description=aisd,
                 skip_evidences=skip_evidences,
-                # TODO supporting True on this parameter is a bit tricky
-                # problem is the grammar-based decoding, which is unaware of the prefilling
-                prefill=False,
+                prefill=prefill,
                 chat_templating_tokenizer=chat_templating_tokenizer,
+                with_probabilities=with_probabilities,
             )
             for c, aisd in zip(conversations, ai_service_descriptions)  # type: ignore[invalid-argument-type]
         ]
@@ -1,8 +1,19 @@
+import sys
+from collections.abc import Sequence
 from enum import Enum
 from typing import Annotated, Any, Literal
 
-from pydantic import BaseModel, BeforeValidator, Field, TypeAdapter
-
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    Field,
+    TypeAdapter,
+    ValidatorFunctionWrapHandler,
+    WrapValidator,
+)
+
+from ..columnar import BatchResult, OptionalRaggedColumn, UsageColumn
+from ..confidence import normalize_logprobs
 from ..types import ConversationMessage, LLMUsage
 
 
@@ -87,6 +98,109 @@ class ScopeGuardV2Output(BaseModel):
     usage: LLMUsage | None = Field(
         default=None, description="Token usage reported by the model backend."
     )
+    scope_class_probabilities: dict[ScopeClass, float] | None = Field(
+        default=None,
+        description="The probability of each scope class, when requested with `with_probabilities=True`.",
+    )
+    pre_filter_confidence: float | None = Field(
+        default=None,
+        description="The confidence of the pre-filter, when it answered instead of the model.",
+    )
+
+    @property
+    def confidence(self) -> float | None:
+        """The probability of `scope_class`, if the backend or pre-filter reported it."""
+        if self.scope_class_probabilities is None:
+            return self.pre_filter_confidence
+        return self.scope_class_probabilities.get(self.scope_class, 0.0)
+
+
+def scope_class_probabilities(
+    class_logprobs: Sequence[float], temperature: float = 1.0
+) -> dict[ScopeClass, float]:
+    """Turn the log-probabilities of the scope classes into probabilities.
+
+    `class_logprobs` are in `ScopeClass` order and need not be normalized. A
+    `temperature` fitted with `orbitals.confidence.TemperatureScaling`
+    calibrates the probabilities.
+    """
+    return dict(zip(ScopeClass, normalize_logprobs(class_logprobs, temperature)))
+
+
+class ScopeGuardV2ScopeClassEvent(BaseModel):
+    """Sent by `validate_stream` as soon as the scope class is generated."""
+
+    event: Literal["scope_class"] = "scope_class"
+    scope_class: ScopeClass
+
+
+class ScopeGuardV2FieldEvent(BaseModel):
+    """Sent by `validate_stream` as soon as another field of the response is generated."""
+
+    event: Literal["field"] = "field"
+    field: Literal["evidences", "reasoning", "suggested_response"]
+    value: list[str] | str | None
+
+
+class ScopeGuardV2OutputEvent(BaseModel):
+    """The last event of `validate_stream`, with the complete output."""
+
+    event: Literal["output"] = "output"
+    output: ScopeGuardV2Output
+
+
+ScopeGuardV2StreamEvent = Annotated[
+    ScopeGuardV2ScopeClassEvent | ScopeGuardV2FieldEvent | ScopeGuardV2OutputEvent,
+    Field(discriminator="event"),
+]
+
+
+class ScopeGuardV2BatchResult(BatchResult[ScopeGuardV2Output]):
+    """Compact `batch_validate` results, see `orbitals.columnar.BatchResult`."""
+
+    def __init__(self):
+        self.scope_classes: list[str] = []
+        self.reasonings: list[str] = []
+        self.suggested_responses: list[str | None] = []
+        self.models: list[str] = []
+        self.evidences = OptionalRaggedColumn()
+        self.usage = UsageColumn()
+        # one probability per scope class, in `ScopeClass` order
+        self.scope_class_probabilities = OptionalRaggedColumn()
+        self.pre_filter_confidences: list[float | None] = []
+
+    def __len__(self) -> int:
+        return len(self.scope_classes)
+
+    def append(self, output: ScopeGuardV2Output) -> None:
+        self.scope_classes.append(sys.intern(output.scope_class.value))
+        self.reasonings.append(output.reasoning)
+        self.suggested_responses.append(output.suggested_response)
+        self.models.append(sys.intern(output.model))
+        self.evidences.append(output.evidences)
+        self.usage.append(output.usage)
+        probabilities = output.scope_class_probabilities
+        self.scope_class_probabilities.append(
+            [probabilities.get(scope_class, 0.0) for scope_class in ScopeClass]
+            if probabilities is not None
+            else None
+        )
+        self.pre_filter_confidences.append(output.pre_filter_confidence)
+
+    def _row(self, index: int) -> ScopeGuardV2Output:
+        probabilities = self.scope_class_probabilities[index]
+        return ScopeGuardV2Output.model_construct(
+            evidences=self.evidences[index],
+            reasoning=self.reasonings[index],
+            scope_class=ScopeClass(self.scope_classes[index]),
+            suggested_response=self.suggested_responses[index],
+            model=self.models[index],
+            usage=self.usage[index],
+            scope_class_probabilities=dict(zip(ScopeClass, probabilities))
+            if probabilities is not None
+            else None,
+            pre_filter_confidence=self.pre_filter_confidences[index],
+        )
 
 
 class ConversationUserMessage(BaseModel):
@@ -94,23 +208,35 @@ class ConversationUserMessage(BaseModel):
     content: str
 
 
+# built once: constructing a TypeAdapter compiles a core schema
+_MESSAGE_ADAPTER = TypeAdapter(ConversationUserMessage)
+_CONVERSATION_ADAPTER = TypeAdapter(list[ConversationMessage])
+
+
 def _select_model_based_on_fields(
-    v: Any,
+    v: Any, handler: ValidatorFunctionWrapHandler
 ) -> str | ConversationUserMessage | list[ConversationMessage]:
-    if isinstance(v, str):
-        return TypeAdapter(str).validate_python(v)
+    if isinstance(v, (str, ConversationUserMessage)):
+        return v
     elif isinstance(v, dict):
-        return TypeAdapter(ConversationUserMessage).validate_python(v)
+        return _MESSAGE_ADAPTER.validate_python(v)
     elif isinstance(v, list):
-        return TypeAdapter(list[ConversationMessage]).validate_python(v)
+        # conversations of already validated messages need no revalidation
+        if all(type(message) is ConversationMessage for message in v):
+            return v
+        return _CONVERSATION_ADAPTER.validate_python(v)
 
     # no matching model found, let's fall back to standard pydantic behavior
-    return v
+    return handler(v)
 
 
 ScopeGuardV2Input = Annotated[
     str | ConversationUserMessage | list[ConversationMessage],
-    BeforeValidator(_select_model_based_on_fields),
+    WrapValidator(_select_model_based_on_fields),
 ]
 
 ScopeGuardV2InputTypeAdapter = TypeAdapter(ScopeGuardV2Input)
+# validates a whole batch at once, errors are located by conversation index
+ScopeGuardV2InputListTypeAdapter = TypeAdapter(
+    list[ScopeGuardV2Input], config=ConfigDict(title="conversations")
+)
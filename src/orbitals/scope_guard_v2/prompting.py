@@ -1,7 +1,17 @@
 import json
+from functools import cache
 
 from pydantic import BaseModel, Field
 
+from ..prefill import (
+    ITEM_SEPARATOR,
+    JSON_STRING,
+    JSON_STRING_REST,
+    json_array,
+    json_enum,
+    json_key,
+    json_nullable,
+)
 from ..types import AIServiceDescriptionV2, Conversation, ConversationMessage
 from .modeling import (
     ConversationUserMessage,
@@ -28,9 +38,13 @@ class ScopeGuardV2ResponseModel(BaseModel):
 
 
 _SCOPE_CLASSES_BLOCK = ScopeClass.get_classes_manifest()
-_RESPONSE_SCHEMA = json.dumps(ScopeGuardV2ResponseModel.model_json_schema())
 
-SYSTEM_PROMPT = f"""You are an expert AI classifier specialized in classifying user queries given the description of an AI service.
+
+@cache
+def get_system_prompt() -> str:
+    """The system prompt, built on first use as it embeds the response JSON schema."""
+    response_schema = json.dumps(ScopeGuardV2ResponseModel.model_json_schema())
+    return f"""You are an expert AI classifier specialized in classifying user queries given the description of an AI service.
 
 Your task is to analyse a conversation and classify the last user message against the AI service description provided in the AI Service Description section below.
 
@@ -80,10 +94,16 @@ The AI Service Description may be a structured document with labelled fields, or
 
 ## Output Format
 You MUST respond with a single JSON object and nothing else — no markdown fences, no preamble, no explanation outside the JSON. The JSON must conform to this schema:
-{_RESPONSE_SCHEMA}
+{response_schema}
 """
 
 
+def __getattr__(name: str):
+    if name == "SYSTEM_PROMPT":
+        return get_system_prompt()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 LAST_MESSAGE_TAG = "LAST MESSAGE"
 
 
@@ -154,7 +174,7 @@ def prepare_input_messages(
     messages = [
         {
             "role": "system",
-            "content": SYSTEM_PROMPT,
+            "content": get_system_prompt(),
         },
         {"role": "user", "content": user_input},
     ]
@@ -181,9 +201,37 @@ def build_prompt(
     )
 
     if prefill:
-        if skip_evidences:
-            prompt += '{"evidences": null, "reasoning": "'
-        else:
-            prompt += '{"evidences":'
+        prompt += get_prefill(skip_evidences)
 
     return prompt
+
+
+def get_prefill(skip_evidences: bool) -> str:
+    """The start of the response that `build_prompt(prefill=True)` writes for the model."""
+    if skip_evidences:
+        return '{"evidences": null, "reasoning": "'
+    return '{"evidences":'
+
+
+def prefill_structured_outputs(skip_evidences: bool) -> dict:
+    """The vLLM `structured_outputs` constraining the rest of a prefilled response."""
+    rest = (
+        ITEM_SEPARATOR
+        + json_key("scope_class")
+        + json_enum(scope_class.value for scope_class in ScopeClass)
+        + "("
+        + ITEM_SEPARATOR
+        + json_key("suggested_response")
+        + json_nullable(JSON_STRING)
+        + r")?\}"
+    )
+    if skip_evidences:
+        return {"regex": JSON_STRING_REST + rest}
+    return {
+        "regex": " ?"
+        + json_nullable(json_array(JSON_STRING))
+        + ITEM_SEPARATOR
+        + json_key("reasoning")
+        + JSON_STRING
+        + rest
+    }
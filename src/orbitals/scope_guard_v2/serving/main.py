@@ -3,28 +3,51 @@ import time
 from contextlib import asynccontextmanager
 from typing import Annotated
 
-from fastapi import Body, FastAPI
+from fastapi import APIRouter, Body, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from orbitals.scope_guard_v2 import AsyncScopeGuardV2
 from orbitals.scope_guard_v2.guards import AsyncVLLMApiScopeGuardV2
 from orbitals.scope_guard_v2.modeling import ScopeClass, ScopeGuardV2Input
+from orbitals.serving.health import ServingHealth, install_health
+from orbitals.serving.rate_limiting import install_rate_limiting, rate_limiter_from_env
+from orbitals.serving.streaming import event_stream_response
 from orbitals.types import AIServiceDescriptionV2, LLMUsage
+from orbitals.upstream import VLLMUpstream
 
 scope_guard: AsyncVLLMApiScopeGuardV2
 
 
+def create_scope_guard(
+    upstream: VLLMUpstream | None = None,
+) -> AsyncVLLMApiScopeGuardV2:
+    return AsyncScopeGuardV2(  # type: ignore[invalid-return-type]
+        backend="vllm-api",
+        model=os.environ["SCOPE_GUARD_V2_VLLM_MODEL"],
+        skip_evidences=os.environ["SCOPE_GUARD_V2_SKIP_EVIDENCES"] == "1",
+        vllm_serving_url=os.environ["SCOPE_GUARD_V2_VLLM_SERVING_URL"],
+        chat_templating_tokenizer=os.environ.get(
+            "SCOPE_GUARD_V2_CHAT_TEMPLATING_TOKENIZER"
+        ),
+        upstream=upstream,
+    )
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     global scope_guard
 
-    scope_guard = AsyncScopeGuardV2(  # type: ignore[invalid-assignment]
-        backend="vllm-api",
-        model=os.environ["SCOPE_GUARD_V2_VLLM_MODEL"],
-        skip_evidences=os.environ["SCOPE_GUARD_V2_SKIP_EVIDENCES"] == "1",
+    scope_guard = create_scope_guard()
+
+    max_in_flight = os.environ.get("SCOPE_GUARD_V2_MAX_IN_FLIGHT")
+    app.state.health = ServingHealth(
         vllm_serving_url=os.environ["SCOPE_GUARD_V2_VLLM_SERVING_URL"],
+        max_in_flight=int(max_in_flight) if max_in_flight else None,
     )
+    await app.state.health.warmup(scope_guard.warmup)
+    app.state.rate_limiter = rate_limiter_from_env("SCOPE_GUARD_V2_RATE_LIMIT_CONFIG")
 
     yield
 
@@ -41,6 +64,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+install_health(app)
+install_rate_limiting(app)
+
+
+router = APIRouter()
+
 
 class ScopeGuardV2Response(BaseModel):
     scope_class: ScopeClass
@@ -52,7 +81,7 @@ class ScopeGuardV2Response(BaseModel):
     time_taken: float
 
 
-@app.post("/orbitals/scope-guard-v2/validate", response_model=ScopeGuardV2Response)
+@router.post("/orbitals/scope-guard-v2/validate", response_model=ScopeGuardV2Response)
 async def validate(
     conversation: ScopeGuardV2Input,
     ai_service_description: Annotated[str | AIServiceDescriptionV2, Body()],
@@ -83,7 +112,27 @@ async def validate(
     )
 
 
-@app.post(
+@router.post("/orbitals/scope-guard-v2/validate-stream")
+async def validate_stream(
+    conversation: ScopeGuardV2Input,
+    ai_service_description: Annotated[str | AIServiceDescriptionV2, Body()],
+    skip_evidences: Annotated[bool | None, Body()] = None,
+    model: Annotated[str | None, Body()] = None,
+    include_default_safety_principles: Annotated[bool | None, Body()] = None,
+) -> StreamingResponse:
+    return event_stream_response(
+        scope_guard.validate_stream(
+            conversation,
+            validated=True,
+            ai_service_description=ai_service_description,
+            skip_evidences=skip_evidences,
+            include_default_safety_principles=include_default_safety_principles,
+            model=model,
+        )
+    )
+
+
+@router.post(
     "/orbitals/scope-guard-v2/batch-validate",
     response_model=list[ScopeGuardV2Response],
 )
@@ -102,6 +151,7 @@ async def batch_validate(
     start_time = time.time()
     results = await scope_guard.batch_validate(
         conversations,
+        validated=True,
         ai_service_description=ai_service_description,
         ai_service_descriptions=ai_service_descriptions,
         skip_evidences=skip_evidences,
@@ -122,3 +172,6 @@ async def batch_validate(
         )
         for result in results
     ]
+
+
+app.include_router(router)
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import threading
+from collections.abc import Callable
+
+import aiohttp
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from orbitals.serving.streaming import release_after_body
+from orbitals.upstream import VLLMUpstream
+
+logger = logging.getLogger(__name__)
+
+# set once the process has been asked to shut down; shared by every app served
+# by this process, since signals are process-wide
+_draining = threading.Event()
+
+# probes are not work, so they are neither rejected nor counted while draining
+_PROBE_PATHS = frozenset({"/livez", "/readyz", "/health", "/metrics"})
+
+
+def start_draining():
+    _draining.set()
+
+
+def is_draining() -> bool:
+    return _draining.is_set()
+
+
+class ServingHealth:
+    """Liveness, readiness and in-flight tracking for a serving app.
+
+    The app is ready when the tokenizers have been warmed up, the vLLM upstream
+    answers its `/health` endpoint, the process is not draining and the request
+    queue is not saturated.
+
+    Args:
+        vllm_serving_url: The vLLM server whose health is checked, when no
+            `upstream` is given.
+        upstream: The shared upstream. Its health and scheduler queue are used.
+        max_in_flight: The number of in-flight requests above which the app
+            reports itself as not ready.
+        upstream_timeout: Timeout of the upstream health check, in seconds.
+    """
+
+    def __init__(
+        self,
+        vllm_serving_url: str | None = None,
+        upstream: VLLMUpstream | None = None,
+        max_in_flight: int | None = None,
+        upstream_timeout: float = 2.0,
+    ):
+        self.vllm_serving_url = (
+            vllm_serving_url.rstrip("/") if vllm_serving_url is not None else None
+        )
+        self.upstream = upstream
+        self.max_in_flight = max_in_flight
+        self.upstream_timeout = upstream_timeout
+        self.in_flight = 0
+        self.warmed_up = False
+        self.warmup_error: str | None = None
+
+    async def warmup(self, *warmups: Callable[[], object]):
+        """Run the (blocking) warmup callables in a worker thread.
+
+        A failed warmup is logged and keeps the app not ready, rather than
+        preventing it from starting, so that the error shows up in `/readyz`.
+        """
+        try:
+            for warmup in warmups:
+                await asyncio.to_thread(warmup)
+        except Exception as e:
+            logger.exception("Warmup failed")
+            self.warmup_error = f"{type(e).__name__}: {e}"
+        else:
+            self.warmed_up = True
+
+    async def _upstream_healthy(self) -> bool:
+        if self.upstream is not None:
+            return await self.upstream.is_healthy(timeout=self.upstream_timeout)
+        if self.vllm_serving_url is None:
+            return True
+        try:
+            async with (
+                aiohttp.ClientSession() as session,
+                session.get(
+                    f"{self.vllm_serving_url}/health",
+                    timeout=aiohttp.ClientTimeout(total=self.upstream_timeout),
+                ) as response,
+            ):
+                return response.status == 200
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return False
+
+    def _saturated(self) -> bool:
+        if self.max_in_flight is not None and self.in_flight >= self.max_in_flight:
+            return True
+        if self.upstream is not None:
+            scheduler = self.upstream.scheduler
+            # a queue longer than the concurrency limit means at least one
+            # more full round of upstream latency before new work starts
+            return (
+                scheduler.max_concurrency is not None
+                and scheduler.queued >= scheduler.max_concurrency
+            )
+        return False
+
+    async def readiness(self) -> tuple[bool, dict[str, object]]:
+        checks: dict[str, object] = {
+            "draining": is_draining(),
+            "warmed_up": self.warmed_up,
+            "saturated": self._saturated(),
+            "upstream": await self._upstream_healthy(),
+            "in_flight": self.in_flight,
+        }
+        if self.warmup_error is not None:
+            checks["warmup_error"] = self.warmup_error
+        ready = (
+            not checks["draining"]
+            and checks["warmed_up"]
+            and not checks["saturated"]
+            and checks["upstream"]
+        )
+        return bool(ready), checks
+
+
+def install_health(app: FastAPI):
+    """Add `/livez`, `/readyz` and in-flight tracking to `app`.
+
+    The app lifespan is expected to set `app.state.health` to a `ServingHealth`;
+    until then, the app reports itself as not ready. While draining, new
+    requests are rejected with a 503 and in-flight ones are left to complete.
+    """
+
+    @app.middleware("http")
+    async def track_in_flight(request: Request, call_next):
+        health: ServingHealth | None = getattr(request.app.state, "health", None)
+        if health is None or request.url.path in _PROBE_PATHS:
+            return await call_next(request)
+
+        if is_draining():
+            return JSONResponse(
+                status_code=503,
+                content={"detail": "Server is shutting down"},
+                headers={"Connection": "close"},
+            )
+
+        def _done():
+            health.in_flight -= 1
+
+        health.in_flight += 1
+        try:
+            response = await call_next(request)
+        except BaseException:
+            _done()
+            raise
+        # a draining server waits for streamed responses to end, not to start
+        return release_after_body(response, _done)
+
+    @app.get("/livez")
+    async def livez() -> dict[str, str]:
+        return {"status": "ok"}
+
+    @app.get("/readyz")
+    async def readyz(request: Request) -> JSONResponse:
+        health: ServingHealth | None = getattr(request.app.state, "health", None)
+        if health is None:
+            return JSONResponse(status_code=503, content={"status": "starting"})
+        ready, checks = await health.readiness()
+        return JSONResponse(
+            status_code=200 if ready else 503,
+            content={"status": "ready" if ready else "not ready", **checks},
+        )
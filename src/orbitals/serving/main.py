@@ -0,0 +1,247 @@
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Annotated, Literal
+
+from fastapi import APIRouter, Body, FastAPI, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, ValidationError
+
+from orbitals.claim_extractor import ClaimExtractorOutput
+from orbitals.claim_extractor.serving import main as claim_extractor_serving
+from orbitals.metrics import MetricsRegistry, default_registry
+from orbitals.pipeline import AsyncGuardrailPipeline
+from orbitals.scope_guard import ScopeGuardOutput
+from orbitals.scope_guard.serving import main as scope_guard_serving
+from orbitals.scope_guard_v2.serving import main as scope_guard_v2_serving
+from orbitals.serving.health import ServingHealth, install_health
+from orbitals.serving.rate_limiting import install_rate_limiting, rate_limiter_from_env
+from orbitals.types import AIServiceDescription
+from orbitals.upstream import VLLMUpstream
+
+GUARDRAILS = ("scope-guard", "scope-guard-v2", "claim-extractor")
+PIPELINE_GUARDRAILS = ("scope-guard", "claim-extractor")
+
+pipeline_router = APIRouter()
+
+
+class PipelineResponse(BaseModel):
+    scope_guard: ScopeGuardOutput | None
+    claim_extractor: ClaimExtractorOutput | None
+    extraction_cancelled: bool
+    time_taken: float
+
+
+@pipeline_router.post("/orbitals/pipeline/run", response_model=PipelineResponse)
+async def run_pipeline(
+    request: Request,
+    conversation: Annotated[str | dict | list[dict], Body()],
+    ai_service_description: Annotated[str | AIServiceDescription, Body()],
+    guardrails: Annotated[
+        list[Literal["scope-guard", "claim-extractor"]] | None, Body()
+    ] = None,
+    skip_evidences: Annotated[bool | None, Body()] = None,
+    include_default_safety_principles: Annotated[bool | None, Body()] = None,
+    intents_only: Annotated[bool | None, Body()] = None,
+    cancel_extraction_on_restricted: Annotated[bool, Body()] = False,
+) -> PipelineResponse:
+    served = [g for g in PIPELINE_GUARDRAILS if g in request.app.state.guardrails]
+    selected = guardrails or served
+    not_served = sorted(set(selected) - set(served))
+    if not_served:
+        raise RequestValidationError(
+            [
+                {
+                    "type": "value_error",
+                    "loc": ("body", "guardrails"),
+                    "msg": f"Guardrails {not_served} are not served",
+                    "input": guardrails,
+                }
+            ]
+        )
+
+    pipeline = AsyncGuardrailPipeline(
+        scope_guard=(
+            scope_guard_serving.scope_guard if "scope-guard" in selected else None
+        ),
+        claim_extractor=(
+            claim_extractor_serving.claim_extractor
+            if "claim-extractor" in selected
+            else None
+        ),
+    )
+
+    start_time = time.time()
+    try:
+        result = await pipeline.run(
+            conversation,
+            ai_service_description=ai_service_description,
+            skip_evidences=skip_evidences,
+            include_default_safety_principles=include_default_safety_principles,
+            intents_only=intents_only,
+            cancel_extraction_on_restricted=cancel_extraction_on_restricted,
+        )
+    except ValidationError as e:
+        raise RequestValidationError(e.errors()) from None
+    end_time = time.time()
+
+    return PipelineResponse(
+        scope_guard=result.scope_guard,
+        claim_extractor=result.claim_extractor,
+        extraction_cancelled=result.extraction_cancelled,
+        time_taken=end_time - start_time,
+    )
+
+
+def _mounted_guards(guardrails: list[str]) -> list:
+    guards = []
+    if "scope-guard" in guardrails:
+        guards.append(scope_guard_serving.scope_guard)
+    if "scope-guard-v2" in guardrails:
+        guards.append(scope_guard_v2_serving.scope_guard)
+    if "claim-extractor" in guardrails:
+        guards.append(claim_extractor_serving.claim_extractor)
+    return guards
+
+
+def _parse_guardrails(value: str) -> list[str]:
+    guardrails = [g.strip() for g in value.split(",") if g.strip()]
+    unknown = set(guardrails) - set(GUARDRAILS)
+    if unknown:
+        raise ValueError(
+            f"Unknown guardrails: {sorted(unknown)}. Available: {list(GUARDRAILS)}"
+        )
+    return guardrails
+
+
+def _create_upstream(metrics: MetricsRegistry) -> VLLMUpstream:
+    max_concurrency = os.environ.get("ORBITALS_SERVE_MAX_CONCURRENCY")
+    return VLLMUpstream(
+        # comma-separated for several replicas
+        vllm_serving_url=os.environ["ORBITALS_SERVE_VLLM_SERVING_URL"].split(","),
+        max_connections=int(os.environ.get("ORBITALS_SERVE_MAX_CONNECTIONS", "100")),
+        max_concurrency=int(max_concurrency) if max_concurrency else None,
+        metrics=metrics,
+    )
+
+
+def create_app(
+    guardrails: list[str] | None = None,
+    upstream: VLLMUpstream | None = None,
+    metrics: MetricsRegistry | None = None,
+) -> FastAPI:
+    """Create a single app serving several guardrails.
+
+    All enabled guardrails share one `VLLMUpstream`, hence one connection pool,
+    one scheduler and one metrics registry, exposed on `/metrics`. When
+    scope-guard and/or claim-extractor are mounted, `/orbitals/pipeline/run`
+    runs them concurrently on one conversation.
+
+    Args:
+        guardrails: The guardrails to mount. Defaults to the comma-separated
+            `ORBITALS_SERVE_GUARDRAILS` environment variable, or all of them.
+        upstream: The shared upstream. Defaults to one built from the
+            `ORBITALS_SERVE_*` environment variables.
+        metrics: The metrics registry. Defaults to the upstream's registry.
+    """
+    if guardrails is None:
+        guardrails = _parse_guardrails(
+            os.environ.get("ORBITALS_SERVE_GUARDRAILS", ",".join(GUARDRAILS))
+        )
+    else:
+        guardrails = _parse_guardrails(",".join(guardrails))
+
+    if metrics is None:
+        metrics = upstream.metrics if upstream is not None else default_registry
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        shared_upstream = (
+            upstream if upstream is not None else _create_upstream(metrics)
+        )
+        app.state.upstream = shared_upstream
+
+        if "scope-guard" in guardrails:
+            scope_guard_serving.scope_guard = scope_guard_serving.create_scope_guard(
+                upstream=shared_upstream
+            )
+        if "scope-guard-v2" in guardrails:
+            scope_guard_v2_serving.scope_guard = (
+                scope_guard_v2_serving.create_scope_guard(upstream=shared_upstream)
+            )
+        if "claim-extractor" in guardrails:
+            claim_extractor_serving.claim_extractor = (
+                claim_extractor_serving.create_claim_extractor(upstream=shared_upstream)
+            )
+
+        max_in_flight = os.environ.get("ORBITALS_SERVE_MAX_IN_FLIGHT")
+        app.state.health = ServingHealth(
+            upstream=shared_upstream,
+            max_in_flight=int(max_in_flight) if max_in_flight else None,
+        )
+        await app.state.health.warmup(
+            *(guard.warmup for guard in _mounted_guards(guardrails))
+        )
+
+        app.state.rate_limiter = rate_limiter_from_env(
+            "ORBITALS_SERVE_RATE_LIMIT_CONFIG", metrics=metrics
+        )
+
+        try:
+            yield
+        finally:
+            await shared_upstream.aclose()
+
+    app = FastAPI(lifespan=lifespan)
+    app.state.guardrails = guardrails
+    app.state.metrics = metrics
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # Adjust this in production
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    install_health(app)
+    install_rate_limiting(app)
+
+    @app.middleware("http")
+    async def record_http_metrics(request: Request, call_next):
+        start_time = time.perf_counter()
+        response = await call_next(request)
+        # use the route template rather than the raw path to bound cardinality
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        metrics.inc(
+            "orbitals_http_requests_total",
+            path=path,
+            status=response.status_code,
+        )
+        metrics.observe(
+            "orbitals_http_request_duration_seconds",
+            time.perf_counter() - start_time,
+            path=path,
+        )
+        return response
+
+    @app.get("/health")
+    async def health() -> dict[str, str | list[str]]:
+        return {"status": "ok", "guardrails": guardrails}
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def prometheus_metrics() -> str:
+        return metrics.render_prometheus()
+
+    if "scope-guard" in guardrails:
+        app.include_router(scope_guard_serving.router)
+    if "scope-guard-v2" in guardrails:
+        app.include_router(scope_guard_v2_serving.router)
+    if "claim-extractor" in guardrails:
+        app.include_router(claim_extractor_serving.router)
+    if any(g in guardrails for g in PIPELINE_GUARDRAILS):
+        app.include_router(pipeline_router)
+
+    return app
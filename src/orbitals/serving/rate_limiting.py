@@ -0,0 +1,409 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import time
+from pathlib import Path
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field, ValidationError
+
+from orbitals.metrics import MetricsRegistry, default_registry
+from orbitals.serving.streaming import release_after_body
+
+logger = logging.getLogger(__name__)
+
+API_KEY_HEADER = "X-API-Key"
+
+# rough chars-per-token ratio used to estimate prompt tokens from the request
+# body before it is templated and tokenized
+CHARS_PER_TOKEN = 4
+
+
+class TenantLimits(BaseModel):
+    name: str | None = Field(
+        default=None,
+        description="Display name reported in metrics and usage, which need not be unique.",
+    )
+    requests_per_minute: float | None = Field(
+        default=None, description="Sustained request rate. None means unlimited."
+    )
+    prompt_tokens_per_minute: float | None = Field(
+        default=None,
+        description="Sustained rate of estimated prompt tokens. None means unlimited.",
+    )
+    max_concurrency: int | None = Field(
+        default=None, description="Maximum number of in-flight requests."
+    )
+    admin: bool = Field(
+        default=False,
+        description="Whether the tenant can read the usage of every tenant, "
+        "rather than only its own.",
+    )
+
+
+class RateLimitConfig(BaseModel):
+    default: TenantLimits = Field(
+        default_factory=TenantLimits,
+        description="Limits applied to API keys not listed in `tenants`.",
+    )
+    anonymous: TenantLimits | None = Field(
+        default_factory=TenantLimits,
+        description="Limits applied to requests without an API key. None rejects them.",
+    )
+    tenants: dict[str, TenantLimits] = Field(
+        default_factory=dict, description="Limits keyed by API key."
+    )
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, tenant: str, reason: str, retry_after: float):
+        super().__init__(f"Rate limit exceeded for {tenant}: {reason}")
+        self.tenant = tenant
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class MissingAPIKey(Exception):
+    pass
+
+
+class TokenBucket:
+    """Token bucket refilled at `rate_per_minute`, holding up to a minute of it."""
+
+    def __init__(self, rate_per_minute: float, now: float | None = None):
+        self.rate = rate_per_minute / 60
+        self.capacity = rate_per_minute
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic() if now is None else now
+
+    def _refill(self, now: float):
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def retry_after(self, cost: float, now: float) -> float:
+        """Seconds until `cost` can be consumed, 0 if it can be right away."""
+        self._refill(now)
+        # a cost larger than the capacity is let through once the bucket is
+        # full, otherwise it could never be served
+        needed = min(cost, self.capacity)
+        if self.tokens >= needed:
+            return 0.0
+        return (needed - self.tokens) / self.rate
+
+    def consume(self, cost: float):
+        self.tokens -= cost
+
+
+def _bucket(
+    rate_per_minute: float | None, now: float, previous: TokenBucket | None = None
+) -> TokenBucket | None:
+    if rate_per_minute is None:
+        return None
+    bucket = TokenBucket(rate_per_minute, now)
+    if previous is not None:
+        # carry over what the tenant already consumed
+        previous._refill(now)
+        bucket.tokens = bucket.capacity - (previous.capacity - previous.tokens)
+    return bucket
+
+
+class _TenantState:
+    def __init__(self, tenant_id: str, name: str, limits: TenantLimits, now: float):
+        self.id = tenant_id
+        self.name = name
+        self.limits = limits
+        self.in_flight = 0
+        self.requests = _bucket(limits.requests_per_minute, now)
+        self.prompt_tokens = _bucket(limits.prompt_tokens_per_minute, now)
+
+    def update(self, name: str, limits: TenantLimits, now: float):
+        self.name = name
+        self.limits = limits
+        self.requests = _bucket(limits.requests_per_minute, now, self.requests)
+        self.prompt_tokens = _bucket(
+            limits.prompt_tokens_per_minute, now, self.prompt_tokens
+        )
+
+
+def estimate_prompt_tokens(body: bytes) -> int:
+    return len(body) // CHARS_PER_TOKEN + 1
+
+
+# keys of the anonymous and default tenant states, which no API key can clash
+# with: an empty API key counts as none, and headers cannot contain NUL
+_ANONYMOUS_KEY = ""
+_DEFAULT_KEY = "\0default"
+
+
+def _anonymized(api_key: str) -> str:
+    return "key-" + hashlib.sha256(api_key.encode()).hexdigest()[:8]
+
+
+def _tenant_id(key: str) -> str:
+    """The stable id of the tenant of a state key, which metrics and usage are keyed on."""
+    if key == _ANONYMOUS_KEY:
+        return "anonymous"
+    if key == _DEFAULT_KEY:
+        return "default"
+    return _anonymized(key)
+
+
+class RateLimiter:
+    """Per-tenant rate limiting keyed on the `X-API-Key` header.
+
+    Each tenant gets a token bucket for requests, one for estimated prompt
+    tokens and a cap on in-flight requests. The configuration is a JSON file
+    matching `RateLimitConfig`; it is checked for changes at most every
+    `reload_interval` seconds and reloaded without a restart, keeping the
+    state of existing buckets.
+
+    Args:
+        config_path: Path of the JSON configuration file.
+        reload_interval: Minimum number of seconds between two checks of the
+            configuration file.
+        metrics: The metrics registry for the per-tenant usage counters.
+    """
+
+    def __init__(
+        self,
+        config_path: str | Path,
+        reload_interval: float = 5.0,
+        metrics: MetricsRegistry | None = None,
+    ):
+        self.config_path = Path(config_path)
+        self.reload_interval = reload_interval
+        self.metrics = metrics if metrics is not None else default_registry
+        self._tenants: dict[str, _TenantState] = {}
+        self._mtime: float | None = None
+        self._checked_at = float("-inf")
+        self.config = self._load()
+
+    def _load(self) -> RateLimitConfig:
+        self._mtime = os.stat(self.config_path).st_mtime
+        return RateLimitConfig.model_validate(json.loads(self.config_path.read_text()))
+
+    def maybe_reload(self, now: float | None = None):
+        now = time.monotonic() if now is None else now
+        if now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+
+        try:
+            if os.stat(self.config_path).st_mtime == self._mtime:
+                return
+            config = self._load()
+        except (OSError, ValueError, ValidationError):
+            # keep enforcing the last valid configuration
+            logger.exception("Could not reload rate limit config, keeping the old one")
+            return
+
+        logger.info("Reloaded rate limit config from %s", self.config_path)
+        self.config = config
+        for key, state in list(self._tenants.items()):
+            limits = self._limits_for(key)
+            if limits is None:
+                # rejected now, or moved to the shared default tenant
+                del self._tenants[key]
+            elif limits != state.limits:
+                state.update(self._tenant_name(key, limits), limits, now)
+
+    def _state_key(self, api_key: str | None) -> str:
+        """The key of the state of `api_key`.
+
+        Every API key not listed in `tenants` shares the state of the default
+        tenant: otherwise each unknown key would get its own buckets, and a
+        client could get around the limits by rotating keys.
+        """
+        if api_key is None:
+            return _ANONYMOUS_KEY
+        return api_key if api_key in self.config.tenants else _DEFAULT_KEY
+
+    def _limits_for(self, key: str) -> TenantLimits | None:
+        if key == _ANONYMOUS_KEY:
+            return self.config.anonymous
+        if key == _DEFAULT_KEY:
+            return self.config.default
+        return self.config.tenants.get(key)
+
+    def _tenant_name(self, key: str, limits: TenantLimits) -> str:
+        return limits.name if limits.name is not None else _tenant_id(key)
+
+    def _tenant(self, api_key: str | None, now: float) -> _TenantState:
+        key = self._state_key(api_key)
+        state = self._tenants.get(key)
+        if state is None:
+            limits = self._limits_for(key)
+            if limits is None:
+                raise MissingAPIKey(f"The {API_KEY_HEADER} header is required")
+            state = _TenantState(
+                _tenant_id(key), self._tenant_name(key, limits), limits, now
+            )
+            self._tenants[key] = state
+        return state
+
+    def acquire(self, api_key: str | None, prompt_tokens: int) -> _TenantState:
+        """Admit a request, or raise `RateLimitExceeded` / `MissingAPIKey`.
+
+        The returned state must be passed to `release` once the request is done.
+        """
+        now = time.monotonic()
+        self.maybe_reload(now)
+        state = self._tenant(api_key or None, now)
+
+        try:
+            max_concurrency = state.limits.max_concurrency
+            if max_concurrency is not None and state.in_flight >= max_concurrency:
+                raise RateLimitExceeded(state.name, "too many concurrent requests", 1)
+
+            retry_after = 0.0
+            if state.requests is not None:
+                retry_after = max(retry_after, state.requests.retry_after(1, now))
+            if state.prompt_tokens is not None:
+                retry_after = max(
+                    retry_after, state.prompt_tokens.retry_after(prompt_tokens, now)
+                )
+            if retry_after > 0:
+                raise RateLimitExceeded(state.name, "rate limit exceeded", retry_after)
+        except RateLimitExceeded:
+            self.metrics.inc(
+                "orbitals_tenant_requests_total",
+                tenant=state.id,
+                tenant_name=state.name,
+                status="limited",
+            )
+            raise
+
+        if state.requests is not None:
+            state.requests.consume(1)
+        if state.prompt_tokens is not None:
+            state.prompt_tokens.consume(prompt_tokens)
+        state.in_flight += 1
+
+        self.metrics.inc(
+            "orbitals_tenant_requests_total",
+            tenant=state.id,
+            tenant_name=state.name,
+            status="admitted",
+        )
+        self.metrics.inc(
+            "orbitals_tenant_estimated_prompt_tokens_total",
+            prompt_tokens,
+            tenant=state.id,
+            tenant_name=state.name,
+        )
+        return state
+
+    def release(self, state: _TenantState):
+        state.in_flight -= 1
+
+    def usage(self) -> dict[str, dict[str, float | str]]:
+        """Per-tenant usage counters since the server started, by tenant id.
+
+        Tenants are told apart by their id (see `_tenant_id`), as several can
+        share a name; the current name of each is reported as `name`.
+        """
+        names = {state.id: state.name for state in self._tenants.values()}
+        usage: dict[str, dict[str, float | str]] = {}
+
+        def add(labels: dict[str, str], field: str, value: float):
+            tenant = usage.setdefault(
+                labels["tenant"],
+                {"name": names.get(labels["tenant"], labels["tenant_name"])},
+            )
+            # a renamed tenant has one series per name
+            tenant[field] = tenant.get(field, 0) + value  # type: ignore[operator]
+
+        counters = self.metrics.snapshot()["counters"]
+        for series in counters.get("orbitals_tenant_requests_total", []):
+            add(
+                series["labels"],
+                f"{series['labels']['status']}_requests",
+                series["value"],
+            )
+        for series in counters.get("orbitals_tenant_estimated_prompt_tokens_total", []):
+            add(series["labels"], "estimated_prompt_tokens", series["value"])
+        return usage
+
+    def usage_for(self, api_key: str | None) -> dict[str, dict[str, float | str]]:
+        """The usage visible to `api_key`, or raise `MissingAPIKey`.
+
+        Only the tenants listed in the configuration can read usage: admin
+        tenants that of every tenant, the others only their own.
+        """
+        self.maybe_reload()
+        if not api_key or api_key not in self.config.tenants:
+            raise MissingAPIKey(
+                f"The {API_KEY_HEADER} header of a configured tenant is required"
+            )
+        usage = self.usage()
+        if self.config.tenants[api_key].admin:
+            return usage
+        tenant_id = _tenant_id(api_key)
+        return {tenant_id: usage[tenant_id]} if tenant_id in usage else {}
+
+
+def rate_limiter_from_env(
+    env_var: str, metrics: MetricsRegistry | None = None
+) -> RateLimiter | None:
+    """Build a `RateLimiter` from the config file at `env_var`, if set."""
+    config_path = os.environ.get(env_var)
+    if not config_path:
+        return None
+    return RateLimiter(config_path, metrics=metrics)
+
+
+def install_rate_limiting(app: FastAPI):
+    """Rate limit the `/orbitals/` endpoints of `app` per `X-API-Key`.
+
+    The app lifespan is expected to set `app.state.rate_limiter` to a
+    `RateLimiter`, or to None to disable rate limiting.
+    """
+
+    @app.middleware("http")
+    async def rate_limit(request: Request, call_next):
+        limiter: RateLimiter | None = getattr(request.app.state, "rate_limiter", None)
+        if (
+            limiter is None
+            or request.method != "POST"
+            or not request.url.path.startswith("/orbitals/")
+        ):
+            return await call_next(request)
+
+        body = await request.body()
+        try:
+            state = limiter.acquire(
+                request.headers.get(API_KEY_HEADER), estimate_prompt_tokens(body)
+            )
+        except MissingAPIKey as e:
+            return JSONResponse(status_code=401, content={"detail": str(e)})
+        except RateLimitExceeded as e:
+            return JSONResponse(
+                status_code=429,
+                content={"detail": e.reason},
+                headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+            )
+
+        try:
+            response = await call_next(request)
+        except BaseException:
+            limiter.release(state)
+            raise
+        # streamed responses hold their slot until their last event
+        return release_after_body(response, lambda: limiter.release(state))
+
+    @app.get("/orbitals/usage", response_model=None)
+    async def usage(
+        request: Request,
+    ) -> dict[str, dict[str, float | str]] | JSONResponse:
+        limiter: RateLimiter | None = getattr(request.app.state, "rate_limiter", None)
+        if limiter is None:
+            return {}
+        try:
+            return limiter.usage_for(request.headers.get(API_KEY_HEADER))
+        except MissingAPIKey as e:
+            return JSONResponse(status_code=401, content={"detail": str(e)})
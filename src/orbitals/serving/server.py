@@ -0,0 +1,76 @@
+import logging
+import subprocess
+import threading
+from types import FrameType
+
+import uvicorn
+
+from .health import is_draining, start_draining
+
+logger = logging.getLogger(__name__)
+
+
+class GracefulServer(uvicorn.Server):
+    """Uvicorn server that drains before shutting down.
+
+    On the first SIGTERM/SIGINT the process is marked as draining, so `/readyz`
+    starts failing and new requests are rejected, while in-flight requests keep
+    running. After `drain_delay` seconds, uvicorn stops listening and waits up
+    to `timeout_graceful_shutdown` for the remaining requests. A second signal
+    skips the delay.
+    """
+
+    def __init__(self, config: uvicorn.Config, drain_delay: float = 0.0):
+        super().__init__(config)
+        self.drain_delay = drain_delay
+
+    def handle_exit(self, sig: int, frame: FrameType | None) -> None:
+        if not is_draining() and self.drain_delay > 0:
+            start_draining()
+            logger.info(
+                "Draining, stopping to listen in %.1f seconds", self.drain_delay
+            )
+            timer = threading.Timer(
+                self.drain_delay, super().handle_exit, args=(sig, frame)
+            )
+            timer.daemon = True
+            timer.start()
+            return
+
+        start_draining()
+        super().handle_exit(sig, frame)
+
+
+def run_server(
+    app: str,
+    host: str,
+    port: int,
+    log_config: dict,
+    drain_timeout: int = 30,
+    drain_delay: float = 0.0,
+    factory: bool = False,
+):
+    """Run `app` with uvicorn, draining in-flight requests on shutdown."""
+    config = uvicorn.Config(
+        app,
+        host=host,
+        port=port,
+        log_config=log_config,
+        log_level="info",
+        factory=factory,
+        timeout_graceful_shutdown=drain_timeout,
+    )
+    GracefulServer(config, drain_delay=drain_delay).run()
+
+
+def stop_vllm_process(process: subprocess.Popen, timeout: float = 30.0):
+    """Terminate the vLLM subprocess, killing it if it does not exit in time."""
+    if process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        logger.warning("vLLM server did not stop in %.0f seconds, killing it", timeout)
+        process.kill()
+        process.wait()
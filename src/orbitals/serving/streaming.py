@@ -0,0 +1,60 @@
+import json
+import logging
+from collections.abc import AsyncIterator, Callable
+
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+def _frame(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+async def _frames(events: AsyncIterator[BaseModel]) -> AsyncIterator[str]:
+    try:
+        async for event in events:
+            yield _frame(event.event, event.model_dump_json())  # type: ignore[attr-defined]
+    except Exception as e:
+        # the status line has already been sent: report the failure in-stream
+        logger.exception("Streaming request failed")
+        yield _frame("error", json.dumps({"detail": str(e)}))
+
+
+def event_stream_response(events: AsyncIterator[BaseModel]) -> StreamingResponse:
+    """Send the events of a `validate_stream` or `extract_stream` as server-sent events.
+
+    Every event is named after its `event` field, with its JSON as data. An
+    exception raised while streaming ends the stream with an `error` event.
+    """
+    return StreamingResponse(
+        _frames(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+def release_after_body(response: Response, release: Callable[[], None]) -> Response:
+    """Call `release` once the body of `response` has been sent.
+
+    A middleware releasing a resource right after `call_next` would release it
+    as soon as the response starts, which for a server-sent event stream is
+    long before it ends. `release` is also called if the client disconnects
+    mid-stream.
+    """
+    body_iterator = getattr(response, "body_iterator", None)
+    if body_iterator is None:
+        release()
+        return response
+
+    async def _body():
+        try:
+            async for chunk in body_iterator:
+                yield chunk
+        finally:
+            release()
+
+    response.body_iterator = _body()  # type: ignore[attr-defined]
+    return response
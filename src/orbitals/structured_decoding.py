@@ -0,0 +1,41 @@
+import json
+
+
+class JSONSchemaDecoding:
+    """Constrains Hugging Face generation to a JSON schema, with xgrammar.
+
+    The same constraint the vllm-api backends request with
+    `structured_outputs.json`: every generated token must keep the output a
+    valid prefix of an instance of the schema, so the output always parses,
+    and enum fields like `scope_class` can only take one of their values.
+    The grammar follows the `json.dumps` layout the models are trained on,
+    without extra whitespace.
+
+    The tokenizer information is computed on first use, and every compiled
+    schema is cached by xgrammar's compiler.
+    """
+
+    def __init__(self) -> None:
+        self._compiler = None
+
+    def logits_processor(self, model, tokenizer, schema: dict):
+        """A logits processor constraining a single `generate` call to `schema`."""
+        try:
+            import xgrammar
+            import xgrammar.contrib.hf
+        except ModuleNotFoundError:
+            raise ImportError(
+                "Schema-constrained decoding requires xgrammar. Please install it: `pip install xgrammar`"
+            )
+
+        if self._compiler is None:
+            tokenizer_info = xgrammar.TokenizerInfo.from_huggingface(
+                tokenizer, vocab_size=model.config.vocab_size
+            )
+            self._compiler = xgrammar.GrammarCompiler(tokenizer_info)
+
+        compiled_grammar = self._compiler.compile_json_schema(
+            json.dumps(schema), any_whitespace=False
+        )
+        # the processor keeps one matcher per sequence, so it is not reusable
+        return xgrammar.contrib.hf.LogitsProcessor(compiled_grammar)
@@ -0,0 +1,497 @@
+import asyncio
+import bisect
+import hashlib
+import json
+import math
+import time
+from collections import OrderedDict, deque
+from collections.abc import AsyncIterator, Callable, Iterator, Sequence
+from contextlib import asynccontextmanager, contextmanager
+
+import aiohttp
+from pydantic import BaseModel
+
+from .metrics import MetricsRegistry, default_registry
+
+
+class FairScheduler:
+    """Admission control for a shared upstream.
+
+    At most `max_concurrency` requests are in flight at once. When the limit is
+    reached, waiting requests are queued per key (e.g. per guardrail) and slots
+    are handed out round-robin across keys, so a burst from one guardrail cannot
+    starve the others.
+    """
+
+    def __init__(self, max_concurrency: int | None = None):
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self._queues: dict[str, deque[asyncio.Future]] = {}
+        self._rotation: deque[str] = deque()
+
+    @property
+    def queued(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def _has_capacity(self) -> bool:
+        return self.max_concurrency is None or self.in_flight < self.max_concurrency
+
+    async def acquire(self, key: str = "default"):
+        if self._has_capacity() and self.queued == 0:
+            self.in_flight += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        if key not in self._queues:
+            self._queues[key] = deque()
+            self._rotation.append(key)
+        self._queues[key].append(future)
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # the slot was granted right before cancellation, hand it back
+                self.release()
+            elif future in self._queues.get(key, ()):
+                self._queues[key].remove(future)
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self._grant_next()
+
+    def _grant_next(self):
+        while self._has_capacity() and self._rotation:
+            key = self._rotation[0]
+            self._rotation.rotate(-1)
+            queue = self._queues[key]
+            while queue and queue[0].done():
+                queue.popleft()
+            if not queue:
+                del self._queues[key]
+                self._rotation.remove(key)
+                continue
+            self.in_flight += 1
+            queue.popleft().set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, key: str = "default"):
+        await self.acquire(key)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+def _ring_hash(value: str) -> int:
+    # unlike `hash`, stable across processes, so that every orbitals server
+    # sends a description to the same replica
+    return int.from_bytes(
+        hashlib.blake2b(value.encode(), digest_size=8).digest(), "big"
+    )
+
+
+def routing_key(ai_service_description: str | BaseModel | None) -> str | None:
+    """The key a request is routed by: the AI service description of its prompt.
+
+    Prompts only differ after the system prompt and the description, so
+    requests with the same description share the longest prefix.
+    """
+    if ai_service_description is None:
+        return None
+    if isinstance(ai_service_description, BaseModel):
+        return ai_service_description.model_dump_json()
+    return ai_service_description
+
+
+class ReplicaRouter:
+    """Routes requests across vLLM replicas by consistent hashing, with bounded loads.
+
+    vLLM's automatic prefix caching only pays off when the requests sharing a
+    prompt prefix land on the same replica. Requests are routed by key (see
+    `routing_key`) to the first replica following the key on a hash ring,
+    where every replica has `virtual_nodes` points, so that adding or removing
+    a replica only moves the keys next to its points.
+
+    So that a hot key cannot overload its replica, a replica is skipped while
+    it has `load_factor` times the average number of in-flight requests, and
+    the request spills over to the next replica on the ring (consistent
+    hashing with bounded loads). Requests without a key go to the least
+    loaded replica. The replicas in `unhealthy` (see
+    `VLLMUpstream.is_healthy`) are skipped, unless none is left.
+
+    Every replica remembers the last `prefix_cache_size` keys routed to it: a
+    request whose key is among them is counted as an estimated prefix-cache
+    hit, in `stats()` and in the `orbitals_replica_prefix_hits_total` metric.
+
+    Args:
+        replica_urls: The base URLs of the replicas.
+        load_factor: The bound on the load of a replica, relative to the
+            average, at least 1.
+        virtual_nodes: The number of points of every replica on the ring.
+        prefix_cache_size: The number of recent keys remembered per replica.
+        metrics: The registry of the per-replica metrics.
+    """
+
+    def __init__(
+        self,
+        replica_urls: str | Sequence[str],
+        load_factor: float = 1.25,
+        virtual_nodes: int = 64,
+        prefix_cache_size: int = 256,
+        metrics: MetricsRegistry | None = None,
+    ):
+        if isinstance(replica_urls, str):
+            replica_urls = [replica_urls]
+        if not replica_urls:
+            raise ValueError("At least one replica URL is required")
+        if load_factor < 1:
+            raise ValueError("load_factor must be at least 1")
+        self.replica_urls = list(dict.fromkeys(url.rstrip("/") for url in replica_urls))
+        self.load_factor = load_factor
+        self.prefix_cache_size = prefix_cache_size
+        self.metrics = metrics if metrics is not None else default_registry
+        self.in_flight = {url: 0 for url in self.replica_urls}
+        self.requests = {url: 0 for url in self.replica_urls}
+        self.prefix_hits = {url: 0 for url in self.replica_urls}
+        self.unhealthy: set[str] = set()
+        self._recent_keys: dict[str, OrderedDict[str, None]] = {
+            url: OrderedDict() for url in self.replica_urls
+        }
+
+        ring = sorted(
+            (_ring_hash(f"{url}#{i}"), url)
+            for url in self.replica_urls
+            for i in range(virtual_nodes)
+        )
+        self._ring_hashes = [point for point, _ in ring]
+        self._ring_urls = [url for _, url in ring]
+
+        self.metrics.describe(
+            "orbitals_replica_requests_total",
+            "Completion requests routed to every vLLM replica",
+        )
+        self.metrics.describe(
+            "orbitals_replica_prefix_hits_total",
+            "Requests routed to a replica that recently served their prefix",
+        )
+
+    def _available(self) -> list[str]:
+        # with every replica down, keep routing rather than failing outright
+        available = [url for url in self.replica_urls if url not in self.unhealthy]
+        return available or self.replica_urls
+
+    def _capacity(self, available: list[str]) -> int:
+        # the bound on the in-flight requests of a replica, the new one included;
+        # the replicas cannot all be at it, so a replica is always found
+        total = sum(self.in_flight[url] for url in available) + 1
+        return math.ceil(self.load_factor * total / len(available))
+
+    def select(self, key: str | None) -> str:
+        """The replica a request with `key` is sent to."""
+        available = self._available()
+        if key is None or len(available) == 1:
+            return min(available, key=self.in_flight.__getitem__)
+
+        capacity = self._capacity(available)
+        start = bisect.bisect(self._ring_hashes, _ring_hash(key))
+        for offset in range(len(self._ring_urls)):
+            url = self._ring_urls[(start + offset) % len(self._ring_urls)]
+            if url in available and self.in_flight[url] < capacity:
+                return url
+        return min(available, key=self.in_flight.__getitem__)
+
+    def _record(self, url: str, key: str | None):
+        self.requests[url] += 1
+        self.metrics.inc("orbitals_replica_requests_total", replica=url)
+        if key is None:
+            return
+        recent = self._recent_keys[url]
+        if key in recent:
+            recent.move_to_end(key)
+            self.prefix_hits[url] += 1
+            self.metrics.inc("orbitals_replica_prefix_hits_total", replica=url)
+        else:
+            recent[key] = None
+            if len(recent) > self.prefix_cache_size:
+                recent.popitem(last=False)
+
+    @contextmanager
+    def route(self, key: str | None) -> Iterator[str]:
+        """Select the replica of a request, counting it as in flight until exit."""
+        url = self.select(key)
+        self._record(url, key)
+        self.in_flight[url] += 1
+        try:
+            yield url
+        finally:
+            self.in_flight[url] -= 1
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        """The requests, in-flight requests and estimated prefix hits of every replica."""
+        return {
+            url: {
+                "requests": self.requests[url],
+                "in_flight": self.in_flight[url],
+                "prefix_hits": self.prefix_hits[url],
+                "prefix_hit_rate": self.prefix_hits[url] / self.requests[url]
+                if self.requests[url]
+                else 0.0,
+            }
+            for url in self.replica_urls
+        }
+
+
+async def iter_sse_json(response: aiohttp.ClientResponse) -> AsyncIterator[dict]:
+    """The JSON payloads of a server-sent events response, up to `data: [DONE]`."""
+    async for line in response.content:
+        data = line.decode().strip()
+        if not data.startswith("data:"):
+            continue
+        data = data[len("data:") :].strip()
+        if data == "[DONE]":
+            return
+        yield json.loads(data)
+
+
+async def collect_completion_stream(
+    chunks: AsyncIterator[dict], on_text: Callable[[str], None]
+) -> dict:
+    """Read a streamed completion, passing every piece of text to `on_text`.
+
+    Returns:
+        The completion, reassembled in the format of a non-streaming response:
+        its text, its `logprobs` if requested, and the `usage` of the final
+        chunk, which vLLM sends with `stream_options.include_usage`.
+    """
+    text: list[str] = []
+    logprobs: dict[str, list] = {"tokens": [], "top_logprobs": []}
+    usage = None
+    async for chunk in chunks:
+        for choice in chunk.get("choices") or []:
+            if choice.get("text"):
+                text.append(choice["text"])
+                on_text(choice["text"])
+            if choice.get("logprobs"):
+                logprobs["tokens"].extend(choice["logprobs"]["tokens"])
+                logprobs["top_logprobs"].extend(choice["logprobs"]["top_logprobs"])
+        if chunk.get("usage"):
+            usage = chunk["usage"]
+    return {
+        "choices": [{"index": 0, "text": "".join(text), "logprobs": logprobs}],
+        "usage": usage,
+    }
+
+
+def streaming_body(request_body: dict) -> dict:
+    """`request_body` for a streamed completion, reporting its usage at the end."""
+    return {
+        **request_body,
+        "stream": True,
+        "stream_options": {"include_usage": True},
+    }
+
+
+class VLLMUpstream:
+    """Pooled client for a vLLM OpenAI-compatible server, or several replicas of it.
+
+    A single instance can be shared by several vllm-api backends (e.g. ScopeGuard
+    and ClaimExtractor pointed at one multi-model or LoRA-enabled vLLM server):
+    they then reuse one connection pool, one `FairScheduler` and one metrics
+    registry. Without an upstream, the vllm-api backends open a fresh session
+    per request.
+
+    Given a list of replica URLs, requests are spread across them by a
+    `ReplicaRouter`, keeping the requests with the same AI service description
+    on the same replica.
+    """
+
+    def __init__(
+        self,
+        vllm_serving_url: str | Sequence[str] = "http://localhost:8000",
+        max_connections: int = 100,
+        max_concurrency: int | None = None,
+        timeout: float | None = None,
+        metrics: MetricsRegistry | None = None,
+        load_factor: float = 1.25,
+    ):
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.scheduler = FairScheduler(max_concurrency)
+        self.metrics = metrics if metrics is not None else default_registry
+        self.router = ReplicaRouter(
+            vllm_serving_url, load_factor=load_factor, metrics=self.metrics
+        )
+        self._session: aiohttp.ClientSession | None = None
+
+        self.metrics.describe(
+            "orbitals_upstream_requests_total",
+            "Completion requests sent to the vLLM upstream",
+        )
+        self.metrics.describe(
+            "orbitals_upstream_latency_seconds",
+            "Latency of completion requests to the vLLM upstream",
+        )
+        self.metrics.describe(
+            "orbitals_scheduler_wait_seconds",
+            "Time spent waiting for an upstream slot",
+        )
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def completions(
+        self,
+        request_body: dict,
+        guardrail: str = "default",
+        routing_key: str | None = None,
+    ) -> dict:
+        """POST `request_body` to `/v1/completions` and return the decoded JSON.
+
+        With several replicas, the request is routed by `routing_key`.
+        """
+        queued_at = time.perf_counter()
+        async with self.scheduler.slot(guardrail):
+            started_at = time.perf_counter()
+            self.metrics.observe(
+                "orbitals_scheduler_wait_seconds",
+                started_at - queued_at,
+                guardrail=guardrail,
+            )
+            self.metrics.add_gauge("orbitals_upstream_in_flight", 1)
+            status = "error"
+            try:
+                with self.router.route(routing_key) as replica_url:
+                    async with self._get_session().post(
+                        f"{replica_url}/v1/completions",
+                        json=request_body,
+                        headers={"Content-Type": "application/json"},
+                    ) as response:
+                        status = str(response.status)
+                        response.raise_for_status()
+                        response_json = await response.json()
+            finally:
+                self.metrics.add_gauge("orbitals_upstream_in_flight", -1)
+                self.metrics.inc(
+                    "orbitals_upstream_requests_total",
+                    guardrail=guardrail,
+                    status=status,
+                )
+                self.metrics.observe(
+                    "orbitals_upstream_latency_seconds",
+                    time.perf_counter() - started_at,
+                    guardrail=guardrail,
+                )
+
+        usage = response_json.get("usage") or {}
+        self.metrics.inc(
+            "orbitals_upstream_prompt_tokens_total",
+            usage.get("prompt_tokens", 0),
+            guardrail=guardrail,
+        )
+        self.metrics.inc(
+            "orbitals_upstream_completion_tokens_total",
+            usage.get("completion_tokens", 0),
+            guardrail=guardrail,
+        )
+        return response_json
+
+    async def stream_completions(
+        self,
+        request_body: dict,
+        guardrail: str = "default",
+        routing_key: str | None = None,
+    ) -> AsyncIterator[dict]:
+        """POST a streamed `request_body` to `/v1/completions` and yield its chunks.
+
+        The upstream slot is held until the stream is exhausted or closed. With
+        several replicas, the request is routed by `routing_key`.
+        """
+        queued_at = time.perf_counter()
+        async with self.scheduler.slot(guardrail):
+            started_at = time.perf_counter()
+            self.metrics.observe(
+                "orbitals_scheduler_wait_seconds",
+                started_at - queued_at,
+                guardrail=guardrail,
+            )
+            self.metrics.add_gauge("orbitals_upstream_in_flight", 1)
+            status = "error"
+            usage: dict = {}
+            try:
+                with self.router.route(routing_key) as replica_url:
+                    async with self._get_session().post(
+                        f"{replica_url}/v1/completions",
+                        json=request_body,
+                        headers={"Content-Type": "application/json"},
+                    ) as response:
+                        status = str(response.status)
+                        response.raise_for_status()
+                        async for chunk in iter_sse_json(response):
+                            usage = chunk.get("usage") or usage
+                            yield chunk
+            finally:
+                self.metrics.add_gauge("orbitals_upstream_in_flight", -1)
+                self.metrics.inc(
+                    "orbitals_upstream_requests_total",
+                    guardrail=guardrail,
+                    status=status,
+                )
+                self.metrics.observe(
+                    "orbitals_upstream_latency_seconds",
+                    time.perf_counter() - started_at,
+                    guardrail=guardrail,
+                )
+                self.metrics.inc(
+                    "orbitals_upstream_prompt_tokens_total",
+                    usage.get("prompt_tokens", 0),
+                    guardrail=guardrail,
+                )
+                self.metrics.inc(
+                    "orbitals_upstream_completion_tokens_total",
+                    usage.get("completion_tokens", 0),
+                    guardrail=guardrail,
+                )
+
+    async def _is_replica_healthy(self, replica_url: str, timeout: float) -> bool:
+        try:
+            async with self._get_session().get(
+                f"{replica_url}/health",
+                timeout=aiohttp.ClientTimeout(total=timeout),
+            ) as response:
+                return response.status == 200
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return False
+
+    async def is_healthy(self, timeout: float = 2.0) -> bool:
+        """Whether any replica answers its `/health` endpoint.
+
+        The router skips the replicas that do not, until a later check finds
+        them healthy again.
+        """
+        replica_urls = self.router.replica_urls
+        healthy = await asyncio.gather(
+            *(
+                self._is_replica_healthy(replica_url, timeout)
+                for replica_url in replica_urls
+            )
+        )
+        self.router.unhealthy = {
+            url
+            for url, replica_healthy in zip(replica_urls, healthy)
+            if not replica_healthy
+        }
+        return any(healthy)
+
+    async def aclose(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
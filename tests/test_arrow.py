@@ -0,0 +1,170 @@
+"""Tests for the Arrow/Parquet batch APIs (`batch_validate_arrow`, `batch_extract_arrow`)."""
+
+from __future__ import annotations
+
+import pytest
+
+from orbitals.claim_extractor import (
+    Claim,
+    ClaimExtractor,
+    ClaimExtractorOutput,
+    Extractions,
+    Intent,
+)
+from orbitals.claim_extractor.extractors.base import BaseClaimExtractor
+from orbitals.scope_guard import ScopeClass, ScopeGuard, ScopeGuardOutput
+from orbitals.scope_guard.guards.base import BaseScopeGuard
+from orbitals.types import AIServiceDescription, LLMUsage
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+class _StubScopeGuard(ScopeGuard):
+    def __new__(cls, *args, **kwargs):
+        return BaseScopeGuard.__new__(cls)
+
+    def __init__(self) -> None:
+        self.backend = "stub"
+        self.calls: list[tuple[list, list | None]] = []
+
+    def _batch_validate(
+        self,
+        conversations,
+        *,
+        ai_service_description=None,
+        ai_service_descriptions=None,
+        **kwargs,
+    ) -> list[ScopeGuardOutput]:
+        self.calls.append((conversations, ai_service_descriptions))
+        return [
+            ScopeGuardOutput(
+                evidences=["evidence"] if isinstance(c, str) else None,
+                scope_class=ScopeClass.OUT_OF_SCOPE,
+                model="scope-guard",
+                usage=LLMUsage(prompt_tokens=10, completion_tokens=2, total_tokens=12),
+            )
+            for c in conversations
+        ]
+
+
+class _StubClaimExtractor(ClaimExtractor):
+    def __new__(cls, *args, **kwargs):
+        return BaseClaimExtractor.__new__(cls)
+
+    def __init__(self) -> None:
+        self.backend = "stub"
+
+    def _batch_extract(self, conversations, **kwargs) -> list[ClaimExtractorOutput]:
+        # conversation i gets i claims and one intent when i is even
+        return [
+            ClaimExtractorOutput(
+                extractions=Extractions(
+                    intents=[Intent(content=f"intent {i}")] if i % 2 == 0 else [],
+                    claims=[
+                        Claim(
+                            subtype="Factoid", content=f"claim {i}.{j}", evidences=["e"]
+                        )
+                        for j in range(i)
+                    ],
+                ),
+                model="claim-extractor",
+                usage=None,
+            )
+            for i in range(len(conversations))
+        ]
+
+
+def _conversations() -> pa.Table:
+    return pa.table(
+        {
+            "id": ["a", "b", "c"],
+            "conversation": [
+                [{"role": "user", "content": "Where is my parcel?"}],
+                [{"role": "user", "content": "Can I get a refund?"}],
+                [{"role": "user", "content": "Hi!"}],
+            ],
+            "description": ["Parcel tracking.", "Parcel tracking.", "Chit chat."],
+        }
+    )
+
+
+def test_batch_validate_arrow_streams_record_batches():
+    guard = _StubScopeGuard()
+
+    table = guard.batch_validate_arrow(
+        _conversations(),
+        description_column="description",
+        keep_columns=["id"],
+        batch_size=2,
+    )
+
+    assert [len(conversations) for conversations, _ in guard.calls] == [2, 1]
+    assert guard.calls[1][1] == ["Chit chat."]
+    assert table.column_names == [
+        "row_index",
+        "id",
+        "scope_class",
+        "evidences",
+        "model",
+        "prompt_tokens",
+        "completion_tokens",
+    ]
+    assert table.column("row_index").to_pylist() == [0, 1, 2]
+    assert table.column("id").to_pylist() == ["a", "b", "c"]
+    assert table.column("scope_class").to_pylist() == ["Out of Scope"] * 3
+    assert table.column("evidences").to_pylist() == [None, None, None]
+
+
+def test_struct_descriptions_are_parsed():
+    guard = _StubScopeGuard()
+    description = {"identity_role": "Parcel tracker", "context": "A postal service."}
+    guard.batch_validate_arrow(
+        pa.table({"conversation": ["Hi"], "description": [description]}),
+        description_column="description",
+    )
+    assert isinstance(guard.calls[0][1][0], AIServiceDescription)
+
+
+def test_batch_extract_arrow_flattens_extractions(tmp_path):
+    path = tmp_path / "conversations.parquet"
+    pq.write_table(_conversations(), path)
+
+    table = _StubClaimExtractor().batch_extract_arrow(
+        path, keep_columns=["id"], batch_size=3
+    )
+
+    assert table.column("row_index").to_pylist() == [0, 1, 2, 2, 2]
+    assert table.column("id").to_pylist() == ["a", "b", "c", "c", "c"]
+    assert table.column("kind").to_pylist() == [
+        "intent",
+        "claim",
+        "intent",
+        "claim",
+        "claim",
+    ]
+    assert table.column("subtype").to_pylist() == [
+        None,
+        "Factoid",
+        None,
+        "Factoid",
+        "Factoid",
+    ]
+    assert table.column("content").to_pylist()[-1] == "claim 2.1"
+    assert table.column("evidences").to_pylist() == [[], ["e"], [], ["e"], ["e"]]
+
+
+def test_iter_extract_arrow_writes_parquet_incrementally(tmp_path):
+    extractor = _StubClaimExtractor()
+    path = tmp_path / "extractions.parquet"
+
+    writer = None
+    for record_batch in extractor.iter_extract_arrow(_conversations(), batch_size=1):
+        if writer is None:
+            writer = pq.ParquetWriter(path, record_batch.schema)
+        writer.write_batch(record_batch)
+    assert writer is not None
+    writer.close()
+
+    # every conversation is the first of its batch, so only intents remain
+    assert pq.read_table(path).column("kind").to_pylist() == ["intent"] * 3
@@ -0,0 +1,175 @@
+"""Tests for the compact, columnar results returned by `batch_*(compact=True)`."""
+
+from __future__ import annotations
+
+import pytest
+
+from orbitals.claim_extractor import (
+    Claim,
+    ClaimExtractorBatchResult,
+    ClaimExtractorOutput,
+    Extractions,
+    Intent,
+)
+from orbitals.scope_guard import (
+    ScopeClass,
+    ScopeGuardBatchResult,
+    ScopeGuardOutput,
+)
+from orbitals.scope_guard.guards.base import BaseScopeGuard, ScopeGuard
+from orbitals.scope_guard_v2 import ScopeClass as ScopeClassV2
+from orbitals.scope_guard_v2 import ScopeGuardV2BatchResult, ScopeGuardV2Output
+from orbitals.types import LLMUsage
+
+
+def _usage(n: int) -> LLMUsage:
+    return LLMUsage(prompt_tokens=n, completion_tokens=1, total_tokens=n + 1)
+
+
+def _scope_guard_outputs() -> list[ScopeGuardOutput]:
+    return [
+        ScopeGuardOutput(
+            evidences=["Only tracking questions."],
+            scope_class=ScopeClass.OUT_OF_SCOPE,
+            model="scope-guard",
+            usage=_usage(10),
+        ),
+        ScopeGuardOutput(
+            evidences=None,
+            scope_class=ScopeClass.DIRECTLY_SUPPORTED,
+            model="scope-guard",
+            usage=None,
+        ),
+        ScopeGuardOutput(
+            evidences=[],
+            scope_class=ScopeClass.OUT_OF_SCOPE,
+            model="pre-filter",
+            usage=None,
+            pre_filter_confidence=0.97,
+        ),
+    ]
+
+
+def _claim_extractor_outputs() -> list[ClaimExtractorOutput]:
+    return [
+        ClaimExtractorOutput(
+            extractions=Extractions(
+                intents=[Intent(content="Track a parcel", evidences=["where is it"])],
+                claims=[
+                    Claim(subtype="Factoid", content="The parcel shipped"),
+                    Claim(
+                        subtype="User Assertion",
+                        content="The user is in Rome",
+                        evidences=["I live in Rome", "here in Rome"],
+                    ),
+                ],
+            ),
+            model="claim-extractor",
+            usage=_usage(100),
+        ),
+        ClaimExtractorOutput(
+            extractions=Extractions(), model="claim-extractor", usage=None
+        ),
+        ClaimExtractorOutput(
+            extractions=Extractions(
+                claims=[Claim(subtype="Factoid", content="Refunds take 5 days")]
+            ),
+            model="claim-extractor",
+            usage=_usage(50),
+        ),
+    ]
+
+
+def test_scope_guard_batch_result_round_trips():
+    outputs = _scope_guard_outputs()
+    result = ScopeGuardBatchResult.from_outputs(outputs)
+
+    assert len(result) == 3
+    assert result.to_list() == outputs
+    assert result[-1] == outputs[-1]
+    assert result[1:] == outputs[1:]
+    assert result.scope_classes == [
+        "Out of Scope",
+        "Directly Supported",
+        "Out of Scope",
+    ]
+    assert result[0].scope_class is ScopeClass.OUT_OF_SCOPE
+    with pytest.raises(IndexError):
+        result[3]
+
+
+def test_low_cardinality_strings_are_interned():
+    outputs = [
+        ScopeGuardOutput(
+            evidences=None,
+            scope_class=ScopeClass.RESTRICTED,
+            # a new string object per output
+            model=b"scope-guard".decode(),
+            usage=None,
+        )
+        for _ in range(2)
+    ]
+    assert outputs[0].model is not outputs[1].model
+
+    result = ScopeGuardBatchResult.from_outputs(outputs)
+    assert result.models[0] is result.models[1]
+
+    claims = ClaimExtractorBatchResult.from_outputs(_claim_extractor_outputs())
+    assert claims.claim_subtypes[0] is claims.claim_subtypes[2]
+
+
+def test_scope_guard_v2_batch_result_round_trips():
+    outputs = [
+        ScopeGuardV2Output(
+            evidences=["Refunds are handled by humans."],
+            reasoning="Refund requests need an operator.",
+            scope_class=ScopeClassV2.HUMAN_OVERSIGHT,
+            suggested_response="Let me connect you with an operator.",
+            model="scope-guard-v2",
+            usage=_usage(20),
+        ),
+        ScopeGuardV2Output(
+            reasoning="Small talk.",
+            scope_class=ScopeClassV2.CHIT_CHAT,
+            model="scope-guard-v2",
+        ),
+    ]
+    assert ScopeGuardV2BatchResult.from_outputs(outputs).to_list() == outputs
+
+
+def test_claim_extractor_batch_result_flattens_extractions():
+    outputs = _claim_extractor_outputs()
+    result = ClaimExtractorBatchResult.from_outputs(outputs)
+
+    assert list(result) == outputs
+    assert list(result.claim_offsets) == [0, 2, 2, 3]
+    assert list(result.intent_offsets) == [0, 1, 1, 1]
+    assert result.claim_evidences[1] == ["I live in Rome", "here in Rome"]
+    assert result.usage[1] is None
+    assert result[2].usage == _usage(50)
+
+
+class _StubScopeGuard(ScopeGuard):
+    def __new__(cls, *args, **kwargs):
+        return BaseScopeGuard.__new__(cls)
+
+    def __init__(self) -> None:
+        self.backend = "stub"
+
+    def _batch_validate(self, conversations, **kwargs) -> list[ScopeGuardOutput]:
+        return _scope_guard_outputs()[: len(conversations)]
+
+
+def test_batch_validate_returns_compact_results_on_request():
+    guard = _StubScopeGuard()
+
+    assert isinstance(guard.batch_validate(["q"], ai_service_description="d"), list)
+
+    result = guard.batch_validate(
+        ["q1", "q2"], ai_service_description="d", compact=True
+    )
+    assert isinstance(result, ScopeGuardBatchResult)
+    assert result.to_list() == _scope_guard_outputs()[:2]
+
+    empty = guard.batch_validate([], ai_service_description="d", compact=True)
+    assert isinstance(empty, ScopeGuardBatchResult) and len(empty) == 0
@@ -0,0 +1,284 @@
+"""Tests for the resumable JSONL batch runner behind `run-batch`."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import ClassVar
+
+import pytest
+from typer.testing import CliRunner
+
+from orbitals.batch import run_batch
+from orbitals.scope_guard import ScopeClass, ScopeGuardOutput
+
+
+def _write_input(path, n, fail_at=()):
+    with path.open("w") as f:
+        for i in range(n):
+            record = {
+                "id": f"row-{i}",
+                "conversation": "boom" if i in fail_at else f"message {i}",
+                "ai_service_description": "A helpful assistant.",
+            }
+            f.write(json.dumps(record) + "\n")
+
+
+def _read_output(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def _processor(calls):
+    async def process_batch(records):
+        calls.append([record["id"] for record in records])
+        # finish later batches first, to exercise in-order writing
+        await asyncio.sleep(0.01 * (3 - len(calls) % 3))
+        if any(record["conversation"] == "boom" for record in records):
+            raise ValueError("bad row")
+        return [
+            ScopeGuardOutput(
+                evidences=None,
+                scope_class=ScopeClass.DIRECTLY_SUPPORTED,
+                model="m",
+                usage=None,
+            )
+            for _ in records
+        ]
+
+    return process_batch
+
+
+async def test_run_batch_writes_rows_in_input_order(tmp_path):
+    input_path = tmp_path / "in.jsonl"
+    output_path = tmp_path / "out.jsonl"
+    _write_input(input_path, 10)
+
+    calls: list[list[str]] = []
+    progress: list[tuple[int, float]] = []
+    rows = await run_batch(
+        input_path,
+        output_path,
+        _processor(calls),
+        batch_size=3,
+        concurrency=3,
+        progress=lambda done, rate: progress.append((done, rate)),
+    )
+
+    assert rows == 10
+    assert [len(call) for call in calls] == [3, 3, 3, 1]
+    output = _read_output(output_path)
+    assert [row["id"] for row in output] == [f"row-{i}" for i in range(10)]
+    assert [row["index"] for row in output] == list(range(10))
+    assert output[0]["scope_class"] == "Directly Supported"
+    assert progress[-1][0] == 10
+
+
+async def test_run_batch_isolates_failing_rows(tmp_path):
+    input_path = tmp_path / "in.jsonl"
+    output_path = tmp_path / "out.jsonl"
+    _write_input(input_path, 4, fail_at={2})
+
+    await run_batch(input_path, output_path, _processor([]), batch_size=4)
+
+    output = _read_output(output_path)
+    assert len(output) == 4
+    assert output[2]["error"] == "ValueError: bad row"
+    assert all("error" not in row for i, row in enumerate(output) if i != 2)
+
+
+@pytest.mark.parametrize("batch_size", [1, 2])
+async def test_run_batch_writes_an_error_row_for_a_failing_last_row(
+    tmp_path, batch_size
+):
+    input_path = tmp_path / "in.jsonl"
+    output_path = tmp_path / "out.jsonl"
+    _write_input(input_path, 3, fail_at={2})
+
+    rows = await run_batch(
+        input_path, output_path, _processor([]), batch_size=batch_size
+    )
+
+    assert rows == 3
+    output = _read_output(output_path)
+    assert [row["id"] for row in output] == ["row-0", "row-1", "row-2"]
+    assert output[2]["error"] == "ValueError: bad row"
+
+
+async def test_run_batch_flushes_completed_rows_before_failing(tmp_path):
+    input_path = tmp_path / "in.jsonl"
+    output_path = tmp_path / "out.jsonl"
+    _write_input(input_path, 4)
+
+    class Abort(BaseException):
+        """Escapes the per-row error handling, like a cancelled run."""
+
+    async def process_batch(records):
+        if records[0]["id"] == "row-2":
+            await asyncio.sleep(0.02)
+            raise Abort
+        return await _processor([])(records)
+
+    with pytest.raises(Abort):
+        await run_batch(input_path, output_path, process_batch, batch_size=2)
+
+    assert [row["id"] for row in _read_output(output_path)] == ["row-0", "row-1"]
+    checkpoint = json.loads((tmp_path / "out.jsonl.checkpoint").read_text())
+    assert checkpoint["rows_done"] == 2
+
+
+async def test_run_batch_resumes_from_checkpoint(tmp_path):
+    input_path = tmp_path / "in.jsonl"
+    output_path = tmp_path / "out.jsonl"
+    _write_input(input_path, 6)
+
+    await run_batch(input_path, output_path, _processor([]), batch_size=2)
+    checkpoint_path = tmp_path / "out.jsonl.checkpoint"
+    full_output = output_path.read_text()
+
+    # simulate a run killed after its first batch, with a partial write after it
+    first_batch = "".join(full_output.splitlines(keepends=True)[:2])
+    output_path.write_text(first_batch + '{"index": 2, "trunc')
+    checkpoint_path.write_text(
+        json.dumps({"rows_done": 2, "output_size": len(first_batch.encode())})
+    )
+
+    calls: list[list[str]] = []
+    rows = await run_batch(input_path, output_path, _processor(calls), batch_size=2)
+
+    assert rows == 4
+    assert calls[0] == ["row-2", "row-3"]
+    assert output_path.read_text() == full_output
+    assert json.loads(checkpoint_path.read_text())["rows_done"] == 6
+
+
+async def test_run_batch_resume_skips_records_not_blank_lines(tmp_path):
+    input_path = tmp_path / "in.jsonl"
+    output_path = tmp_path / "out.jsonl"
+    _write_input(input_path, 4)
+    lines = input_path.read_text().splitlines(keepends=True)
+    input_path.write_text("\n" + "".join(lines[:2]) + "\n\n" + "".join(lines[2:]))
+
+    await run_batch(input_path, output_path, _processor([]), batch_size=2)
+    output = output_path.read_text()
+    first_batch = "".join(output.splitlines(keepends=True)[:2])
+    output_path.write_text(first_batch)
+    (tmp_path / "out.jsonl.checkpoint").write_text(
+        json.dumps({"rows_done": 2, "output_size": len(first_batch.encode())})
+    )
+
+    calls: list[list[str]] = []
+    await run_batch(input_path, output_path, _processor(calls), batch_size=2)
+
+    assert calls == [["row-2", "row-3"]]
+    assert output_path.read_text() == output
+
+
+async def test_run_batch_without_resume_starts_over(tmp_path):
+    input_path = tmp_path / "in.jsonl"
+    output_path = tmp_path / "out.jsonl"
+    _write_input(input_path, 3)
+
+    await run_batch(input_path, output_path, _processor([]))
+    rows = await run_batch(input_path, output_path, _processor([]), resume=False)
+
+    assert rows == 3
+    assert len(_read_output(output_path)) == 3
+
+
+async def test_run_batch_rejects_unknown_output_format(tmp_path):
+    input_path = tmp_path / "in.jsonl"
+    _write_input(input_path, 1)
+
+    with pytest.raises(ValueError, match="Unknown output format"):
+        await run_batch(
+            input_path,
+            tmp_path / "out.csv",
+            _processor([]),
+            output_format="csv",  # type: ignore[arg-type]
+        )
+
+
+@pytest.mark.parametrize(
+    "guardrail", ["scope-guard", "scope-guard-v2", "claim-extractor"]
+)
+def test_run_batch_help(guardrail):
+    from orbitals.cli.main import app
+
+    result = CliRunner().invoke(app, [guardrail, "run-batch", "--help"])
+    assert result.exit_code == 0
+    assert "--batch-size" in result.stdout
+
+
+class _FakeGuard:
+    instances: ClassVar[list[_FakeGuard]] = []
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.descriptions = []
+        _FakeGuard.instances.append(self)
+
+    def batch_validate(self, conversations, ai_service_descriptions):
+        self.descriptions.extend(ai_service_descriptions)
+        return [
+            ScopeGuardOutput(
+                evidences=None,
+                scope_class=ScopeClass.DIRECTLY_SUPPORTED,
+                model="m",
+                usage=None,
+            )
+            for _ in conversations
+        ]
+
+
+def test_run_batch_command_builds_the_guardrail(tmp_path, monkeypatch):
+    from orbitals.cli import run_batch as run_batch_cli
+
+    monkeypatch.setitem(
+        run_batch_cli.GUARDS,
+        "fake",
+        run_batch_cli.GUARDS["scope-guard"]._replace(guard_cls=_FakeGuard),
+    )
+    monkeypatch.setattr(_FakeGuard, "instances", [])
+    input_path, output_path = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_input(input_path, 3)
+    with input_path.open("a") as f:
+        f.write(json.dumps({"id": "row-3", "conversation": "hi"}) + "\n")
+
+    result = CliRunner().invoke(
+        run_batch_cli.build_app("fake"),
+        [str(input_path), str(output_path), "--backend", "vllm"]
+        + ["--with-probabilities", "--batch-size", "2"],
+    )
+
+    assert result.exit_code == 0, result.output
+    assert [guard.kwargs for guard in _FakeGuard.instances] == [
+        {
+            "backend": "vllm",
+            "model": "scope-guard",
+            "skip_evidences": False,
+            "with_probabilities": True,
+        }
+    ]
+    rows = _read_output(output_path)
+    assert [row["id"] for row in rows] == ["row-0", "row-1", "row-2", "row-3"]
+    # the last row has no AI service description and no default to fall back to
+    assert "error" in rows[3]
+    assert not any("error" in row for row in rows[:3])
+
+
+@pytest.mark.parametrize("backend", ["hf", "api"])
+def test_run_batch_rejects_probabilities_on_unsupported_backends(tmp_path, backend):
+    from orbitals.cli.main import app
+
+    input_path = tmp_path / "in.jsonl"
+    _write_input(input_path, 1)
+
+    result = CliRunner().invoke(
+        app,
+        ["scope-guard", "run-batch", str(input_path), str(tmp_path / "out.jsonl")]
+        + ["--backend", backend, "--with-probabilities"],
+    )
+
+    assert result.exit_code == 2
+    assert "--with-probabilities is not supported" in result.output
+    assert not (tmp_path / "out.jsonl").exists()
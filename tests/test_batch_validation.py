@@ -14,9 +14,11 @@ from __future__ import annotations
 from typing import Any
 
 import pytest
+from pydantic import ValidationError
 
 from orbitals.scope_guard import ScopeClass, ScopeGuard, ScopeGuardOutput
 from orbitals.scope_guard.guards.base import BaseScopeGuard
+from orbitals.types import ConversationMessage
 
 
 class _StubScopeGuard(ScopeGuard):
@@ -27,6 +29,7 @@ class _StubScopeGuard(ScopeGuard):
 
     def __init__(self) -> None:
         self.backend = "stub"
+        self.conversations: list = []
 
     def _batch_validate(
         self,
@@ -37,6 +40,7 @@ class _StubScopeGuard(ScopeGuard):
         skip_evidences=None,
         **kwargs: Any,
     ) -> list[ScopeGuardOutput]:
+        self.conversations = conversations
         return [
             ScopeGuardOutput(
                 evidences=None,
@@ -100,3 +104,31 @@ def test_per_conversation_descriptions_accepted_when_lengths_match():
         ai_service_descriptions=["d1", "d2"],
     )
     assert len(out) == 2
+
+
+def test_invalid_conversation_error_reports_its_index():
+    guard = _make_guard()
+    with pytest.raises(ValidationError) as exc_info:
+        guard.batch_validate(
+            ["q1", [{"role": "user", "content": "q2"}], [{"role": "bot"}]],
+            ai_service_description="desc",
+        )
+    assert {error["loc"][0] for error in exc_info.value.errors()} == {2}
+    assert "for conversations" in str(exc_info.value)
+
+
+def test_conversations_are_validated_as_a_whole():
+    guard = _make_guard()
+    guard.batch_validate(
+        ["q1", [{"role": "user", "content": "q2"}]],
+        ai_service_description="desc",
+    )
+    assert guard.conversations[0] == "q1"
+    assert isinstance(guard.conversations[1][0], ConversationMessage)
+
+
+def test_validated_conversations_are_trusted():
+    guard = _make_guard()
+    conversations = [[ConversationMessage(role="user", content="q1")], "q2"]
+    guard.batch_validate(conversations, ai_service_description="desc", validated=True)
+    assert guard.conversations is conversations
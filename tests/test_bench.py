@@ -0,0 +1,142 @@
+"""Tests for the `orbitals bench` load generator."""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from orbitals.bench import (
+    BenchRequest,
+    format_report,
+    load_requests,
+    parse_prometheus,
+    percentile,
+    run_bench,
+    server_stage_metrics,
+)
+from orbitals.metrics import MetricsRegistry
+
+
+def _usage():
+    return {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+
+
+@pytest.fixture
+async def server_url():
+    metrics = MetricsRegistry()
+
+    async def validate(request: web.Request) -> web.Response:
+        body = await request.json()
+        if body["conversation"] == "fail":
+            return web.json_response({"detail": "boom"}, status=500)
+        metrics.observe("orbitals_upstream_latency_seconds", 0.02, guardrail="sg")
+        return web.json_response({"scope_class": "Out of Scope", "usage": _usage()})
+
+    async def batch_validate(request: web.Request) -> web.Response:
+        body = await request.json()
+        return web.json_response([{"usage": _usage()} for _ in body["conversations"]])
+
+    async def prometheus(request: web.Request) -> web.Response:
+        return web.Response(text=metrics.render_prometheus())
+
+    app = web.Application()
+    app.router.add_post("/orbitals/scope-guard/validate", validate)
+    app.router.add_post("/orbitals/scope-guard/batch-validate", batch_validate)
+    app.router.add_get("/metrics", prometheus)
+    server = TestServer(app)
+    await server.start_server()
+    yield str(server.make_url("")).rstrip("/")
+    await server.close()
+
+
+def test_percentile_uses_nearest_rank():
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile(values, 0.999) == 100
+    assert percentile([], 0.5) is None
+
+
+def test_server_stage_metrics_reports_deltas():
+    before = parse_prometheus(
+        'orbitals_upstream_latency_seconds_sum{guardrail="sg"} 1.0\n'
+        'orbitals_upstream_latency_seconds_count{guardrail="sg"} 10\n'
+        'orbitals_upstream_requests_total{guardrail="sg"} 10\n'
+    )
+    after = parse_prometheus(
+        "# TYPE orbitals_upstream_latency_seconds histogram\n"
+        'orbitals_upstream_latency_seconds_bucket{guardrail="sg",le="+Inf"} 14\n'
+        'orbitals_upstream_latency_seconds_sum{guardrail="sg"} 1.4\n'
+        'orbitals_upstream_latency_seconds_count{guardrail="sg"} 14\n'
+        'orbitals_upstream_requests_total{guardrail="sg"} 14\n'
+        "orbitals_upstream_in_flight 2\n"
+    )
+
+    stages = server_stage_metrics(before, after)
+
+    (latency,) = stages["orbitals_upstream_latency_seconds"]
+    assert latency["count"] == 4
+    assert latency["mean_ms"] == pytest.approx(100)
+    assert stages["orbitals_upstream_requests_total"][0]["increase"] == 4
+    assert "orbitals_upstream_in_flight" not in stages
+
+
+def test_load_requests_resolves_aliases(tmp_path):
+    path = tmp_path / "mix.jsonl"
+    path.write_text(
+        json.dumps({"endpoint": "validate", "body": {}, "weight": 3}) + "\n\n"
+    )
+    (request,) = load_requests(path)
+    assert request.endpoint == "/orbitals/scope-guard/validate"
+    assert request.weight == 3
+
+
+async def test_closed_loop_run(server_url):
+    requests = [
+        BenchRequest("validate", {"conversation": "hi"}, weight=2),
+        BenchRequest("validate", {"conversation": "fail"}, weight=1),
+        BenchRequest("batch-validate", {"conversations": ["a", "b"]}, weight=1),
+    ]
+
+    report = await run_bench(
+        server_url,
+        requests,
+        concurrency=4,
+        duration=None,
+        num_requests=40,
+        seed=0,
+    )
+
+    assert report["mode"] == "closed-loop"
+    assert report["requests"] == 40
+    assert 0 < report["errors"] < 40
+    assert report["errors_by_type"] == {"500": report["errors"]}
+    batch = report["endpoints"]["/orbitals/scope-guard/batch-validate"]
+    assert batch["tokens"]["completion"] == 10 * batch["requests"]
+    assert report["latency_ms"]["p50"] <= report["latency_ms"]["p99.9"]
+    (upstream,) = report["server"]["orbitals_upstream_latency_seconds"]
+    validated = report["requests"] - report["errors"] - batch["requests"]
+    assert upstream["count"] == validated
+    assert "p99.9" in format_report(report)
+
+
+async def test_open_loop_run_sends_at_the_requested_rate(server_url):
+    report = await run_bench(
+        server_url,
+        [BenchRequest("validate", {"conversation": "hi"})],
+        rate=100,
+        arrival="fixed",
+        duration=0.2,
+    )
+
+    assert report["mode"] == "open-loop"
+    assert 15 <= report["requests"] <= 21
+    assert report["errors"] == 0
+
+
+async def test_run_bench_requires_a_single_mode():
+    with pytest.raises(ValueError, match="Exactly one"):
+        await run_bench("http://localhost", [], rate=1, concurrency=1)
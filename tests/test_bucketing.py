@@ -0,0 +1,150 @@
+"""Tests for the length-bucketed and description-grouped batching of the backends."""
+
+from __future__ import annotations
+
+import json
+import sys
+import types
+
+import pytest
+
+from orbitals.bucketing import (
+    grouped_order,
+    length_buckets,
+    padded_tokens,
+    restore_order,
+    run_length_bucketed,
+)
+
+
+def test_length_buckets_respect_the_token_budget():
+    lengths = [10, 200, 12, 190, 11, 500]
+
+    buckets = length_buckets(lengths, max_tokens_per_batch=400)
+
+    assert buckets == [[5], [1, 3], [2, 4, 0]]
+    assert sorted(i for bucket in buckets for i in bucket) == list(range(6))
+    # arrival-order batches of 3 pad every short input to the long ones
+    assert padded_tokens(lengths, buckets) < padded_tokens(
+        lengths, [[0, 1, 2], [3, 4, 5]]
+    )
+
+
+def test_length_buckets_edge_cases():
+    assert length_buckets([], 100) == []
+    assert length_buckets([5] * 4, 10) == [[0, 1], [2, 3]]
+    with pytest.raises(ValueError):
+        length_buckets([5], 0)
+
+
+class _FakeTokenizer:
+    def __call__(self, text):
+        return {"input_ids": text.split()}
+
+
+class _FakePipeline:
+    """Mimics an orbitals pipeline: one output list per input, in input order."""
+
+    tokenizer = _FakeTokenizer()
+
+    def __init__(self) -> None:
+        self.batches: list[tuple[list, int]] = []
+
+    def _sanitize_parameters(self, **kwargs):
+        return kwargs, {}, {}
+
+    def preprocess(self, inputs, skip_evidences=False):
+        conversation, _ = inputs
+        return {"text": conversation + (" evidences" if not skip_evidences else "")}
+
+    def __call__(self, inputs, batch_size=1, **kwargs):
+        self.batches.append(([conversation for conversation, _ in inputs], batch_size))
+        return [
+            [{"generated_text": conversation.upper()}] for conversation, _ in inputs
+        ]
+
+
+def test_run_length_bucketed_restores_the_input_order():
+    pipeline = _FakePipeline()
+    inputs = [("a", "d"), ("b b b b", "d"), ("c", "d"), ("e e e", "d")]
+
+    outputs = run_length_bucketed(
+        pipeline, inputs, max_tokens_per_batch=8, skip_evidences=True
+    )
+
+    assert [output[0]["generated_text"] for output in outputs] == [
+        "A",
+        "B B B B",
+        "C",
+        "E E E",
+    ]
+    assert pipeline.batches == [(["b b b b", "e e e"], 2), (["a", "c"], 2)]
+
+
+def test_grouped_order_groups_then_sorts_by_length():
+    groups = ["a", "b", "a", "c", "b", "a"]
+    lengths = [1, 5, 3, 2, 9, 2]
+
+    order = grouped_order(groups, lengths)
+
+    assert order == [2, 5, 0, 4, 1, 3]
+    assert restore_order(order, [groups[i] for i in order]) == groups
+
+
+class _FakeLLM:
+    """Records the submitted prompts, and answers with them as the reasoning."""
+
+    def __init__(self, **kwargs) -> None:
+        self.kwargs = kwargs
+        self.prompts: list[str] = []
+
+    def generate(self, prompts, sampling_params, use_tqdm=True):
+        self.prompts.extend(prompts)
+        return [
+            types.SimpleNamespace(
+                outputs=[
+                    types.SimpleNamespace(
+                        text=json.dumps(
+                            {
+                                "evidences": None,
+                                "reasoning": prompt,
+                                "scope_class": "Chit Chat",
+                            }
+                        )
+                    )
+                ]
+            )
+            for prompt in prompts
+        ]
+
+
+class _PromptTokenizer:
+    def apply_chat_template(self, messages, **kwargs):
+        return "|".join(m["content"] for m in messages)
+
+
+def test_offline_vllm_batches_are_grouped_by_description(monkeypatch):
+    from orbitals.scope_guard_v2 import ScopeGuardV2
+    from orbitals.scope_guard_v2.guards import vllm
+    from orbitals.scope_guard_v2.prompting import build_prompt
+
+    monkeypatch.setitem(
+        sys.modules,
+        "vllm",
+        types.SimpleNamespace(LLM=_FakeLLM, SamplingParams=types.SimpleNamespace),
+    )
+    monkeypatch.setattr(vllm, "_get_tokenizer", lambda name: _PromptTokenizer())
+    monkeypatch.setenv("CUDA_VISIBLE_DEVICES", "")
+    guard = ScopeGuardV2(backend="vllm", model="scope-guard-v2")
+    descriptions = ["Bot A.", "Bot B.", "Bot A.", "Bot B."]
+    conversations = ["Hi", "Hello", "Good morning", "Hey"]
+
+    outputs = guard.batch_validate(conversations, ai_service_descriptions=descriptions)
+
+    assert guard.llm.kwargs["enable_prefix_caching"] is True
+    submitted = [
+        build_prompt(_PromptTokenizer(), c, d, skip_evidences=False)
+        for c, d in zip(conversations, descriptions)
+    ]
+    assert guard.llm.prompts == [submitted[i] for i in (2, 0, 1, 3)]
+    assert [output.reasoning for output in outputs] == submitted
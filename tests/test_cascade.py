@@ -0,0 +1,163 @@
+"""Tests for the cascade backend of the claim extractor."""
+
+from __future__ import annotations
+
+import json
+import math
+
+import pytest
+
+from orbitals.claim_extractor import AsyncClaimExtractor
+from orbitals.claim_extractor.extractors.base import MODEL_MAPPING
+from orbitals.confidence import mean_token_probability
+from orbitals.metrics import MetricsRegistry
+
+pytestmark = pytest.mark.filterwarnings("ignore::DeprecationWarning")
+
+SMALL = MODEL_MAPPING["claim-extractor-2B-q"]
+LARGE = MODEL_MAPPING["claim-extractor-4B-q"]
+
+_CLAIM = {
+    "extractions": {
+        "intents": [],
+        "claims": [{"subtype": "Factoid", "content": "Refunds take 5 days."}],
+    }
+}
+_EMPTY = {"extractions": {"intents": [], "claims": []}}
+_USAGE = {"prompt_tokens": 10, "completion_tokens": 4, "total_tokens": 14}
+
+
+class _FakeTokenizer:
+    def apply_chat_template(self, messages, **kwargs):
+        return "".join(m["content"] for m in messages)
+
+    def encode(self, text):
+        return list(range(len(text) // 4))
+
+
+def _choice(text, finish_reason="stop", token_logprobs=None):
+    choice = {"index": 0, "text": text, "finish_reason": finish_reason}
+    if token_logprobs is not None:
+        choice["logprobs"] = {"token_logprobs": token_logprobs}
+    return choice
+
+
+class _ModelUpstream:
+    """Answers every model with its own choice, given per conversation."""
+
+    def __init__(self, choices: dict[str, dict[str, dict]]) -> None:
+        self.choices = choices
+        self.bodies: list[dict] = []
+
+    async def completions(self, request_body, guardrail="default", routing_key=None):
+        self.bodies.append(request_body)
+        by_prompt = self.choices[request_body["model"]]
+        choice = next(c for p, c in by_prompt.items() if p in request_body["prompt"])
+        return {"choices": [choice], "usage": _USAGE}
+
+
+@pytest.fixture(autouse=True)
+def _fake_tokenizer(monkeypatch):
+    from orbitals.claim_extractor.extractors import vllm
+
+    monkeypatch.setattr(vllm, "_get_tokenizer", lambda name: _FakeTokenizer())
+
+
+def test_mean_token_probability():
+    assert mean_token_probability(
+        [None, math.log(0.5), math.log(0.125)]
+    ) == pytest.approx(0.25)
+    assert mean_token_probability([None]) is None
+
+
+async def test_cascade_keeps_confident_small_model_outputs():
+    upstream = _ModelUpstream(
+        {
+            SMALL: {
+                "refund": _choice(json.dumps(_CLAIM), token_logprobs=[-0.01, -0.02])
+            },
+            LARGE: {},
+        }
+    )
+    metrics = MetricsRegistry()
+    extractor = AsyncClaimExtractor(
+        backend="cascade", upstream=upstream, metrics=metrics
+    )
+
+    output = await extractor.extract("I want a refund")
+
+    assert output.model == SMALL
+    assert output.extractions.claims[0].content == "Refunds take 5 days."
+    (body,) = upstream.bodies
+    assert body["logprobs"] == 0
+    assert extractor.stats() == {
+        "requests": 1,
+        "escalations": {"invalid": 0, "truncated": 0, "empty": 0, "low_confidence": 0},
+        "escalation_rate": 0.0,
+    }
+    assert metrics.get_counter("orbitals_cascade_requests_total") == 1
+
+
+async def test_cascade_escalates_on_every_trigger():
+    long_message = "long " * 100
+    upstream = _ModelUpstream(
+        {
+            SMALL: {
+                "invalid": _choice('{"extractions": '),
+                "truncated": _choice(json.dumps(_CLAIM), finish_reason="length"),
+                long_message: _choice(json.dumps(_EMPTY)),
+                "short": _choice(json.dumps(_EMPTY)),
+                "unsure": _choice(
+                    json.dumps(_CLAIM), token_logprobs=[math.log(0.5)] * 3
+                ),
+            },
+            LARGE: {"": _choice(json.dumps(_CLAIM))},
+        }
+    )
+    metrics = MetricsRegistry()
+    extractor = AsyncClaimExtractor(
+        backend="cascade", upstream=upstream, metrics=metrics
+    )
+
+    outputs = await extractor.batch_extract(
+        ["invalid", "truncated", long_message, "short", "unsure"]
+    )
+
+    assert [output.model for output in outputs] == [LARGE, LARGE, LARGE, SMALL, LARGE]
+    assert extractor.escalations == {
+        "invalid": 1,
+        "truncated": 1,
+        "empty": 1,
+        "low_confidence": 1,
+    }
+    assert extractor.escalation_rate == pytest.approx(0.8)
+    assert (
+        metrics.get_counter("orbitals_cascade_escalations_total", trigger="empty") == 1
+    )
+    # the large model is not asked for log-probabilities
+    assert all(
+        "logprobs" not in body for body in upstream.bodies if body["model"] == LARGE
+    )
+
+
+async def test_cascade_only_escalates_on_the_configured_triggers():
+    upstream = _ModelUpstream(
+        {SMALL: {"invalid": _choice('{"extractions": ')}, LARGE: {}}
+    )
+    extractor = AsyncClaimExtractor(
+        backend="cascade",
+        upstream=upstream,
+        escalate_on=["truncated"],
+        metrics=MetricsRegistry(),
+    )
+
+    with pytest.raises(ValueError, match="Failed to parse"):
+        await extractor.extract("invalid")
+
+    assert "logprobs" not in upstream.bodies[0]
+    assert extractor.escalation_rate == 0.0
+
+
+def test_cascade_rejects_unknown_triggers():
+    with pytest.raises(ValueError, match="Unknown escalation triggers"):
+        AsyncClaimExtractor(backend="cascade", escalate_on=["slow"])
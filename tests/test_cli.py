@@ -58,3 +58,12 @@ def test_scope_guard_convert_default_model_name_passes_through_unknown():
     )
     assert result.exit_code == 0
     assert "my-org/custom-model" in result.stdout
+
+
+def test_serve_help():
+    from orbitals.cli.main import app
+
+    runner = CliRunner()
+    result = runner.invoke(app, ["serve", "--help"])
+    assert result.exit_code == 0
+    assert "--guardrail" in result.stdout
@@ -0,0 +1,178 @@
+"""Tests for the class probabilities read off generated token logprobs."""
+
+from __future__ import annotations
+
+import json
+import math
+
+import pytest
+from typer.testing import CliRunner
+
+from orbitals.confidence import TemperatureScaling, class_logprobs
+from orbitals.scope_guard import AsyncScopeGuard, ScopeClass
+
+LABELS = [scope_class.value for scope_class in ScopeClass]
+
+
+def test_class_logprobs_handles_merged_quotes():
+    # the tokenizer merges the opening quote with the first word of the label
+    tokens = ['{"', "scope_class", '":', ' "Out', " of", " Scope", '"}']
+    top_logprobs = [
+        {},
+        {},
+        {},
+        {' "Out': -0.2, ' "Restricted': -2.0, ' "Directly': -3.0, " null": -5.0},
+        {},
+        {},
+        {},
+    ]
+
+    logprobs = class_logprobs(tokens, top_logprobs, LABELS)
+
+    assert dict(zip(LABELS, logprobs)) == {
+        "Directly Supported": -3.0,
+        "Potentially Supported": -math.inf,
+        "Out of Scope": -0.2,
+        "Restricted": -2.0,
+        "Chit Chat": -math.inf,
+    }
+    assert class_logprobs(["{}"], [{}], LABELS) is None
+
+
+def _overconfident_samples(n: int = 200):
+    # always 95% sure, right 70% of the time
+    samples = []
+    for i in range(n):
+        probabilities = {"a": 0.95, "b": 0.05}
+        samples.append((probabilities, "a" if i % 10 < 7 else "b"))
+    return samples
+
+
+def test_temperature_scaling_softens_overconfident_predictions():
+    calibration = TemperatureScaling.fit(_overconfident_samples())
+
+    assert calibration.temperature > 1
+    assert calibration.apply({"a": 0.95, "b": 0.05})["a"] == pytest.approx(
+        0.7, abs=0.01
+    )
+    with pytest.raises(ValueError):
+        TemperatureScaling.fit([({"a": 1.0}, "b")])
+
+
+@pytest.mark.parametrize("guardrail", ["scope-guard", "scope-guard-v2"])
+def test_calibrate_cli_fits_and_saves(tmp_path, guardrail):
+    from orbitals.cli.main import app
+
+    predictions = tmp_path / "predictions.jsonl"
+    predictions.write_text(
+        "\n".join(
+            json.dumps(
+                {"index": i, "scope_class_probabilities": probabilities, "label": label}
+            )
+            for i, (probabilities, label) in enumerate(_overconfident_samples())
+        )
+    )
+    output = tmp_path / "calibration.json"
+
+    result = CliRunner().invoke(
+        app, [guardrail, "calibrate", str(predictions), str(output)]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert TemperatureScaling.load(output) == TemperatureScaling.fit_jsonl(predictions)
+
+
+def test_calibration_skips_pre_filter_answers(tmp_path):
+    from orbitals.prefilter import PRE_FILTER_MODEL
+
+    rows = [
+        {"index": i, "model": "m", "scope_class_probabilities": p, "label": label}
+        for i, (p, label) in enumerate(_overconfident_samples())
+    ]
+    # a wrong and a right pre-filter answer, with the one-class probabilities
+    # logged by earlier versions, and a current one
+    rows += [
+        {
+            "model": PRE_FILTER_MODEL,
+            "scope_class_probabilities": {"c": 1.0},
+            "label": "a",
+        },
+        {
+            "model": PRE_FILTER_MODEL,
+            "scope_class_probabilities": {"a": 1.0},
+            "label": "a",
+        },
+        {"model": PRE_FILTER_MODEL, "pre_filter_confidence": 0.99, "label": "a"},
+    ]
+    predictions = tmp_path / "predictions.jsonl"
+    predictions.write_text("\n".join(json.dumps(row) for row in rows))
+
+    calibration = TemperatureScaling.fit_jsonl(predictions)
+
+    assert calibration == TemperatureScaling.fit(_overconfident_samples())
+
+
+class _LogprobsUpstream:
+    def __init__(self) -> None:
+        self.bodies: list[dict] = []
+
+    async def completions(self, request_body, guardrail="default", routing_key=None):
+        self.bodies.append(request_body)
+        tokens = ['{"evidences": null, "scope_class": "', "Out", " of Scope", '"}']
+        return {
+            "choices": [
+                {
+                    "index": 0,
+                    "text": "".join(tokens),
+                    "logprobs": {
+                        "tokens": tokens,
+                        "top_logprobs": [
+                            {tokens[0]: 0.0},
+                            {"Out": math.log(0.9), "Rest": math.log(0.1)},
+                            {" of Scope": 0.0},
+                            {'"}': 0.0},
+                        ],
+                    },
+                }
+            ],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 4, "total_tokens": 14},
+        }
+
+
+@pytest.fixture
+def fake_tokenizer(monkeypatch):
+    from orbitals.scope_guard.guards import vllm
+
+    class _FakeTokenizer:
+        def apply_chat_template(self, messages, **kwargs):
+            return "".join(m["content"] for m in messages)
+
+        def encode(self, text):
+            return list(range(len(text) // 4))
+
+    monkeypatch.setattr(vllm, "_get_tokenizer", lambda name: _FakeTokenizer())
+
+
+async def test_vllm_api_returns_calibrated_probabilities(fake_tokenizer):
+    upstream = _LogprobsUpstream()
+    guard = AsyncScopeGuard(
+        backend="vllm-api",
+        skip_evidences=True,
+        upstream=upstream,
+        calibration=TemperatureScaling(temperature=2.0),
+    )
+
+    plain = await guard.validate("Hi", ai_service_description="Parcel tracking.")
+    output = await guard.validate(
+        "Hi", ai_service_description="Parcel tracking.", with_probabilities=True
+    )
+
+    assert "logprobs" not in upstream.bodies[0]
+    assert upstream.bodies[1]["logprobs"] == 20
+    assert plain.scope_class_probabilities is None and plain.confidence is None
+    assert output.scope_class is ScopeClass.OUT_OF_SCOPE
+    # 0.9 vs 0.1 flattened by a temperature of 2: 3 vs 1
+    assert output.confidence == pytest.approx(0.75)
+    assert output.scope_class_probabilities[ScopeClass.RESTRICTED] == pytest.approx(
+        0.25
+    )
@@ -80,3 +80,33 @@ def test_empty_list_is_accepted():
     # A list of messages can validly be empty (no messages).
     result = ScopeGuardInputTypeAdapter.validate_python([])
     assert result == []
+
+
+def test_already_validated_conversation_is_passed_through():
+    conversation = ScopeGuardInputTypeAdapter.validate_python(
+        [{"role": "user", "content": "Where is my parcel?"}]
+    )
+    assert ScopeGuardInputTypeAdapter.validate_python(conversation) is conversation
+
+    message = ConversationUserMessage(role="user", content="Where is my parcel?")
+    assert ScopeGuardInputTypeAdapter.validate_python(message) is message
+
+
+def test_mixed_conversation_is_validated():
+    result = ScopeGuardInputTypeAdapter.validate_python(
+        [
+            ConversationMessage(role="user", content="I ordered a package"),
+            {"role": "assistant", "content": "Great, it is in transit."},
+        ]
+    )
+    assert all(isinstance(m, ConversationMessage) for m in result)
+
+
+def test_non_conversation_input_reports_every_union_member():
+    with pytest.raises(ValidationError) as exc_info:
+        ScopeGuardInputTypeAdapter.validate_python(3)
+    assert {error["type"] for error in exc_info.value.errors()} == {
+        "string_type",
+        "model_type",
+        "list_type",
+    }
@@ -0,0 +1,177 @@
+"""Tests for the fake vLLM server behind `orbitals dev fake-vllm`."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import time
+
+import aiohttp
+import pytest
+from aiohttp.test_utils import TestServer
+from typer.testing import CliRunner
+
+from orbitals.claim_extractor.prompting import (
+    CLAIMS_STOP_STRING,
+    validate_extractions_response,
+)
+from orbitals.dev import FakeVLLM, LatencyModel
+from orbitals.dev.fake_vllm import sample_from_schema
+from orbitals.scope_guard.prompting import ScopeGuardResponseModel
+from orbitals.scope_guard_v2.prompting import ScopeGuardV2ResponseModel
+
+
+class FakeTokenizer:
+    def apply_chat_template(self, messages, **kwargs):
+        return "".join(f"<{m['role']}>{m['content']}</{m['role']}>" for m in messages)
+
+    def encode(self, text):
+        return list(range(len(text) // 4))
+
+
+@pytest.fixture
+def fake_tokenizer(monkeypatch):
+    from orbitals.claim_extractor.extractors import vllm as ce_vllm
+    from orbitals.scope_guard.guards import vllm as sg_vllm
+    from orbitals.scope_guard_v2.guards import vllm as sg_v2_vllm
+
+    for module in (sg_vllm, sg_v2_vllm, ce_vllm):
+        monkeypatch.setattr(module, "_get_tokenizer", lambda name: FakeTokenizer())
+
+
+async def _start(server: FakeVLLM) -> TestServer:
+    test_server = TestServer(server.create_app())
+    await test_server.start_server()
+    return test_server
+
+
+@pytest.mark.parametrize("model", [ScopeGuardResponseModel, ScopeGuardV2ResponseModel])
+def test_sampled_scope_guard_outputs_are_schema_valid(model):
+    rng = random.Random(0)
+    for _ in range(20):
+        model.model_validate(sample_from_schema(model.model_json_schema(), rng))
+
+
+@pytest.mark.parametrize("skip_evidences", [True, False])
+def test_canned_extractions_are_valid(skip_evidences):
+    response, _ = FakeVLLM(seed=0).complete({"prompt": "hi"})
+    data = json.loads(response["choices"][0]["text"])
+    extractions = validate_extractions_response(data, skip_evidences).extractions
+    assert extractions.intents and extractions.claims
+
+
+def test_choice_structured_outputs():
+    response, _ = FakeVLLM(seed=0).complete(
+        {"prompt": "hi", "structured_outputs": {"choice": ["a", "b"]}}
+    )
+    assert response["choices"][0]["text"] in {"a", "b"}
+
+
+def test_stop_strings_are_excluded_from_the_output():
+    response, _ = FakeVLLM(seed=0).complete(
+        {"prompt": "hi", "stop": [CLAIMS_STOP_STRING]}
+    )
+    choice = response["choices"][0]
+    assert CLAIMS_STOP_STRING not in choice["text"]
+    assert choice["text"].endswith(", ")
+    assert choice["finish_reason"] == "stop"
+
+
+def test_max_tokens_truncates_and_reports_length():
+    response, completion_tokens = FakeVLLM(seed=0).complete(
+        {"prompt": "x" * 40, "max_tokens": 5}
+    )
+    assert len(response["choices"][0]["text"]) == 20
+    assert response["choices"][0]["finish_reason"] == "length"
+    assert completion_tokens == 5
+    assert response["usage"] == {
+        "prompt_tokens": 10,
+        "completion_tokens": 5,
+        "total_tokens": 15,
+    }
+
+
+def test_latency_model():
+    rng = random.Random(0)
+    assert LatencyModel(mean_ms=10, per_token_ms=1).sample(rng, 5) == 0.015
+
+    samples = [
+        LatencyModel("lognormal", mean_ms=100, stddev_ms=50).sample(rng, 0)
+        for _ in range(5000)
+    ]
+    assert sum(samples) / len(samples) == pytest.approx(0.1, rel=0.05)
+
+    with pytest.raises(ValueError, match="Unknown latency distribution"):
+        LatencyModel("pareto")
+
+
+async def test_injected_errors():
+    server = await _start(FakeVLLM(error_rate=1.0, error_status=503))
+    try:
+        async with (
+            aiohttp.ClientSession() as session,
+            session.post(
+                server.make_url("/v1/completions"), json={"prompt": "hi"}
+            ) as response,
+        ):
+            assert response.status == 503
+    finally:
+        await server.close()
+
+
+async def test_concurrency_limit_queues_requests():
+    fake = FakeVLLM(latency=LatencyModel(mean_ms=50), max_concurrency=1)
+    server = await _start(fake)
+    try:
+        async with aiohttp.ClientSession() as session:
+
+            async def complete():
+                async with session.post(
+                    server.make_url("/v1/completions"), json={"prompt": "hi"}
+                ) as response:
+                    assert response.status == 200
+
+            start = time.perf_counter()
+            await asyncio.gather(*[complete() for _ in range(3)])
+            assert time.perf_counter() - start >= 0.15
+            async with session.get(server.make_url("/stats")) as response:
+                assert (await response.json())["requests"] == 3
+    finally:
+        await server.close()
+
+
+async def test_vllm_api_backends_run_against_the_fake_server(fake_tokenizer):
+    from orbitals.claim_extractor import AsyncClaimExtractor
+    from orbitals.scope_guard import AsyncScopeGuard
+    from orbitals.scope_guard_v2 import AsyncScopeGuardV2
+
+    server = await _start(FakeVLLM(seed=0))
+    url = str(server.make_url("")).rstrip("/")
+    try:
+        scope_guard = AsyncScopeGuard(backend="vllm-api", vllm_serving_url=url)
+        result = await scope_guard.validate("hi", ai_service_description="A bot.")
+        assert result.usage is not None and result.usage.completion_tokens > 0
+
+        scope_guard_v2 = AsyncScopeGuardV2(
+            backend="vllm-api", model="my-model", vllm_serving_url=url
+        )
+        v2_result = await scope_guard_v2.validate("hi", ai_service_description="A bot.")
+        assert v2_result.reasoning
+
+        claim_extractor = AsyncClaimExtractor(
+            backend="vllm-api", vllm_serving_url=url, intents_only=True
+        )
+        extraction = await claim_extractor.extract("The parcel ships tomorrow.")
+        assert extraction.extractions.intents
+        assert extraction.extractions.claims == []
+    finally:
+        await server.close()
+
+
+def test_fake_vllm_help():
+    from orbitals.cli.main import app
+
+    result = CliRunner().invoke(app, ["dev", "fake-vllm", "--help"])
+    assert result.exit_code == 0
+    assert "--error-rate" in result.stdout
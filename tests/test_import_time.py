@@ -0,0 +1,86 @@
+"""Guards the import cost of the guardrail packages and of the CLI."""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+# only loaded once a backend that needs them is requested
+HEAVY_MODULES = {"aiohttp", "requests", "httpx", "uvicorn", "fastapi", "transformers"}
+
+# best of 3 runs, cumulative time of the imported module in milliseconds
+IMPORT_BUDGET_MS = float(os.environ.get("ORBITALS_IMPORT_BUDGET_MS", "350"))
+
+
+def _importtime(module: str) -> dict[str, int]:
+    """Run `python -X importtime -c "import <module>"`, return the cumulative µs per module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative_us, name = line.removeprefix("import time:").split("|")
+        if cumulative_us.strip().isdigit():
+            cumulative[name.strip()] = int(cumulative_us)
+    return cumulative
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        "orbitals.scope_guard",
+        "orbitals.scope_guard_v2",
+        "orbitals.claim_extractor",
+        "orbitals.cli.main",
+    ],
+)
+def test_import_does_not_load_backend_dependencies(module):
+    imported = _importtime(module)
+    assert not HEAVY_MODULES & imported.keys()
+
+
+def test_import_time_budget():
+    best_ms = min(
+        _importtime("orbitals.scope_guard")["orbitals.scope_guard"] / 1000
+        for _ in range(3)
+    )
+    assert best_ms < IMPORT_BUDGET_MS
+
+
+def test_backends_are_resolved_on_first_use():
+    code = (
+        "import sys\n"
+        "from orbitals.scope_guard import ScopeGuard\n"
+        "from orbitals.scope_guard.guards import APIScopeGuard\n"
+        "assert 'requests' in sys.modules\n"
+        "assert 'orbitals.scope_guard.guards.vllm' not in sys.modules\n"
+        "assert type(ScopeGuard(backend='api', api_key='key')) is APIScopeGuard\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_unknown_backend_lists_the_lazy_ones():
+    from orbitals.claim_extractor import AsyncClaimExtractor
+
+    with pytest.raises(
+        ValueError, match=r"Available: \['vllm-api', 'api', 'cascade'\]"
+    ):
+        AsyncClaimExtractor(backend="foo")
+
+
+def test_system_prompt_is_still_a_module_attribute():
+    from orbitals.scope_guard import prompting
+    from orbitals.scope_guard_v2 import prompting as prompting_v2
+
+    assert prompting.SYSTEM_PROMPT is prompting.get_system_prompt()
+    assert prompting_v2.SYSTEM_PROMPT.startswith("You are an expert AI classifier")
+    with pytest.raises(AttributeError):
+        prompting.NOT_A_CONSTANT  # noqa: B018
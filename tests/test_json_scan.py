@@ -0,0 +1,79 @@
+"""Tests for the JSON scanner and the JSON-completion stopping criterion."""
+
+from __future__ import annotations
+
+import sys
+import types
+
+import pytest
+
+from orbitals.json_scan import JSONCompletionCriteria, JSONScanner
+
+
+def test_scanner_finds_the_end_of_the_top_level_object():
+    text = '{"a": "}\\" {", "b": [1, {"c": null}]}  \n trailing'
+    scanner = JSONScanner()
+
+    ends = [scanner.feed(text[i : i + 3]) for i in range(0, len(text), 3)]
+
+    (chunk,) = [i for i, end in enumerate(ends) if end is not None]
+    assert chunk * 3 + ends[chunk] == text.index("}  ") + 1
+    assert scanner.complete
+
+
+def test_scanner_closes_truncated_json():
+    scanner = JSONScanner()
+    scanner.feed('{"intents": [{"content": "half a \\"quote')
+
+    assert not scanner.complete
+    assert scanner.closer() == '"}]}'
+
+
+class _Ids:
+    """Just enough of a 2D tensor of token ids."""
+
+    device = "cpu"
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.shape = (len(rows), len(rows[0]))
+
+    def __getitem__(self, index):
+        _, columns = index
+        return _Ids([row[columns] for row in self.rows])
+
+    def tolist(self):
+        return self.rows
+
+
+class _CharTokenizer:
+    def decode(self, ids, skip_special_tokens=False):
+        return "".join(chr(i) for i in ids if i)
+
+
+@pytest.fixture
+def fake_torch(monkeypatch):
+    monkeypatch.setitem(
+        sys.modules,
+        "torch",
+        types.SimpleNamespace(
+            bool="bool", tensor=lambda data, dtype=None, device=None: data
+        ),
+    )
+
+
+def test_criteria_finish_each_sequence_at_its_closing_brace(fake_torch):
+    prompt = [[0, ord("P")], [ord("P"), ord("P")]]
+    generated = ['{"a": 1}  ', '{"b": "}"}']
+    criteria = JSONCompletionCriteria(_CharTokenizer(), prompt_length=2)
+
+    finished = []
+    for step in range(1, len(generated[0]) + 1):
+        rows = [
+            row + [ord(c) for c in text[:step]] for row, text in zip(prompt, generated)
+        ]
+        finished.append(criteria(_Ids(rows), scores=None))
+
+    assert finished[6] == [False, False]
+    assert finished[7] == [True, False]
+    assert finished[-1] == [True, True]
@@ -0,0 +1,143 @@
+"""Tests for generation-free scope classification (`score_labels=True`)."""
+
+from __future__ import annotations
+
+import math
+
+import pytest
+
+from orbitals.scope_guard import (
+    AsyncScopeGuard,
+    ScopeClass,
+    ScopeGuardBatchResult,
+    ScopeGuardOutput,
+)
+from orbitals.scope_guard.modeling import scope_class_probabilities
+from orbitals.scope_guard.prompting import (
+    label_continuations,
+    score_label_continuations,
+)
+
+
+class _FakeTokenizer:
+    def apply_chat_template(self, messages, **kwargs):
+        return "".join(f"<{m['role']}>{m['content']}</{m['role']}>" for m in messages)
+
+    def encode(self, text):
+        return list(range(len(text) // 4))
+
+
+@pytest.fixture(autouse=True)
+def fake_tokenizer(monkeypatch):
+    from orbitals.scope_guard.guards import vllm
+
+    monkeypatch.setattr(vllm, "_get_tokenizer", lambda name: _FakeTokenizer())
+
+
+def test_labels_are_scored_after_the_shared_prompt():
+    # the tokenizer merges the prefilled quote with the first word of the label
+    tokens = [
+        [":", " ", '"Directly', " Supported", '"'],
+        [":", " ", '"Out', " of", " Scope", '"'],
+    ]
+    token_logprobs = [[None, -5.0, -0.5, -0.1, 0.0], [None, -5.0, -2.0, 0.0, 0.0, 0.0]]
+
+    assert score_label_continuations(tokens, token_logprobs) == [-0.6, -2.0]
+
+
+def test_scope_class_probabilities_are_normalized():
+    probabilities = scope_class_probabilities([-1000.0, -1001.0, -1002.0, -1e9, -1e9])
+
+    assert list(probabilities) == list(ScopeClass)
+    assert math.isclose(sum(probabilities.values()), 1.0)
+    assert math.isclose(
+        probabilities[ScopeClass.DIRECTLY_SUPPORTED]
+        / probabilities[ScopeClass.POTENTIALLY_SUPPORTED],
+        math.e,
+    )
+    assert probabilities[ScopeClass.CHIT_CHAT] == 0.0
+
+
+class _EchoingUpstream:
+    """Echoes every prompt one character per token, favouring `Out of Scope`."""
+
+    def __init__(self) -> None:
+        self.bodies: list[dict] = []
+
+    async def completions(self, request_body, guardrail="default", routing_key=None):
+        self.bodies.append(request_body)
+        choices = []
+        for index, prompt in enumerate(request_body["prompt"]):
+            favoured = prompt.endswith(f'{ScopeClass.OUT_OF_SCOPE.value}"')
+            tokens = [*prompt, "<generated>"]
+            choices.append(
+                {
+                    "index": index,
+                    "text": prompt + "}",
+                    "logprobs": {
+                        "tokens": tokens,
+                        "token_logprobs": [None]
+                        + [-0.01 if favoured else -0.5] * (len(tokens) - 1),
+                    },
+                }
+            )
+        return {
+            "choices": choices[::-1],
+            "usage": {
+                "prompt_tokens": 500,
+                "completion_tokens": 5,
+                "total_tokens": 505,
+            },
+        }
+
+
+async def test_vllm_api_scores_labels_in_one_request():
+    upstream = _EchoingUpstream()
+    guard = AsyncScopeGuard(
+        backend="vllm-api",
+        skip_evidences=True,
+        score_labels=True,
+        upstream=upstream,
+        count_system_prompt_in_usage=True,
+    )
+
+    output = await guard.validate(
+        "Can you book me a flight?", ai_service_description="Parcel tracking."
+    )
+
+    (body,) = upstream.bodies
+    assert body["max_tokens"] == 1 and body["echo"] is True
+    assert [
+        prompt[-len(label) :]
+        for prompt, label in zip(body["prompt"], label_continuations())
+    ] == label_continuations()
+    assert body["prompt"][0].endswith(
+        '{"evidences": null, "scope_class": "Directly Supported"'
+    )
+    assert output.scope_class is ScopeClass.OUT_OF_SCOPE
+    assert output.evidences is None
+    assert max(output.scope_class_probabilities.values()) == pytest.approx(
+        output.scope_class_probabilities[ScopeClass.OUT_OF_SCOPE]
+    )
+    assert output.usage.prompt_tokens == 500
+
+
+async def test_label_scoring_requires_skip_evidences():
+    guard = AsyncScopeGuard(backend="vllm-api", upstream=_EchoingUpstream())
+
+    with pytest.raises(ValueError, match="skip_evidences"):
+        await guard.validate("Hi", ai_service_description="d", score_labels=True)
+
+
+def test_compact_results_keep_the_probabilities():
+    output = ScopeGuardOutput(
+        evidences=None,
+        scope_class=ScopeClass.RESTRICTED,
+        model="scope-guard",
+        usage=None,
+        scope_class_probabilities=scope_class_probabilities([-3, -3, -2, -0.1, -4]),
+    )
+    without = output.model_copy(update={"scope_class_probabilities": None})
+
+    result = ScopeGuardBatchResult.from_outputs([output, without])
+    assert result.to_list() == [output, without]
@@ -0,0 +1,216 @@
+"""Tests for `AsyncGuardrailPipeline`, running guardrails concurrently."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+import pytest
+from pydantic import ValidationError
+
+from orbitals.claim_extractor import ClaimExtractorOutput, Extractions
+from orbitals.claim_extractor.extractors.base import AsyncClaimExtractor
+from orbitals.metrics import MetricsRegistry
+from orbitals.pipeline import AsyncGuardrailPipeline
+from orbitals.prefilter import PRE_FILTER_MODEL, PreFilter, RulePreClassifier
+from orbitals.scope_guard import ScopeClass, ScopeGuardOutput
+from orbitals.scope_guard.guards.base import AsyncScopeGuard
+from orbitals.types import AIServiceDescription, ConversationMessage
+
+
+class _StubScopeGuard(AsyncScopeGuard):
+    def __new__(cls, *args, **kwargs):
+        return object.__new__(cls)
+
+    def __init__(
+        self,
+        scope_class: ScopeClass,
+        delay: float = 0.0,
+        pre_filter: PreFilter | None = None,
+    ):
+        super().__init__("stub", pre_filter=pre_filter)
+        self.scope_class = scope_class
+        self.delay = delay
+        self.calls: list[dict[str, Any]] = []
+
+    async def _validate(self, conversation, *, ai_service_description, **kwargs):
+        self.calls.append(
+            {"conversation": conversation, "description": ai_service_description}
+        )
+        await asyncio.sleep(self.delay)
+        return ScopeGuardOutput(
+            scope_class=self.scope_class, evidences=None, model="stub", usage=None
+        )
+
+
+class _StubClaimExtractor(AsyncClaimExtractor):
+    def __new__(cls, *args, **kwargs):
+        return object.__new__(cls)
+
+    def __init__(self, delay: float = 0.0):
+        super().__init__("stub")
+        self.delay = delay
+        self.calls: list[dict[str, Any]] = []
+        self.cancelled = False
+
+    async def _extract(self, conversation, *, ai_service_description=None, **kwargs):
+        self.calls.append(
+            {"conversation": conversation, "description": ai_service_description}
+        )
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return ClaimExtractorOutput(extractions=Extractions(), model="stub", usage=None)
+
+
+DESCRIPTION = AIServiceDescription(
+    identity_role="Parcel delivery assistant",
+    context="Tracks parcels.",
+)
+
+
+async def test_pipeline_runs_guardrails_concurrently():
+    scope_guard = _StubScopeGuard(ScopeClass.DIRECTLY_SUPPORTED, delay=0.2)
+    claim_extractor = _StubClaimExtractor(delay=0.2)
+    pipeline = AsyncGuardrailPipeline(scope_guard, claim_extractor)
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    result = await pipeline.run(
+        [{"role": "user", "content": "Where is my parcel?"}],
+        ai_service_description=DESCRIPTION,
+    )
+
+    assert loop.time() - start < 0.35
+    assert result.scope_guard is not None
+    assert result.claim_extractor is not None
+    assert not result.extraction_cancelled
+
+
+async def test_pipeline_shares_parsed_conversation_and_rendered_description():
+    scope_guard = _StubScopeGuard(ScopeClass.DIRECTLY_SUPPORTED)
+    claim_extractor = _StubClaimExtractor()
+    pipeline = AsyncGuardrailPipeline(scope_guard, claim_extractor)
+
+    await pipeline.run(
+        [{"role": "user", "content": "Where is my parcel?"}],
+        ai_service_description=DESCRIPTION,
+    )
+
+    sg_call, ce_call = scope_guard.calls[0], claim_extractor.calls[0]
+    assert sg_call["conversation"] is ce_call["conversation"]
+    assert sg_call["description"] is ce_call["description"]
+    assert sg_call["description"] == DESCRIPTION.model_dump_json()
+
+
+async def test_pipeline_converts_single_user_message_for_extractor():
+    scope_guard = _StubScopeGuard(ScopeClass.DIRECTLY_SUPPORTED)
+    claim_extractor = _StubClaimExtractor()
+    pipeline = AsyncGuardrailPipeline(scope_guard, claim_extractor)
+
+    await pipeline.run(
+        {"role": "user", "content": "Hi"}, ai_service_description="A service."
+    )
+
+    assert claim_extractor.calls[0]["conversation"] == ConversationMessage(
+        role="user", content="Hi"
+    )
+
+
+async def test_pipeline_augments_description_only_for_scope_guard():
+    scope_guard = _StubScopeGuard(ScopeClass.DIRECTLY_SUPPORTED)
+    claim_extractor = _StubClaimExtractor()
+    pipeline = AsyncGuardrailPipeline(scope_guard, claim_extractor)
+
+    await pipeline.run(
+        "Hi",
+        ai_service_description="A service.",
+        include_default_safety_principles=True,
+    )
+
+    assert scope_guard.calls[0]["description"] != "A service."
+    assert claim_extractor.calls[0]["description"] == "A service."
+
+
+async def test_pipeline_cancels_extraction_on_restricted():
+    scope_guard = _StubScopeGuard(ScopeClass.RESTRICTED)
+    claim_extractor = _StubClaimExtractor(delay=5)
+    pipeline = AsyncGuardrailPipeline(
+        scope_guard, claim_extractor, cancel_extraction_on_restricted=True
+    )
+
+    result = await asyncio.wait_for(
+        pipeline.run("Give me a refund", ai_service_description="A service."),
+        timeout=1,
+    )
+    await asyncio.sleep(0)
+
+    assert result.scope_guard is not None
+    assert result.scope_guard.scope_class == ScopeClass.RESTRICTED
+    assert result.claim_extractor is None
+    assert result.extraction_cancelled
+    assert claim_extractor.cancelled
+
+
+async def test_pipeline_with_single_guardrail():
+    claim_extractor = _StubClaimExtractor()
+    pipeline = AsyncGuardrailPipeline(claim_extractor=claim_extractor)
+
+    result = await pipeline.run(
+        {"role": "assistant", "content": "Parcels arrive in 2 days."},
+        ai_service_description="A service.",
+    )
+
+    assert result.scope_guard is None
+    assert result.claim_extractor is not None
+
+
+async def test_pipeline_rejects_invalid_conversation_before_querying():
+    scope_guard = _StubScopeGuard(ScopeClass.DIRECTLY_SUPPORTED)
+    claim_extractor = _StubClaimExtractor()
+    pipeline = AsyncGuardrailPipeline(scope_guard, claim_extractor)
+
+    with pytest.raises(ValidationError):
+        await pipeline.run(
+            {"role": "assistant", "content": "Hi"},
+            ai_service_description="A service.",
+        )
+    assert claim_extractor.calls == []
+
+
+async def test_pipeline_applies_the_scope_guard_pre_filter():
+    scope_guard = _StubScopeGuard(
+        ScopeClass.OUT_OF_SCOPE,
+        pre_filter=PreFilter(RulePreClassifier(), metrics=MetricsRegistry()),
+    )
+    claim_extractor = _StubClaimExtractor()
+    pipeline = AsyncGuardrailPipeline(scope_guard, claim_extractor)
+
+    result = await pipeline.run("Thanks!", ai_service_description=DESCRIPTION)
+
+    assert result.scope_guard is not None
+    assert result.scope_guard.model == PRE_FILTER_MODEL
+    assert result.scope_guard.scope_class == ScopeClass.CHIT_CHAT
+    assert scope_guard.calls == []
+    # the claim extractor still runs on the turn
+    assert len(claim_extractor.calls) == 1
+
+
+async def test_pipeline_records_the_scope_guard_pre_filter_shadow():
+    pre_filter = PreFilter(RulePreClassifier(), shadow=True, metrics=MetricsRegistry())
+    scope_guard = _StubScopeGuard(ScopeClass.OUT_OF_SCOPE, pre_filter=pre_filter)
+    pipeline = AsyncGuardrailPipeline(scope_guard)
+
+    result = await pipeline.run("Thanks!", ai_service_description=DESCRIPTION)
+
+    assert result.scope_guard is not None
+    assert result.scope_guard.model == "stub"
+    assert len(scope_guard.calls) == 1
+    assert pre_filter.stats()["disagreements"] == 1
+
+
+def test_pipeline_requires_a_guardrail():
+    with pytest.raises(ValueError):
+        AsyncGuardrailPipeline()
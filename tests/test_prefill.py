@@ -0,0 +1,117 @@
+"""Tests for the prefilled vllm-api requests and their structured outputs."""
+
+from __future__ import annotations
+
+import json
+import re
+
+import pytest
+
+from orbitals.claim_extractor import AsyncClaimExtractor
+from orbitals.claim_extractor.prompting import get_prefill as claims_prefill
+from orbitals.scope_guard import AsyncScopeGuard, ScopeClass
+from orbitals.scope_guard import prompting as v1_prompting
+from orbitals.scope_guard_v2 import prompting as v2_prompting
+
+
+def _rest(prompting, skip_evidences: bool, response: dict) -> str:
+    text = json.dumps(response, ensure_ascii=False)
+    prefill = prompting.get_prefill(skip_evidences)
+    assert text.startswith(prefill)
+    return text[len(prefill) :]
+
+
+def test_v1_structured_outputs_match_the_rest_of_the_response():
+    response = {"evidences": ['Quote "one"', "ünïcode"], "scope_class": "Restricted"}
+    regex = v1_prompting.prefill_structured_outputs(False)["regex"]
+
+    assert re.fullmatch(regex, _rest(v1_prompting, False, response))
+    assert re.fullmatch(regex, ' null,"scope_class":"Chit Chat"}')
+    assert not re.fullmatch(regex, ' null, "scope_class": "Unknown"}')
+
+    choices = v1_prompting.prefill_structured_outputs(True)["choice"]
+    assert [
+        json.loads(v1_prompting.get_prefill(True) + choice)["scope_class"]
+        for choice in choices
+    ] == [scope_class.value for scope_class in ScopeClass]
+
+
+@pytest.mark.parametrize("skip_evidences", [True, False])
+@pytest.mark.parametrize("suggested_response", [None, "Sorry, I can't help.", ...])
+def test_v2_structured_outputs_match_the_rest_of_the_response(
+    skip_evidences, suggested_response
+):
+    response = {
+        "evidences": None if skip_evidences else ["a", "b\\c"],
+        "reasoning": 'The user asks for "refunds".\nThat is restricted.',
+        "scope_class": "Restricted",
+    }
+    if suggested_response is not ...:
+        response["suggested_response"] = suggested_response
+    regex = v2_prompting.prefill_structured_outputs(skip_evidences)["regex"]
+
+    assert re.fullmatch(regex, _rest(v2_prompting, skip_evidences, response))
+
+
+class _FakeTokenizer:
+    def apply_chat_template(self, messages, **kwargs):
+        return "".join(m["content"] for m in messages)
+
+    def encode(self, text):
+        return list(range(len(text) // 4))
+
+
+class _CompletingUpstream:
+    """Answers the completions with the given texts, in order."""
+
+    def __init__(self, *texts: str) -> None:
+        self.texts = list(texts)
+        self.bodies: list[dict] = []
+
+    async def completions(self, request_body, guardrail="default", routing_key=None):
+        self.bodies.append(request_body)
+        return {
+            "choices": [{"index": 0, "text": self.texts.pop(0)}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 4, "total_tokens": 14},
+        }
+
+
+async def test_vllm_api_prefills_the_scope_guard_response(monkeypatch):
+    from orbitals.scope_guard.guards import vllm
+
+    monkeypatch.setattr(vllm, "_get_tokenizer", lambda name: _FakeTokenizer())
+    upstream = _CompletingUpstream(
+        'Out of Scope"}', '{"evidences": null, "scope_class": "Out of Scope"}'
+    )
+    guard = AsyncScopeGuard(
+        backend="vllm-api", skip_evidences=True, prefill=True, upstream=upstream
+    )
+
+    output = await guard.validate("Hi", ai_service_description="Parcel tracking.")
+    plain_output = await guard.validate(
+        "Hi", ai_service_description="Parcel tracking.", prefill=False
+    )
+
+    prefilled, plain = upstream.bodies
+    assert prefilled["prompt"].endswith('{"evidences": null, "scope_class": "')
+    assert prefilled["structured_outputs"] == {
+        "choice": [f'{scope_class.value}"}}' for scope_class in ScopeClass]
+    }
+    assert "json" in plain["structured_outputs"]
+    assert output.scope_class is ScopeClass.OUT_OF_SCOPE
+    assert output == plain_output
+
+
+async def test_vllm_api_prefills_the_claim_extractor_response(monkeypatch):
+    from orbitals.claim_extractor.extractors import vllm
+
+    monkeypatch.setattr(vllm, "_get_tokenizer", lambda name: _FakeTokenizer())
+    upstream = _CompletingUpstream('{"content": "The user wants a refund."}]}}')
+    extractor = AsyncClaimExtractor(backend="vllm-api", upstream=upstream)
+
+    output = await extractor.extract("I want a refund", prefill=True)
+
+    assert upstream.bodies[0]["prompt"].endswith(claims_prefill())
+    assert [intent.content for intent in output.extractions.intents] == [
+        "The user wants a refund."
+    ]
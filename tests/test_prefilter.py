@@ -0,0 +1,271 @@
+"""Tests for the pre-filter answering trivial turns without the model."""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+from typer.testing import CliRunner
+
+from orbitals.metrics import MetricsRegistry
+from orbitals.prefilter import (
+    CHIT_CHAT,
+    PRE_FILTER_MODEL,
+    CharNGramClassifier,
+    PreFilter,
+    RulePreClassifier,
+    load_pre_classifier,
+)
+from orbitals.scope_guard import AsyncScopeGuard, ScopeClass
+from orbitals.scope_guard_v2 import AsyncScopeGuardV2
+
+pytestmark = pytest.mark.filterwarnings("ignore::DeprecationWarning")
+
+_SAMPLES = [
+    ("hi", CHIT_CHAT),
+    ("hello there", CHIT_CHAT),
+    ("thanks!", CHIT_CHAT),
+    ("thank you very much", CHIT_CHAT),
+    ("good morning", CHIT_CHAT),
+    ("where is my parcel?", "Directly Supported"),
+    ("track my order 1234", "Directly Supported"),
+    ("when will my package arrive", "Directly Supported"),
+    ("can you book a flight to paris", "Out of Scope"),
+    ("write me a poem about cars", "Out of Scope"),
+]
+
+
+class _FakeTokenizer:
+    def apply_chat_template(self, messages, **kwargs):
+        return "".join(m["content"] for m in messages)
+
+    def encode(self, text):
+        return list(range(len(text) // 4))
+
+
+class _ScopeClassUpstream:
+    """Answers `Chit Chat` to the prompts mentioning thanks, else `Out of Scope`."""
+
+    def __init__(self) -> None:
+        self.prompts: list[str] = []
+
+    async def completions(self, request_body, guardrail="default", routing_key=None):
+        self.prompts.append(request_body["prompt"])
+        scope_class = (
+            "Chit Chat" if "anks" in request_body["prompt"] else "Out of Scope"
+        )
+        text = json.dumps(
+            {
+                "evidences": None,
+                "scope_class": scope_class,
+                "reasoning": "r",
+                "suggested_response": None,
+            }
+        )
+        return {
+            "choices": [{"index": 0, "text": text}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 4, "total_tokens": 14},
+        }
+
+
+@pytest.fixture(autouse=True)
+def _fake_tokenizers(monkeypatch):
+    from orbitals.scope_guard.guards import vllm
+    from orbitals.scope_guard_v2.guards import vllm as vllm_v2
+
+    monkeypatch.setattr(vllm, "_get_tokenizer", lambda name: _FakeTokenizer())
+    monkeypatch.setattr(vllm_v2, "_get_tokenizer", lambda name: _FakeTokenizer())
+
+
+def test_rules_only_match_whole_pleasantries():
+    rules = RulePreClassifier()
+
+    assert rules.predict("Hello there, thanks a lot!!") == (CHIT_CHAT, 1.0)
+    assert rules.predict("Good morning") == (CHIT_CHAT, 1.0)
+    assert rules.predict("Hi, where is my parcel?") is None
+    assert rules.predict("Can you book me a flight?") is None
+
+
+def test_char_ngram_classifier_generalizes_and_round_trips(tmp_path):
+    classifier = CharNGramClassifier.fit(_SAMPLES * 10)
+    path = tmp_path / "pre_classifier.json"
+    classifier.save(path)
+
+    loaded = load_pre_classifier(path)
+
+    assert isinstance(loaded, CharNGramClassifier)
+    assert loaded.labels == ["Chit Chat", "Directly Supported", "Out of Scope"]
+    label, confidence = loaded.predict("hey, thanks")
+    assert label == CHIT_CHAT and confidence > 0.9
+    assert loaded.predict("where is my package 999")[0] == "Directly Supported"
+    assert loaded.predict_proba("hi") == pytest.approx(classifier.predict_proba("hi"))
+
+
+async def test_pre_filter_answers_chit_chat_without_the_model():
+    upstream = _ScopeClassUpstream()
+    metrics = MetricsRegistry()
+    guard = AsyncScopeGuard(
+        backend="vllm-api",
+        skip_evidences=True,
+        upstream=upstream,
+        pre_filter=PreFilter(RulePreClassifier(), metrics=metrics),
+    )
+
+    outputs = await guard.batch_validate(
+        ["Hi!", "Can you book me a flight?", "thanks, bye"],
+        ai_service_descriptions=["Parcel tracking.", "Parcel delivery.", "Parcels."],
+    )
+    single = await guard.validate("Hello", ai_service_description="Parcel tracking.")
+
+    assert [output.scope_class for output in outputs] == [
+        ScopeClass.CHIT_CHAT,
+        ScopeClass.OUT_OF_SCOPE,
+        ScopeClass.CHIT_CHAT,
+    ]
+    assert [output.model for output in outputs] == [
+        PRE_FILTER_MODEL,
+        guard.default_model_name,
+        PRE_FILTER_MODEL,
+    ]
+    assert outputs[0].usage.total_tokens == 0
+    assert outputs[0].confidence == 1.0
+    assert single.model == PRE_FILTER_MODEL
+    # only the flight request reached the model, with its own description
+    (prompt,) = upstream.prompts
+    assert "flight" in prompt and "Parcel delivery." in prompt
+    assert guard.pre_filter.stats()["decisions"] == 3
+    assert metrics.get_counter("orbitals_prefilter_requests_total") == 4
+
+
+async def test_shadow_mode_sends_everything_to_the_model_and_measures_agreement():
+    upstream = _ScopeClassUpstream()
+    metrics = MetricsRegistry()
+    pre_filter = PreFilter(RulePreClassifier(), shadow=True, metrics=metrics)
+    guard = AsyncScopeGuard(
+        backend="vllm-api",
+        skip_evidences=True,
+        upstream=upstream,
+        pre_filter=pre_filter,
+    )
+
+    outputs = await guard.batch_validate(
+        ["Thanks!", "Hello", "Where is my parcel?"],
+        ai_service_description="Parcel tracking.",
+    )
+
+    assert len(upstream.prompts) == 3
+    assert all(output.model != PRE_FILTER_MODEL for output in outputs)
+    assert pre_filter.stats() == {
+        "requests": 3,
+        "decisions": 2,
+        "agreements": 1,
+        "disagreements": 1,
+        "agreement_rate": 0.5,
+    }
+    assert (
+        metrics.get_counter(
+            "orbitals_prefilter_shadow_total", scope_class=CHIT_CHAT, outcome="agree"
+        )
+        == 1
+    )
+
+
+async def test_pre_filter_below_threshold_forwards_to_the_model():
+    class _Unsure:
+        def predict(self, text):
+            return CHIT_CHAT, 0.6
+
+    upstream = _ScopeClassUpstream()
+    guard = AsyncScopeGuard(
+        backend="vllm-api",
+        skip_evidences=True,
+        upstream=upstream,
+        pre_filter=PreFilter(_Unsure(), threshold=0.9, metrics=MetricsRegistry()),
+    )
+
+    output = await guard.validate("Hi", ai_service_description="Parcel tracking.")
+
+    assert output.model != PRE_FILTER_MODEL
+    assert len(upstream.prompts) == 1
+
+
+async def test_pre_filter_answers_carry_its_confidence():
+    class _Sure:
+        def predict(self, text):
+            return CHIT_CHAT, 0.95
+
+    guard = AsyncScopeGuardV2(
+        backend="vllm-api",
+        model="scope-guard-v2",
+        upstream=_ScopeClassUpstream(),
+        pre_filter=PreFilter(_Sure(), threshold=0.9, metrics=MetricsRegistry()),
+    )
+
+    output = await guard.validate("Hi", ai_service_description="Parcel tracking.")
+
+    assert output.model == PRE_FILTER_MODEL
+    # no made-up distribution over the other scope classes
+    assert output.scope_class_probabilities is None
+    assert output.pre_filter_confidence == 0.95
+    assert output.confidence == 0.95
+
+
+async def test_v2_streams_pre_filter_answers_at_once():
+    upstream = _ScopeClassUpstream()
+    guard = AsyncScopeGuardV2(
+        backend="vllm-api",
+        model="scope-guard-v2",
+        skip_evidences=True,
+        upstream=upstream,
+        pre_filter=PreFilter(RulePreClassifier(), metrics=MetricsRegistry()),
+    )
+
+    events = [
+        event
+        async for event in guard.validate_stream(
+            "Thank you!", ai_service_description="Parcel tracking."
+        )
+    ]
+
+    assert [event.event for event in events] == ["scope_class", "output"]
+    assert events[-1].output.model == PRE_FILTER_MODEL
+    assert events[-1].output.scope_class.value == CHIT_CHAT
+    assert upstream.prompts == []
+
+
+@pytest.mark.parametrize("guardrail", ["scope-guard", "scope-guard-v2"])
+def test_train_prefilter_cli(tmp_path, guardrail):
+    from orbitals.cli.main import app
+
+    logs = tmp_path / "logs.jsonl"
+    logs.write_text(
+        "\n".join(
+            json.dumps({"index": i, "scope_class": label})
+            for i, (_, label) in enumerate(_SAMPLES * 5)
+        )
+        + "\n"
+        + json.dumps({"index": len(_SAMPLES) * 5, "error": "ValueError: failed"})
+    )
+    inputs = tmp_path / "inputs.jsonl"
+    inputs.write_text(
+        "\n".join(json.dumps({"conversation": text}) for text, _ in _SAMPLES * 5)
+        + "\n"
+        + json.dumps({"conversation": "hi"})
+    )
+    output = tmp_path / "pre_classifier.json"
+
+    result = CliRunner().invoke(
+        app,
+        [
+            guardrail,
+            "train-prefilter",
+            str(logs),
+            str(output),
+            "--inputs-path",
+            str(inputs),
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "Trained on 45 turns" in result.output
+    assert load_pre_classifier(output).predict("hello")[0] == CHIT_CHAT
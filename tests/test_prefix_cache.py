@@ -0,0 +1,157 @@
+"""Tests for the system-prompt KV-cache reuse of the Hugging Face pipelines."""
+
+from __future__ import annotations
+
+import sys
+import types
+
+import pytest
+
+from orbitals.prefix_cache import PrefixCache, shared_prefix, splice_prefix
+
+
+def _prompt(system: str, description: str, conversation: str) -> str:
+    return (
+        f"<system>{system}</system><user>"
+        f"**START OF THE AI SERVICE DESCRIPTION**\n\n{description}\n\n"
+        f"**END OF THE AI SERVICE DESCRIPTION**\n\n\n{conversation}</user>"
+    )
+
+
+def test_shared_prefix_prefers_the_description_when_enabled():
+    texts = [_prompt("S", "D", "hi"), _prompt("S", "D", "hello")]
+
+    assert shared_prefix(texts, cache_descriptions=False) == "<system>S</system><user>"
+    assert shared_prefix(texts, cache_descriptions=True).endswith(
+        "D\n\n**END OF THE AI SERVICE DESCRIPTION**"
+    )
+
+    # different descriptions fall back to the system prompt
+    texts.append(_prompt("S", "E", "hi"))
+    assert shared_prefix(texts, cache_descriptions=True) == "<system>S</system><user>"
+
+    # different prompt variants share nothing
+    texts.append(_prompt("S, skipping evidences", "D", "hi"))
+    assert shared_prefix(texts, cache_descriptions=True) is None
+    assert shared_prefix(["no markers"], cache_descriptions=False) is None
+
+
+def test_splice_prefix_pads_between_prefix_and_suffix():
+    spliced = splice_prefix([1, 2], [[1, 2, 3], [1, 2, 4, 5, 6]], pad_token_id=0)
+
+    assert spliced.input_ids == [[1, 2, 0, 0, 3], [1, 2, 4, 5, 6]]
+    assert spliced.attention_mask == [[1, 1, 0, 0, 1], [1, 1, 1, 1, 1]]
+    assert splice_prefix([1, 2], [[1, 3, 4]], pad_token_id=0) is None
+
+
+class _NullContext:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class _FakeCache:
+    def __init__(self, input_ids):
+        self.input_ids = input_ids
+        self.repeats = 1
+
+    def batch_repeat_interleave(self, repeats):
+        self.repeats = repeats
+
+
+class _FakeModel:
+    name_or_path = "tiny"
+    device = "cpu"
+
+    def __init__(self) -> None:
+        self.prefills = 0
+
+    def __call__(self, input_ids, use_cache):
+        self.prefills += 1
+        return types.SimpleNamespace(past_key_values=_FakeCache(input_ids[0]))
+
+
+class _FakeTokenizer:
+    pad_token_id = 0
+
+    def __call__(self, text, truncation=False):
+        if isinstance(text, str):
+            return {"input_ids": [ord(c) for c in text]}
+        return {"input_ids": [[ord(c) for c in t] for t in text]}
+
+
+@pytest.fixture
+def fake_torch(monkeypatch):
+    monkeypatch.setitem(
+        sys.modules,
+        "torch",
+        types.SimpleNamespace(
+            inference_mode=lambda: _NullContext(),
+            tensor=lambda data, device=None: data,
+        ),
+    )
+
+
+def test_prefix_cache_computes_each_prefix_once(fake_torch):
+    model, tokenizer = _FakeModel(), _FakeTokenizer()
+    cache = PrefixCache(max_size=1)
+    texts = [_prompt("S", "D", "hi"), _prompt("S", "E", "hello")]
+
+    inputs = cache.prepare(model, tokenizer, texts)
+    cache.prepare(model, tokenizer, texts[0])
+
+    assert model.prefills == 1
+    prefix_ids = tokenizer("<system>S</system><user>")["input_ids"][:-1]
+    assert inputs["input_ids"][0][: len(prefix_ids)] == prefix_ids
+    assert inputs["past_key_values"].input_ids == prefix_ids
+    assert inputs["past_key_values"].repeats == 2
+
+    # a new prompt variant evicts the least recently used prefix
+    cache.prepare(model, tokenizer, _prompt("T", "D", "hi"))
+    cache.prepare(model, tokenizer, texts[0])
+    assert model.prefills == 3
+    assert len(cache) == 1
+
+    assert cache.prepare(model, tokenizer, "no markers") is None
+
+
+def test_cached_prefix_generates_like_the_full_prompt():
+    torch = pytest.importorskip("torch")
+    transformers = pytest.importorskip("transformers")
+
+    torch.manual_seed(0)
+    config = transformers.LlamaConfig(
+        vocab_size=128,
+        hidden_size=32,
+        intermediate_size=64,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        initializer_range=0.2,
+    )
+    # float64, so that the cached and full prefill round the same way
+    model = transformers.LlamaForCausalLM(config).to(torch.float64).eval()
+    tokenizer = _FakeTokenizer()
+    texts = [
+        _prompt("Be brief.", "A parcel tracker", "where is my parcel?"),
+        _prompt("Be brief.", "A parcel tracker", "hi"),
+    ]
+
+    cached = PrefixCache().prepare(model, tokenizer, texts)
+    rows = tokenizer(texts)["input_ids"]
+    width = max(len(row) for row in rows)
+    full = {
+        "input_ids": torch.tensor([[0] * (width - len(r)) + r for r in rows]),
+        "attention_mask": torch.tensor(
+            [[0] * (width - len(r)) + [1] * len(r) for r in rows]
+        ),
+    }
+
+    outputs = [
+        model.generate(**inputs, max_new_tokens=8, do_sample=False, pad_token_id=0)
+        for inputs in (cached, full)
+    ]
+    assert cached["input_ids"].shape[1] == width
+    assert outputs[0][:, width:].tolist() == outputs[1][:, width:].tolist()
@@ -44,6 +44,7 @@ def test_scope_guard_package_all_is_exhaustive():
         "ADDITIONAL_SAFETY_RULES",
         "AsyncScopeGuard",
         "ScopeClass",
+        "ScopeGuardBatchResult",
         "ScopeGuardOutput",
         "ScopeGuard",
         "augment_with_default_safety_principles",
@@ -0,0 +1,252 @@
+"""Tests for per-tenant rate limiting keyed on the `X-API-Key` header."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+
+import pytest
+from fastapi import FastAPI
+
+from orbitals.metrics import MetricsRegistry
+from orbitals.serving.rate_limiting import (
+    MissingAPIKey,
+    RateLimiter,
+    RateLimitExceeded,
+    TokenBucket,
+    install_rate_limiting,
+)
+
+pytestmark = pytest.mark.filterwarnings("ignore::DeprecationWarning")
+
+# the tenant id of "acme-key", which usage is keyed on
+ACME_ID = "key-" + hashlib.sha256(b"acme-key").hexdigest()[:8]
+
+
+def _names(usage: dict) -> set[str]:
+    return {tenant["name"] for tenant in usage.values()}
+
+
+def _write_config(path, config: dict, mtime: float | None = None):
+    path.write_text(json.dumps(config))
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    path = tmp_path / "rate_limits.json"
+    _write_config(
+        path,
+        {
+            "default": {"requests_per_minute": 2},
+            "tenants": {
+                "acme-key": {"name": "acme", "prompt_tokens_per_minute": 100},
+                "solo-key": {"name": "solo", "max_concurrency": 1},
+            },
+        },
+        mtime=1_000,
+    )
+    return path
+
+
+def test_token_bucket_refills_over_time():
+    bucket = TokenBucket(60, now=0)
+    assert bucket.retry_after(60, now=0) == 0
+    bucket.consume(60)
+    assert bucket.retry_after(1, now=0) == pytest.approx(1.0)
+    assert bucket.retry_after(1, now=1) == 0
+
+
+def test_token_bucket_lets_oversized_costs_through_when_full():
+    bucket = TokenBucket(10, now=0)
+    assert bucket.retry_after(50, now=0) == 0
+    bucket.consume(50)
+    assert bucket.retry_after(1, now=0) > 0
+
+
+def test_request_rate_is_limited_per_api_key(config_path):
+    limiter = RateLimiter(config_path, metrics=MetricsRegistry())
+
+    for _ in range(2):
+        limiter.release(limiter.acquire("key-a", 1))
+    with pytest.raises(RateLimitExceeded) as exc_info:
+        limiter.acquire("key-a", 1)
+    assert exc_info.value.retry_after > 0
+
+    # unknown keys share the default bucket, so rotating keys does not help
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire("key-b", 1)
+    # configured tenants have their own
+    limiter.release(limiter.acquire("acme-key", 1))
+    assert _names(limiter.usage()) == {"default", "acme"}
+
+
+def test_prompt_tokens_are_limited(config_path):
+    limiter = RateLimiter(config_path, metrics=MetricsRegistry())
+
+    limiter.release(limiter.acquire("acme-key", 80))
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire("acme-key", 80)
+
+
+def test_concurrency_is_capped(config_path):
+    limiter = RateLimiter(config_path, metrics=MetricsRegistry())
+
+    state = limiter.acquire("solo-key", 1)
+    with pytest.raises(RateLimitExceeded, match="concurrent"):
+        limiter.acquire("solo-key", 1)
+    limiter.release(state)
+    limiter.release(limiter.acquire("solo-key", 1))
+
+
+def test_usage_counters_are_kept_per_tenant(config_path):
+    limiter = RateLimiter(config_path, metrics=MetricsRegistry())
+
+    limiter.release(limiter.acquire("acme-key", 80))
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire("acme-key", 80)
+
+    assert limiter.usage()[ACME_ID] == {
+        "name": "acme",
+        "admitted_requests": 1,
+        "limited_requests": 1,
+        "estimated_prompt_tokens": 80,
+    }
+
+
+def test_tenants_sharing_a_name_are_counted_apart(config_path):
+    config = json.loads(config_path.read_text())
+    config["tenants"]["other-key"] = {"name": "acme", "prompt_tokens_per_minute": 100}
+    _write_config(config_path, config)
+    limiter = RateLimiter(config_path, metrics=MetricsRegistry())
+
+    limiter.release(limiter.acquire("acme-key", 80))
+    limiter.release(limiter.acquire("other-key", 80))
+    usage = limiter.usage()
+
+    assert len(usage) == 2
+    assert _names(usage) == {"acme"}
+    assert usage[ACME_ID]["admitted_requests"] == 1
+    assert limiter.usage_for("other-key") == {
+        tenant_id: tenant for tenant_id, tenant in usage.items() if tenant_id != ACME_ID
+    }
+
+
+def test_config_is_reloaded_without_losing_bucket_state(config_path):
+    limiter = RateLimiter(config_path, reload_interval=0, metrics=MetricsRegistry())
+    limiter.release(limiter.acquire("acme-key", 80))
+
+    config = json.loads(config_path.read_text())
+    config["tenants"]["acme-key"]["prompt_tokens_per_minute"] = 1_000
+    config["anonymous"] = None
+    _write_config(config_path, config, mtime=2_000)
+
+    # the 80 tokens already consumed still count against the new limit
+    limiter.release(limiter.acquire("acme-key", 900))
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire("acme-key", 100)
+    with pytest.raises(MissingAPIKey):
+        limiter.acquire(None, 1)
+
+
+def test_invalid_config_keeps_the_previous_one(config_path):
+    limiter = RateLimiter(config_path, reload_interval=0, metrics=MetricsRegistry())
+
+    config_path.write_text("{not json")
+    os.utime(config_path, (2_000, 2_000))
+
+    limiter.release(limiter.acquire("solo-key", 1))
+    assert limiter.config.tenants["solo-key"].max_concurrency == 1
+
+
+def test_middleware_returns_429_with_retry_after(config_path):
+    from fastapi.testclient import TestClient
+
+    app = FastAPI()
+    install_rate_limiting(app)
+    app.state.rate_limiter = RateLimiter(config_path, metrics=MetricsRegistry())
+
+    @app.post("/orbitals/scope-guard/validate")
+    async def validate() -> dict[str, str]:
+        return {"status": "ok"}
+
+    with TestClient(app) as client:
+        headers = {"X-API-Key": "key-a"}
+        for _ in range(2):
+            response = client.post("/orbitals/scope-guard/validate", headers=headers)
+            assert response.status_code == 200
+
+        response = client.post("/orbitals/scope-guard/validate", headers=headers)
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+
+        # other tenants are not affected
+        response = client.post(
+            "/orbitals/scope-guard/validate", headers={"X-API-Key": "acme-key"}
+        )
+        assert response.status_code == 200
+
+        usage = client.get("/orbitals/usage", headers={"X-API-Key": "acme-key"})
+        assert usage.json() == {
+            ACME_ID: {
+                "name": "acme",
+                "admitted_requests": 1,
+                "estimated_prompt_tokens": 1,
+            }
+        }
+
+
+def test_usage_is_only_readable_by_configured_tenants(config_path):
+    from fastapi.testclient import TestClient
+
+    config = json.loads(config_path.read_text())
+    config["tenants"]["admin-key"] = {"name": "ops", "admin": True}
+    _write_config(config_path, config)
+
+    app = FastAPI()
+    install_rate_limiting(app)
+    limiter = RateLimiter(config_path, metrics=MetricsRegistry())
+    app.state.rate_limiter = limiter
+    limiter.release(limiter.acquire("acme-key", 10))
+    limiter.release(limiter.acquire("unknown-key", 10))
+
+    with TestClient(app) as client:
+        assert client.get("/orbitals/usage").status_code == 401
+        response = client.get("/orbitals/usage", headers={"X-API-Key": "key-a"})
+        assert response.status_code == 401
+
+        own = client.get("/orbitals/usage", headers={"X-API-Key": "acme-key"})
+        assert _names(own.json()) == {"acme"}
+        every = client.get("/orbitals/usage", headers={"X-API-Key": "admin-key"})
+        assert _names(every.json()) == {"acme", "default"}
+
+
+def test_middleware_holds_the_slot_of_streamed_responses(config_path):
+    import asyncio
+
+    from fastapi.responses import StreamingResponse
+    from fastapi.testclient import TestClient
+
+    app = FastAPI()
+    install_rate_limiting(app)
+    limiter = RateLimiter(config_path, metrics=MetricsRegistry())
+    app.state.rate_limiter = limiter
+
+    @app.post("/orbitals/scope-guard/validate-stream")
+    async def validate_stream() -> StreamingResponse:
+        async def events():
+            yield "first\n"
+            # the middleware has returned the response by now
+            await asyncio.sleep(0.01)
+            yield f"{limiter._tenants['solo-key'].in_flight}\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    with TestClient(app) as client:
+        response = client.post(
+            "/orbitals/scope-guard/validate-stream", headers={"X-API-Key": "solo-key"}
+        )
+        assert response.text == "first\n1\n"
+        assert limiter._tenants["solo-key"].in_flight == 0
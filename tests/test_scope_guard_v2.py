@@ -48,6 +48,7 @@ def test_scope_guard_v2_package_all_is_exhaustive():
         "AsyncScopeGuardV2",
         "ScopeClass",
         "ScopeGuardV2",
+        "ScopeGuardV2BatchResult",
         "ScopeGuardV2Output",
         "augment_with_default_safety_principles_v2",
     }
@@ -0,0 +1,208 @@
+"""Tests for liveness/readiness probes and graceful drain of the serving apps."""
+
+from __future__ import annotations
+
+import signal
+import subprocess
+import sys
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from fastapi import Request
+
+pytestmark = pytest.mark.filterwarnings("ignore::DeprecationWarning")
+
+
+@pytest.fixture(autouse=True)
+def reset_draining():
+    from orbitals.serving import health
+
+    health._draining.clear()
+    yield
+    health._draining.clear()
+
+
+@pytest.fixture
+async def fake_vllm_health():
+    state = {"status": 200}
+
+    async def health(request: web.Request) -> web.Response:
+        return web.Response(status=state["status"])
+
+    app = web.Application()
+    app.router.add_get("/health", health)
+    server = TestServer(app)
+    await server.start_server()
+    yield str(server.make_url("")), state
+    await server.close()
+
+
+def _make_app(health):
+    from fastapi import FastAPI
+
+    from orbitals.serving.health import install_health
+
+    app = FastAPI()
+    install_health(app)
+    app.state.health = health
+
+    @app.get("/work")
+    async def work(request: Request) -> dict[str, int]:
+        return {"in_flight": request.app.state.health.in_flight}
+
+    return app
+
+
+async def test_readiness_tracks_warmup_upstream_and_saturation(fake_vllm_health):
+    from orbitals.serving.health import ServingHealth
+
+    url, state = fake_vllm_health
+    health = ServingHealth(vllm_serving_url=url, max_in_flight=1)
+
+    ready, checks = await health.readiness()
+    assert not ready and checks["warmed_up"] is False
+
+    await health.warmup(lambda: None)
+    ready, checks = await health.readiness()
+    assert ready, checks
+
+    state["status"] = 503
+    ready, checks = await health.readiness()
+    assert not ready and checks["upstream"] is False
+
+    state["status"] = 200
+    health.in_flight = 1
+    ready, checks = await health.readiness()
+    assert not ready and checks["saturated"] is True
+
+
+async def test_failed_warmup_is_reported():
+    from orbitals.serving.health import ServingHealth
+
+    def _fail():
+        raise OSError("tokenizer not found")
+
+    health = ServingHealth()
+    await health.warmup(_fail)
+    ready, checks = await health.readiness()
+
+    assert not ready
+    assert checks["warmup_error"] == "OSError: tokenizer not found"
+
+
+async def test_readiness_uses_upstream_scheduler_queue():
+    from orbitals.metrics import MetricsRegistry
+    from orbitals.serving.health import ServingHealth
+    from orbitals.upstream import VLLMUpstream
+
+    upstream = VLLMUpstream(max_concurrency=1, metrics=MetricsRegistry())
+    health = ServingHealth(upstream=upstream)
+    assert not health._saturated()
+
+    upstream.scheduler._queues["scope-guard"] = [object()]  # type: ignore[assignment]
+    assert health._saturated()
+
+
+def test_probes_and_draining_over_http():
+    from fastapi.testclient import TestClient
+
+    from orbitals.serving.health import ServingHealth, start_draining
+
+    health = ServingHealth()
+    health.warmed_up = True
+    app = _make_app(health)
+
+    with TestClient(app) as client:
+        assert client.get("/livez").status_code == 200
+        assert client.get("/readyz").status_code == 200
+        assert client.get("/work").json() == {"in_flight": 1}
+        assert health.in_flight == 0
+
+        start_draining()
+
+        response = client.get("/readyz")
+        assert response.status_code == 503
+        assert response.json()["draining"] is True
+        assert client.get("/work").status_code == 503
+        assert client.get("/livez").status_code == 200
+
+
+def test_streamed_responses_are_in_flight_until_their_last_event():
+    import asyncio
+
+    from fastapi.responses import StreamingResponse
+    from fastapi.testclient import TestClient
+
+    from orbitals.serving.health import ServingHealth
+
+    health = ServingHealth()
+    app = _make_app(health)
+
+    @app.get("/stream")
+    async def stream() -> StreamingResponse:
+        async def events():
+            yield "first\n"
+            # the middleware has returned the response by now
+            await asyncio.sleep(0.01)
+            yield f"{health.in_flight}\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    with TestClient(app) as client:
+        assert client.get("/stream").text == "first\n1\n"
+        assert health.in_flight == 0
+
+
+def test_guardrail_apps_expose_probes(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from orbitals.scope_guard.serving import main as serving_main
+
+    monkeypatch.setenv("SCOPE_GUARD_VLLM_MODEL", "scope-guard")
+    monkeypatch.setenv("SCOPE_GUARD_VLLM_SERVING_URL", "http://127.0.0.1:1")
+    monkeypatch.setenv("SCOPE_GUARD_SKIP_EVIDENCES", "0")
+
+    with TestClient(serving_main.app) as client:
+        assert client.get("/livez").status_code == 200
+        # vLLM is unreachable, so the app must not receive traffic
+        response = client.get("/readyz")
+        assert response.status_code == 503
+        assert response.json()["upstream"] is False
+
+
+def test_graceful_server_drains_before_exiting():
+    import uvicorn
+
+    from orbitals.serving.health import is_draining
+    from orbitals.serving.server import GracefulServer
+
+    server = GracefulServer(uvicorn.Config("x:app"), drain_delay=60)
+    server.handle_exit(signal.SIGTERM, None)
+    assert is_draining()
+    assert not server.should_exit
+
+    # a second signal skips the delay
+    server.handle_exit(signal.SIGTERM, None)
+    assert server.should_exit
+
+
+def test_stop_vllm_process_kills_unresponsive_process():
+    from orbitals.serving.server import stop_vllm_process
+
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-c",
+            (
+                "import signal, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); "
+                "print('ready', flush=True); time.sleep(30)"
+            ),
+        ],
+        stdout=subprocess.PIPE,
+    )
+    assert process.stdout is not None
+    process.stdout.readline()
+
+    stop_vllm_process(process, timeout=0.5)
+    assert process.returncode == -signal.SIGKILL
@@ -0,0 +1,266 @@
+"""Tests for the streamed vllm-api requests and their incremental events."""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from orbitals.claim_extractor import AsyncClaimExtractor
+from orbitals.json_scan import JSONStreamParser
+from orbitals.scope_guard_v2 import AsyncScopeGuardV2, ScopeClass
+
+pytestmark = pytest.mark.filterwarnings("ignore::DeprecationWarning")
+
+
+def _chunks(text: str, size: int = 7) -> list[str]:
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+def test_stream_parser_reports_values_as_they_complete():
+    text = json.dumps(
+        {
+            "extractions": {
+                "intents": [{"content": 'Book a "flight", {now}'}],
+                "claims": [{"subtype": "Factoid", "content": "x"}, 3, True],
+            }
+        }
+    )
+    parser = JSONStreamParser(max_depth=3)
+
+    completed = []
+    for chunk in _chunks(text, size=3):
+        completed.extend(parser.feed(chunk))
+
+    assert completed == [
+        (("extractions", "intents", 0), {"content": 'Book a "flight", {now}'}),
+        (("extractions", "intents"), [{"content": 'Book a "flight", {now}'}]),
+        (("extractions", "claims", 0), {"subtype": "Factoid", "content": "x"}),
+        (("extractions", "claims", 1), 3),
+        (("extractions", "claims", 2), True),
+        (
+            ("extractions", "claims"),
+            [{"subtype": "Factoid", "content": "x"}, 3, True],
+        ),
+        (("extractions",), json.loads(text)["extractions"]),
+        ((), json.loads(text)),
+    ]
+
+
+def test_stream_parser_skips_deep_values():
+    parser = JSONStreamParser(max_depth=1)
+
+    completed = parser.feed('{"evidences": ["a", "b"], "scope_class": "Chit')
+
+    assert completed == [(("evidences",), ["a", "b"])]
+    assert parser.feed(' Chat"') == [(("scope_class",), "Chit Chat")]
+
+
+class _FakeTokenizer:
+    def apply_chat_template(self, messages, **kwargs):
+        return "".join(m["content"] for m in messages)
+
+    def encode(self, text):
+        return list(range(len(text) // 4))
+
+
+class _StreamingUpstream:
+    """Streams the given text a few characters per chunk, then its usage."""
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.bodies: list[dict] = []
+        self.guardrails: list[str] = []
+
+    async def stream_completions(
+        self, request_body, guardrail="default", routing_key=None
+    ):
+        self.bodies.append(request_body)
+        self.guardrails.append(guardrail)
+        for chunk in _chunks(self.text):
+            yield {"choices": [{"index": 0, "text": chunk}], "usage": None}
+        yield {
+            "choices": [],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 4, "total_tokens": 14},
+        }
+
+
+async def test_vllm_api_streams_the_scope_class_first(monkeypatch):
+    from orbitals.scope_guard_v2.guards import vllm
+
+    monkeypatch.setattr(vllm, "_get_tokenizer", lambda name: _FakeTokenizer())
+    upstream = _StreamingUpstream(
+        json.dumps(
+            {
+                "evidences": None,
+                "scope_class": "Out of Scope",
+                "reasoning": "The user asks for flights.",
+                "suggested_response": "I can only track parcels.",
+            }
+        )
+    )
+    guard = AsyncScopeGuardV2(
+        backend="vllm-api",
+        model="scope-guard-v2",
+        skip_evidences=True,
+        upstream=upstream,
+    )
+
+    events = [
+        event
+        async for event in guard.validate_stream(
+            "Can you book me a flight?", ai_service_description="Parcel tracking."
+        )
+    ]
+
+    (body,) = upstream.bodies
+    assert body["stream"] is True and body["stream_options"] == {"include_usage": True}
+    assert upstream.guardrails == ["scope-guard-v2"]
+    assert [event.event for event in events] == [
+        "field",
+        "scope_class",
+        "field",
+        "field",
+        "output",
+    ]
+    assert events[1].scope_class is ScopeClass.OUT_OF_SCOPE
+    assert events[2].field == "reasoning"
+    assert events[2].value == "The user asks for flights."
+    output = events[-1].output
+    assert output.scope_class is ScopeClass.OUT_OF_SCOPE
+    assert output.suggested_response == "I can only track parcels."
+    assert output.usage.completion_tokens == 4
+
+
+async def test_vllm_api_streams_intents_and_claims(monkeypatch):
+    from orbitals.claim_extractor.extractors import vllm
+
+    monkeypatch.setattr(vllm, "_get_tokenizer", lambda name: _FakeTokenizer())
+    upstream = _StreamingUpstream(
+        '{"content": "The user wants a refund."}], "claims": ['
+        '{"subtype": "Factoid", "content": "Refunds take 5 days."}, '
+        '{"subtype": "Capability", "content": "Refunds are automatic."}]}}'
+    )
+    extractor = AsyncClaimExtractor(backend="vllm-api", upstream=upstream, prefill=True)
+
+    events = [event async for event in extractor.extract_stream("I want a refund")]
+
+    assert upstream.guardrails == ["claim-extractor"]
+    assert [event.event for event in events] == ["intent", "claim", "claim", "output"]
+    assert events[0].index == 0
+    assert events[0].intent.content == "The user wants a refund."
+    assert [events[1].index, events[2].index] == [0, 1]
+    assert events[1].claim.content == "Refunds take 5 days."
+    assert events[-1].output.extractions.claims == [events[1].claim, events[2].claim]
+
+
+async def test_vllm_api_stream_skips_invalid_extractions_then_raises(monkeypatch):
+    from orbitals.claim_extractor.extractors import vllm
+
+    monkeypatch.setattr(vllm, "_get_tokenizer", lambda name: _FakeTokenizer())
+    upstream = _StreamingUpstream(
+        '{"extractions": {"intents": [], "claims": ['
+        '{"subtype": "Factoid", "content": "Refunds take 5 days."}, '
+        '{"subtype": "Unknown", "content": "Invalid."}]}}'
+    )
+    extractor = AsyncClaimExtractor(backend="vllm-api", upstream=upstream)
+
+    events = []
+    with pytest.raises(ValueError, match="Failed to validate"):
+        async for event in extractor.extract_stream("I want a refund"):
+            events.append(event)
+
+    assert [event.event for event in events] == ["claim"]
+
+
+async def test_api_backend_does_not_stream():
+    guard = AsyncScopeGuardV2(backend="api", api_key="key")
+
+    with pytest.raises(NotImplementedError, match="'api' backend"):
+        async for _ in guard.validate_stream("Hi", ai_service_description="d"):
+            pass
+
+
+def test_serving_sends_server_sent_events(monkeypatch):
+    monkeypatch.setenv("CLAIM_EXTRACTOR_VLLM_MODEL", "claim-extractor")
+    monkeypatch.setenv("CLAIM_EXTRACTOR_VLLM_SERVING_URL", "http://localhost:8001")
+    monkeypatch.setenv("CLAIM_EXTRACTOR_SKIP_EVIDENCES", "1")
+
+    from fastapi.testclient import TestClient
+
+    from orbitals.claim_extractor.modeling import (
+        ClaimExtractorIntentEvent,
+        Intent,
+    )
+    from orbitals.claim_extractor.serving import main as serving_main
+
+    class _StubAsyncExtractor:
+        async def extract_stream(self, conversation, **kwargs):
+            yield ClaimExtractorIntentEvent(index=0, intent=Intent(content="Refund"))
+            raise RuntimeError("upstream went away")
+
+    with TestClient(serving_main.app) as client:
+        monkeypatch.setattr(serving_main, "claim_extractor", _StubAsyncExtractor())
+        response = client.post(
+            "/orbitals/claim-extractor/extract-stream",
+            json={"conversation": "I want a refund"},
+        )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    frames = [frame.split("\n") for frame in response.text.strip().split("\n\n")]
+    assert [frame[0] for frame in frames] == ["event: intent", "event: error"]
+    assert json.loads(frames[0][1][len("data: ") :])["intent"]["content"] == "Refund"
+    assert json.loads(frames[1][1][len("data: ") :]) == {"detail": "upstream went away"}
+
+
+@pytest.mark.parametrize(
+    ("module", "attribute", "method", "path", "body"),
+    [
+        (
+            "orbitals.scope_guard_v2.serving.main",
+            "scope_guard",
+            "validate_stream",
+            "/orbitals/scope-guard-v2/validate-stream",
+            {"ai_service_description": "A parcel tracker"},
+        ),
+        (
+            "orbitals.claim_extractor.serving.main",
+            "claim_extractor",
+            "extract_stream",
+            "/orbitals/claim-extractor/extract-stream",
+            {},
+        ),
+    ],
+)
+def test_streaming_endpoints_validate_before_streaming(
+    monkeypatch, module, attribute, method, path, body
+):
+    import importlib
+
+    from fastapi.testclient import TestClient
+
+    for prefix in ("SCOPE_GUARD_V2", "CLAIM_EXTRACTOR"):
+        monkeypatch.setenv(f"{prefix}_VLLM_MODEL", "model")
+        monkeypatch.setenv(f"{prefix}_VLLM_SERVING_URL", "http://localhost:8001")
+        monkeypatch.setenv(f"{prefix}_SKIP_EVIDENCES", "0")
+    serving_main = importlib.import_module(module)
+    calls = []
+
+    async def stream(conversation, **kwargs):
+        calls.append(kwargs)
+        return
+        yield
+
+    with TestClient(serving_main.app) as client:
+        monkeypatch.setattr(
+            serving_main, attribute, type("Stub", (), {method: staticmethod(stream)})
+        )
+        invalid = client.post(
+            path, json={**body, "conversation": [{"role": "robot", "content": "hi"}]}
+        )
+        valid = client.post(path, json={**body, "conversation": "Hi"})
+
+    assert invalid.status_code == 422
+    assert valid.status_code == 200
+    assert [call["validated"] for call in calls] == [True]
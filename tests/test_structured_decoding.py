@@ -0,0 +1,63 @@
+"""Tests for the schema-constrained decoding of the Hugging Face pipelines."""
+
+from __future__ import annotations
+
+import json
+import sys
+import types
+
+import pytest
+
+from orbitals.scope_guard.prompting import ScopeGuardResponseModel
+from orbitals.structured_decoding import JSONSchemaDecoding
+
+
+class _FakeCompiler:
+    def __init__(self, tokenizer_info):
+        self.tokenizer_info = tokenizer_info
+        self.compiled: list[tuple[str, bool]] = []
+
+    def compile_json_schema(self, schema, any_whitespace=True):
+        self.compiled.append((schema, any_whitespace))
+        return ("grammar", schema)
+
+
+@pytest.fixture
+def fake_xgrammar(monkeypatch):
+    tokenizer_infos = []
+
+    def from_huggingface(tokenizer, vocab_size):
+        tokenizer_infos.append((tokenizer, vocab_size))
+        return "info"
+
+    hf = types.SimpleNamespace(LogitsProcessor=lambda grammar: ["processor", grammar])
+    xgrammar = types.SimpleNamespace(
+        TokenizerInfo=types.SimpleNamespace(from_huggingface=from_huggingface),
+        GrammarCompiler=_FakeCompiler,
+        contrib=types.SimpleNamespace(hf=hf),
+    )
+    monkeypatch.setitem(sys.modules, "xgrammar", xgrammar)
+    monkeypatch.setitem(sys.modules, "xgrammar.contrib", xgrammar.contrib)
+    monkeypatch.setitem(sys.modules, "xgrammar.contrib.hf", hf)
+    return tokenizer_infos
+
+
+def test_logits_processors_share_the_compiler(fake_xgrammar):
+    model = types.SimpleNamespace(config=types.SimpleNamespace(vocab_size=151_936))
+    decoding = JSONSchemaDecoding()
+    schema = ScopeGuardResponseModel.model_json_schema()
+
+    first = decoding.logits_processor(model, "tokenizer", schema)
+    second = decoding.logits_processor(model, "tokenizer", schema)
+
+    assert first == second == ["processor", ("grammar", json.dumps(schema))]
+    assert first is not second
+    assert fake_xgrammar == [("tokenizer", 151_936)]
+    assert decoding._compiler.compiled == [(json.dumps(schema), False)] * 2
+
+
+def test_missing_xgrammar_is_reported(monkeypatch):
+    monkeypatch.setitem(sys.modules, "xgrammar", None)
+
+    with pytest.raises(ImportError, match="pip install xgrammar"):
+        JSONSchemaDecoding().logits_processor(None, None, {})
@@ -0,0 +1,180 @@
+"""Tests for the unified `orbitals serve` app mounting several guardrails."""
+
+from __future__ import annotations
+
+import warnings
+
+import pytest
+
+pytestmark = pytest.mark.filterwarnings("ignore::DeprecationWarning")
+
+
+@pytest.fixture
+def guardrail_env(monkeypatch):
+    monkeypatch.setenv("ORBITALS_SERVE_VLLM_SERVING_URL", "http://localhost:8001")
+    monkeypatch.setenv("SCOPE_GUARD_VLLM_MODEL", "scope-guard")
+    monkeypatch.setenv("SCOPE_GUARD_VLLM_SERVING_URL", "http://localhost:8001")
+    monkeypatch.setenv("SCOPE_GUARD_SKIP_EVIDENCES", "1")
+    monkeypatch.setenv("SCOPE_GUARD_V2_VLLM_MODEL", "scope-guard-v2")
+    monkeypatch.setenv("SCOPE_GUARD_V2_VLLM_SERVING_URL", "http://localhost:8001")
+    monkeypatch.setenv("SCOPE_GUARD_V2_SKIP_EVIDENCES", "1")
+    monkeypatch.setenv("CLAIM_EXTRACTOR_VLLM_MODEL", "claim-extractor")
+    monkeypatch.setenv("CLAIM_EXTRACTOR_VLLM_SERVING_URL", "http://localhost:8001")
+
+
+def _paths(app) -> set[str]:
+    return set(app.openapi()["paths"])
+
+
+def test_unified_app_mounts_all_guardrails_sharing_one_upstream(
+    guardrail_env, monkeypatch
+):
+    from fastapi.testclient import TestClient
+
+    from orbitals.claim_extractor.serving import main as claim_extractor_serving
+    from orbitals.scope_guard.serving import main as scope_guard_serving
+    from orbitals.scope_guard_v2.serving import main as scope_guard_v2_serving
+    from orbitals.serving.main import create_app
+
+    # restore the module globals the lifespan assigns
+    for module, name in (
+        (scope_guard_serving, "scope_guard"),
+        (scope_guard_v2_serving, "scope_guard"),
+        (claim_extractor_serving, "claim_extractor"),
+    ):
+        monkeypatch.setattr(module, name, None, raising=False)
+
+    app = create_app()
+    with warnings.catch_warnings():
+        # e.g. a route mounted twice, with a duplicate operation ID
+        warnings.simplefilter("error")
+        paths = _paths(app)
+    assert "/orbitals/scope-guard/validate" in paths
+    assert "/orbitals/scope-guard-v2/validate" in paths
+    assert "/orbitals/claim-extractor/extract" in paths
+    assert "/metrics" in paths
+
+    with TestClient(app) as client:
+        upstream = app.state.upstream
+        assert scope_guard_serving.scope_guard.upstream is upstream
+        assert scope_guard_v2_serving.scope_guard.upstream is upstream
+        assert claim_extractor_serving.claim_extractor.upstream is upstream
+
+        response = client.get("/health")
+        assert response.status_code == 200
+        assert response.json()["guardrails"] == [
+            "scope-guard",
+            "scope-guard-v2",
+            "claim-extractor",
+        ]
+
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert 'orbitals_http_requests_total{path="/health",status="200"}' in (
+            response.text
+        )
+
+
+def test_unified_app_mounts_only_selected_guardrails(guardrail_env, monkeypatch):
+    from orbitals.scope_guard.serving import main as scope_guard_serving
+    from orbitals.serving.main import create_app
+
+    monkeypatch.setattr(scope_guard_serving, "scope_guard", None, raising=False)
+
+    paths = _paths(create_app(guardrails=["scope-guard"]))
+    assert "/orbitals/scope-guard/validate" in paths
+    assert "/orbitals/claim-extractor/extract" not in paths
+
+
+def test_unified_app_rejects_unknown_guardrails():
+    from orbitals.serving.main import create_app
+
+    with pytest.raises(ValueError, match="Unknown guardrails"):
+        create_app(guardrails=["not-a-guardrail"])
+
+
+def test_pipeline_endpoint_merges_guardrail_results(guardrail_env, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from orbitals.claim_extractor import ClaimExtractorOutput, Extractions
+    from orbitals.claim_extractor.serving import main as claim_extractor_serving
+    from orbitals.scope_guard import ScopeClass, ScopeGuardOutput
+    from orbitals.scope_guard.serving import main as scope_guard_serving
+    from orbitals.serving.main import create_app
+    from orbitals.types import LLMUsage
+
+    usage = LLMUsage(prompt_tokens=1, completion_tokens=1, total_tokens=2)
+
+    class _StubScopeGuard:
+        async def validate(self, conversation, **kwargs):
+            return ScopeGuardOutput(
+                scope_class=ScopeClass.OUT_OF_SCOPE,
+                evidences=None,
+                model="stub",
+                usage=usage,
+            )
+
+    class _StubClaimExtractor:
+        async def extract(self, conversation, **kwargs):
+            return ClaimExtractorOutput(
+                extractions=Extractions(), model="stub", usage=usage
+            )
+
+    for module, name in (
+        (scope_guard_serving, "scope_guard"),
+        (claim_extractor_serving, "claim_extractor"),
+    ):
+        monkeypatch.setattr(module, name, None, raising=False)
+
+    app = create_app(guardrails=["scope-guard", "claim-extractor"])
+    with TestClient(app) as client:
+        monkeypatch.setattr(scope_guard_serving, "scope_guard", _StubScopeGuard())
+        monkeypatch.setattr(
+            claim_extractor_serving, "claim_extractor", _StubClaimExtractor()
+        )
+
+        response = client.post(
+            "/orbitals/pipeline/run",
+            json={
+                "conversation": "Where is my parcel?",
+                "ai_service_description": "A parcel delivery service.",
+            },
+        )
+        assert response.status_code == 200
+        body = response.json()
+        assert body["scope_guard"]["scope_class"] == "Out of Scope"
+        assert body["claim_extractor"]["model"] == "stub"
+        assert body["extraction_cancelled"] is False
+
+        response = client.post(
+            "/orbitals/pipeline/run",
+            json={
+                "conversation": "Where is my parcel?",
+                "ai_service_description": "A parcel delivery service.",
+                "guardrails": ["claim-extractor"],
+            },
+        )
+        assert response.status_code == 200
+        assert response.json()["scope_guard"] is None
+
+
+def test_pipeline_endpoint_rejects_guardrails_not_served(guardrail_env, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from orbitals.claim_extractor.serving import main as claim_extractor_serving
+    from orbitals.serving.main import create_app
+
+    monkeypatch.setattr(
+        claim_extractor_serving, "claim_extractor", None, raising=False
+    )
+
+    with TestClient(create_app(guardrails=["claim-extractor"])) as client:
+        response = client.post(
+            "/orbitals/pipeline/run",
+            json={
+                "conversation": "Hi",
+                "ai_service_description": "A service.",
+                "guardrails": ["scope-guard"],
+            },
+        )
+        assert response.status_code == 422
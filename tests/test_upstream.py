@@ -0,0 +1,301 @@
+"""Tests for the shared vLLM upstream client and its fair scheduler."""
+
+from __future__ import annotations
+
+import asyncio
+from contextlib import ExitStack
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from orbitals.metrics import MetricsRegistry
+from orbitals.upstream import FairScheduler, ReplicaRouter, VLLMUpstream
+
+
+async def test_scheduler_without_limit_never_queues():
+    scheduler = FairScheduler()
+    for _ in range(10):
+        await scheduler.acquire("a")
+    assert scheduler.in_flight == 10
+    assert scheduler.queued == 0
+
+
+async def test_scheduler_rejects_non_positive_limit():
+    with pytest.raises(ValueError):
+        FairScheduler(0)
+
+
+async def test_scheduler_round_robins_across_keys():
+    scheduler = FairScheduler(max_concurrency=1)
+    await scheduler.acquire("a")
+
+    order: list[str] = []
+
+    async def worker(key: str):
+        async with scheduler.slot(key):
+            order.append(key)
+            await asyncio.sleep(0)
+
+    # a burst from "a" queued before a single request from "b"
+    tasks = [asyncio.create_task(worker("a")) for _ in range(3)]
+    tasks.append(asyncio.create_task(worker("b")))
+    await asyncio.sleep(0)
+    assert scheduler.queued == 4
+
+    scheduler.release()
+    await asyncio.gather(*tasks)
+
+    assert order[:2] == ["a", "b"]
+    assert scheduler.in_flight == 0
+
+
+async def test_scheduler_cancelled_waiter_does_not_leak_slot():
+    scheduler = FairScheduler(max_concurrency=1)
+    await scheduler.acquire("a")
+
+    waiter = asyncio.create_task(scheduler.acquire("b"))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    assert scheduler.queued == 0
+    scheduler.release()
+    assert scheduler.in_flight == 0
+
+
+@pytest.fixture
+async def fake_vllm():
+    requests: list[dict] = []
+
+    async def completions(request: web.Request) -> web.Response:
+        body = await request.json()
+        requests.append(body)
+        return web.json_response(
+            {
+                "choices": [{"text": "ok"}],
+                "usage": {"prompt_tokens": 7, "completion_tokens": 3},
+            }
+        )
+
+    async def health(request: web.Request) -> web.Response:
+        return web.Response(text="")
+
+    app = web.Application()
+    app.router.add_post("/v1/completions", completions)
+    app.router.add_get("/health", health)
+
+    server = TestServer(app)
+    await server.start_server()
+    server.requests = requests  # type: ignore[attr-defined]
+    yield server
+    await server.close()
+
+
+async def test_upstream_reuses_one_session_and_records_metrics(fake_vllm):
+    metrics = MetricsRegistry()
+    upstream = VLLMUpstream(
+        str(fake_vllm.make_url("")), max_concurrency=2, metrics=metrics
+    )
+
+    responses = await asyncio.gather(
+        upstream.completions({"prompt": "a"}, guardrail="scope-guard"),
+        upstream.completions({"prompt": "b"}, guardrail="claim-extractor"),
+    )
+    session = upstream._session
+
+    assert [r["choices"][0]["text"] for r in responses] == ["ok", "ok"]
+    assert len(fake_vllm.requests) == 2
+    assert upstream._get_session() is session
+    assert (
+        metrics.get_counter(
+            "orbitals_upstream_requests_total", guardrail="scope-guard", status="200"
+        )
+        == 1
+    )
+    assert (
+        metrics.get_counter(
+            "orbitals_upstream_prompt_tokens_total", guardrail="claim-extractor"
+        )
+        == 7
+    )
+    assert metrics.get_gauge("orbitals_upstream_in_flight") == 0
+    assert await upstream.is_healthy()
+
+    await upstream.aclose()
+    assert session.closed
+
+
+async def test_upstream_is_unhealthy_when_unreachable():
+    upstream = VLLMUpstream("http://127.0.0.1:1", metrics=MetricsRegistry())
+    assert not await upstream.is_healthy(timeout=0.5)
+    await upstream.aclose()
+
+
+async def test_upstream_routes_around_an_unhealthy_replica(fake_vllm):
+    down = "http://127.0.0.1:1"
+    upstream = VLLMUpstream(
+        [str(fake_vllm.make_url("")), down], metrics=MetricsRegistry()
+    )
+
+    assert await upstream.is_healthy(timeout=0.5)
+    assert upstream.router.unhealthy == {down}
+    for key in (f"d{i}" for i in range(20)):
+        await upstream.completions({"prompt": "a"}, routing_key=key)
+    assert len(fake_vllm.requests) == 20
+    assert upstream.router.stats()[down]["requests"] == 0
+
+    await upstream.aclose()
+
+
+async def test_vllm_api_backends_post_through_upstream():
+    from orbitals.claim_extractor import AsyncClaimExtractor
+    from orbitals.scope_guard import AsyncScopeGuard
+
+    calls: list[tuple[dict, str]] = []
+
+    class _RecordingUpstream:
+        async def completions(
+            self, request_body, guardrail="default", routing_key=None
+        ):
+            calls.append((request_body, guardrail))
+            return {}
+
+    upstream = _RecordingUpstream()
+    scope_guard = AsyncScopeGuard(backend="vllm-api", upstream=upstream)
+    claim_extractor = AsyncClaimExtractor(backend="vllm-api", upstream=upstream)
+
+    await scope_guard._post_completion({"prompt": "a"})
+    await claim_extractor._post_completion({"prompt": "b"})
+
+    assert calls == [
+        ({"prompt": "a"}, "scope-guard"),
+        ({"prompt": "b"}, "claim-extractor"),
+    ]
+
+
+REPLICAS = [f"http://replica-{i}:8000" for i in range(3)]
+
+
+def test_router_keeps_every_key_on_one_replica():
+    router = ReplicaRouter(REPLICAS, metrics=MetricsRegistry())
+
+    replicas = {key: router.select(key) for key in (f"d{i}" for i in range(30))}
+
+    assert all(router.select(key) == replica for key, replica in replicas.items())
+    assert set(replicas.values()) == set(REPLICAS)
+    # the keys of the remaining replicas do not move when one is removed
+    smaller = ReplicaRouter(REPLICAS[:2], metrics=MetricsRegistry())
+    assert all(
+        smaller.select(key) == replica
+        for key, replica in replicas.items()
+        if replica != REPLICAS[2]
+    )
+
+
+def test_router_spills_a_hot_key_over_to_other_replicas():
+    router = ReplicaRouter(REPLICAS, load_factor=1.25, metrics=MetricsRegistry())
+    home = router.select("hot")
+
+    with ExitStack() as stack:
+        for _ in range(9):
+            stack.enter_context(router.route("hot"))
+        # at most 1.25 times the average of 3 in-flight requests
+        assert router.in_flight[home] == 4
+        assert max(router.in_flight.values()) == 4
+        assert min(router.in_flight.values()) >= 1
+    assert sum(router.in_flight.values()) == 0
+
+
+def test_router_estimates_prefix_hits_per_replica():
+    metrics = MetricsRegistry()
+    router = ReplicaRouter(REPLICAS, prefix_cache_size=1, metrics=metrics)
+
+    for key in ["a", "a", "a", None]:
+        with router.route(key):
+            pass
+    replica = router.select("a")
+
+    assert router.stats()[replica]["prefix_hits"] == 2
+    assert (
+        metrics.get_counter("orbitals_replica_prefix_hits_total", replica=replica) == 2
+    )
+    assert sum(stats["requests"] for stats in router.stats().values()) == 4
+
+
+def test_router_skips_unhealthy_replicas():
+    router = ReplicaRouter(REPLICAS, metrics=MetricsRegistry())
+    keys = [f"d{i}" for i in range(30)]
+    replicas = {key: router.select(key) for key in keys}
+
+    router.unhealthy = {REPLICAS[0]}
+    assert REPLICAS[0] not in {router.select(key) for key in [*keys, None]}
+    # the keys of the healthy replicas stay where they were
+    assert all(
+        router.select(key) == replica
+        for key, replica in replicas.items()
+        if replica != REPLICAS[0]
+    )
+
+    # with every replica down, requests are still routed
+    router.unhealthy = set(REPLICAS)
+    assert router.select("d0") in REPLICAS
+
+
+def test_router_rejects_invalid_settings():
+    with pytest.raises(ValueError):
+        ReplicaRouter([])
+    with pytest.raises(ValueError):
+        ReplicaRouter(REPLICAS, load_factor=0.5)
+
+
+class _FakeTokenizer:
+    def apply_chat_template(self, messages, **kwargs):
+        return "".join(m["content"] for m in messages)
+
+    def encode(self, text):
+        return list(range(len(text) // 4))
+
+
+async def test_vllm_api_backends_route_descriptions_to_replicas(monkeypatch):
+    from orbitals.claim_extractor import AsyncClaimExtractor
+    from orbitals.claim_extractor.extractors import vllm
+    from orbitals.dev import FakeVLLM
+
+    monkeypatch.setattr(vllm, "_get_tokenizer", lambda name: _FakeTokenizer())
+    fakes = [FakeVLLM(seed=i) for i in range(3)]
+    servers = [TestServer(fake.create_app()) for fake in fakes]
+    for server in servers:
+        await server.start_server()
+    urls = [str(server.make_url("")) for server in servers]
+
+    try:
+        descriptions = [f"Assistant {i}." for i in range(6)]
+        for url_list, upstream in [
+            (urls, None),
+            (urls[0], VLLMUpstream(urls, metrics=MetricsRegistry())),
+        ]:
+            extractor = AsyncClaimExtractor(
+                backend="vllm-api", vllm_serving_url=url_list, upstream=upstream
+            )
+            router = upstream.router if upstream is not None else extractor.router
+            for fake in fakes:
+                fake.requests = 0
+
+            for _ in range(3):
+                for description in descriptions:
+                    await extractor.extract("Hi", ai_service_description=description)
+
+            assert [fake.requests for fake in fakes] == [
+                3 * sum(router.select(d) == url.rstrip("/") for d in descriptions)
+                for url in urls
+            ]
+            stats = router.stats()
+            assert sum(replica["prefix_hits"] for replica in stats.values()) == 12
+            if upstream is not None:
+                assert await upstream.is_healthy()
+                await upstream.aclose()
+    finally:
+        for server in servers:
+            await server.close()